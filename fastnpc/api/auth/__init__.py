@@ -36,7 +36,9 @@ from fastnpc.api.auth.users import (
     change_password,
     list_users,
     get_user_by_id,
-    delete_account
+    delete_account,
+    get_user_settings_async,
+    get_user_by_id_async
 )
 
 # ===== 角色管理 =====
@@ -49,7 +51,8 @@ from fastnpc.api.auth.characters import (
     update_character_structured,
     get_character_detail,
     mark_character_as_test_case,
-    reset_character_state
+    reset_character_state,
+    get_or_create_character_async
 )
 
 # ===== 消息管理 =====
@@ -58,7 +61,15 @@ from fastnpc.api.auth.messages import (
     list_messages,
     mark_messages_as_compressed,
     mark_group_messages_as_compressed,
-    update_message_system_prompt
+    update_message_system_prompt,
+    get_message_system_prompt,
+    MESSAGE_COLUMNS_CHAT,
+    MESSAGE_COLUMNS_DEFAULT,
+    MESSAGE_COLUMNS_FULL,
+    add_message_async,
+    list_messages_async,
+    update_message_system_prompt_async,
+    schedule_message_system_prompt_update
 )
 
 # ===== 群聊功能 =====
@@ -74,7 +85,9 @@ from fastnpc.api.auth.groups import (
     get_group_chat_detail,
     remove_group_member,
     mark_group_as_test_case,
-    reset_group_state
+    reset_group_state,
+    GROUP_MESSAGE_COLUMNS_DEFAULT,
+    GROUP_MESSAGE_COLUMNS_FULL
 )
 
 # ===== 反馈系统 =====
@@ -90,15 +103,23 @@ from fastnpc.api.auth.feedbacks import (
 from fastnpc.api.auth.char_data import (
     save_character_full_data,
     load_character_full_data_impl,
+    load_characters_full_data_impl,
     save_character_memories_impl,
     load_character_memories_impl
 )
 
 # 为向后兼容，提供这三个包装函数
-def load_character_full_data(character_id: int):
+def load_character_full_data(character_id: int, include_baike: bool = True, include_memories: bool = False):
     """从所有相关表加载完整角色数据"""
     from fastnpc.config import USE_POSTGRESQL
-    return load_character_full_data_impl(_get_conn, _row_to_dict, USE_POSTGRESQL, character_id)
+    return load_character_full_data_impl(_get_conn, _row_to_dict, USE_POSTGRESQL, character_id,
+                                         include_baike=include_baike, include_memories=include_memories)
+
+def load_characters_full_data(character_ids, include_baike: bool = True, include_memories: bool = False):
+    """批量加载多个角色的完整数据，返回 {角色ID: 数据}"""
+    from fastnpc.config import USE_POSTGRESQL
+    return load_characters_full_data_impl(_get_conn, USE_POSTGRESQL, character_ids,
+                                          include_baike=include_baike, include_memories=include_memories)
 
 def save_character_memories(character_id: int, short_term=None, long_term=None):
     """保存角色记忆到数据库"""
@@ -137,6 +158,8 @@ __all__ = [
     'list_users',
     'get_user_by_id',
     'delete_account',
+    'get_user_settings_async',
+    'get_user_by_id_async',
     
     # 角色管理
     'get_or_create_character',
@@ -148,6 +171,7 @@ __all__ = [
     'get_character_detail',
     'mark_character_as_test_case',
     'reset_character_state',
+    'get_or_create_character_async',
     
     # 消息管理
     'add_message',
@@ -155,6 +179,14 @@ __all__ = [
     'mark_messages_as_compressed',
     'mark_group_messages_as_compressed',
     'update_message_system_prompt',
+    'get_message_system_prompt',
+    'MESSAGE_COLUMNS_CHAT',
+    'MESSAGE_COLUMNS_DEFAULT',
+    'MESSAGE_COLUMNS_FULL',
+    'add_message_async',
+    'list_messages_async',
+    'update_message_system_prompt_async',
+    'schedule_message_system_prompt_update',
     
     # 群聊功能
     'create_group_chat',
@@ -169,6 +201,8 @@ __all__ = [
     'remove_group_member',
     'mark_group_as_test_case',
     'reset_group_state',
+    'GROUP_MESSAGE_COLUMNS_DEFAULT',
+    'GROUP_MESSAGE_COLUMNS_FULL',
     
     # 反馈系统
     'create_feedback',
@@ -180,6 +214,7 @@ __all__ = [
     # 角色完整数据操作
     'save_character_full_data',
     'load_character_full_data',
+    'load_characters_full_data',
     'save_character_memories',
     'load_character_memories',
 ]
@@ -8,7 +8,8 @@
 from __future__ import annotations
 import time
 import json
-from typing import Dict, Any, List, Optional
+import difflib
+from typing import Any, Callable, Dict, List, Optional
 
 # 注意：_get_conn, _row_to_dict, USE_POSTGRESQL 作为参数传入，避免循环导入
 
@@ -79,158 +80,79 @@ def save_character_full_data(user_id: int, name: str, structured_data: Dict[str,
                 conn.commit()
                 character_id = int(cur.lastrowid)
         
-        # 辅助函数：将复杂类型转换为JSON字符串
-        def _safe_json_value(value):
-            if value is None:
-                return None
-            if isinstance(value, (dict, list)):
-                return json.dumps(value, ensure_ascii=False)
-            return str(value) if value else None
-        
-        # 2. 保存基础身份信息
-        basic_info = structured_data.get('基础身份信息', {})
-        if basic_info:
-            cur.execute("DELETE FROM character_basic_info WHERE character_id=%s", (character_id,))
-            cur.execute(
-                """INSERT INTO character_basic_info(character_id, name, age, gender, occupation, identity_background, appearance, titles, brief_intro)
-                   VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
-                (character_id, 
-                 _safe_json_value(basic_info.get('姓名')),
-                 _safe_json_value(basic_info.get('年龄')),
-                 _safe_json_value(basic_info.get('性别')),
-                 _safe_json_value(basic_info.get('职业')),
-                 _safe_json_value(basic_info.get('身份背景')),
-                 _safe_json_value(basic_info.get('外貌特征')),
-                 _safe_json_value(basic_info.get('称谓/头衔')),
-                 _safe_json_value(basic_info.get('人物简介')))
-            )
-        
-        # 3. 保存知识与能力
-        knowledge = structured_data.get('知识与能力', {})
-        if knowledge:
-            cur.execute("DELETE FROM character_knowledge WHERE character_id=%s", (character_id,))
-            cur.execute(
-                """INSERT INTO character_knowledge(character_id, knowledge_domain, skills, limitations)
-                   VALUES(%s,%s,%s,%s)""",
-                (character_id, _safe_json_value(knowledge.get('知识领域')), 
-                 _safe_json_value(knowledge.get('技能')), _safe_json_value(knowledge.get('限制')))
-            )
-        
-        # 4. 保存个性与行为设定
-        personality = structured_data.get('个性与行为设定', {})
-        if personality:
-            cur.execute("DELETE FROM character_personality WHERE character_id=%s", (character_id,))
-            cur.execute(
-                """INSERT INTO character_personality(character_id, traits, values, emotion_style, speaking_style, preferences, dislikes, motivation_goals)
-                   VALUES(%s,%s,%s,%s,%s,%s,%s,%s)""",
-                (character_id, _safe_json_value(personality.get('性格特质')), 
-                 _safe_json_value(personality.get('价值观')), _safe_json_value(personality.get('情绪风格')),
-                 _safe_json_value(personality.get('说话方式')), _safe_json_value(personality.get('偏好')), 
-                 _safe_json_value(personality.get('厌恶')), _safe_json_value(personality.get('动机与目标')))
-            )
-        
-        # 5. 保存对话与交互规范
-        dialogue = structured_data.get('对话与交互规范', {})
-        if dialogue:
-            cur.execute("DELETE FROM character_dialogue_rules WHERE character_id=%s", (character_id,))
-            cur.execute(
-                """INSERT INTO character_dialogue_rules(character_id, tone, language_style, behavior_constraints, interaction_pattern)
-                   VALUES(%s,%s,%s,%s,%s)""",
-                (character_id, _safe_json_value(dialogue.get('语气')), _safe_json_value(dialogue.get('语言风格')), 
-                 _safe_json_value(dialogue.get('行为约束')), _safe_json_value(dialogue.get('互动模式')))
-            )
-        
-        # 6. 保存任务/功能性信息
-        tasks = structured_data.get('任务/功能性信息', {})
-        if tasks:
-            cur.execute("DELETE FROM character_tasks WHERE character_id=%s", (character_id,))
-            cur.execute(
-                """INSERT INTO character_tasks(character_id, task_goal, dialogue_intent, interaction_limits, trigger_conditions)
-                   VALUES(%s,%s,%s,%s,%s)""",
-                (character_id, _safe_json_value(tasks.get('任务目标')), _safe_json_value(tasks.get('对话意图')), 
-                 _safe_json_value(tasks.get('交互限制')), _safe_json_value(tasks.get('触发条件')))
-            )
-        
-        # 7. 保存环境与世界观
-        worldview = structured_data.get('环境与世界观', {})
-        if worldview:
-            cur.execute("DELETE FROM character_worldview WHERE character_id=%s", (character_id,))
-            cur.execute(
-                """INSERT INTO character_worldview(character_id, worldview, timeline, social_rules, external_resources)
-                   VALUES(%s,%s,%s,%s,%s)""",
-                (character_id, _safe_json_value(worldview.get('世界观')), _safe_json_value(worldview.get('时间线')), 
-                 _safe_json_value(worldview.get('社会规则')), _safe_json_value(worldview.get('外部资源')))
-            )
-        
-        # 8. 保存背景故事
-        background = structured_data.get('背景故事', {})
-        if background:
-            cur.execute("DELETE FROM character_background WHERE character_id=%s", (character_id,))
-            cur.execute(
-                """INSERT INTO character_background(character_id, origin, current_situation, secrets)
-                   VALUES(%s,%s,%s,%s)""",
-                (character_id, _safe_json_value(background.get('出身')), 
-                 _safe_json_value(background.get('当前处境')), _safe_json_value(background.get('秘密')))
-            )
+        # 2~10. 各分区与已保存内容逐一比较，只写入有变化的分区（子表 character_id 唯一，原地更新）
+        current: Dict[str, Any] = {}
+        if row:
+            loader = _load_characters_pg if USE_POSTGRESQL else _load_characters_sqlite
+            current = loader(cur, [character_id], False, False).get(character_id, {})
+        
+        changed = 0
+        for section, table, fields in _SECTION_TABLES:
+            section_data = structured_data.get(section, {})
+            if not section_data:
+                continue
+            columns = [column for _, column in fields]
+            old_section = current.get(section)
+            if table == "character_source_info":
+                # 来源信息量：有百科全文时按其长度计算，否则保留原值
+                if baike_content is not None:
+                    source_info_size = len(baike_content)
+                else:
+                    source_info_size = (old_section or {}).get('来源信息量') or 0
+                values = [_safe_json_value(section_data.get('唯一标识')),
+                          _safe_json_value(section_data.get('链接')), source_info_size]
+            else:
+                values = [_safe_json_value(section_data.get(label)) for label, _ in fields]
+            
+            if old_section is None:
+                _insert_rows(cur, table, ["character_id"] + columns, [tuple([character_id] + values)])
+                changed += 1
+            elif [old_section.get(label) for label, _ in fields] != values:
+                assignments = ", ".join(f'"{column}"=%s' for column in columns)
+                cur.execute(f"UPDATE {table} SET {assignments} WHERE character_id=%s", tuple(values + [character_id]))
+                changed += 1
+            
+            if table != "character_background":
+                continue
             
-            # 保存经历
-            experiences = background.get('经历', [])
+            # 经历：按 sequence_order 排序，只写入变化的行
+            experiences = section_data.get('经历', [])
             if experiences:
-                cur.execute("DELETE FROM character_experiences WHERE character_id=%s", (character_id,))
-                for idx, exp in enumerate(experiences):
-                    cur.execute(
-                        """INSERT INTO character_experiences(character_id, experience_text, sequence_order, created_at)
-                           VALUES(%s,%s,%s,%s)""",
-                        (character_id, exp, idx, now)
-                    )
+                cur.execute(
+                    "SELECT id, experience_text, sequence_order FROM character_experiences "
+                    "WHERE character_id=%s ORDER BY sequence_order ASC, id ASC",
+                    (character_id,)
+                )
+                rows = cur.fetchall()
+                next_order = max((r[2] for r in rows), default=-1) + 1
+                changed += _sync_list_rows(
+                    cur, "character_experiences", "experience_text",
+                    [(r[0], r[1]) for r in rows], list(experiences),
+                    lambda offset, text: (character_id, text, next_order + offset, now),
+                    ["character_id", "experience_text", "sequence_order", "created_at"],
+                )
             
-            # 保存关系网络
-            relationships = background.get('关系网络', [])
+            # 关系网络：按 created_at 排序，只写入变化的行
+            relationships = section_data.get('关系网络', [])
             if relationships:
-                cur.execute("DELETE FROM character_relationships WHERE character_id=%s", (character_id,))
-                for rel in relationships:
-                    cur.execute(
-                        """INSERT INTO character_relationships(character_id, relationship_text, created_at)
-                           VALUES(%s,%s,%s)""",
-                        (character_id, rel, now)
-                    )
-        
-        # 9. 保存系统与控制参数
-        system_params = structured_data.get('系统与控制参数', {})
-        if system_params:
-            cur.execute("DELETE FROM character_system_params WHERE character_id=%s", (character_id,))
-            cur.execute(
-                """INSERT INTO character_system_params(character_id, consistency_control, preference_control, safety_limits, deduction_range)
-                   VALUES(%s,%s,%s,%s,%s)""",
-                (character_id, _safe_json_value(system_params.get('一致性控制')), 
-                 _safe_json_value(system_params.get('偏好控制')), 
-                 _safe_json_value(system_params.get('安全限制')), _safe_json_value(system_params.get('演绎范围')))
-            )
-        
-        # 10. 保存来源信息
-        source_info = structured_data.get('来源', {})
-        if source_info:
-            # 获取现有的 source_info_size（如果 baike_content 为 None，保留原值）
-            if baike_content is not None:
-                source_info_size = len(baike_content)
-            else:
-                # 保留原有的值
-                cur.execute("SELECT source_info_size FROM character_source_info WHERE character_id=%s", (character_id,))
-                existing_row = cur.fetchone()
-                if existing_row:
-                    source_info_size = existing_row[0] if existing_row[0] is not None else 0
-                else:
-                    source_info_size = 0
-            
-            cur.execute("DELETE FROM character_source_info WHERE character_id=%s", (character_id,))
-            cur.execute(
-                """INSERT INTO character_source_info(character_id, unique_id, source_url, source_info_size)
-                   VALUES(%s,%s,%s,%s)""",
-                (character_id, _safe_json_value(source_info.get('唯一标识')), 
-                 _safe_json_value(source_info.get('链接')), source_info_size)
-            )
+                cur.execute(
+                    "SELECT id, relationship_text FROM character_relationships "
+                    "WHERE character_id=%s ORDER BY created_at ASC, id ASC",
+                    (character_id,)
+                )
+                changed += _sync_list_rows(
+                    cur, "character_relationships", "relationship_text",
+                    [(r[0], r[1]) for r in cur.fetchall()], list(relationships),
+                    lambda offset, text: (character_id, text, now),
+                    ["character_id", "relationship_text", "created_at"],
+                )
         
         conn.commit()
+        
+        if changed:
+            # 画像已变化，使缓存的画像段失效
+            from fastnpc.chat.persona_cache import invalidate_persona_cache
+            invalidate_persona_cache(character_id)
         return character_id
         
     except Exception as e:
@@ -240,172 +162,353 @@ def save_character_full_data(user_id: int, name: str, structured_data: Dict[str,
         _return_conn(conn)
 
 
-def load_character_full_data_impl(_get_conn, _row_to_dict, USE_POSTGRESQL, character_id: int) -> Optional[Dict[str, Any]]:
-    """从所有相关表加载完整角色数据
-    
+# 一对一子表 → 结构化分区（顺序即返回字典中的分区顺序）
+_SECTION_TABLES = [
+    ("基础身份信息", "character_basic_info", [
+        ("姓名", "name"), ("年龄", "age"), ("性别", "gender"), ("职业", "occupation"),
+        ("身份背景", "identity_background"), ("外貌特征", "appearance"),
+        ("称谓/头衔", "titles"), ("人物简介", "brief_intro"),
+    ]),
+    ("知识与能力", "character_knowledge", [
+        ("知识领域", "knowledge_domain"), ("技能", "skills"), ("限制", "limitations"),
+    ]),
+    ("个性与行为设定", "character_personality", [
+        ("性格特质", "traits"), ("价值观", "values"), ("情绪风格", "emotion_style"),
+        ("说话方式", "speaking_style"), ("偏好", "preferences"), ("厌恶", "dislikes"),
+        ("动机与目标", "motivation_goals"),
+    ]),
+    ("对话与交互规范", "character_dialogue_rules", [
+        ("语气", "tone"), ("语言风格", "language_style"),
+        ("行为约束", "behavior_constraints"), ("互动模式", "interaction_pattern"),
+    ]),
+    ("任务/功能性信息", "character_tasks", [
+        ("任务目标", "task_goal"), ("对话意图", "dialogue_intent"),
+        ("交互限制", "interaction_limits"), ("触发条件", "trigger_conditions"),
+    ]),
+    ("环境与世界观", "character_worldview", [
+        ("世界观", "worldview"), ("时间线", "timeline"),
+        ("社会规则", "social_rules"), ("外部资源", "external_resources"),
+    ]),
+    ("背景故事", "character_background", [
+        ("出身", "origin"), ("当前处境", "current_situation"), ("秘密", "secrets"),
+    ]),
+    ("系统与控制参数", "character_system_params", [
+        ("一致性控制", "consistency_control"), ("偏好控制", "preference_control"),
+        ("安全限制", "safety_limits"), ("演绎范围", "deduction_range"),
+    ]),
+    ("来源", "character_source_info", [
+        ("唯一标识", "unique_id"), ("链接", "source_url"), ("来源信息量", "source_info_size"),
+    ]),
+]
+
+_MAIN_COLUMNS = ["id", "user_id", "name", "model", "source", "avatar_url", "created_at", "updated_at"]
+
+# SQLite IN (...) 每批的参数个数（旧版本 SQLite 限制 999 个变量）
+_SQLITE_BATCH = 500
+
+
+def _assemble_full_data(
+    main: Dict[str, Any],
+    sections: Dict[str, Dict[str, Any]],
+    experiences: List[str],
+    relationships: List[str],
+    memories: Optional[List[tuple]],
+    include_baike: bool,
+) -> Dict[str, Any]:
+    """由主表行、各子表行组装完整角色数据（格式与逐表查询时完全一致）"""
+    result = {
+        "_metadata": {
+            "character_id": main['id'],
+            "user_id": main['user_id'],
+            "name": main['name'],
+            "model": main['model'],
+            "source": main['source'],
+            "avatar_url": main.get('avatar_url'),
+            "created_at": main['created_at'],
+            "updated_at": main['updated_at'],
+        },
+    }
+    if include_baike:
+        result["baike_content"] = main.get('baike_content')
+    for section, table, fields in _SECTION_TABLES:
+        row = sections.get(table)
+        if not row:
+            continue
+        result[section] = {label: row.get(column) for label, column in fields}
+        if table == "character_background":
+            if experiences:
+                result[section]['经历'] = experiences
+            if relationships:
+                result[section]['关系网络'] = relationships
+    if memories is not None:
+        result["_memories"] = {
+            "short_term": [content for memory_type, content in memories if memory_type == 'short_term'],
+            "long_term": [content for memory_type, content in memories if memory_type == 'long_term'],
+        }
+    return result
+
+
+def _json_value(value: Any) -> Any:
+    """psycopg2 默认会把 json 列解码为 Python 对象，这里兼容未解码的字符串"""
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def _safe_json_value(value):
+    """将复杂类型转换为JSON字符串（与子表列的存储格式一致）"""
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value) if value else None
+
+
+def _insert_rows(cur, table: str, columns: List[str], rows: List[tuple]) -> None:
+    """多行 VALUES 批量插入（按 _SQLITE_BATCH 个参数分批）"""
+    if not rows:
+        return
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    row_placeholder = "(" + ",".join(["%s"] * len(columns)) + ")"
+    per_batch = max(1, _SQLITE_BATCH // len(columns))
+    for start in range(0, len(rows), per_batch):
+        batch = rows[start:start + per_batch]
+        params = [value for row in batch for value in row]
+        cur.execute(
+            f"INSERT INTO {table}({quoted}) VALUES " + ",".join([row_placeholder] * len(batch)),
+            tuple(params),
+        )
+
+
+def _delete_rows_by_id(cur, table: str, ids: List[int]) -> None:
+    """按主键批量删除"""
+    for start in range(0, len(ids), _SQLITE_BATCH):
+        batch = ids[start:start + _SQLITE_BATCH]
+        placeholders = ",".join(["%s"] * len(batch))
+        cur.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", tuple(batch))
+
+
+def _sync_list_rows(
+    cur,
+    table: str,
+    text_column: str,
+    existing: List[tuple],
+    new_items: List[str],
+    make_row: Callable[[int, str], tuple],
+    insert_columns: List[str],
+) -> int:
+    """把有序列表表（记忆/经历/关系）同步为 new_items，只写变化的行
+
+    existing 为按读取顺序排列的 (id, 文本)。新行总是追加在末尾（排序键大于已有行），
+    因此：
+    - 新列表 = 旧列表删掉若干条 + 末尾追加若干条（追加记忆、压缩后丢弃开头、随机裁剪）
+      → 按 id 删除被移除的行，只插入末尾新增的行
+    - 其它情况 → 按位置复用已有行：内容变化的按 id 更新，多余的按 id 删除，不足的追加
+
+    make_row(序号, 文本) 生成插入行，序号从 0 开始计数新增行。
+
+    Returns:
+        写入（插入/更新/删除）的行数
+    """
+    old_texts = [text for _, text in existing]
+    if old_texts == new_items:
+        return 0
+
+    delete_ids: List[int] = []
+    updates: List[tuple] = []
+    appended: List[str] = []
+
+    matcher = difflib.SequenceMatcher(None, old_texts, new_items, autojunk=False)
+    opcodes = matcher.get_opcodes()
+    tail_only = all(
+        tag in ("equal", "delete") or (tag == "insert" and i1 == len(old_texts) and index == len(opcodes) - 1)
+        for index, (tag, i1, _, _, _) in enumerate(opcodes)
+    )
+    if tail_only:
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "delete":
+                delete_ids.extend(row_id for row_id, _ in existing[i1:i2])
+            elif tag == "insert":
+                appended = new_items[j1:j2]
+    else:
+        for (row_id, old_text), new_text in zip(existing, new_items):
+            if old_text != new_text:
+                updates.append((new_text, row_id))
+        delete_ids = [row_id for row_id, _ in existing[len(new_items):]]
+        appended = new_items[len(existing):]
+
+    if updates:
+        cur.executemany(f"UPDATE {table} SET {text_column}=%s WHERE id=%s", updates)
+    _delete_rows_by_id(cur, table, delete_ids)
+    _insert_rows(cur, table, insert_columns, [make_row(offset, text) for offset, text in enumerate(appended)])
+    return len(updates) + len(delete_ids) + len(appended)
+
+
+def _load_characters_pg(cur, character_ids: List[int], include_baike: bool, include_memories: bool) -> Dict[int, Dict[str, Any]]:
+    """PostgreSQL：一条查询，子表通过相关子查询聚合为 JSON"""
+    main_cols = ", ".join(f"c.{col}" for col in _MAIN_COLUMNS + (["baike_content"] if include_baike else []))
+    section_cols = []
+    for _, table, fields in _SECTION_TABLES:
+        pairs = ", ".join(f"'{column}', t.\"{column}\"" for _, column in fields)
+        section_cols.append(f"(SELECT json_build_object({pairs}) FROM {table} t WHERE t.character_id = c.id) AS {table}")
+    section_cols.append(
+        "(SELECT json_agg(e.experience_text ORDER BY e.sequence_order ASC, e.id ASC) "
+        "FROM character_experiences e WHERE e.character_id = c.id) AS experiences"
+    )
+    section_cols.append(
+        "(SELECT json_agg(r.relationship_text ORDER BY r.created_at ASC, r.id ASC) "
+        "FROM character_relationships r WHERE r.character_id = c.id) AS relationships"
+    )
+    if include_memories:
+        section_cols.append(
+            "(SELECT json_agg(json_build_array(m.memory_type, m.content) ORDER BY m.created_at ASC, m.id ASC) "
+            "FROM character_memories m WHERE m.character_id = c.id) AS memories"
+        )
+    cur.execute(
+        f"SELECT {main_cols}, {', '.join(section_cols)} FROM characters c WHERE c.id = ANY(%s)",
+        (list(character_ids),),
+    )
+    columns = [desc[0] for desc in cur.description]
+    results = {}
+    for row in cur.fetchall():
+        data = dict(zip(columns, row))
+        sections = {table: _json_value(data.get(table)) for _, table, _ in _SECTION_TABLES}
+        memories = None
+        if include_memories:
+            memories = [tuple(m) for m in (_json_value(data.get('memories')) or [])]
+        results[int(data['id'])] = _assemble_full_data(
+            data,
+            sections,
+            _json_value(data.get('experiences')) or [],
+            _json_value(data.get('relationships')) or [],
+            memories,
+            include_baike,
+        )
+    return results
+
+
+def _load_characters_sqlite(cur, character_ids: List[int], include_baike: bool, include_memories: bool) -> Dict[int, Dict[str, Any]]:
+    """SQLite：每张表一条 IN (...) 查询，批量加载所有角色（查询数与角色数量无关）"""
+    results = {}
+    main_cols = _MAIN_COLUMNS + (["baike_content"] if include_baike else [])
+    for start in range(0, len(character_ids), _SQLITE_BATCH):
+        ids = character_ids[start:start + _SQLITE_BATCH]
+        placeholders = ",".join(["%s"] * len(ids))
+
+        cur.execute(f"SELECT {', '.join(main_cols)} FROM characters WHERE id IN ({placeholders})", tuple(ids))
+        mains = {int(row[0]): dict(zip(main_cols, row)) for row in cur.fetchall()}
+        if not mains:
+            continue
+
+        sections: Dict[int, Dict[str, Dict[str, Any]]] = {cid: {} for cid in mains}
+        for _, table, fields in _SECTION_TABLES:
+            columns = [column for _, column in fields]
+            quoted = ", ".join(f'"{column}"' for column in columns)
+            cur.execute(f"SELECT character_id, {quoted} FROM {table} WHERE character_id IN ({placeholders})", tuple(ids))
+            for row in cur.fetchall():
+                cid = int(row[0])
+                if cid in sections:
+                    sections[cid][table] = dict(zip(columns, row[1:]))
+
+        experiences: Dict[int, List[str]] = {}
+        cur.execute(
+            f"SELECT character_id, experience_text FROM character_experiences WHERE character_id IN ({placeholders}) "
+            "ORDER BY character_id, sequence_order ASC, id ASC",
+            tuple(ids),
+        )
+        for row in cur.fetchall():
+            experiences.setdefault(int(row[0]), []).append(row[1])
+
+        relationships: Dict[int, List[str]] = {}
+        cur.execute(
+            f"SELECT character_id, relationship_text FROM character_relationships WHERE character_id IN ({placeholders}) "
+            "ORDER BY character_id, created_at ASC, id ASC",
+            tuple(ids),
+        )
+        for row in cur.fetchall():
+            relationships.setdefault(int(row[0]), []).append(row[1])
+
+        memories: Dict[int, List[tuple]] = {}
+        if include_memories:
+            cur.execute(
+                f"SELECT character_id, memory_type, content FROM character_memories WHERE character_id IN ({placeholders}) "
+                "ORDER BY character_id, created_at ASC, id ASC",
+                tuple(ids),
+            )
+            for row in cur.fetchall():
+                memories.setdefault(int(row[0]), []).append((row[1], row[2]))
+
+        for cid, main in mains.items():
+            results[cid] = _assemble_full_data(
+                main,
+                sections[cid],
+                experiences.get(cid, []),
+                relationships.get(cid, []),
+                memories.get(cid, []) if include_memories else None,
+                include_baike,
+            )
+    return results
+
+
+def load_characters_full_data_impl(
+    _get_conn,
+    USE_POSTGRESQL,
+    character_ids: List[int],
+    include_baike: bool = True,
+    include_memories: bool = False,
+) -> Dict[int, Dict[str, Any]]:
+    """批量加载多个角色的完整数据（群聊成员、管理视图等）
+
+    PostgreSQL 一次往返完成；SQLite 每张子表一条查询。
+
     Args:
-        character_id: 角色ID
-    
+        character_ids: 角色ID列表
+        include_baike: 是否包含百科全文（体积较大，画像加载时不需要）
+        include_memories: 是否同时加载记忆，结果放在 "_memories" 键中
+            （{'short_term': [...], 'long_term': [...]}，与 load_character_memories 一致）
+
     Returns:
-        完整的角色数据字典，如果角色不存在则返回 None
+        {角色ID: 完整角色数据}，不存在的角色不出现在结果中
     """
     from fastnpc.api.auth.db_utils import _return_conn
+    ids = list(dict.fromkeys(int(i) for i in character_ids if i))
+    if not ids:
+        return {}
     conn = _get_conn()
     try:
         cur = conn.cursor()
-        
-        # 1. 加载主表数据
-        cur.execute("SELECT id, user_id, name, model, source, baike_content, avatar_url, created_at, updated_at FROM characters WHERE id=%s", (character_id,))
-        main_row = cur.fetchone()
-        if not main_row:
-            return None
-        
-        main_data = _row_to_dict(main_row, cur)
-        
-        result = {
-            "_metadata": {
-                "character_id": main_data['id'],
-                "user_id": main_data['user_id'],
-                "name": main_data['name'],
-                "model": main_data['model'],
-                "source": main_data['source'],
-                "avatar_url": main_data.get('avatar_url'),
-                "created_at": main_data['created_at'],
-                "updated_at": main_data['updated_at'],
-            },
-            "baike_content": main_data.get('baike_content'),
-        }
-        
-        # 2. 加载基础身份信息
-        cur.execute("SELECT * FROM character_basic_info WHERE character_id=%s", (character_id,))
-        basic_row = cur.fetchone()
-        if basic_row:
-            basic_data = _row_to_dict(basic_row, cur)
-            result['基础身份信息'] = {
-                "姓名": basic_data.get('name'),
-                "年龄": basic_data.get('age'),
-                "性别": basic_data.get('gender'),
-                "职业": basic_data.get('occupation'),
-                "身份背景": basic_data.get('identity_background'),
-                "外貌特征": basic_data.get('appearance'),
-                "称谓/头衔": basic_data.get('titles'),
-                "人物简介": basic_data.get('brief_intro'),
-            }
-        
-        # 3. 加载知识与能力
-        cur.execute("SELECT * FROM character_knowledge WHERE character_id=%s", (character_id,))
-        knowledge_row = cur.fetchone()
-        if knowledge_row:
-            knowledge_data = _row_to_dict(knowledge_row, cur)
-            result['知识与能力'] = {
-                "知识领域": knowledge_data.get('knowledge_domain'),
-                "技能": knowledge_data.get('skills'),
-                "限制": knowledge_data.get('limitations'),
-            }
-        
-        # 4. 加载个性与行为设定
-        cur.execute("SELECT * FROM character_personality WHERE character_id=%s", (character_id,))
-        personality_row = cur.fetchone()
-        if personality_row:
-            personality_data = _row_to_dict(personality_row, cur)
-            result['个性与行为设定'] = {
-                "性格特质": personality_data.get('traits'),
-                "价值观": personality_data.get('values'),
-                "情绪风格": personality_data.get('emotion_style'),
-                "说话方式": personality_data.get('speaking_style'),
-                "偏好": personality_data.get('preferences'),
-                "厌恶": personality_data.get('dislikes'),
-                "动机与目标": personality_data.get('motivation_goals'),
-            }
-        
-        # 5. 加载对话与交互规范
-        cur.execute("SELECT * FROM character_dialogue_rules WHERE character_id=%s", (character_id,))
-        dialogue_row = cur.fetchone()
-        if dialogue_row:
-            dialogue_data = _row_to_dict(dialogue_row, cur)
-            result['对话与交互规范'] = {
-                "语气": dialogue_data.get('tone'),
-                "语言风格": dialogue_data.get('language_style'),
-                "行为约束": dialogue_data.get('behavior_constraints'),
-                "互动模式": dialogue_data.get('interaction_pattern'),
-            }
-        
-        # 6. 加载任务/功能性信息
-        cur.execute("SELECT * FROM character_tasks WHERE character_id=%s", (character_id,))
-        tasks_row = cur.fetchone()
-        if tasks_row:
-            tasks_data = _row_to_dict(tasks_row, cur)
-            result['任务/功能性信息'] = {
-                "任务目标": tasks_data.get('task_goal'),
-                "对话意图": tasks_data.get('dialogue_intent'),
-                "交互限制": tasks_data.get('interaction_limits'),
-                "触发条件": tasks_data.get('trigger_conditions'),
-            }
-        
-        # 7. 加载环境与世界观
-        cur.execute("SELECT * FROM character_worldview WHERE character_id=%s", (character_id,))
-        worldview_row = cur.fetchone()
-        if worldview_row:
-            worldview_data = _row_to_dict(worldview_row, cur)
-            result['环境与世界观'] = {
-                "世界观": worldview_data.get('worldview'),
-                "时间线": worldview_data.get('timeline'),
-                "社会规则": worldview_data.get('social_rules'),
-                "外部资源": worldview_data.get('external_resources'),
-            }
-        
-        # 8. 加载背景故事
-        cur.execute("SELECT * FROM character_background WHERE character_id=%s", (character_id,))
-        background_row = cur.fetchone()
-        if background_row:
-            background_data = _row_to_dict(background_row, cur)
-            result['背景故事'] = {
-                "出身": background_data.get('origin'),
-                "当前处境": background_data.get('current_situation'),
-                "秘密": background_data.get('secrets'),
-            }
-            
-            # 加载经历
-            cur.execute("SELECT experience_text FROM character_experiences WHERE character_id=%s ORDER BY sequence_order ASC", (character_id,))
-            exp_rows = cur.fetchall()
-            if exp_rows:
-                result['背景故事']['经历'] = [_row_to_dict(row, cur)['experience_text'] for row in exp_rows]
-            
-            # 加载关系网络
-            cur.execute("SELECT relationship_text FROM character_relationships WHERE character_id=%s ORDER BY created_at ASC", (character_id,))
-            rel_rows = cur.fetchall()
-            if rel_rows:
-                result['背景故事']['关系网络'] = [_row_to_dict(row, cur)['relationship_text'] for row in rel_rows]
-        
-        # 9. 加载系统与控制参数
-        cur.execute("SELECT * FROM character_system_params WHERE character_id=%s", (character_id,))
-        system_row = cur.fetchone()
-        if system_row:
-            system_data = _row_to_dict(system_row, cur)
-            result['系统与控制参数'] = {
-                "一致性控制": system_data.get('consistency_control'),
-                "偏好控制": system_data.get('preference_control'),
-                "安全限制": system_data.get('safety_limits'),
-                "演绎范围": system_data.get('deduction_range'),
-            }
-        
-        # 10. 加载来源信息
-        cur.execute("SELECT * FROM character_source_info WHERE character_id=%s", (character_id,))
-        source_row = cur.fetchone()
-        if source_row:
-            source_data = _row_to_dict(source_row, cur)
-            result['来源'] = {
-                "唯一标识": source_data.get('unique_id'),
-                "链接": source_data.get('source_url'),
-                "来源信息量": source_data.get('source_info_size'),
-            }
-        
-        return result
-        
+        if USE_POSTGRESQL:
+            return _load_characters_pg(cur, ids, include_baike, include_memories)
+        return _load_characters_sqlite(cur, ids, include_baike, include_memories)
     finally:
         _return_conn(conn)
 
 
+def load_character_full_data_impl(
+    _get_conn,
+    _row_to_dict,
+    USE_POSTGRESQL,
+    character_id: int,
+    include_baike: bool = True,
+    include_memories: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """从所有相关表加载完整角色数据
+    
+    Args:
+        character_id: 角色ID
+        include_baike: 是否包含百科全文
+        include_memories: 是否同时加载记忆（见 load_characters_full_data_impl）
+    
+    Returns:
+        完整的角色数据字典，如果角色不存在则返回 None
+    """
+    results = load_characters_full_data_impl(
+        _get_conn, USE_POSTGRESQL, [character_id],
+        include_baike=include_baike, include_memories=include_memories,
+    )
+    return results.get(int(character_id))
+
+
 def save_character_memories_impl(_get_conn, USE_POSTGRESQL, character_id: int, short_term: List[str] = None, long_term: List[str] = None) -> None:
     """保存角色记忆到数据库（并清除缓存）
     
@@ -423,27 +526,26 @@ def save_character_memories_impl(_get_conn, USE_POSTGRESQL, character_id: int, s
     try:
         cur = conn.cursor()
         
-        # 保存短期记忆
-        if short_term is not None:
-            # 先删除旧的短期记忆
-            cur.execute("DELETE FROM character_memories WHERE character_id=%s AND memory_type=%s", (character_id, 'short_term'))
-            # 插入新的短期记忆
-            for memory in short_term:
-                cur.execute(
-                    "INSERT INTO character_memories(character_id, memory_type, content, created_at) VALUES(%s,%s,%s,%s)",
-                    (character_id, 'short_term', memory, now)
-                )
-        
-        # 保存长期记忆
-        if long_term is not None:
-            # 先删除旧的长期记忆
-            cur.execute("DELETE FROM character_memories WHERE character_id=%s AND memory_type=%s", (character_id, 'long_term'))
-            # 插入新的长期记忆
-            for memory in long_term:
-                cur.execute(
-                    "INSERT INTO character_memories(character_id, memory_type, content, created_at) VALUES(%s,%s,%s,%s)",
-                    (character_id, 'long_term', memory, now)
-                )
+        # 读取已有记忆（按加载时的顺序），与新列表比较后只写入变化的行：
+        # 追加记忆只插入新增条目，压缩/裁剪只按 id 删除被移除的条目
+        targets = [(memory_type, items) for memory_type, items in (('short_term', short_term), ('long_term', long_term)) if items is not None]
+        existing: Dict[str, List[tuple]] = {memory_type: [] for memory_type, _ in targets}
+        if targets:
+            cur.execute(
+                "SELECT id, memory_type, content FROM character_memories WHERE character_id=%s ORDER BY created_at ASC, id ASC",
+                (character_id,)
+            )
+            for row in cur.fetchall():
+                if row[1] in existing:
+                    existing[row[1]].append((row[0], row[2]))
+        
+        for memory_type, items in targets:
+            _sync_list_rows(
+                cur, "character_memories", "content",
+                existing[memory_type], list(items),
+                lambda offset, text, memory_type=memory_type: (character_id, memory_type, text, now),
+                ["character_id", "memory_type", "content", "created_at"],
+            )
         
         conn.commit()
         
@@ -483,7 +585,7 @@ def load_character_memories_impl(_get_conn, _row_to_dict, USE_POSTGRESQL, charac
         
         # 加载短期记忆
         cur.execute(
-            "SELECT content FROM character_memories WHERE character_id=%s AND memory_type=%s ORDER BY created_at ASC",
+            "SELECT content FROM character_memories WHERE character_id=%s AND memory_type=%s ORDER BY created_at ASC, id ASC",
             (character_id, 'short_term')
         )
         short_rows = cur.fetchall()
@@ -491,7 +593,7 @@ def load_character_memories_impl(_get_conn, _row_to_dict, USE_POSTGRESQL, charac
         
         # 加载长期记忆
         cur.execute(
-            "SELECT content FROM character_memories WHERE character_id=%s AND memory_type=%s ORDER BY created_at ASC",
+            "SELECT content FROM character_memories WHERE character_id=%s AND memory_type=%s ORDER BY created_at ASC, id ASC",
             (character_id, 'long_term')
         )
         long_rows = cur.fetchall()
@@ -7,10 +7,14 @@
 
 from __future__ import annotations
 
+import asyncio
 import time
 from typing import Optional, Tuple, Dict, Any
 
 from fastnpc.api.auth.db_utils import _get_conn, _row_to_dict, _return_conn
+from fastnpc.api.auth.db_pool_async import get_async_db_connection, async_db_available
+from fastnpc.api.auth.prompt_snapshots import release_snapshots_where
+from fastnpc.chat.persona_cache import invalidate_persona_cache
 from fastnpc.config import USE_POSTGRESQL
 from fastnpc.api.cache import get_redis_cache
 
@@ -145,7 +149,8 @@ def delete_character(user_id: int, name: str) -> None:
             # 注意：由于设置了 ON DELETE CASCADE 外键约束，理论上删除 characters 记录会自动级联删除
             # 但为了兼容旧数据库（可能没有外键约束），这里显式删除所有子表数据
             try:
-                # 删除消息
+                # 删除消息（并释放其引用的prompt快照）
+                release_snapshots_where(cur, "messages", "user_id=%s AND character_id=%s", (user_id, cid))
                 cur.execute("DELETE FROM messages WHERE user_id=%s AND character_id=%s", (user_id, cid))
                 
                 # 删除角色详细信息（9个分类表）
@@ -218,6 +223,7 @@ def update_character_structured(user_id: int, name: str, structured_json: str) -
         # 清除角色配置缓存
         cache = get_redis_cache()
         cache.delete(f"{CACHE_KEY_CHARACTER_PROFILE}:{user_id}:{name}")
+        invalidate_persona_cache(cid)
     finally:
         _return_conn(conn)
 
@@ -287,7 +293,8 @@ def reset_character_state(user_id: int, character_id: int) -> Tuple[bool, str, i
         row_dict = _row_to_dict(row, cur)
         name = row_dict['name']
         
-        # 删除对话消息
+        # 删除对话消息（并释放其引用的prompt快照）
+        release_snapshots_where(cur, "messages", "user_id=%s AND character_id=%s", (user_id, character_id))
         cur.execute("DELETE FROM messages WHERE user_id=%s AND character_id=%s", (user_id, character_id))
         message_count = cur.rowcount
         
@@ -310,3 +317,40 @@ def reset_character_state(user_id: int, character_id: int) -> Tuple[bool, str, i
     finally:
         _return_conn(conn)
 
+
+# ===== 异步版本（供 async 路由使用，不阻塞事件循环）=====
+
+async def get_or_create_character_async(user_id: int, name: str) -> int:
+    """获取或创建角色（异步版本，参数与返回值同 get_or_create_character）"""
+    if not async_db_available():
+        return await asyncio.to_thread(get_or_create_character, user_id, name)
+    async with get_async_db_connection() as conn:
+        character_id = await conn.fetchval("SELECT id FROM characters WHERE user_id=%s AND name=%s", (user_id, name))
+        if character_id is not None:
+            return int(character_id)
+        
+        now = int(time.time())
+        params = (user_id, name, '', '', '', now, now)
+        if USE_POSTGRESQL:
+            character_id = await conn.fetchval(
+                "INSERT INTO characters(user_id, name, model, source, structured_json, created_at, updated_at) VALUES(%s,%s,%s,%s,%s,%s,%s) RETURNING id",
+                params,
+            )
+        else:
+            character_id = await conn.execute(
+                "INSERT INTO characters(user_id, name, model, source, structured_json, created_at, updated_at) VALUES(%s,%s,%s,%s,%s,%s,%s)",
+                params,
+            )
+    
+    # 清除相关缓存（创建了新角色；Redis 调用在线程中执行，不阻塞事件循环）
+    def _invalidate() -> None:
+        cache = get_redis_cache()
+        cache.delete(f"{CACHE_KEY_CHARACTER_ID}:{user_id}:{name}")
+        cache.delete(f"{CACHE_KEY_CHARACTER_LIST}:{user_id}")
+
+    try:
+        await asyncio.to_thread(_invalidate)
+    except Exception as e:
+        print(f"[WARN] 清除缓存失败: {e}")
+    
+    return int(character_id)
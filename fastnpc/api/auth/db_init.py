@@ -3,10 +3,11 @@
 数据库初始化
 
 创建所有数据库表结构，支持 PostgreSQL 和 SQLite。
-包含数据库迁移逻辑（添加新字段）。
+包含数据库迁移逻辑（添加新字段），之后执行 db_migrations 中的版本化迁移。
 """
 
 from fastnpc.api.auth.db_utils import _get_conn, _column_exists, _return_conn
+from fastnpc.api.auth.db_migrations import run_migrations
 from fastnpc.config import USE_POSTGRESQL
 
 
@@ -948,5 +949,9 @@ def init_db():
     print("[INFO] 提示词管理系统表创建完成")
     
     conn.commit()
+    
+    # 版本化结构迁移（索引等，按版本号只执行一次）
+    run_migrations(conn)
+    
     _return_conn(conn)
 
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+版本化数据库迁移
+
+init_db() 负责建表和历史字段补齐；此处按版本号顺序执行之后的结构变更，
+已执行的版本记录在 schema_migrations 表中，每个版本只执行一次。
+
+新增迁移：在 MIGRATIONS 末尾追加 (版本号, 名称, 函数)，版本号递增，不要修改已发布的迁移。
+
+PostgreSQL 上普通 CREATE INDEX 在整个构建期间持有 SHARE 锁，大表（messages 等）建索引时所有写入被阻塞。
+给已有数据的表建索引的迁移登记在 ONLINE_MIGRATIONS 中：在 PostgreSQL 上以自动提交模式执行，
+索引用 CREATE INDEX CONCURRENTLY 建立（不能在事务中执行），构建期间读写照常进行。
+这类迁移不是原子的，每条语句都必须幂等（IF NOT EXISTS），中途失败后下次启动重新执行即可。
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from typing import Callable, List, Tuple
+
+from fastnpc.api.auth.db_utils import _column_exists
+from fastnpc.config import USE_POSTGRESQL
+
+
+# PostgreSQL advisory lock 键：多个 Worker 进程同时启动时串行执行迁移
+_MIGRATION_LOCK_KEY = 7_205_310_001
+
+# 会话记忆查询条件（与 list_messages / list_group_messages 中的写法保持一致，
+# 否则部分索引无法被优化器使用）
+UNCOMPRESSED_PREDICATE = "(compressed IS NULL OR compressed=0)"
+
+
+# 在 PostgreSQL 上以自动提交模式执行、索引并发构建的迁移版本（见模块说明）
+ONLINE_MIGRATIONS = {1, 2, 4}
+# 等待其它进程执行在线迁移时的轮询间隔（秒）
+_LOCK_POLL_INTERVAL = 1.0
+
+_INDEX_NAME_RE = re.compile(r"INDEX\s+(?:CONCURRENTLY\s+)?IF NOT EXISTS\s+(\w+)", re.IGNORECASE)
+
+
+def _create_index_sql() -> str:
+    """建索引语句前缀：PostgreSQL 上并发构建（只能在 ONLINE_MIGRATIONS 中使用）"""
+    return "CREATE INDEX CONCURRENTLY IF NOT EXISTS" if USE_POSTGRESQL else "CREATE INDEX IF NOT EXISTS"
+
+
+def message_index_statements(
+    messages_table: str = "messages",
+    group_messages_table: str = "group_messages",
+    create: str = "CREATE INDEX IF NOT EXISTS",
+) -> List[str]:
+    """聊天热路径索引的建表语句（表名可替换，供基准测试脚本复用）
+
+    - list_messages: WHERE user_id=? AND character_id=? [AND 未压缩] ORDER BY id
+    - list_group_messages: WHERE group_id=? [AND 未压缩] ORDER BY id
+    content 为大文本，不放进索引；按 id 有序的复合索引使 LIMIT 查询无需排序。
+    """
+    return [
+        f"{create} idx_{messages_table}_chat "
+        f"ON {messages_table}(user_id, character_id, id)",
+        f"{create} idx_{messages_table}_uncompressed "
+        f"ON {messages_table}(user_id, character_id, id) WHERE {UNCOMPRESSED_PREDICATE}",
+        f"{create} idx_{group_messages_table}_group "
+        f"ON {group_messages_table}(group_id, id)",
+        f"{create} idx_{group_messages_table}_uncompressed "
+        f"ON {group_messages_table}(group_id, id) WHERE {UNCOMPRESSED_PREDICATE}",
+    ]
+
+
+def _create_indexes(cur, statements: List[str]) -> None:
+    """执行建索引语句
+
+    CREATE INDEX CONCURRENTLY 中途失败会留下无效（INVALID）索引，而 IF NOT EXISTS 会跳过同名索引，
+    因此 PostgreSQL 上先删除同名的无效索引再重建。
+    """
+    for sql in statements:
+        match = _INDEX_NAME_RE.search(sql)
+        if USE_POSTGRESQL and match:
+            cur.execute(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = %s AND NOT i.indisvalid",
+                (match.group(1),),
+            )
+            if cur.fetchone():
+                print(f"[WARN] 删除上次中断留下的无效索引 {match.group(1)}")
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+        cur.execute(sql)
+
+
+def _migration_001_message_indexes(cur) -> None:
+    """messages / group_messages 热路径复合索引与未压缩部分索引"""
+    _create_indexes(cur, message_index_statements(create=_create_index_sql()))
+    # 更新统计信息，让优化器立即选用新索引
+    cur.execute("ANALYZE messages")
+    cur.execute("ANALYZE group_messages")
+
+
+def _migration_002_prompt_snapshots(cur) -> None:
+    """system prompt 快照去重存储（见 prompt_snapshots.py），消息表改为引用快照ID"""
+    if USE_POSTGRESQL:
+        id_type, int_type, blob_type = "SERIAL PRIMARY KEY", "INT", "BYTEA"
+    else:
+        id_type, int_type, blob_type = "INTEGER PRIMARY KEY AUTOINCREMENT", "INTEGER", "BLOB"
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS prompt_snapshots(
+            id {id_type},
+            content_hash TEXT NOT NULL UNIQUE,
+            size {int_type} NOT NULL,
+            ref_count {int_type} NOT NULL DEFAULT 0,
+            created_at BIGINT NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS prompt_chunks(
+            id {id_type},
+            chunk_hash TEXT NOT NULL UNIQUE,
+            data {blob_type} NOT NULL,
+            size {int_type} NOT NULL,
+            compressed {int_type} NOT NULL DEFAULT 0,
+            created_at BIGINT NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS prompt_snapshot_chunks(
+            snapshot_id {int_type} NOT NULL,
+            position {int_type} NOT NULL,
+            chunk_id {int_type} NOT NULL,
+            PRIMARY KEY (snapshot_id, position)
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_prompt_snapshot_chunks_chunk ON prompt_snapshot_chunks(chunk_id)")
+    for table in ("messages", "group_messages"):
+        if not _column_exists(cur, table, "system_prompt_snapshot_id"):
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN system_prompt_snapshot_id {int_type}")
+        # 供 gc_prompt_snapshots 重新统计引用计数
+        _create_indexes(cur, [
+            f"{_create_index_sql()} idx_{table}_snapshot ON {table}(system_prompt_snapshot_id) "
+            "WHERE system_prompt_snapshot_id IS NOT NULL"
+        ])
+
+
+def _migration_003_structure_results(cur) -> None:
+    """结构化 LLM 结果缓存（见 pipeline/structure/result_cache.py）"""
+    int_type = "INT" if USE_POSTGRESQL else "INTEGER"
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS structure_results(
+            content_hash TEXT NOT NULL,
+            category TEXT NOT NULL,
+            prompt_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            result_json TEXT NOT NULL,
+            hit_count {int_type} NOT NULL DEFAULT 0,
+            created_at BIGINT NOT NULL,
+            last_hit_at BIGINT NOT NULL,
+            PRIMARY KEY (content_hash, category, prompt_hash, model)
+        )
+        """
+    )
+
+
+def _migration_004_character_list_index(cur) -> None:
+    """角色列表（侧边栏）键集分页索引：与 _query_character_list 的排序表达式 COALESCE(updated_at, 0) 一致"""
+    drop = "DROP INDEX CONCURRENTLY IF EXISTS" if USE_POSTGRESQL else "DROP INDEX IF EXISTS"
+    # 旧版本 init_db 按原始列建立的索引
+    cur.execute(f"{drop} idx_characters_user_updated")
+    _create_indexes(cur, [
+        f"{_create_index_sql()} idx_characters_user_updated_key "
+        "ON characters(user_id, (COALESCE(updated_at, 0)) DESC, id DESC)"
+    ])
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "message_hot_path_indexes", _migration_001_message_indexes),
+    (2, "prompt_snapshots", _migration_002_prompt_snapshots),
+    (3, "structure_results", _migration_003_structure_results),
+    (4, "character_list_index", _migration_004_character_list_index),
+]
+
+
+def _ensure_migrations_table(cur) -> None:
+    if USE_POSTGRESQL:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations(
+                version INT PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at BIGINT NOT NULL
+            )
+            """
+        )
+    else:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations(
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at INTEGER NOT NULL
+            )
+            """
+        )
+
+
+def get_schema_version(cur) -> int:
+    """当前已执行的最大迁移版本（未执行过任何迁移时为 0）"""
+    cur.execute("SELECT MAX(version) FROM schema_migrations")
+    row = cur.fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def _run_online_migration(conn, version: int, name: str, migrate: Callable) -> bool:
+    """PostgreSQL：在自动提交模式下执行迁移（CREATE INDEX CONCURRENTLY 不能在事务中执行）
+
+    多个 Worker 之间用会话级 advisory lock 串行。其它进程用 pg_try_advisory_lock 轮询而不是阻塞等待：
+    阻塞中的 SELECT 持有快照，而 CREATE INDEX CONCURRENTLY 要等待所有更早的快照结束，两者会互相等待。
+
+    Returns:
+        本进程是否执行了该迁移（已由其它进程执行时为 False）
+    """
+    conn.autocommit = True
+    try:
+        cur = conn.cursor()
+        while True:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (_MIGRATION_LOCK_KEY,))
+            if cur.fetchone()[0]:
+                break
+            time.sleep(_LOCK_POLL_INTERVAL)
+        try:
+            if version <= get_schema_version(cur):
+                return False
+            migrate(cur)
+            cur.execute(
+                "INSERT INTO schema_migrations(version, name, applied_at) VALUES(%s,%s,%s)",
+                (version, name, int(time.time())),
+            )
+            return True
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (_MIGRATION_LOCK_KEY,))
+    finally:
+        conn.autocommit = False
+
+
+def run_migrations(conn) -> int:
+    """执行所有未执行的迁移，每个版本单独提交（PostgreSQL 上 ONLINE_MIGRATIONS 以自动提交模式执行）
+
+    Returns:
+        本次执行的迁移数量
+    """
+    cur = conn.cursor()
+    _ensure_migrations_table(cur)
+    conn.commit()
+
+    placeholder = "%s" if USE_POSTGRESQL else "?"
+    applied = 0
+    for version, name, migrate in MIGRATIONS:
+        try:
+            if USE_POSTGRESQL and version in ONLINE_MIGRATIONS:
+                started = time.time()
+                if _run_online_migration(conn, version, name, migrate):
+                    applied += 1
+                    print(f"[INFO] 数据库迁移 {version:03d}_{name} 完成（{time.time() - started:.1f}s）")
+                continue
+            if USE_POSTGRESQL:
+                # 事务级锁，提交/回滚时自动释放
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (_MIGRATION_LOCK_KEY,))
+            else:
+                cur.execute("BEGIN IMMEDIATE")
+            if version <= get_schema_version(cur):
+                conn.commit()
+                continue
+            started = time.time()
+            migrate(cur)
+            cur.execute(
+                f"INSERT INTO schema_migrations(version, name, applied_at) VALUES({placeholder},{placeholder},{placeholder})",
+                (version, name, int(time.time())),
+            )
+            conn.commit()
+            applied += 1
+            print(f"[INFO] 数据库迁移 {version:03d}_{name} 完成（{time.time() - started:.1f}s）")
+        except Exception as e:
+            conn.rollback()
+            print(f"[ERROR] 数据库迁移 {version:03d}_{name} 失败: {e}")
+            # 后续迁移可能依赖本次迁移，停止执行
+            break
+    return applied
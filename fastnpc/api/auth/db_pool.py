@@ -2,17 +2,20 @@
 """
 数据库连接池管理
 
-使用 psycopg2.pool.ThreadedConnectionPool 实现线程安全的连接池。
+使用自实现的 FairConnectionPool（基于 psycopg2）实现线程安全的公平连接池。
 支持 PostgreSQL 和 SQLite 两种数据库。
 """
 
 from __future__ import annotations
 
 import threading
+import time
+from collections import deque
 from contextlib import contextmanager
-from typing import Optional, Any
+from typing import Optional, Any, Dict
 
 import psycopg2
+import psycopg2.extensions
 from psycopg2 import pool
 
 from fastnpc.config import (
@@ -24,23 +27,252 @@ from fastnpc.config import (
     POSTGRES_PASSWORD,
     DB_PATH as CONFIG_DB_PATH,
     DB_POOL_MIN_CONN,
-    DB_POOL_MAX_CONN
+    DB_POOL_MAX_CONN,
+    DB_POOL_ACQUIRE_TIMEOUT,
+    DB_POOL_IDLE_CHECK_SECONDS,
+    DB_POOL_MAX_LIFETIME
 )
 
 
 # 全局连接池实例
-_pg_connection_pool: Optional[pool.ThreadedConnectionPool] = None
+_pg_connection_pool: Optional["FairConnectionPool"] = None
 _pool_lock = threading.Lock()
 
 DB_PATH = CONFIG_DB_PATH.as_posix()
 
+# 等待时间直方图的桶上界（毫秒），最后一个桶收集所有更长的等待
+WAIT_HISTOGRAM_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
 
-def _create_pg_connection_pool() -> pool.ThreadedConnectionPool:
+
+class PoolTimeoutError(Exception):
+    """在超时时间内无法从连接池获取连接"""
+
+
+class FairConnectionPool:
+    """线程安全的公平连接池（替代 psycopg2.pool.ThreadedConnectionPool）
+
+    - 连接池满时，请求按到达顺序（FIFO）在条件变量上排队等待，不再轮询 sleep
+    - 仅对空闲超过 idle_check_seconds 的连接做 SELECT 1 健康检查，而不是每次取出都检查
+    - 连接存活超过 max_lifetime 秒后在归还/取出时回收重建
+    - 记录获取连接的等待时间直方图，供 scripts/monitor_pool.py 展示
+    """
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        idle_check_seconds: float = 30.0,
+        max_lifetime: float = 1800.0,
+        **conn_kwargs,
+    ):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.idle_check_seconds = idle_check_seconds
+        self.max_lifetime = max_lifetime
+        self._conn_kwargs = conn_kwargs
+
+        self._cond = threading.Condition()
+        # 空闲连接：(conn, 上次归还时间)，后进先出以保持热连接
+        self._idle: deque = deque()
+        # 连接创建时间，用于最大存活时间
+        self._created_at: Dict[int, float] = {}
+        # 已创建（含正在创建中）的连接总数
+        self._size = 0
+        self._waiters: deque = deque()
+        self._closed = False
+
+        self._stats = {
+            "acquired": 0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "health_check_failed": 0,
+            "recycled_lifetime": 0,
+        }
+        self._wait_histogram = [0] * (len(WAIT_HISTOGRAM_BUCKETS_MS) + 1)
+        self._wait_total_ms = 0.0
+        self._wait_max_ms = 0.0
+
+        for _ in range(minconn):
+            with self._cond:
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._conn_kwargs)
+        self._created_at[id(conn)] = time.monotonic()
+        self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        """关闭连接并释放名额（调用方需持有 self._cond）"""
+        self._created_at.pop(id(conn), None)
+        self._size -= 1
+        self._stats["closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._cond.notify_all()
+
+    def _expired(self, conn, now: float) -> bool:
+        created = self._created_at.get(id(conn))
+        return created is not None and self.max_lifetime > 0 and now - created > self.max_lifetime
+
+    def _record_wait(self, wait_ms: float) -> None:
+        for i, bound in enumerate(WAIT_HISTOGRAM_BUCKETS_MS):
+            if wait_ms <= bound:
+                self._wait_histogram[i] += 1
+                break
+        else:
+            self._wait_histogram[-1] += 1
+        self._wait_total_ms += wait_ms
+        self._wait_max_ms = max(self._wait_max_ms, wait_ms)
+
+    def getconn(self, timeout: Optional[float] = None):
+        """获取连接；连接池满时按 FIFO 顺序阻塞等待
+
+        Raises:
+            PoolTimeoutError: 超时仍无可用连接
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        ticket = object()
+
+        with self._cond:
+            if self._closed:
+                raise pool.PoolError("connection pool is closed")
+            self._waiters.append(ticket)
+            try:
+                # 只有队首请求可以取连接，保证先到先得
+                while self._waiters[0] is not ticket or (not self._idle and self._size >= self.maxconn):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(f"连接池耗尽：等待{timeout}秒后仍无法获取连接")
+                    self._cond.wait(remaining)
+                    if self._closed:
+                        raise pool.PoolError("connection pool is closed")
+
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                else:
+                    # 预占名额，在锁外建立连接
+                    conn, idle_since = None, None
+                    self._size += 1
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+            wait_ms = (time.monotonic() - start) * 1000
+            self._record_wait(wait_ms)
+            self._stats["acquired"] += 1
+
+        if conn is None:
+            try:
+                return self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify_all()
+                raise
+
+        now = time.monotonic()
+        if self._expired(conn, now):
+            with self._cond:
+                self._stats["recycled_lifetime"] += 1
+                self._discard(conn)
+                self._size += 1
+            return self._reconnect()
+
+        if now - idle_since > self.idle_check_seconds:
+            # 空闲较久的连接可能已被服务端/防火墙断开，取出前验证一次
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+            except Exception as e:
+                print(f"[WARN] 空闲连接已失效，重新建立: {e}")
+                with self._cond:
+                    self._stats["health_check_failed"] += 1
+                    self._discard(conn)
+                    self._size += 1
+                return self._reconnect()
+
+        return conn
+
+    def _reconnect(self):
+        """为已预占的名额建立新连接"""
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify_all()
+            raise
+
+    def putconn(self, conn, close: bool = False) -> None:
+        """归还连接；已关闭、出错或超过最大存活时间的连接会被丢弃"""
+        if not close and not conn.closed:
+            try:
+                # 与 ThreadedConnectionPool 一致：归还前回滚未结束的事务
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+
+        with self._cond:
+            now = time.monotonic()
+            if close or conn.closed or self._closed:
+                self._discard(conn)
+            elif self._expired(conn, now):
+                self._stats["recycled_lifetime"] += 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, now))
+                self._cond.notify_all()
+
+    def closeall(self) -> None:
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def status(self) -> Dict[str, Any]:
+        """连接池实时状态与等待时间直方图"""
+        with self._cond:
+            acquired = self._stats["acquired"]
+            labels = [f"<={b}ms" for b in WAIT_HISTOGRAM_BUCKETS_MS] + [f">{WAIT_HISTOGRAM_BUCKETS_MS[-1]}ms"]
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": len(self._waiters),
+                **self._stats,
+                "wait_avg_ms": round(self._wait_total_ms / acquired, 3) if acquired else 0.0,
+                "wait_max_ms": round(self._wait_max_ms, 3),
+                "wait_histogram": dict(zip(labels, self._wait_histogram)),
+            }
+
+
+def _create_pg_connection_pool() -> FairConnectionPool:
     """创建 PostgreSQL 连接池"""
     print(f"[INFO] 创建PostgreSQL连接池: minconn={DB_POOL_MIN_CONN}, maxconn={DB_POOL_MAX_CONN}")
-    return pool.ThreadedConnectionPool(
+    return FairConnectionPool(
         minconn=DB_POOL_MIN_CONN,
         maxconn=DB_POOL_MAX_CONN,
+        idle_check_seconds=DB_POOL_IDLE_CHECK_SECONDS,
+        max_lifetime=DB_POOL_MAX_LIFETIME,
         host=POSTGRES_HOST,
         port=POSTGRES_PORT,
         database=POSTGRES_DB,
@@ -49,7 +281,7 @@ def _create_pg_connection_pool() -> pool.ThreadedConnectionPool:
     )
 
 
-def get_pg_connection_pool() -> pool.ThreadedConnectionPool:
+def get_pg_connection_pool() -> FairConnectionPool:
     """获取或创建 PostgreSQL 连接池（单例模式）"""
     global _pg_connection_pool
     
@@ -65,7 +297,7 @@ def get_pg_connection_pool() -> pool.ThreadedConnectionPool:
 def get_connection_from_pool():
     """从连接池获取连接
     
-    当连接池满时，会自动等待并重试（最多等待30秒）。
+    当连接池满时，按先来后到排队阻塞等待（最多等待 DB_POOL_ACQUIRE_TIMEOUT 秒）。
     
     Returns:
         数据库连接对象
@@ -76,41 +308,7 @@ def get_connection_from_pool():
     """
     if USE_POSTGRESQL:
         pg_pool = get_pg_connection_pool()
-        
-        # 重试机制：连接池满时等待
-        max_retries = 100  # 最多重试100次
-        retry_delay = 0.05  # 每次等待50ms
-        
-        for attempt in range(max_retries):
-            try:
-                conn = pg_pool.getconn()
-                
-                # 验证连接是否有效
-                try:
-                    cur = conn.cursor()
-                    cur.execute("SELECT 1")
-                    cur.close()
-                except Exception as e:
-                    # 连接无效，归还并重新获取
-                    print(f"[WARN] 连接无效，重新获取: {e}")
-                    pg_pool.putconn(conn, close=True)
-                    continue
-                
-                return conn
-                
-            except pool.PoolError as e:
-                # 连接池耗尽
-                if attempt < max_retries - 1:
-                    if attempt == 0:
-                        print(f"[INFO] 连接池已满，等待空闲连接... (尝试 {attempt+1}/{max_retries})")
-                    import time
-                    time.sleep(retry_delay)
-                else:
-                    # 最后一次尝试失败，抛出异常
-                    raise Exception(f"连接池耗尽：等待{max_retries}秒后仍无法获取连接") from e
-        
-        # 理论上不会到这里
-        raise Exception("无法从连接池获取连接")
+        return pg_pool.getconn(timeout=DB_POOL_ACQUIRE_TIMEOUT)
         
     else:
         # SQLite 不使用连接池（轻量级，直接创建）
@@ -201,13 +399,14 @@ def get_pool_status() -> dict:
             "pool_created": False
         }
     
-    # 注意：psycopg2.pool 没有直接获取连接数的方法
-    # 这里只返回配置信息
     return {
         "database": "PostgreSQL",
         "pool_enabled": True,
         "pool_created": True,
         "min_connections": DB_POOL_MIN_CONN,
         "max_connections": DB_POOL_MAX_CONN,
+        "idle_check_seconds": DB_POOL_IDLE_CHECK_SECONDS,
+        "max_lifetime": DB_POOL_MAX_LIFETIME,
+        **_pg_connection_pool.status(),
     }
 
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+异步数据库连接池管理
+
+供 async 路由（聊天热路径）使用，避免同步 psycopg2 调用阻塞事件循环。
+- PostgreSQL: asyncpg 连接池（每个事件循环一个）
+- SQLite: aiosqlite（每次获取新连接，轻量级）
+
+SQL 语句沿用同步层的 %s 占位符写法，由本模块转换为驱动对应的占位符。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastnpc.config import (
+    USE_POSTGRESQL,
+    POSTGRES_HOST,
+    POSTGRES_PORT,
+    POSTGRES_DB,
+    POSTGRES_USER,
+    POSTGRES_PASSWORD,
+    DB_PATH as CONFIG_DB_PATH,
+    ASYNC_DB_POOL_MIN_CONN,
+    ASYNC_DB_POOL_MAX_CONN,
+)
+
+try:
+    import asyncpg
+    _HAS_ASYNCPG = True
+except ImportError:
+    _HAS_ASYNCPG = False
+
+try:
+    import aiosqlite
+    _HAS_AIOSQLITE = True
+except ImportError:
+    _HAS_AIOSQLITE = False
+
+
+DB_PATH = CONFIG_DB_PATH.as_posix()
+
+# asyncpg 连接池绑定到创建它的事件循环，因此按事件循环分别维护
+_pg_pools: Dict[int, "asyncpg.Pool"] = {}
+_pool_locks: Dict[int, asyncio.Lock] = {}
+
+_PLACEHOLDER_RE = re.compile(r"%s")
+
+
+def async_db_available() -> bool:
+    """当前数据库类型对应的异步驱动是否已安装"""
+    return _HAS_ASYNCPG if USE_POSTGRESQL else _HAS_AIOSQLITE
+
+
+def _convert_placeholders(sql: str) -> str:
+    """将 %s 占位符转换为 asyncpg 的 $1..$n 或 SQLite 的 ?"""
+    if not USE_POSTGRESQL:
+        return sql.replace("%s", "?")
+    counter = iter(range(1, sql.count("%s") + 1))
+    return _PLACEHOLDER_RE.sub(lambda _: f"${next(counter)}", sql)
+
+
+async def get_async_pg_pool() -> "asyncpg.Pool":
+    """获取当前事件循环的 asyncpg 连接池（懒加载）"""
+    loop_id = id(asyncio.get_running_loop())
+    pg_pool = _pg_pools.get(loop_id)
+    if pg_pool is not None:
+        return pg_pool
+
+    lock = _pool_locks.setdefault(loop_id, asyncio.Lock())
+    async with lock:
+        pg_pool = _pg_pools.get(loop_id)
+        if pg_pool is None:
+            print(f"[INFO] 创建asyncpg连接池: min_size={ASYNC_DB_POOL_MIN_CONN}, max_size={ASYNC_DB_POOL_MAX_CONN}")
+            pg_pool = await asyncpg.create_pool(
+                host=POSTGRES_HOST,
+                port=POSTGRES_PORT,
+                database=POSTGRES_DB,
+                user=POSTGRES_USER,
+                password=POSTGRES_PASSWORD,
+                min_size=ASYNC_DB_POOL_MIN_CONN,
+                max_size=ASYNC_DB_POOL_MAX_CONN,
+            )
+            _pg_pools[loop_id] = pg_pool
+    return pg_pool
+
+
+class AsyncConnection:
+    """异步连接的统一封装（屏蔽 asyncpg / aiosqlite 的接口差异）
+
+    所有方法接受 %s 占位符的 SQL；查询结果以 dict 返回。
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    async def fetch(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        sql = _convert_placeholders(sql)
+        if USE_POSTGRESQL:
+            rows = await self.raw.fetch(sql, *params)
+            return [dict(r) for r in rows]
+        async with self.raw.execute(sql, tuple(params)) as cur:
+            rows = await cur.fetchall()
+        return [dict(r) for r in rows]
+
+    async def fetchrow(self, sql: str, params: Sequence[Any] = ()) -> Optional[Dict[str, Any]]:
+        sql = _convert_placeholders(sql)
+        if USE_POSTGRESQL:
+            row = await self.raw.fetchrow(sql, *params)
+            return dict(row) if row is not None else None
+        async with self.raw.execute(sql, tuple(params)) as cur:
+            row = await cur.fetchone()
+        return dict(row) if row is not None else None
+
+    async def fetchval(self, sql: str, params: Sequence[Any] = ()) -> Any:
+        sql = _convert_placeholders(sql)
+        if USE_POSTGRESQL:
+            return await self.raw.fetchval(sql, *params)
+        async with self.raw.execute(sql, tuple(params)) as cur:
+            row = await cur.fetchone()
+        return row[0] if row is not None else None
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> Optional[int]:
+        """执行写操作并提交
+
+        Returns:
+            SQLite 下返回 lastrowid；PostgreSQL 请使用 RETURNING + fetchval
+        """
+        sql = _convert_placeholders(sql)
+        if USE_POSTGRESQL:
+            # asyncpg 在事务块外自动提交
+            await self.raw.execute(sql, *params)
+            return None
+        cur = await self.raw.execute(sql, tuple(params))
+        await self.raw.commit()
+        return cur.lastrowid
+
+
+@asynccontextmanager
+async def get_async_db_connection():
+    """获取异步数据库连接上下文管理器
+
+    Example:
+        async with get_async_db_connection() as conn:
+            row = await conn.fetchrow("SELECT id FROM users WHERE id=%s", (uid,))
+    """
+    if USE_POSTGRESQL:
+        pg_pool = await get_async_pg_pool()
+        async with pg_pool.acquire() as raw:
+            yield AsyncConnection(raw)
+    else:
+        raw = await aiosqlite.connect(DB_PATH)
+        raw.row_factory = aiosqlite.Row
+        try:
+            yield AsyncConnection(raw)
+        finally:
+            await raw.close()
+
+
+async def close_async_pools() -> None:
+    """关闭当前事件循环的 asyncpg 连接池（应用关闭时调用）"""
+    try:
+        loop_id = id(asyncio.get_running_loop())
+    except RuntimeError:
+        return
+    pg_pool = _pg_pools.pop(loop_id, None)
+    _pool_locks.pop(loop_id, None)
+    if pg_pool is not None:
+        await pg_pool.close()
+        print("[INFO] asyncpg连接池已关闭")
@@ -6,7 +6,7 @@
 支持 PostgreSQL 和 SQLite 两种数据库。
 
 使用连接池优化性能：
-- PostgreSQL: 使用 ThreadedConnectionPool
+- PostgreSQL: 使用 FairConnectionPool（FIFO 等待队列）
 - SQLite: 直接创建连接（轻量级）
 """
 
@@ -14,7 +14,7 @@ from __future__ import annotations
 
 import psycopg2
 import psycopg2.extras
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Sequence
 from contextlib import contextmanager
 
 from fastnpc.config import USE_POSTGRESQL
@@ -76,6 +76,15 @@ def _row_to_dict(row, cursor) -> Dict[str, Any]:
         return dict(row) if row else None
 
 
+def _projection(columns: Optional[Sequence[str]], default: Sequence[str], allowed: Sequence[str]) -> str:
+    """校验并拼接 SELECT 列（列名只能来自白名单，防止注入）"""
+    cols = tuple(columns) if columns else tuple(default)
+    unknown = [c for c in cols if c not in allowed]
+    if unknown:
+        raise ValueError(f"不支持的列: {unknown}")
+    return ", ".join(cols)
+
+
 def _column_exists(cursor, table_name: str, column_name: str) -> bool:
     """检查列是否存在"""
     if USE_POSTGRESQL:
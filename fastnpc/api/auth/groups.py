@@ -8,11 +8,16 @@
 from __future__ import annotations
 
 import time
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, Sequence
 
-from fastnpc.api.auth.db_utils import _get_conn, _row_to_dict, _return_conn
+from fastnpc.api.auth.db_utils import _get_conn, _row_to_dict, _return_conn, _projection
+from fastnpc.api.auth.prompt_snapshots import store_prompt_snapshot, hydrate_prompt_snapshots, release_snapshots_where
 from fastnpc.config import USE_POSTGRESQL
 
+# 群聊消息查询列投影（FULL 附带提示词快照和主持人信息，仅管理/调试视图使用）
+GROUP_MESSAGE_COLUMNS_DEFAULT = ("id", "sender_type", "sender_id", "sender_name", "content", "created_at", "compressed")
+GROUP_MESSAGE_COLUMNS_FULL = GROUP_MESSAGE_COLUMNS_DEFAULT + ("system_prompt_snapshot", "moderator_prompt", "moderator_response")
+
 
 def create_group_chat(user_id: int, name: str) -> int:
     """创建群聊"""
@@ -123,10 +128,12 @@ def add_group_message(
     conn = _get_conn()
     try:
         cur = conn.cursor()
+        # 快照按内容去重存储，消息只保存快照ID
+        snapshot_id = store_prompt_snapshot(cur, system_prompt_snapshot)
         if USE_POSTGRESQL:
             cur.execute(
-                "INSERT INTO group_messages(group_id, sender_type, sender_id, sender_name, content, created_at, system_prompt_snapshot, moderator_prompt, moderator_response) VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s) RETURNING id",
-                (group_id, sender_type, sender_id, sender_name, content, int(time.time()), system_prompt_snapshot, moderator_prompt, moderator_response)
+                "INSERT INTO group_messages(group_id, sender_type, sender_id, sender_name, content, created_at, system_prompt_snapshot_id, moderator_prompt, moderator_response) VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s) RETURNING id",
+                (group_id, sender_type, sender_id, sender_name, content, int(time.time()), snapshot_id, moderator_prompt, moderator_response)
             )
             msg_id = int(cur.fetchone()[0])
             # 更新群聊的 updated_at
@@ -135,8 +142,8 @@ def add_group_message(
             return msg_id
         else:
             cur.execute(
-                "INSERT INTO group_messages(group_id, sender_type, sender_id, sender_name, content, created_at, system_prompt_snapshot, moderator_prompt, moderator_response) VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s)",
-                (group_id, sender_type, sender_id, sender_name, content, int(time.time()), system_prompt_snapshot, moderator_prompt, moderator_response)
+                "INSERT INTO group_messages(group_id, sender_type, sender_id, sender_name, content, created_at, system_prompt_snapshot_id, moderator_prompt, moderator_response) VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s)",
+                (group_id, sender_type, sender_id, sender_name, content, int(time.time()), snapshot_id, moderator_prompt, moderator_response)
             )
             conn.commit()
             msg_id = int(cur.lastrowid)
@@ -144,6 +151,9 @@ def add_group_message(
             cur.execute("UPDATE group_chats SET updated_at=%s WHERE id=%s", (int(time.time()), group_id))
             conn.commit()
             return msg_id
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         _return_conn(conn)
 
@@ -162,32 +172,36 @@ def update_group_message_moderator_info(message_id: int, moderator_prompt: str,
         _return_conn(conn)
 
 
-def list_group_messages(group_id: int, limit: int = 200, only_uncompressed: bool = False) -> list[Dict[str, Any]]:
+def list_group_messages(group_id: int, limit: int = 200, only_uncompressed: bool = False, columns: Optional[Sequence[str]] = None) -> list[Dict[str, Any]]:
     """列出群聊消息
     
     Args:
         group_id: 群聊ID
         limit: 最多返回多少条
         only_uncompressed: 是否只返回未压缩的消息（用于会话记忆）
+        columns: 返回的列（默认 GROUP_MESSAGE_COLUMNS_DEFAULT，不含提示词快照；
+                 需要快照时传 GROUP_MESSAGE_COLUMNS_FULL）
     """
+    projection = _projection(columns, GROUP_MESSAGE_COLUMNS_DEFAULT, GROUP_MESSAGE_COLUMNS_FULL)
+    with_snapshot = "system_prompt_snapshot" in projection
+    if with_snapshot:
+        projection += ", system_prompt_snapshot_id"
+    sql = f"SELECT {projection} FROM group_messages WHERE group_id=%s"
+    if only_uncompressed:
+        sql += " AND (compressed IS NULL OR compressed=0)"
+    sql += " ORDER BY id ASC LIMIT %s"
     conn = _get_conn()
     try:
         cur = conn.cursor()
-        if only_uncompressed:
-            cur.execute(
-                "SELECT id, sender_type, sender_id, sender_name, content, created_at, system_prompt_snapshot, moderator_prompt, moderator_response, compressed FROM group_messages WHERE group_id=%s AND (compressed IS NULL OR compressed=0) ORDER BY id ASC LIMIT %s",
-                (group_id, limit)
-            )
-        else:
-            cur.execute(
-                "SELECT id, sender_type, sender_id, sender_name, content, created_at, system_prompt_snapshot, moderator_prompt, moderator_response, compressed FROM group_messages WHERE group_id=%s ORDER BY id ASC LIMIT %s",
-                (group_id, limit)
-            )
+        cur.execute(sql, (group_id, limit))
         rows = cur.fetchall()
         if USE_POSTGRESQL:
-            return [_row_to_dict(r, cur) for r in rows]
+            items = [_row_to_dict(r, cur) for r in rows]
         else:
-            return [dict(r) for r in rows]
+            items = [dict(r) for r in rows]
+        if with_snapshot:
+            hydrate_prompt_snapshots(cur, items)
+        return items
     finally:
         _return_conn(conn)
 
@@ -201,6 +215,7 @@ def delete_group_chat(user_id: int, group_id: int) -> None:
         cur.execute("SELECT 1 FROM group_chats WHERE id=%s AND user_id=%s", (group_id, user_id))
         if not cur.fetchone():
             return
+        release_snapshots_where(cur, "group_messages", "group_id=%s", (group_id,))
         cur.execute("DELETE FROM group_messages WHERE group_id=%s", (group_id,))
         cur.execute("DELETE FROM group_members WHERE group_id=%s", (group_id,))
         cur.execute("DELETE FROM group_chats WHERE id=%s", (group_id,))
@@ -278,6 +293,7 @@ def reset_group_state(user_id: int, group_id: int) -> Tuple[bool, str, int]:
             return False, '群聊不存在或无权限', 0
         
         # 删除群聊消息
+        release_snapshots_where(cur, "group_messages", "group_id=%s", (group_id,))
         cur.execute("DELETE FROM group_messages WHERE group_id=%s", (group_id,))
         message_count = cur.rowcount
         
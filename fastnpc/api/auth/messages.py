@@ -7,12 +7,28 @@
 
 from __future__ import annotations
 
+import asyncio
 import time
-from typing import List
+from typing import List, Optional, Sequence
 
-from fastnpc.api.auth.db_utils import _get_conn, _row_to_dict, _return_conn
+from fastnpc.api.auth.db_utils import _get_conn, _row_to_dict, _return_conn, _projection
+from fastnpc.api.auth.db_pool_async import get_async_db_connection, async_db_available
+from fastnpc.api.auth.prompt_snapshots import (
+    store_prompt_snapshot,
+    release_prompt_snapshots,
+    resolve_prompt_snapshot,
+    hydrate_prompt_snapshots,
+)
 from fastnpc.config import USE_POSTGRESQL
 
+# 消息查询列投影
+# - CHAT: 聊天热路径（构建上下文、记忆压缩）只需要这三列
+# - DEFAULT: 消息列表接口
+# - FULL: 管理员查看时附带 system_prompt_snapshot（从 prompt_snapshots 还原，每条可达数KB）
+MESSAGE_COLUMNS_CHAT = ("id", "role", "content")
+MESSAGE_COLUMNS_DEFAULT = ("id", "role", "content", "created_at", "compressed")
+MESSAGE_COLUMNS_FULL = MESSAGE_COLUMNS_DEFAULT + ("system_prompt_snapshot",)
+
 
 def add_message(user_id: int, character_id: int, role: str, content: str, system_prompt_snapshot: str = None) -> int:
     """添加消息
@@ -30,26 +46,50 @@ def add_message(user_id: int, character_id: int, role: str, content: str, system
     conn = _get_conn()
     try:
         cur = conn.cursor()
+        # 快照按内容去重存储，消息只保存快照ID
+        snapshot_id = store_prompt_snapshot(cur, system_prompt_snapshot)
         if USE_POSTGRESQL:
             cur.execute(
-                "INSERT INTO messages(user_id, character_id, role, content, created_at, system_prompt_snapshot) VALUES(%s,%s,%s,%s,%s,%s) RETURNING id",
-                (user_id, character_id, role, content, int(time.time()), system_prompt_snapshot),
+                "INSERT INTO messages(user_id, character_id, role, content, created_at, system_prompt_snapshot_id) VALUES(%s,%s,%s,%s,%s,%s) RETURNING id",
+                (user_id, character_id, role, content, int(time.time()), snapshot_id),
             )
             msg_id = int(cur.fetchone()[0])
             conn.commit()
             return msg_id
         else:
             cur.execute(
-                "INSERT INTO messages(user_id, character_id, role, content, created_at, system_prompt_snapshot) VALUES(%s,%s,%s,%s,%s,%s)",
-                (user_id, character_id, role, content, int(time.time()), system_prompt_snapshot),
+                "INSERT INTO messages(user_id, character_id, role, content, created_at, system_prompt_snapshot_id) VALUES(%s,%s,%s,%s,%s,%s)",
+                (user_id, character_id, role, content, int(time.time()), snapshot_id),
             )
             conn.commit()
             return int(cur.lastrowid)
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         _return_conn(conn)
 
 
-def list_messages(user_id: int, character_id: int, limit: int = 100, after_id: int = 0, only_uncompressed: bool = False):
+def _list_messages_query(user_id: int, character_id: int, limit: int, after_id: int, only_uncompressed: bool, columns: Optional[Sequence[str]] = None):
+    """构造消息列表查询（同步/异步版本共用）"""
+    projection = _projection(columns, MESSAGE_COLUMNS_DEFAULT, MESSAGE_COLUMNS_FULL)
+    if "system_prompt_snapshot" in projection:
+        # 新消息的快照存放在 prompt_snapshots 中，由 hydrate_prompt_snapshots 还原
+        projection += ", system_prompt_snapshot_id"
+    sql = f"SELECT {projection} FROM messages WHERE user_id=%s AND character_id=%s"
+    params: list = [user_id, character_id]
+    if after_id > 0:
+        sql += " AND id>%s"
+        params.append(after_id)
+    if only_uncompressed:
+        # 只读取未压缩的消息（会话记忆）
+        sql += " AND (compressed IS NULL OR compressed=0)"
+    sql += " ORDER BY id ASC LIMIT %s"
+    params.append(limit)
+    return sql, tuple(params)
+
+
+def list_messages(user_id: int, character_id: int, limit: int = 100, after_id: int = 0, only_uncompressed: bool = False, columns: Optional[Sequence[str]] = None):
     """读取消息列表
     
     Args:
@@ -58,39 +98,22 @@ def list_messages(user_id: int, character_id: int, limit: int = 100, after_id: i
         limit: 最多返回多少条
         after_id: 只返回id大于这个值的消息
         only_uncompressed: 是否只返回未压缩的消息（用于会话记忆）
+        columns: 返回的列（默认 MESSAGE_COLUMNS_DEFAULT，不含 system_prompt_snapshot；
+                 聊天路径用 MESSAGE_COLUMNS_CHAT，管理员查看用 MESSAGE_COLUMNS_FULL）
     """
+    sql, params = _list_messages_query(user_id, character_id, limit, after_id, only_uncompressed, columns)
     conn = _get_conn()
     try:
         cur = conn.cursor()
-        if only_uncompressed:
-            # 只读取未压缩的消息（会话记忆）
-            if after_id > 0:
-                cur.execute(
-                    "SELECT id, role, content, created_at, compressed, system_prompt_snapshot FROM messages WHERE user_id=%s AND character_id=%s AND id>%s AND (compressed IS NULL OR compressed=0) ORDER BY id ASC LIMIT %s",
-                    (user_id, character_id, after_id, limit),
-                )
-            else:
-                cur.execute(
-                    "SELECT id, role, content, created_at, compressed, system_prompt_snapshot FROM messages WHERE user_id=%s AND character_id=%s AND (compressed IS NULL OR compressed=0) ORDER BY id ASC LIMIT %s",
-                    (user_id, character_id, limit),
-                )
-        else:
-            # 读取所有消息（包括已压缩的）
-            if after_id > 0:
-                cur.execute(
-                    "SELECT id, role, content, created_at, compressed, system_prompt_snapshot FROM messages WHERE user_id=%s AND character_id=%s AND id>%s ORDER BY id ASC LIMIT %s",
-                    (user_id, character_id, after_id, limit),
-                )
-            else:
-                cur.execute(
-                    "SELECT id, role, content, created_at, compressed, system_prompt_snapshot FROM messages WHERE user_id=%s AND character_id=%s ORDER BY id ASC LIMIT %s",
-                    (user_id, character_id, limit),
-                )
+        cur.execute(sql, params)
         rows = cur.fetchall()
         if USE_POSTGRESQL:
-            return [_row_to_dict(r, cur) for r in rows]
+            items = [_row_to_dict(r, cur) for r in rows]
         else:
-            return [dict(r) for r in rows]
+            items = [dict(r) for r in rows]
+        if "system_prompt_snapshot" in sql:
+            hydrate_prompt_snapshots(cur, items)
+        return items
     finally:
         _return_conn(conn)
 
@@ -142,7 +165,7 @@ def mark_group_messages_as_compressed(group_id: int, message_ids: List[int]) ->
 
 
 def update_message_system_prompt(message_id: int, system_prompt: str) -> None:
-    """更新消息的system_prompt_snapshot字段（保存实际发送给LLM的system prompt）
+    """更新消息的system prompt快照（保存实际发送给LLM的system prompt）
     
     Args:
         message_id: 消息ID
@@ -151,11 +174,97 @@ def update_message_system_prompt(message_id: int, system_prompt: str) -> None:
     conn = _get_conn()
     try:
         cur = conn.cursor()
+        cur.execute("SELECT system_prompt_snapshot_id FROM messages WHERE id=%s", (message_id,))
+        row = cur.fetchone()
+        old_snapshot_id = row[0] if row else None
+        snapshot_id = store_prompt_snapshot(cur, system_prompt)
         cur.execute(
-            "UPDATE messages SET system_prompt_snapshot=%s WHERE id=%s",
-            (system_prompt, message_id)
+            "UPDATE messages SET system_prompt_snapshot_id=%s, system_prompt_snapshot=NULL WHERE id=%s",
+            (snapshot_id, message_id)
         )
+        release_prompt_snapshots(cur, [old_snapshot_id])
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         _return_conn(conn)
 
+
+def get_message_system_prompt(user_id: int, character_id: int, message_id: int) -> Optional[str]:
+    """读取单条消息的system prompt快照（管理员查看上下文时使用）"""
+    conn = _get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT system_prompt_snapshot, system_prompt_snapshot_id FROM messages WHERE id=%s AND user_id=%s AND character_id=%s",
+            (message_id, user_id, character_id)
+        )
+        row = cur.fetchone()
+        if not row:
+            return None
+        return resolve_prompt_snapshot(cur, row[0], row[1])
+    finally:
+        _return_conn(conn)
+
+
+# ===== 异步版本（供 async 路由使用，不阻塞事件循环）=====
+
+async def add_message_async(user_id: int, character_id: int, role: str, content: str, system_prompt_snapshot: str = None) -> int:
+    """添加消息（异步版本，参数与返回值同 add_message）"""
+    # 带快照的写入涉及多条语句的事务，交给同步实现在线程中执行
+    if system_prompt_snapshot or not async_db_available():
+        return await asyncio.to_thread(add_message, user_id, character_id, role, content, system_prompt_snapshot)
+    params = (user_id, character_id, role, content, int(time.time()))
+    async with get_async_db_connection() as conn:
+        if USE_POSTGRESQL:
+            msg_id = await conn.fetchval(
+                "INSERT INTO messages(user_id, character_id, role, content, created_at) VALUES(%s,%s,%s,%s,%s) RETURNING id",
+                params,
+            )
+        else:
+            msg_id = await conn.execute(
+                "INSERT INTO messages(user_id, character_id, role, content, created_at) VALUES(%s,%s,%s,%s,%s)",
+                params,
+            )
+        return int(msg_id)
+
+
+async def list_messages_async(user_id: int, character_id: int, limit: int = 100, after_id: int = 0, only_uncompressed: bool = False, columns: Optional[Sequence[str]] = None):
+    """读取消息列表（异步版本，参数与返回值同 list_messages）"""
+    if not async_db_available() or (columns and "system_prompt_snapshot" in columns):
+        return await asyncio.to_thread(list_messages, user_id, character_id, limit, after_id, only_uncompressed, columns)
+    sql, params = _list_messages_query(user_id, character_id, limit, after_id, only_uncompressed, columns)
+    async with get_async_db_connection() as conn:
+        return await conn.fetch(sql, params)
+
+
+async def update_message_system_prompt_async(message_id: int, system_prompt: str) -> None:
+    """更新消息的system prompt快照（异步版本）
+
+    快照去重写入需要在同一事务中执行多条语句，由同步实现在线程中完成，不阻塞事件循环。
+    """
+    await asyncio.to_thread(update_message_system_prompt, message_id, system_prompt)
+
+
+# 后台写入任务的引用（防止任务在完成前被垃圾回收）
+_background_tasks: set = set()
+
+
+async def _update_message_system_prompt_logged(message_id: int, system_prompt: str) -> None:
+    try:
+        await update_message_system_prompt_async(message_id, system_prompt)
+    except Exception as e:
+        print(f"[WARN] 保存消息 {message_id} 的system prompt快照失败: {e}")
+
+
+def schedule_message_system_prompt_update(message_id: int, system_prompt: str) -> None:
+    """在后台保存消息的system prompt快照，不阻塞随后的LLM调用（需在事件循环中调用）
+
+    快照只供管理员查看上下文，写入失败只记录日志。
+    """
+    task = asyncio.get_running_loop().create_task(
+        _update_message_system_prompt_logged(message_id, system_prompt)
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
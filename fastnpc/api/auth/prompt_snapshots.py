@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+System prompt 快照的去重存储
+
+每条用户消息/群聊回复都会保存实际发送给LLM的 system prompt，相邻轮次之间
+绝大部分内容（固定规则、角色画像）完全相同。这里按内容寻址存储：
+
+- prompt_snapshots: 每个不同的完整 prompt 一行（content_hash 唯一），ref_count 为引用它的消息数
+- prompt_chunks: 按段落分块后的内容（chunk_hash 唯一，可选 zlib 压缩），不同快照共享相同分块
+- prompt_snapshot_chunks: 快照由哪些分块按顺序组成
+
+消息表只保存 system_prompt_snapshot_id；读取时由 load_prompt_snapshot() 还原全文。
+旧数据仍保存在 system_prompt_snapshot 文本列中，resolve_prompt_snapshot() 兼容两种格式。
+
+所有函数接收调用方的游标，不自行提交事务，与消息写入处于同一事务中。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastnpc.config import PROMPT_SNAPSHOT_COMPRESS, USE_POSTGRESQL
+
+
+# build_chat_system_prompt 的各段之间以空两行分隔，按此切分可让画像等不变的段落被复用
+SECTION_SEPARATOR = "\n\n\n"
+# 小于该长度的分块不压缩
+_COMPRESS_MIN_SIZE = 256
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_prompt_sections(text: str) -> List[str]:
+    """将 prompt 切分为段落分块（SECTION_SEPARATOR.join 可无损还原）"""
+    return text.split(SECTION_SEPARATOR)
+
+
+def _encode_chunk(text: str):
+    raw = text.encode("utf-8")
+    if PROMPT_SNAPSHOT_COMPRESS and len(raw) >= _COMPRESS_MIN_SIZE:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return packed, 1
+    return raw, 0
+
+
+def _decode_chunk(data: Any, compressed: Any) -> str:
+    raw = bytes(data) if data is not None else b""
+    if compressed:
+        raw = zlib.decompress(raw)
+    return raw.decode("utf-8")
+
+
+def _chunk_ids(cur, hashes: List[str]) -> Dict[str, int]:
+    placeholders = ",".join(["%s"] * len(hashes))
+    cur.execute(f"SELECT chunk_hash, id FROM prompt_chunks WHERE chunk_hash IN ({placeholders})", tuple(hashes))
+    return {r[0]: int(r[1]) for r in cur.fetchall()}
+
+
+def _store_chunks(cur, sections: List[str]) -> List[int]:
+    """批量保存（或复用）分块，返回与 sections 一一对应的分块ID
+
+    一条 SELECT 查出已有分块，缺失的用一条多行 INSERT ... RETURNING 写入。
+    """
+    hashes = [_hash(text) for text in sections]
+    texts = dict(zip(hashes, sections))
+    ids = _chunk_ids(cur, list(texts))
+    missing = [h for h in texts if h not in ids]
+    if missing:
+        now = int(time.time())
+        params: List[Any] = []
+        for chunk_hash in missing:
+            data, compressed = _encode_chunk(texts[chunk_hash])
+            params.extend((chunk_hash, data, len(texts[chunk_hash]), compressed, now))
+        values = ",".join(["(%s,%s,%s,%s,%s)"] * len(missing))
+        cur.execute(
+            f"INSERT INTO prompt_chunks(chunk_hash, data, size, compressed, created_at) VALUES {values} "
+            "ON CONFLICT (chunk_hash) DO NOTHING RETURNING chunk_hash, id",
+            tuple(params),
+        )
+        ids.update({r[0]: int(r[1]) for r in cur.fetchall()})
+        # 并发写入的相同分块不会由 RETURNING 返回，补查一次
+        raced = [h for h in missing if h not in ids]
+        if raced:
+            ids.update(_chunk_ids(cur, raced))
+    return [ids[h] for h in hashes]
+
+
+def store_prompt_snapshot(cur, text: Optional[str]) -> Optional[int]:
+    """保存（或复用）一个 prompt 快照并将其引用计数加一
+
+    已存在的快照只需一条语句；新快照共 4~5 条（分块查询、分块写入、快照写入、分块关系写入）。
+
+    Returns:
+        快照ID；text 为空时返回 None
+    """
+    if not text:
+        return None
+    content_hash = _hash(text)
+
+    # 已存在：只增加引用计数
+    cur.execute(
+        "UPDATE prompt_snapshots SET ref_count=ref_count+1 WHERE content_hash=%s RETURNING id",
+        (content_hash,),
+    )
+    row = cur.fetchone()
+    if row:
+        return int(row[0])
+
+    chunk_ids = _store_chunks(cur, split_prompt_sections(text))
+
+    # 并发写入同一快照时由唯一约束兜底
+    cur.execute(
+        "INSERT INTO prompt_snapshots(content_hash, size, ref_count, created_at) VALUES(%s,%s,1,%s) "
+        "ON CONFLICT (content_hash) DO UPDATE SET ref_count=prompt_snapshots.ref_count+1 RETURNING id",
+        (content_hash, len(text), int(time.time())),
+    )
+    snapshot_id = int(cur.fetchone()[0])
+    params: List[Any] = []
+    for position, chunk_id in enumerate(chunk_ids):
+        params.extend((snapshot_id, position, chunk_id))
+    values = ",".join(["(%s,%s,%s)"] * len(chunk_ids))
+    cur.execute(
+        f"INSERT INTO prompt_snapshot_chunks(snapshot_id, position, chunk_id) VALUES {values} "
+        "ON CONFLICT (snapshot_id, position) DO NOTHING",
+        tuple(params),
+    )
+    return snapshot_id
+
+
+def load_prompt_snapshot(cur, snapshot_id: int) -> Optional[str]:
+    """按快照ID还原完整 prompt 文本"""
+    cur.execute(
+        "SELECT c.data, c.compressed FROM prompt_snapshot_chunks sc "
+        "JOIN prompt_chunks c ON c.id = sc.chunk_id "
+        "WHERE sc.snapshot_id=%s ORDER BY sc.position ASC",
+        (snapshot_id,),
+    )
+    rows = cur.fetchall()
+    if not rows:
+        return None
+    return SECTION_SEPARATOR.join(_decode_chunk(r[0], r[1]) for r in rows)
+
+
+def load_prompt_snapshots(cur, snapshot_ids: Iterable[int]) -> Dict[int, str]:
+    """批量还原多个快照（用于列表查询）"""
+    ids = sorted({int(i) for i in snapshot_ids if i})
+    if not ids:
+        return {}
+    placeholders = ",".join(["%s"] * len(ids))
+    cur.execute(
+        "SELECT sc.snapshot_id, c.data, c.compressed FROM prompt_snapshot_chunks sc "
+        "JOIN prompt_chunks c ON c.id = sc.chunk_id "
+        f"WHERE sc.snapshot_id IN ({placeholders}) ORDER BY sc.snapshot_id ASC, sc.position ASC",
+        tuple(ids),
+    )
+    sections: Dict[int, List[str]] = {}
+    for snapshot_id, data, compressed in cur.fetchall():
+        sections.setdefault(int(snapshot_id), []).append(_decode_chunk(data, compressed))
+    return {sid: SECTION_SEPARATOR.join(parts) for sid, parts in sections.items()}
+
+
+def resolve_prompt_snapshot(cur, legacy_text: Optional[str], snapshot_id: Optional[int]) -> Optional[str]:
+    """兼容读取：优先快照ID，其次旧的 system_prompt_snapshot 文本列"""
+    if snapshot_id:
+        text = load_prompt_snapshot(cur, int(snapshot_id))
+        if text is not None:
+            return text
+    return legacy_text
+
+
+def hydrate_prompt_snapshots(cur, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """为查询结果填充 system_prompt_snapshot 文本（就地修改并移除 system_prompt_snapshot_id）"""
+    texts = load_prompt_snapshots(cur, (r.get("system_prompt_snapshot_id") for r in rows))
+    for r in rows:
+        snapshot_id = r.pop("system_prompt_snapshot_id", None)
+        if snapshot_id and int(snapshot_id) in texts:
+            r["system_prompt_snapshot"] = texts[int(snapshot_id)]
+    return rows
+
+
+def release_prompt_snapshots(cur, snapshot_ids: Iterable[Optional[int]]) -> None:
+    """引用快照的消息被删除/改写时，减少其引用计数（实际清理由 gc_prompt_snapshots 完成）"""
+    for snapshot_id, count in Counter(int(i) for i in snapshot_ids if i).items():
+        cur.execute(
+            "UPDATE prompt_snapshots SET ref_count=ref_count-%s WHERE id=%s",
+            (count, snapshot_id),
+        )
+
+
+def release_snapshots_where(cur, table: str, where: str, params: tuple) -> None:
+    """删除消息前调用：释放 table 中满足 where 条件的消息所引用的快照"""
+    cur.execute(
+        f"SELECT system_prompt_snapshot_id FROM {table} WHERE {where} AND system_prompt_snapshot_id IS NOT NULL",
+        params,
+    )
+    release_prompt_snapshots(cur, (r[0] for r in cur.fetchall()))
+
+
+def gc_prompt_snapshots(cur, recount: bool = False) -> Dict[str, int]:
+    """清理无引用的快照和分块（维护操作，建议在低峰期通过脚本执行）
+
+    Args:
+        recount: 先按消息表重新统计引用计数（修正级联删除等未经过 release 的情况）
+    """
+    if recount:
+        cur.execute(
+            "UPDATE prompt_snapshots SET ref_count="
+            "(SELECT COUNT(*) FROM messages m WHERE m.system_prompt_snapshot_id = prompt_snapshots.id)"
+            " + (SELECT COUNT(*) FROM group_messages g WHERE g.system_prompt_snapshot_id = prompt_snapshots.id)"
+        )
+    # 先删快照，再删失去归属的分块关系：并发写入在两步之间复用的快照不会丢失分块
+    cur.execute("DELETE FROM prompt_snapshots WHERE ref_count <= 0")
+    snapshots = cur.rowcount
+    cur.execute(
+        "DELETE FROM prompt_snapshot_chunks WHERE NOT EXISTS "
+        "(SELECT 1 FROM prompt_snapshots s WHERE s.id = prompt_snapshot_chunks.snapshot_id)"
+    )
+    cur.execute(
+        "DELETE FROM prompt_chunks WHERE NOT EXISTS "
+        "(SELECT 1 FROM prompt_snapshot_chunks sc WHERE sc.chunk_id = prompt_chunks.id)"
+    )
+    chunks = cur.rowcount
+    return {"snapshots_deleted": max(snapshots, 0), "chunks_deleted": max(chunks, 0)}
+
+
+def get_prompt_snapshot_stats(cur) -> Dict[str, int]:
+    """去重存储统计：逻辑原文总量（每条消息一份）vs 实际存储量"""
+    cur.execute("SELECT COUNT(*), COALESCE(SUM(size * ref_count), 0), COALESCE(SUM(ref_count), 0) FROM prompt_snapshots")
+    snapshots, logical_chars, refs = cur.fetchone()
+    length_fn = "octet_length" if USE_POSTGRESQL else "length"
+    cur.execute(f"SELECT COUNT(*), COALESCE(SUM({length_fn}(data)), 0) FROM prompt_chunks")
+    chunks, stored_bytes = cur.fetchone()
+    return {
+        "snapshots": int(snapshots),
+        "references": int(refs),
+        "logical_chars": int(logical_chars),
+        "chunks": int(chunks),
+        "stored_bytes": int(stored_bytes),
+    }
@@ -7,12 +7,14 @@
 
 from __future__ import annotations
 
+import asyncio
 import time
 from typing import Optional, Tuple, Dict, Any
 
 from passlib.hash import bcrypt
 
 from fastnpc.api.auth.db_utils import _get_conn, _row_to_dict, _return_conn
+from fastnpc.api.auth.db_pool_async import get_async_db_connection, async_db_available
 from fastnpc.config import USE_POSTGRESQL
 from fastnpc.api.cache import get_redis_cache
 
@@ -32,6 +34,30 @@ def get_user_id_by_username(username: str) -> Optional[int]:
         _return_conn(conn)
 
 
+def _user_settings_from_row(row) -> Dict[str, Any]:
+    """将 user_settings 查询行转换为设置字典（无记录时返回默认值）"""
+    if not row:
+        return {
+            "default_model": None,
+            "ctx_max_chat": None,
+            "ctx_max_stm": None,
+            "ctx_max_ltm": None,
+            "profile": None,
+            "max_group_reply_rounds": 3,
+            "updated_at": 0,
+        }
+    row = tuple(row)
+    return {
+        "default_model": row[0],
+        "ctx_max_chat": (int(row[1]) if row[1] is not None else None),
+        "ctx_max_stm": (int(row[2]) if row[2] is not None else None),
+        "ctx_max_ltm": (int(row[3]) if row[3] is not None else None),
+        "profile": row[4],
+        "max_group_reply_rounds": (int(row[5]) if row[5] is not None else 3),
+        "updated_at": int(row[6]),
+    }
+
+
 def get_user_settings(user_id: int) -> Dict[str, Any]:
     """获取用户设置（带Redis缓存）"""
     cache = get_redis_cache()
@@ -50,27 +76,7 @@ def get_user_settings(user_id: int) -> Dict[str, Any]:
             "SELECT default_model, ctx_max_chat, ctx_max_stm, ctx_max_ltm, profile, max_group_reply_rounds, updated_at FROM user_settings WHERE user_id=%s",
             (user_id,)
         )
-        row = cur.fetchone()
-        if not row:
-            result = {
-                "default_model": None,
-                "ctx_max_chat": None,
-                "ctx_max_stm": None,
-                "ctx_max_ltm": None,
-                "profile": None,
-                "max_group_reply_rounds": 3,
-                "updated_at": 0,
-            }
-        else:
-            result = {
-                "default_model": row[0],
-                "ctx_max_chat": (int(row[1]) if row[1] is not None else None),
-                "ctx_max_stm": (int(row[2]) if row[2] is not None else None),
-                "ctx_max_ltm": (int(row[3]) if row[3] is not None else None),
-                "profile": row[4],
-                "max_group_reply_rounds": (int(row[5]) if row[5] is not None else 3),
-                "updated_at": int(row[6]),
-            }
+        result = _user_settings_from_row(cur.fetchone())
         
         # 保存到缓存（永久，直到更新时删除）
         cache.set(cache_key, result)
@@ -195,3 +201,34 @@ def delete_account(user_id: int) -> None:
     finally:
         _return_conn(conn)
 
+
+
+# ===== 异步版本（供 async 路由使用，不阻塞事件循环）=====
+
+async def get_user_settings_async(user_id: int) -> Dict[str, Any]:
+    """获取用户设置（异步版本，与 get_user_settings 共用Redis缓存；Redis 读写在线程中执行）"""
+    if not async_db_available():
+        return await asyncio.to_thread(get_user_settings, user_id)
+    cache = get_redis_cache()
+    cache_key = f"{CACHE_KEY_USER_SETTINGS}:{user_id}"
+    
+    cached = await asyncio.to_thread(cache.get, cache_key)
+    if cached is not None:
+        return cached
+    
+    async with get_async_db_connection() as conn:
+        row = await conn.fetchrow(
+            "SELECT default_model, ctx_max_chat, ctx_max_stm, ctx_max_ltm, profile, max_group_reply_rounds, updated_at FROM user_settings WHERE user_id=%s",
+            (user_id,)
+        )
+    result = _user_settings_from_row(list(row.values()) if row else None)
+    await asyncio.to_thread(cache.set, cache_key, result)
+    return result
+
+
+async def get_user_by_id_async(user_id: int) -> Optional[Dict[str, Any]]:
+    """根据ID查询用户（异步版本）"""
+    if not async_db_available():
+        return await asyncio.to_thread(get_user_by_id, user_id)
+    async with get_async_db_connection() as conn:
+        return await conn.fetchrow("SELECT id, username, created_at, is_admin FROM users WHERE id=%s", (user_id,))
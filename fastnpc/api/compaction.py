@@ -0,0 +1,533 @@
+# -*- coding: utf-8 -*-
+"""
+记忆压缩后台任务队列
+
+把三层记忆压缩（会话→短期→长期）从聊天请求路径中移出：
+- 聊天接口只负责 enqueue_memory_compaction()，立即返回
+- 后台 Worker 线程池从队列中取任务，调用 LLM 完成压缩
+
+队列后端：
+- Redis 可用时使用 Redis List（多 Worker 进程共享，进程重启后任务不丢失）
+- Redis 不可用时降级为进程内队列
+
+同一 (user_id, character_id) 在排队期间只保留一个任务（参数以最新一次为准），
+连续多条消息只会触发一次压缩。Redis 后端下同一角色由分布式锁串行执行：
+取到任务却拿不到锁时，参数记入 DEFERRED_KEY，持锁的 Worker 释放锁时把它放回队列，
+压缩期间到达的消息不会等到用户下一条消息才被压缩。
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from fastnpc.config import MEMORY_COMPACTION_WORKERS
+
+
+# Redis 键
+QUEUE_KEY = "memory_compaction:queue"
+PROCESSING_KEY = "memory_compaction:processing"
+PAYLOAD_KEY = "memory_compaction:payloads"
+CLAIM_PAYLOAD_KEY = "memory_compaction:claimed"
+CLAIMS_KEY = "memory_compaction:claims"
+LOCK_KEY_PREFIX = "memory_compaction:lock"
+DEFERRED_KEY = "memory_compaction:deferred"
+
+# 单个压缩任务的持锁时间（秒），执行期间由心跳续期；超过该时间没有心跳的认领视为 Worker 已崩溃
+LOCK_TTL = 300
+# 心跳间隔（秒）：续期正在执行的认领与锁，并恢复崩溃 Worker 遗留的任务
+HEARTBEAT_INTERVAL = 60
+# Worker 阻塞等待任务的超时（秒），需小于 Redis socket_timeout
+POP_TIMEOUT = 2
+
+# 认领：把参数从待处理表移到认领表，并记录心跳时间（认领 ID = job_key#token）
+_CLAIM_SCRIPT = """
+local payload = redis.call('hget', KEYS[1], ARGV[1])
+if not payload then
+    return false
+end
+redis.call('hdel', KEYS[1], ARGV[1])
+redis.call('hset', KEYS[2], ARGV[2], payload)
+redis.call('zadd', KEYS[3], ARGV[3], ARGV[2])
+return payload
+"""
+
+# 完成：删除认领记录，并从 processing 中移除一个 job_key
+_DONE_SCRIPT = """
+redis.call('zrem', KEYS[2], ARGV[2])
+redis.call('hdel', KEYS[1], ARGV[2])
+redis.call('lrem', KEYS[3], 1, ARGV[1])
+return 1
+"""
+
+# 加锁：成功返回 1；锁被占用时把参数记入延后表（以最新一次为准），由持锁者释放时重新入队
+_ACQUIRE_SCRIPT = """
+if redis.call('set', KEYS[1], '1', 'NX', 'EX', ARGV[3]) then
+    return 1
+end
+redis.call('hset', KEYS[2], ARGV[1], ARGV[2])
+return 0
+"""
+
+# 释放锁：延后表中有该角色的参数时放回队列（已有更新的排队参数时以新参数为准）
+_RELEASE_SCRIPT = """
+redis.call('del', KEYS[1])
+local payload = redis.call('hget', KEYS[2], ARGV[1])
+if not payload then
+    return 0
+end
+redis.call('hdel', KEYS[2], ARGV[1])
+if redis.call('hsetnx', KEYS[3], ARGV[1], payload) == 1 then
+    redis.call('lpush', KEYS[4], ARGV[1])
+end
+return 1
+"""
+
+# 恢复：心跳超时的认领放回队列（已有更新的排队参数时以新参数为准）；
+# ARGV[2..] 为上一轮心跳就已存在、却始终没有认领记录的 processing 条目（Worker 在取出与认领之间崩溃）
+_RECOVER_SCRIPT = """
+local queue, processing, payloads, claimed, claims = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5]
+local count = 0
+for _, claim in ipairs(redis.call('zrangebyscore', claims, '-inf', ARGV[1])) do
+    local key = string.match(claim, '^(.*)#[^#]*$') or claim
+    local payload = redis.call('hget', claimed, claim)
+    redis.call('zrem', claims, claim)
+    redis.call('hdel', claimed, claim)
+    redis.call('lrem', processing, 1, key)
+    if payload and redis.call('hsetnx', payloads, key, payload) == 1 then
+        redis.call('lpush', queue, key)
+        count = count + 1
+    end
+end
+for i = 2, #ARGV do
+    local key = ARGV[i]
+    if redis.call('lrem', processing, 1, key) > 0 and redis.call('hexists', payloads, key) == 1 then
+        redis.call('lpush', queue, key)
+        count = count + 1
+    end
+end
+return count
+"""
+
+
+def _job_key(uid: int, cid: int) -> str:
+    return f"{uid}:{cid}"
+
+
+class _LocalCompactionQueue:
+    """进程内队列（Redis 不可用时的降级方案）"""
+
+    def __init__(self):
+        self._payloads: "OrderedDict[str, str]" = OrderedDict()
+        self._running: set = set()
+        self._cond = threading.Condition()
+
+    def push(self, key: str, payload: str) -> bool:
+        with self._cond:
+            is_new = key not in self._payloads
+            # 已在排队则只刷新参数，不重复入队
+            self._payloads[key] = payload
+            self._cond.notify()
+            return is_new
+
+    def pop(self, timeout: float) -> Optional[tuple]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for key in list(self._payloads.keys()):
+                    if key in self._running:
+                        continue
+                    payload = self._payloads.pop(key)
+                    self._running.add(key)
+                    return key, payload, None
+                # 没有任务，或排队的角色都正在压缩：继续等待，不空转
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def done(self, key: str, claim: Optional[str] = None) -> None:
+        with self._cond:
+            self._running.discard(key)
+            if key in self._payloads:
+                self._cond.notify_all()
+
+    def size(self) -> int:
+        with self._cond:
+            return len(self._payloads)
+
+
+class _RedisCompactionQueue:
+    """基于 Redis List 的持久化队列（多进程共享）
+
+    - PAYLOAD_KEY(Hash): job_key -> 最新参数，同时充当去重集合
+    - QUEUE_KEY(List): 待处理的 job_key
+    - PROCESSING_KEY(List): 已取出的 job_key
+    - CLAIM_PAYLOAD_KEY(Hash) / CLAIMS_KEY(ZSet): 认领 ID -> 参数 / 最近心跳时间，
+      参数保留到 done() 为止，Worker 崩溃后由其它 Worker 的心跳线程放回队列
+    - LOCK_KEY_PREFIX:{job_key}: 同一角色的执行锁；DEFERRED_KEY(Hash): 锁被占用时延后的参数
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+        self._done = client.register_script(_DONE_SCRIPT)
+        self._recover = client.register_script(_RECOVER_SCRIPT)
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+        # 上一轮心跳时没有认领记录的 processing 条目
+        self._unclaimed: List[str] = []
+
+    def push(self, key: str, payload: str) -> bool:
+        # HSET 返回新增字段数：1 表示此前不在排队中
+        is_new = self.client.hset(PAYLOAD_KEY, key, payload) == 1
+        if is_new:
+            self.client.lpush(QUEUE_KEY, key)
+        return is_new
+
+    def pop(self, timeout: float) -> Optional[tuple]:
+        key = self.client.brpoplpush(QUEUE_KEY, PROCESSING_KEY, timeout=int(timeout))
+        if key is None:
+            return None
+        # 原子地认领参数：之后到来的新消息会重新入队
+        claim = f"{key}#{uuid.uuid4().hex}"
+        payload = self._claim(keys=[PAYLOAD_KEY, CLAIM_PAYLOAD_KEY, CLAIMS_KEY], args=[key, claim, time.time()])
+        if payload is None:
+            self.client.lrem(PROCESSING_KEY, 1, key)
+            return None
+        return key, payload, claim
+
+    def done(self, key: str, claim: Optional[str] = None) -> None:
+        self._done(keys=[CLAIM_PAYLOAD_KEY, CLAIMS_KEY, PROCESSING_KEY], args=[key, claim or ""])
+
+    def acquire(self, key: str, payload: str) -> bool:
+        """获取角色执行锁；锁被占用时记下参数，持锁者释放时重新入队（两步在同一脚本中，不会遗漏）"""
+        return bool(self._acquire(keys=[f"{LOCK_KEY_PREFIX}:{key}", DEFERRED_KEY], args=[key, payload, LOCK_TTL]))
+
+    def release(self, key: str) -> bool:
+        """释放执行锁；返回 True 表示有延后的任务被放回队列"""
+        return bool(self._release(keys=[f"{LOCK_KEY_PREFIX}:{key}", DEFERRED_KEY, PAYLOAD_KEY, QUEUE_KEY], args=[key]))
+
+    def heartbeat(self, claims: Dict[str, str]) -> None:
+        """续期本进程正在执行的认领（claim -> job_key）及其锁"""
+        if not claims:
+            return
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for claim, key in claims.items():
+            pipe.zadd(CLAIMS_KEY, {claim: now}, xx=True)
+            pipe.expire(f"{LOCK_KEY_PREFIX}:{key}", LOCK_TTL)
+        pipe.execute()
+
+    def recover(self) -> int:
+        """把心跳超时（Worker 已崩溃）的任务放回队列；正在执行的任务不受影响"""
+        claimed_keys = {
+            claim.rsplit("#", 1)[0] for claim in self.client.zrange(CLAIMS_KEY, 0, -1)
+        }
+        unclaimed = [k for k in set(self.client.lrange(PROCESSING_KEY, 0, -1)) if k not in claimed_keys]
+        # 只处理连续两轮心跳都没有认领记录的条目，避开刚取出、尚未认领的任务
+        orphans = [k for k in unclaimed if k in self._unclaimed]
+        self._unclaimed = unclaimed
+        return int(self._recover(
+            keys=[QUEUE_KEY, PROCESSING_KEY, PAYLOAD_KEY, CLAIM_PAYLOAD_KEY, CLAIMS_KEY],
+            args=[time.time() - LOCK_TTL, *orphans],
+        ))
+
+    def size(self) -> int:
+        return int(self.client.llen(QUEUE_KEY))
+
+
+_queue = None
+_queue_lock = threading.Lock()
+_workers: List[threading.Thread] = []
+_stop_event = threading.Event()
+# 本进程正在执行的 Redis 认领：claim -> job_key（心跳线程据此续期）
+_active_claims: Dict[str, str] = {}
+_active_lock = threading.Lock()
+_stats = {"enqueued": 0, "deduplicated": 0, "completed": 0, "failed": 0, "deferred": 0, "requeued": 0}
+# 多个 Worker 线程同时更新统计
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _get_queue():
+    """获取队列后端（单例）：优先 Redis，不可用时降级为进程内队列"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                try:
+                    from fastnpc.api.cache import get_redis_cache
+                    cache = get_redis_cache()
+                    if cache.ping():
+                        _queue = _RedisCompactionQueue(cache.client)
+                        print("[INFO] 记忆压缩队列使用 Redis 后端")
+                except Exception as e:
+                    print(f"[WARN] 初始化 Redis 压缩队列失败: {e}")
+                if _queue is None:
+                    _queue = _LocalCompactionQueue()
+                    print("[INFO] 记忆压缩队列使用进程内后端")
+    return _queue
+
+
+def enqueue_memory_compaction(
+    role: str,
+    uid: int,
+    cid: int,
+    user_name: str,
+    ctx_max_chat: int,
+    ctx_max_stm: int,
+    ctx_max_ltm: int,
+) -> bool:
+    """提交一个记忆压缩任务（不阻塞）
+
+    Returns:
+        True 表示新建了任务；False 表示已有排队任务（仅刷新参数）或提交失败
+    """
+    payload = json.dumps({
+        "role": role,
+        "uid": int(uid),
+        "cid": int(cid),
+        "user_name": user_name,
+        "ctx_max_chat": int(ctx_max_chat),
+        "ctx_max_stm": int(ctx_max_stm),
+        "ctx_max_ltm": int(ctx_max_ltm),
+        "enqueued_at": int(time.time()),
+    }, ensure_ascii=False)
+    try:
+        start_compaction_workers()
+        is_new = _get_queue().push(_job_key(uid, cid), payload)
+    except Exception as e:
+        print(f"[ERROR] 提交记忆压缩任务失败: {e}")
+        return False
+    _count("enqueued" if is_new else "deduplicated")
+    return is_new
+
+
+def check_and_compress_memories(
+    role: str,
+    uid: int,
+    cid: int,
+    user_name: str,
+    ctx_max_chat: int,
+    ctx_max_stm: int,
+    ctx_max_ltm: int,
+) -> None:
+    """检查并压缩三层记忆（会话→短期→长期），由后台 Worker 调用"""
+    from fastnpc.api.auth import list_messages, mark_messages_as_compressed, MESSAGE_COLUMNS_CHAT
+    from fastnpc.api.utils import (
+        _read_memories_from_profile,
+        _write_memories_to_profile,
+        _append_short_term_memory,
+        _get_role_summary,
+    )
+    from fastnpc.chat.memory_manager import (
+        calculate_memory_size,
+        split_messages_by_ratio,
+        get_overlap_context,
+        compress_to_short_term_memory,
+        integrate_to_long_term_memory,
+        trim_long_term_memory_weighted,
+    )
+
+    try:
+        # 1. 检查会话记忆（只读取未压缩的消息）
+        session_messages = list_messages(uid, cid, limit=200, only_uncompressed=True, columns=MESSAGE_COLUMNS_CHAT)
+        if not session_messages:
+            return
+
+        # 计算会话记忆大小
+        session_contents = [m.get('content', '') for m in session_messages]
+        session_size = calculate_memory_size(session_contents)
+
+        if session_size > ctx_max_chat:
+            print(f"[INFO] 会话记忆超预算({session_size} > {ctx_max_chat})，开始压缩...")
+
+            # 分割消息：前一半压缩，后一半保留
+            to_compress, to_keep = split_messages_by_ratio(session_messages, ctx_max_chat)
+
+            if to_compress:
+                # 获取重叠上下文
+                overlap = get_overlap_context(session_messages, len(to_compress))
+
+                # 压缩为短期记忆
+                new_stm = compress_to_short_term_memory(to_compress, role, user_name, overlap)
+                print(f"[INFO] 压缩生成 {len(new_stm)} 条短期记忆")
+
+                if new_stm:
+                    _append_short_term_memory(role, uid, new_stm)
+
+                    # 标记这些消息为已压缩
+                    compressed_ids = [m.get('id') for m in to_compress if m.get('id')]
+                    if compressed_ids:
+                        mark_messages_as_compressed(uid, cid, compressed_ids)
+                        print(f"[INFO] 已标记 {len(compressed_ids)} 条消息为已压缩")
+
+                    # 2. 检查短期记忆
+                    stm_list, ltm_list = _read_memories_from_profile(role, uid)
+                    stm_size = calculate_memory_size(stm_list)
+
+                    if stm_size > ctx_max_stm:
+                        print(f"[INFO] 短期记忆超预算({stm_size} > {ctx_max_stm})，开始整合...")
+
+                        # 整合前一半到长期记忆
+                        split_point = len(stm_list) // 2
+                        to_integrate = stm_list[:split_point]
+                        remaining_stm = stm_list[split_point:]
+
+                        # 获取角色简介
+                        role_summary = _get_role_summary(role, uid)
+
+                        # 整合为长期记忆
+                        new_ltm = integrate_to_long_term_memory(to_integrate, ltm_list, role_summary)
+                        print(f"[INFO] 整合生成 {len(new_ltm)} 条长期记忆")
+
+                        # 写回数据库
+                        _write_memories_to_profile(role, uid, short_memories=remaining_stm, long_memories=new_ltm)
+
+                        # 3. 检查长期记忆
+                        ltm_size = calculate_memory_size(new_ltm)
+                        if ltm_size > ctx_max_ltm:
+                            print(f"[INFO] 长期记忆超预算({ltm_size} > {ctx_max_ltm})，开始裁剪...")
+
+                            # 加权随机丢弃30%
+                            trimmed_ltm = trim_long_term_memory_weighted(new_ltm, ctx_max_ltm)
+                            print(f"[INFO] 裁剪后剩余 {len(trimmed_ltm)} 条长期记忆")
+
+                            _write_memories_to_profile(role, uid, long_memories=trimmed_ltm)
+    except Exception as e:
+        print(f"[ERROR] 记忆压缩失败: {e}")
+
+
+def _run_job(queue, key: str, payload: str) -> None:
+    """执行单个压缩任务；Redis 后端下用分布式锁保证同一角色不会被并发压缩"""
+    locked = False
+    if isinstance(queue, _RedisCompactionQueue):
+        locked = queue.acquire(key, payload)
+        if not locked:
+            # 其他 Worker 正在压缩该角色：参数已记入延后表，持锁者释放锁时重新入队
+            _count("deferred")
+            return
+    try:
+        job = json.loads(payload)
+        started = time.time()
+        check_and_compress_memories(
+            job["role"],
+            int(job["uid"]),
+            int(job["cid"]),
+            job.get("user_name") or "用户",
+            int(job["ctx_max_chat"]),
+            int(job["ctx_max_stm"]),
+            int(job["ctx_max_ltm"]),
+        )
+        _count("completed")
+        waited = started - int(job.get("enqueued_at") or started)
+        print(f"[INFO] 记忆压缩任务完成: {key}（排队 {waited:.0f}s，耗时 {time.time() - started:.1f}s）")
+    except Exception as e:
+        _count("failed")
+        print(f"[ERROR] 记忆压缩任务失败 {key}: {e}")
+    finally:
+        if locked:
+            try:
+                if queue.release(key):
+                    _count("requeued")
+            except Exception as e:
+                print(f"[WARN] 释放记忆压缩锁失败 {key}: {e}")
+
+
+def _worker_loop() -> None:
+    queue = _get_queue()
+    while not _stop_event.is_set():
+        try:
+            item = queue.pop(POP_TIMEOUT)
+        except Exception as e:
+            print(f"[WARN] 读取记忆压缩队列失败: {e}")
+            _stop_event.wait(POP_TIMEOUT)
+            continue
+        if item is None:
+            continue
+        key, payload, claim = item
+        if claim:
+            with _active_lock:
+                _active_claims[claim] = key
+        try:
+            _run_job(queue, key, payload)
+        finally:
+            if claim:
+                with _active_lock:
+                    _active_claims.pop(claim, None)
+            try:
+                queue.done(key, claim)
+            except Exception as e:
+                print(f"[WARN] 确认记忆压缩任务失败 {key}: {e}")
+
+
+def _heartbeat_loop() -> None:
+    """Redis 后端：续期本进程正在执行的任务，并恢复心跳超时（Worker 崩溃）的任务"""
+    queue = _get_queue()
+    if not isinstance(queue, _RedisCompactionQueue):
+        return
+    while True:
+        with _active_lock:
+            claims = dict(_active_claims)
+        try:
+            queue.heartbeat(claims)
+            recovered = queue.recover()
+            if recovered:
+                print(f"[INFO] 恢复了 {recovered} 个未完成的记忆压缩任务")
+        except Exception as e:
+            print(f"[WARN] 记忆压缩任务心跳失败: {e}")
+        if _stop_event.wait(HEARTBEAT_INTERVAL):
+            return
+
+
+def start_compaction_workers(num_workers: Optional[int] = None) -> None:
+    """启动后台压缩 Worker 线程池（幂等）"""
+    queue = _get_queue()
+    with _queue_lock:
+        if _workers:
+            return
+        _stop_event.clear()
+        count = max(1, num_workers or MEMORY_COMPACTION_WORKERS)
+        for i in range(count):
+            t = threading.Thread(target=_worker_loop, name=f"memory-compaction-{i}", daemon=True)
+            _workers.append(t)
+        if isinstance(queue, _RedisCompactionQueue):
+            _workers.append(threading.Thread(target=_heartbeat_loop, name="memory-compaction-heartbeat", daemon=True))
+        for t in _workers:
+            t.start()
+    print(f"[INFO] 已启动 {count} 个记忆压缩 Worker")
+
+
+def stop_compaction_workers(timeout: float = 5.0) -> None:
+    """停止后台压缩 Worker（应用关闭时调用）；未完成的 Redis 任务心跳超时后由其它 Worker 恢复"""
+    _stop_event.set()
+    with _queue_lock:
+        workers = list(_workers)
+        _workers.clear()
+    for t in workers:
+        t.join(timeout)
+
+
+def get_compaction_stats() -> Dict[str, Any]:
+    """获取压缩队列统计（用于监控）"""
+    queue = _get_queue()
+    try:
+        pending = queue.size()
+    except Exception:
+        pending = None
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        **stats,
+        "backend": "redis" if isinstance(queue, _RedisCompactionQueue) else "local",
+        "workers": sum(1 for t in _workers if t.name != "memory-compaction-heartbeat"),
+        "pending": pending,
+    }
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+角色创建任务调度器
+
+原先每个创建请求通过 BackgroundTasks 立即执行，各自新建事件循环并同时发起 9 个 LLM 调用，
+并发创建没有上限，突发时会占满 LLM 配额、拖慢聊天。这里改为固定大小的 Worker 线程池：
+
+- 全局并发：所有 Worker 进程合计最多 CREATION_MAX_CONCURRENT 个创建任务同时执行
+- 每用户并发：同一用户最多 CREATION_PER_USER_CONCURRENT 个同时执行，其余排队（不阻塞其他用户）
+- 准入控制：本进程排队总数超过 CREATION_QUEUE_MAX、或同一用户排队+执行中超过
+  CREATION_PER_USER_MAX_PENDING 时拒绝提交（CreationRejected）
+- 相同角色正由其它任务抓取/结构化时（single_flight.FlightBusy），任务不占着 Worker 等待：
+  归还执行名额并放回队列原位置，本进程的领头者结束时立即重新调度，其它 Worker 的领头者则每
+  FLIGHT_RETRY_INTERVAL 秒重试一次；等待中的任务不计入并发，也不占排队位置
+- 跨 Worker 计数：全局与每用户的计数保存在 Redis（见 task_store 的 creation:* 租约），
+  本进程的租约由后台线程续期；Redis 不可用时退化为按进程计数
+- 排队位置写入 TaskState.queue_position（1 表示下一个执行），随进度推送给前端
+- 任务在 LLM 后台通道中执行（见 openrouter.llm_lane），聊天请求保留 LLM 并发余量
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from fastnpc.config import (
+    CREATION_MAX_CONCURRENT,
+    CREATION_PER_USER_CONCURRENT,
+    CREATION_PER_USER_MAX_PENDING,
+    CREATION_QUEUE_MAX,
+)
+from fastnpc.api.state import _set_task, _collect_and_structure
+from fastnpc.api.task_store import (
+    CREATION_LEASE_RENEW_INTERVAL,
+    admit_creation,
+    try_start_creation,
+    release_creation,
+    renew_creation_leases,
+)
+from fastnpc.api.single_flight import FlightBusy, get_single_flight_stats, watch_flight, unwatch_flight
+from fastnpc.llm.openrouter import llm_lane, LANE_BACKGROUND
+
+
+# Worker 等待任务的超时（秒），用于响应停止信号
+POP_TIMEOUT = 2
+# 等待其它 Worker 上相同角色的创建时，重试的间隔（秒）
+FLIGHT_RETRY_INTERVAL = 3.0
+
+
+class CreationRejected(Exception):
+    """创建任务未被接受（排队已满或用户任务数超限）"""
+
+
+class _CreationJob:
+    __slots__ = ("task_id", "user_id", "enqueued_at", "ready_at", "flight_wait_started", "flight_key", "wake")
+
+    def __init__(self, task_id: str, user_id: Optional[int]):
+        self.task_id = task_id
+        self.user_id = user_id
+        self.enqueued_at = time.time()
+        # 等待相同角色的创建时：可重新执行的时间、首次等待的时间、本进程领头者的 key 与结束回调
+        self.ready_at = 0.0
+        self.flight_wait_started: Optional[float] = None
+        self.flight_key: Optional[str] = None
+        self.wake: Optional[Any] = None
+
+
+_cond = threading.Condition()
+_queue: List[_CreationJob] = []
+_running_by_user: Dict[int, int] = {}
+_running_jobs: Dict[str, _CreationJob] = {}
+_positions: Dict[str, int] = {}
+_workers: List[threading.Thread] = []
+_stop_event = threading.Event()
+_stats = {"submitted": 0, "rejected": 0, "completed": 0, "cancelled_in_queue": 0, "parked": 0}
+_lease_thread: Optional[threading.Thread] = None
+
+
+def _user_load_locked(user_id: Optional[int]) -> int:
+    """某用户排队中 + 执行中的任务数（需持有 _cond）"""
+    queued = sum(1 for job in _queue if job.user_id == user_id)
+    return queued + _running_by_user.get(user_id, 0)
+
+
+def _next_job_locked() -> Optional[_CreationJob]:
+    """按提交顺序取第一个所属用户未达到并发上限的任务（需持有 _cond）
+
+    先做进程内检查，再在 Redis 中占用执行名额（跨 Worker 的全局与每用户上限）；
+    全局名额已满时不再查看后面的任务，其它 Worker 的任务结束后在下一次轮询时重试。
+    """
+    now = time.time()
+    for index, job in enumerate(_queue):
+        if job.ready_at > now:
+            continue
+        if job.user_id and _running_by_user.get(job.user_id, 0) >= CREATION_PER_USER_CONCURRENT:
+            continue
+        started = try_start_creation(
+            job.task_id, job.user_id, CREATION_MAX_CONCURRENT, CREATION_PER_USER_CONCURRENT
+        )
+        if started == 0:
+            return None
+        if started == -1:
+            continue
+        return _queue.pop(index)
+    return None
+
+
+def _refresh_queue_positions() -> None:
+    """更新排队中任务的位置（只推送有变化的任务；等待相同角色创建的任务不占排队位置）"""
+    with _cond:
+        waiting = [job for job in _queue if job.flight_wait_started is None]
+        current = {job.task_id: index + 1 for index, job in enumerate(waiting)}
+        changed = {task_id: pos for task_id, pos in current.items() if _positions.get(task_id) != pos}
+        _positions.clear()
+        _positions.update(current)
+    for task_id, pos in changed.items():
+        message = "排队中，即将开始…" if pos == 1 else f"排队中，前面还有 {pos - 1} 个任务…"
+        _set_task(task_id, queue_position=pos, message=message)
+
+
+def submit_creation_task(task_id: str, user_id: Optional[int]) -> int:
+    """提交创建任务（任务需已通过 register_task 登记）
+
+    Returns:
+        排队位置（1 表示下一个执行）
+
+    Raises:
+        CreationRejected: 排队已满或用户任务数超限
+    """
+    start_creation_workers()
+    with _cond:
+        if len(_queue) >= CREATION_QUEUE_MAX:
+            _stats["rejected"] += 1
+            raise CreationRejected("当前创建任务较多，请稍后再试")
+        if user_id and (
+            _user_load_locked(user_id) >= CREATION_PER_USER_MAX_PENDING
+            or admit_creation(task_id, user_id, CREATION_PER_USER_MAX_PENDING) is False
+        ):
+            _stats["rejected"] += 1
+            raise CreationRejected(f"您已有 {CREATION_PER_USER_MAX_PENDING} 个角色正在创建或排队，请等待完成后再试")
+        _queue.append(_CreationJob(task_id, user_id))
+        _stats["submitted"] += 1
+        _cond.notify()
+    _refresh_queue_positions()
+    return _positions.get(task_id, 0)
+
+
+def cancel_queued_creation(task_id: str) -> bool:
+    """从队列中移除尚未开始的任务；已开始执行的任务由取消标志在检查点终止"""
+    with _cond:
+        for index, job in enumerate(_queue):
+            if job.task_id == task_id:
+                _queue.pop(index)
+                _stats["cancelled_in_queue"] += 1
+                break
+        else:
+            return False
+    if job.flight_key and job.wake:
+        unwatch_flight(job.flight_key, job.wake)
+    release_creation(task_id, job.user_id)
+    _set_task(task_id, status="cancelled", queue_position=0, message="已取消")
+    _refresh_queue_positions()
+    return True
+
+
+def _run_job(job: _CreationJob) -> Optional[FlightBusy]:
+    """执行任务；相同角色正在创建时返回 FlightBusy（任务需放回队列）"""
+    if job.flight_wait_started is None:
+        waited = time.time() - job.enqueued_at
+        print(f"[INFO] 开始执行角色创建任务: {job.task_id}（排队 {waited:.1f}s）")
+        _set_task(job.task_id, queue_position=0)
+    try:
+        with llm_lane(LANE_BACKGROUND):
+            _collect_and_structure(job.task_id, job.flight_wait_started)
+    except FlightBusy as busy:
+        return busy
+    with _cond:
+        _stats["completed"] += 1
+    return None
+
+
+def _park_locked(job: _CreationJob, busy: FlightBusy) -> None:
+    """把等待相同角色创建的任务放回队列原位置（按提交顺序，需持有 _cond）
+
+    本进程的领头者结束时由 _watch 登记的回调重新调度，其它 Worker 的领头者则定期重试。
+    """
+    if job.flight_wait_started is None:
+        job.flight_wait_started = time.time()
+    if busy.remote:
+        job.ready_at = time.time() + FLIGHT_RETRY_INTERVAL
+        job.flight_key = job.wake = None
+    else:
+        job.ready_at = float("inf")
+        job.flight_key = busy.key
+        job.wake = lambda: _wake(job)
+    index = next((i for i, queued in enumerate(_queue) if queued.enqueued_at > job.enqueued_at), len(_queue))
+    _queue.insert(index, job)
+    _stats["parked"] += 1
+
+
+def _watch(job: _CreationJob) -> None:
+    """登记本进程领头者的结束回调（不能持有 _cond：领头者结束时回调需要获取 _cond）"""
+    key, wake = job.flight_key, job.wake
+    if key and wake and not watch_flight(key, wake):
+        # 领头者已经结束
+        _wake(job)
+
+
+def _wake(job: _CreationJob) -> None:
+    with _cond:
+        job.ready_at = 0.0
+        job.flight_key = job.wake = None
+        _cond.notify()
+
+
+def _worker_loop() -> None:
+    while not _stop_event.is_set():
+        with _cond:
+            job = _next_job_locked()
+            if job is None:
+                _cond.wait(POP_TIMEOUT)
+                continue
+            _running_jobs[job.task_id] = job
+            if job.user_id:
+                _running_by_user[job.user_id] = _running_by_user.get(job.user_id, 0) + 1
+        _refresh_queue_positions()
+        busy = None
+        try:
+            busy = _run_job(job)
+        except Exception as e:
+            print(f"[ERROR] 角色创建任务异常 {job.task_id}: {e}")
+        finally:
+            # 放回队列的任务只归还执行名额，仍计入用户的排队+执行中
+            release_creation(job.task_id, job.user_id, finished=busy is None)
+            with _cond:
+                _running_jobs.pop(job.task_id, None)
+                if job.user_id:
+                    remaining = _running_by_user.get(job.user_id, 1) - 1
+                    if remaining > 0:
+                        _running_by_user[job.user_id] = remaining
+                    else:
+                        _running_by_user.pop(job.user_id, None)
+                if busy is not None:
+                    _park_locked(job, busy)
+                # 该用户可能有被并发上限挡住的排队任务
+                _cond.notify_all()
+            if busy is not None:
+                _watch(job)
+
+
+def _lease_loop() -> None:
+    """续期本进程排队中与执行中任务在 Redis 中的计数租约（进程退出后租约到期，名额自动归还）"""
+    while not _stop_event.wait(CREATION_LEASE_RENEW_INTERVAL):
+        with _cond:
+            running = [(job.task_id, job.user_id) for job in _running_jobs.values()]
+            pending = running + [(job.task_id, job.user_id) for job in _queue]
+        renew_creation_leases(running, pending)
+
+
+def start_creation_workers(num_workers: Optional[int] = None) -> None:
+    """启动创建任务 Worker 线程池（幂等）"""
+    global _lease_thread
+    with _cond:
+        if _workers:
+            return
+        _stop_event.clear()
+        count = max(1, num_workers or CREATION_MAX_CONCURRENT)
+        for i in range(count):
+            t = threading.Thread(target=_worker_loop, name=f"character-creation-{i}", daemon=True)
+            _workers.append(t)
+            t.start()
+        _lease_thread = threading.Thread(target=_lease_loop, name="character-creation-lease", daemon=True)
+        _lease_thread.start()
+    print(f"[INFO] 已启动 {count} 个角色创建 Worker")
+
+
+def stop_creation_workers(timeout: float = 5.0) -> None:
+    """停止 Worker（应用关闭时调用）：排队中的任务标记为失败，执行中的任务最多等待 timeout 秒"""
+    _stop_event.set()
+    with _cond:
+        pending = list(_queue)
+        _queue.clear()
+        workers = list(_workers)
+        _workers.clear()
+        _cond.notify_all()
+    for job in pending:
+        release_creation(job.task_id, job.user_id)
+        _set_task(job.task_id, status="error", queue_position=0, message="服务重启，任务未执行，请重新创建")
+    for t in workers:
+        t.join(timeout)
+
+
+def get_creation_scheduler_stats() -> Dict[str, Any]:
+    """调度器统计（用于监控）"""
+    with _cond:
+        stats = {
+            **_stats,
+            "workers": len(_workers),
+            "queued": len(_queue),
+            "waiting_for_flight": sum(1 for job in _queue if job.flight_wait_started is not None),
+            "running": len(_running_jobs),
+        }
+    stats["single_flight"] = get_single_flight_stats()
+    return stats
@@ -18,6 +18,8 @@ from fastnpc.api.auth import (
     get_user_by_id,
     get_character_detail,
     list_messages,
+    get_message_system_prompt,
+    MESSAGE_COLUMNS_CHAT,
     get_user_settings,
     get_or_create_character,
     list_group_chats,
@@ -56,6 +58,7 @@ def admin_cleanup_characters(uid: int, request: Request):
         return JSONResponse({"error": "forbidden"}, status_code=403)
     
     from fastnpc.api.auth import _get_conn
+    from fastnpc.api.auth.prompt_snapshots import release_snapshots_where
     
     # 获取数据库中的所有角色
     characters = list_characters(uid)
@@ -72,7 +75,8 @@ def admin_cleanup_characters(uid: int, request: Request):
             if not os.path.exists(struct_path):
                 # 文件不存在，删除数据库记录
                 cur.execute("DELETE FROM characters WHERE id=%s", (char['id'],))
-                # 同时删除相关的消息记录
+                # 同时删除相关的消息记录（并释放其引用的prompt快照）
+                release_snapshots_where(cur, "messages", "character_id=%s", (char['id'],))
                 cur.execute("DELETE FROM messages WHERE character_id=%s", (char['id'],))
                 deleted_count += 1
                 deleted_names.append(char_name)
@@ -169,8 +173,8 @@ def admin_chat_compiled(request: Request, msg_id: int, uid: int = 0, cid: int =
     print(f"[DEBUG] 最终: uid={uid}, cid={cid}, role={role}")
     
     try:
-        # 管理员查看时读取所有消息（包括已压缩的）
-        items = list_messages(uid, cid, limit=2000, only_uncompressed=False)
+        # 管理员查看时读取所有消息（包括已压缩的）；快照只取目标消息的一条
+        items = list_messages(uid, cid, limit=2000, only_uncompressed=False, columns=MESSAGE_COLUMNS_CHAT)
         print(f"[DEBUG] 查询到 {len(items)} 条消息")
     except Exception as e:
         print(f"[ERROR] 查询消息失败: {e}")
@@ -191,7 +195,11 @@ def admin_chat_compiled(request: Request, msg_id: int, uid: int = 0, cid: int =
     user_msg = str(target_msg.get('content', ''))
     
     # 优先使用保存的system_prompt_snapshot（实际发送时的快照）
-    system_prompt_snapshot = target_msg.get('system_prompt_snapshot')
+    try:
+        system_prompt_snapshot = get_message_system_prompt(uid, cid, int(msg_id))
+    except Exception as e:
+        print(f"[ERROR] 读取system prompt快照失败: {e}")
+        system_prompt_snapshot = None
     
     if system_prompt_snapshot:
         # 直接使用保存的快照（这是实际发送给LLM的内容）
@@ -48,6 +48,30 @@ def get_cache_stats(request: Request):
     }
 
 
+@router.get("/admin/cache/structure-stats")
+def get_structure_cache_stats_api(request: Request):
+    """获取结构化 LLM 结果缓存统计（仅管理员）"""
+    _require_admin(request)
+    from fastnpc.pipeline.structure.result_cache import get_structure_cache_stats
+    return get_structure_cache_stats()
+
+
+@router.get("/admin/cache/http-stats")
+def get_http_cache_stats_api(request: Request):
+    """获取数据源 HTTP 响应磁盘缓存统计（仅管理员）"""
+    _require_admin(request)
+    from fastnpc.datasources.http_cache import get_http_cache_stats
+    return get_http_cache_stats()
+
+
+@router.get("/admin/cache/prompt-stats")
+def get_prompt_cache_stats_api(request: Request):
+    """获取激活提示词两级缓存统计（仅管理员，本 Worker）"""
+    _require_admin(request)
+    from fastnpc.prompt_cache import get_prompt_cache_stats
+    return get_prompt_cache_stats()
+
+
 @router.post("/admin/cache/clear")
 def clear_cache(request: Request, pattern: str = "*"):
     """清除缓存（仅管理员）
@@ -59,6 +83,11 @@ def clear_cache(request: Request, pattern: str = "*"):
     
     cache = get_redis_cache()
     
+    # 各 Worker 的进程内提示词缓存不在 Redis 中，需要广播失效
+    if pattern == "*" or pattern.startswith("prompt"):
+        from fastnpc.prompt_cache import invalidate_prompt_cache
+        invalidate_prompt_cache()
+    
     if pattern == "*":
         cache.clear_all()
         return {"ok": True, "message": "已清除所有缓存"}
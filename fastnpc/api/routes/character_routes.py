@@ -8,8 +8,9 @@ import json
 import os
 import shutil
 import uuid
+from typing import Optional
 
-from fastapi import APIRouter, BackgroundTasks, Request, Form, UploadFile, File
+from fastapi import APIRouter, Request, Form, UploadFile, File
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 
@@ -29,8 +30,9 @@ from fastnpc.api.utils import (
     _require_user,
     _structured_path_for_role,
     _list_structured_files,
+    _list_structured_files_page,
 )
-from fastnpc.api.state import TaskState, tasks, tasks_lock, sessions, sessions_lock
+from fastnpc.api.state import TaskState, register_task, _set_task, sessions, sessions_lock
 from fastnpc.pipeline.structure import build_system_prompt
 
 
@@ -40,16 +42,20 @@ templates = Jinja2Templates(directory=TEMPLATES_DIR.as_posix())
 
 
 @router.get("/api/characters")
-def api_characters(request: Request):
+def api_characters(request: Request, limit: Optional[int] = None, cursor: Optional[str] = None):
     user = _require_user(request)
     if not user:
         return JSONResponse({"error": "unauthorized"}, status_code=401)
+    # 传入 limit 时使用键集分页（cursor 为上一页返回的 next_cursor）
+    if limit:
+        limit = max(1, min(int(limit), 200))
+        return _list_structured_files_page(user.get('uid'), limit, cursor)
     return {"items": _list_structured_files(user_id=user.get('uid'))}
 
 
 @router.post("/api/characters")
-async def api_create_character(background_tasks: BackgroundTasks, request: Request):
-    from fastnpc.api.state import _collect_and_structure
+async def api_create_character(request: Request):
+    from fastnpc.api.creation_scheduler import submit_creation_task, CreationRejected
     
     user = _require_user(request)
     if not user:
@@ -90,12 +96,16 @@ async def api_create_character(background_tasks: BackgroundTasks, request: Reque
     state.progress = 1
     state.message = "任务已创建，等待执行..."
     
-    with tasks_lock:
-        tasks[task_id] = state
+    register_task(task_id, state)
     
-    print(f"[INFO] 创建角色任务: task_id={task_id}, role={role}, user_id={user.get('uid')}")
-    background_tasks.add_task(_collect_and_structure, task_id)
-    return {"task_id": task_id}
+    try:
+        queue_position = submit_creation_task(task_id, user.get('uid'))
+    except CreationRejected as e:
+        _set_task(task_id, status="error", message=str(e))
+        return JSONResponse({"error": str(e)}, status_code=429)
+    
+    print(f"[INFO] 创建角色任务: task_id={task_id}, role={role}, user_id={user.get('uid')}, 排队位置={queue_position}")
+    return {"task_id": task_id, "queue_position": queue_position}
 
 
 @router.put('/api/characters/{old_name}/rename')
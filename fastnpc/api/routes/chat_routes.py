@@ -4,11 +4,13 @@
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import time
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
+import anyio
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
@@ -17,12 +19,15 @@ from fastnpc.config import CHAR_DIR, TEMPLATES_DIR
 from fastnpc.utils.roles import normalize_role_name
 from fastnpc.api.auth import (
     get_or_create_character,
-    add_message,
     list_messages,
-    get_user_settings,
-    get_user_by_id,
     mark_messages_as_compressed,
-    update_message_system_prompt,
+    get_or_create_character_async,
+    add_message_async,
+    list_messages_async,
+    get_user_settings_async,
+    get_user_by_id_async,
+    schedule_message_system_prompt_update,
+    MESSAGE_COLUMNS_CHAT,
 )
 from fastnpc.api.utils import (
     _require_user,
@@ -32,19 +37,14 @@ from fastnpc.api.utils import (
     _truncate_messages,
     _ensure_chat_session_for_role,
     _read_memories_from_profile,
-    _write_memories_to_profile,
     _append_short_term_memory,
-    _get_role_summary,
 )
 from fastnpc.api.state import sessions, sessions_lock
+from fastnpc.api.compaction import enqueue_memory_compaction
 from fastnpc.chat.prompt_builder import build_chat_system_prompt
+from fastnpc.chat.persona_cache import get_persona_version
 from fastnpc.chat.memory_manager import (
-    calculate_memory_size,
-    split_messages_by_ratio,
-    get_overlap_context,
     compress_to_short_term_memory,
-    integrate_to_long_term_memory,
-    trim_long_term_memory_weighted,
 )
 from fastnpc.llm.openrouter import (
     get_openrouter_completion, 
@@ -59,83 +59,19 @@ CHAR_DIR_STR = CHAR_DIR.as_posix()
 templates = Jinja2Templates(directory=TEMPLATES_DIR.as_posix())
 
 
-def _check_and_compress_memories(
-    role: str,
-    uid: int,
-    cid: int,
-    user_name: str,
-    ctx_max_chat: int,
-    ctx_max_stm: int,
-    ctx_max_ltm: int,
-) -> None:
-    """检查并压缩三层记忆（会话→短期→长期）"""
+def _load_profile_and_memories(role: str, uid: int, cid: int) -> Tuple[Dict[str, Any], List[str], List[str], int]:
+    """加载角色画像（支持缓存）与短期/长期记忆，失败时返回空画像
+
+    同时返回加载之前读取的画像版本号（画像段缓存按该版本号保存，见 persona_cache）。
+    """
+    persona_version = get_persona_version(cid)
     try:
-        # 1. 检查会话记忆（只读取未压缩的消息）
-        session_messages = list_messages(uid, cid, limit=200, only_uncompressed=True)
-        if not session_messages:
-            return
-        
-        # 计算会话记忆大小
-        session_contents = [m.get('content', '') for m in session_messages]
-        session_size = calculate_memory_size(session_contents)
-        
-        if session_size > ctx_max_chat:
-            print(f"[INFO] 会话记忆超预算({session_size} > {ctx_max_chat})，开始压缩...")
-            
-            # 分割消息：前一半压缩，后一半保留
-            to_compress, to_keep = split_messages_by_ratio(session_messages, ctx_max_chat)
-            
-            if to_compress:
-                # 获取重叠上下文
-                overlap = get_overlap_context(session_messages, len(to_compress))
-                
-                # 压缩为短期记忆
-                new_stm = compress_to_short_term_memory(to_compress, role, user_name, overlap)
-                print(f"[INFO] 压缩生成 {len(new_stm)} 条短期记忆")
-                
-                if new_stm:
-                    _append_short_term_memory(role, uid, new_stm)
-                    
-                    # 标记这些消息为已压缩
-                    compressed_ids = [m.get('id') for m in to_compress if m.get('id')]
-                    if compressed_ids:
-                        mark_messages_as_compressed(uid, cid, compressed_ids)
-                        print(f"[INFO] 已标记 {len(compressed_ids)} 条消息为已压缩")
-                    
-                    # 2. 检查短期记忆
-                    stm_list, ltm_list = _read_memories_from_profile(role, uid)
-                    stm_size = calculate_memory_size(stm_list)
-                    
-                    if stm_size > ctx_max_stm:
-                        print(f"[INFO] 短期记忆超预算({stm_size} > {ctx_max_stm})，开始整合...")
-                        
-                        # 整合前一半到长期记忆
-                        split_point = len(stm_list) // 2
-                        to_integrate = stm_list[:split_point]
-                        remaining_stm = stm_list[split_point:]
-                        
-                        # 获取角色简介
-                        role_summary = _get_role_summary(role, uid)
-                        
-                        # 整合为长期记忆
-                        new_ltm = integrate_to_long_term_memory(to_integrate, ltm_list, role_summary)
-                        print(f"[INFO] 整合生成 {len(new_ltm)} 条长期记忆")
-                        
-                        # 写回文件
-                        _write_memories_to_profile(role, uid, short_memories=remaining_stm, long_memories=new_ltm)
-                        
-                        # 3. 检查长期记忆
-                        ltm_size = calculate_memory_size(new_ltm)
-                        if ltm_size > ctx_max_ltm:
-                            print(f"[INFO] 长期记忆超预算({ltm_size} > {ctx_max_ltm})，开始裁剪...")
-                            
-                            # 加权随机丢弃30%
-                            trimmed_ltm = trim_long_term_memory_weighted(new_ltm, ctx_max_ltm)
-                            print(f"[INFO] 裁剪后剩余 {len(trimmed_ltm)} 条长期记忆")
-                            
-                            _write_memories_to_profile(role, uid, long_memories=trimmed_ltm)
+        structured_profile = _load_character_profile(role, uid) or {}
+        short_term_memories, long_term_memories = _read_memories_from_profile(role, uid)
+        return structured_profile, short_term_memories, long_term_memories, persona_version
     except Exception as e:
-        print(f"[ERROR] 记忆压缩失败: {e}")
+        print(f"[WARNING] 加载角色profile失败: {e}")
+        return {}, [], [], persona_version
 
 
 @router.get("/api/chat/{role}/messages")
@@ -166,45 +102,36 @@ async def api_post_message(role: str, request: Request):
     uid = int(user['uid'])
     # 读取管理员标志
     try:
-        _udb = get_user_by_id(uid)
+        _udb = await get_user_by_id_async(uid)
         _is_admin = int(_udb.get('is_admin', 0)) if _udb else 0
     except Exception:
         _is_admin = 0
-    cid = get_or_create_character(uid, role)
-    user_msg_id = add_message(int(user['uid']), cid, 'user', content)
+    cid = await get_or_create_character_async(uid, role)
+    user_msg_id = await add_message_async(int(user['uid']), cid, 'user', content)
     # 生成回复并写入
-    sid = _ensure_chat_session_for_role(role, user_id=uid)
+    # 首次创建会话时会读取角色画像（同步数据库调用）
+    sid = await asyncio.to_thread(_ensure_chat_session_for_role, role, uid)
     with sessions_lock:
         msgs: List[Dict[str, str]] = sessions[sid]["messages"]  # type: ignore
         msgs.append({"role": "user", "content": content})
     # 获取用户记忆预算
     try:
-        user_settings = get_user_settings(int(user['uid']))
+        user_settings = await get_user_settings_async(int(user['uid']))
     except Exception:
         user_settings = {"ctx_max_chat": None, "ctx_max_stm": None, "ctx_max_ltm": None}
     ctx_max_chat = int(user_settings.get('ctx_max_chat') or 3000)
     ctx_max_stm = int(user_settings.get('ctx_max_stm') or 3000)
     ctx_max_ltm = int(user_settings.get('ctx_max_ltm') or 4000)
 
-    # 加载结构化画像和记忆
-    structured_profile = None
-    # 从数据库加载角色profile和记忆
-    short_term_memories = []
-    long_term_memories = []
-    try:
-        # 使用数据库加载函数（支持缓存）
-        structured_profile = _load_character_profile(role, uid) or {}
-        
-        # 读取记忆（从数据库）
-        short_term_memories, long_term_memories = _read_memories_from_profile(role, uid)
-    except Exception as e:
-        print(f"[WARNING] 加载角色profile失败: {e}")
-        structured_profile = {}
+    # 加载结构化画像和记忆（同步数据库调用，放到线程中执行）
+    structured_profile, short_term_memories, long_term_memories, persona_version = await asyncio.to_thread(
+        _load_profile_and_memories, role, uid, cid
+    )
     
     # 读取会话历史（从DB，避免会话重启丢失）
     # 只读取未压缩的消息，已压缩的消息已经凝练成短期/长期记忆
     try:
-        db_items = list_messages(uid, cid, limit=200, only_uncompressed=True)
+        db_items = await list_messages_async(uid, cid, limit=200, only_uncompressed=True, columns=MESSAGE_COLUMNS_CHAT)
         msgs_for_model = [
             {"role": str(it.get("role", "")), "content": str(it.get("content", ""))}
             for it in db_items if str(it.get("role", "")) in {"user", "assistant"}
@@ -215,13 +142,11 @@ async def api_post_message(role: str, request: Request):
 
     # 构建六段式 system prompt（包含记忆）
     from fastnpc.chat.prompt_builder import _remove_timestamp_suffix
-    from fastnpc.api.auth import get_user_settings
     
     user_name = str(user.get('u') or user.get('username') or '用户')
     role_display_name = _remove_timestamp_suffix(role)
     
-    # 获取用户简介
-    user_settings = get_user_settings(uid)
+    # 获取用户简介（复用上面读取的用户设置）
     user_profile_text = user_settings.get('profile') or ""
     user_profile_dict = {"简介": user_profile_text} if user_profile_text else None
     
@@ -250,10 +175,12 @@ async def api_post_message(role: str, request: Request):
         max_chars_transcript=ctx_max_chat,
         max_chars_ltm=ctx_max_ltm,
         max_chars_stm=ctx_max_stm,
+        character_id=cid,
+        persona_version=persona_version,
     )
     
-    # 保存实际发送给LLM的system prompt到user消息
-    update_message_system_prompt(user_msg_id, system_prompt)
+    # 保存实际发送给LLM的system prompt到user消息（后台写入，不增加首字延迟）
+    schedule_message_system_prompt_update(user_msg_id, system_prompt)
     
     # 上下文导出已移除（完全依赖数据库）
     
@@ -263,13 +190,12 @@ async def api_post_message(role: str, request: Request):
         {"role": "user", "content": content},
     ]
     reply = await get_openrouter_completion_async(prompt_msgs)
-    add_message(int(user['uid']), cid, 'assistant', reply)
+    await add_message_async(int(user['uid']), cid, 'assistant', reply)
     with sessions_lock:
         msgs.append({"role": "assistant", "content": reply})
     
-    # 检查并压缩三层记忆（后台任务，不阻塞响应）
-    # TODO: 可选优化 - 使用 BackgroundTasks 在后台执行
-    _check_and_compress_memories(role, uid, cid, user_name, ctx_max_chat, ctx_max_stm, ctx_max_ltm)
+    # 检查并压缩三层记忆（提交到后台压缩队列，不阻塞响应）
+    enqueue_memory_compaction(role, uid, cid, user_name, ctx_max_chat, ctx_max_stm, ctx_max_ltm)
     
     return {"reply": reply}
 
@@ -283,10 +209,11 @@ async def api_stream_message(role: str, content: str, request: Request, export_c
     # 写入用户消息（暂不保存system_prompt，等构建完成后更新）
     role = normalize_role_name(role)
     uid = int(user['uid'])
-    cid = get_or_create_character(uid, role)
-    user_msg_id = add_message(int(user['uid']), cid, 'user', content)
+    cid = await get_or_create_character_async(uid, role)
+    user_msg_id = await add_message_async(int(user['uid']), cid, 'user', content)
 
-    sid = _ensure_chat_session_for_role(role, user_id=uid)
+    # 首次创建会话时会读取角色画像（同步数据库调用）
+    sid = await asyncio.to_thread(_ensure_chat_session_for_role, role, uid)
     with sessions_lock:
         msgs: List[Dict[str, str]] = sessions[sid]["messages"]  # type: ignore
         msgs.append({"role": "user", "content": content})
@@ -296,32 +223,22 @@ async def api_stream_message(role: str, content: str, request: Request, export_c
         try:
             # 获取用户记忆预算
             try:
-                user_settings = get_user_settings(int(user['uid']))
+                user_settings = await get_user_settings_async(int(user['uid']))
             except Exception:
                 user_settings = {"ctx_max_chat": None, "ctx_max_stm": None, "ctx_max_ltm": None}
             ctx_max_chat = int(user_settings.get('ctx_max_chat') or 3000)
             ctx_max_stm = int(user_settings.get('ctx_max_stm') or 3000)
             ctx_max_ltm = int(user_settings.get('ctx_max_ltm') or 4000)
 
-            # 加载结构化画像和记忆
-            structured_profile = None
-            # 从数据库加载角色profile和记忆
-            short_term_memories = []
-            long_term_memories = []
-            try:
-                # 使用数据库加载函数（支持缓存）
-                structured_profile = _load_character_profile(role, uid) or {}
-                
-                # 读取记忆（从数据库）
-                short_term_memories, long_term_memories = _read_memories_from_profile(role, uid)
-            except Exception as e:
-                print(f"[WARNING] 加载角色profile失败: {e}")
-                structured_profile = {}
+            # 加载结构化画像和记忆（同步数据库调用，放到线程中执行）
+            structured_profile, short_term_memories, long_term_memories, persona_version = await asyncio.to_thread(
+                _load_profile_and_memories, role, uid, cid
+            )
             
             # 读取会话历史（从DB）
             # 只读取未压缩的消息，已压缩的消息已经凝练成短期/长期记忆
             try:
-                db_items = list_messages(uid, cid, limit=200, only_uncompressed=True)
+                db_items = await list_messages_async(uid, cid, limit=200, only_uncompressed=True, columns=MESSAGE_COLUMNS_CHAT)
                 msgs_model = [
                     {"role": str(it.get("role", "")), "content": str(it.get("content", ""))}
                     for it in db_items if str(it.get("role", "")) in {"user", "assistant"}
@@ -332,13 +249,11 @@ async def api_stream_message(role: str, content: str, request: Request, export_c
 
             # 构建六段式 system prompt（包含记忆）
             from fastnpc.chat.prompt_builder import _remove_timestamp_suffix
-            from fastnpc.api.auth import get_user_settings
             
             user_name = str(user.get('u') or user.get('username') or '用户')
             role_display_name = _remove_timestamp_suffix(role)
             
-            # 获取用户简介
-            user_settings = get_user_settings(uid)
+            # 获取用户简介（复用上面读取的用户设置）
             user_profile_text = user_settings.get('profile') or ""
             user_profile_dict = {"简介": user_profile_text} if user_profile_text else None
             
@@ -370,14 +285,16 @@ async def api_stream_message(role: str, content: str, request: Request, export_c
                 max_chars_transcript=ctx_max_chat,
                 max_chars_ltm=ctx_max_ltm,
                 max_chars_stm=ctx_max_stm,
+                character_id=cid,
+                persona_version=persona_version,
             )
             
-            # 保存实际发送给LLM的system prompt到user消息
-            update_message_system_prompt(user_msg_id, system_prompt)
+            # 保存实际发送给LLM的system prompt到user消息（后台写入，不增加首字延迟）
+            schedule_message_system_prompt_update(user_msg_id, system_prompt)
             
             # 导出上下文（仅管理员且开启）
             try:
-                _udb = get_user_by_id(uid)
+                _udb = await get_user_by_id_async(uid)
                 _is_admin = int(_udb.get('is_admin', 0)) if _udb else 0
             except Exception:
                 _is_admin = 0
@@ -395,20 +312,17 @@ async def api_stream_message(role: str, content: str, request: Request, export_c
                 acc += text
         finally:
             if acc:
-                add_message(int(user['uid']), cid, 'assistant', acc)
+                # 客户端断开时生成器会被取消，屏蔽取消以保证已生成的部分回复入库
+                with anyio.CancelScope(shield=True):
+                    await add_message_async(int(user['uid']), cid, 'assistant', acc)
                 with sessions_lock:
                     msgs.append({"role": "assistant", "content": acc})
                 
-                # 检查并压缩三层记忆
+                # 检查并压缩三层记忆（提交到后台压缩队列；记忆预算沿用本次请求读取的设置）
                 try:
-                    user_settings = get_user_settings(int(user['uid']))
-                    ctx_max_chat = int(user_settings.get('ctx_max_chat') or 3000)
-                    ctx_max_stm = int(user_settings.get('ctx_max_stm') or 3000)
-                    ctx_max_ltm = int(user_settings.get('ctx_max_ltm') or 4000)
-                    user_name = str(user.get('u') or user.get('username') or '用户')
-                    _check_and_compress_memories(role, uid, cid, user_name, ctx_max_chat, ctx_max_stm, ctx_max_ltm)
+                    enqueue_memory_compaction(role, uid, cid, user_name, ctx_max_chat, ctx_max_stm, ctx_max_ltm)
                 except Exception as e:
-                    print(f"[ERROR] 流式API记忆压缩失败: {e}")
+                    print(f"[ERROR] 流式API提交记忆压缩任务失败: {e}")
 
     headers = {
         "Cache-Control": "no-cache",
@@ -432,7 +346,7 @@ async def compress_all_session_memory(role: str, request: Request):
     
     try:
         # 读取所有未压缩的会话记忆
-        session_messages = list_messages(uid, cid, limit=200, only_uncompressed=True)
+        session_messages = list_messages(uid, cid, limit=200, only_uncompressed=True, columns=MESSAGE_COLUMNS_CHAT)
         
         if not session_messages:
             return {"status": "ok", "compressed": 0, "message": "无会话记忆"}
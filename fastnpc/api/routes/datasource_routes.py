@@ -4,40 +4,51 @@
 """
 from __future__ import annotations
 
-import time
+import asyncio
 
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 
 from fastnpc.api.utils import _require_user
-from fastnpc.datasources.baike import get_polysemant_options as baike_get_polysemant_options, get_full as baike_get_full
-from fastnpc.datasources.zhwiki import get_polysemant_options as zhwiki_get_polysemant_options
+from fastnpc.datasources.async_http import cached_options_async
+from fastnpc.datasources.baike import lookup_polysemant_async as baike_lookup_polysemant_async, get_full as baike_get_full
+from fastnpc.datasources.zhwiki import lookup_polysemant_async as zhwiki_lookup_polysemant_async
+
+
+# 按关键词缓存时取足量候选，不同 limit 的请求共用一份缓存
+_MAX_OPTIONS = 200
 
 
 router = APIRouter()
 
 
 @router.get('/api/baike/polysemant')
-def api_baike_polysemant(keyword: str, request: Request, limit: int = 120, strict: int = 1):
+async def api_baike_polysemant(keyword: str, request: Request, limit: int = 120, strict: int = 1):
     user = _require_user(request)
     if not user:
         return JSONResponse({"error": "unauthorized"}, status_code=401)
     kw = str(keyword or '').strip()
     if not kw:
         return JSONResponse({"error": "keyword 不能为空"}, status_code=400)
-    try:
-        items, route = baike_get_polysemant_options(kw, limit=limit, strict=bool(strict), return_route=True)
-        if not items:
+
+    async def lookup():
+        # 异步 HTTP 并发请求；浏览器兜底在浏览器池线程中执行，这里只等待结果
+        result = await baike_lookup_polysemant_async(kw, limit=_MAX_OPTIONS)
+        if not result["items"]:
             # 即时重试一次以对抗偶发风控
-            time.sleep(0.4)
-            items = baike_get_polysemant_options(kw, limit=limit)
+            await asyncio.sleep(0.4)
+            result = await baike_lookup_polysemant_async(kw, limit=_MAX_OPTIONS)
+        return result
+
+    try:
+        result = await cached_options_async('baike', kw, lookup)
     except Exception as e:
         return JSONResponse({"error": f"failed: {e}"}, status_code=500)
-    return {"items": items, "route": route}
+    return {"items": result["items"][:max(1, limit)], "route": result["route"], "summary": result.get("summary", "")}
 
 
 @router.get('/api/zhwiki/polysemant')
-def api_zhwiki_polysemant(keyword: str, request: Request, limit: int = 80):
+async def api_zhwiki_polysemant(keyword: str, request: Request, limit: int = 80):
     user = _require_user(request)
     if not user:
         return JSONResponse({"error": "unauthorized"}, status_code=401)
@@ -45,10 +56,10 @@ def api_zhwiki_polysemant(keyword: str, request: Request, limit: int = 80):
     if not kw:
         return JSONResponse({"error": "keyword 不能为空"}, status_code=400)
     try:
-        items, route = zhwiki_get_polysemant_options(kw, limit=limit, return_route=True)
+        result = await cached_options_async('zhwiki', kw, lambda: zhwiki_lookup_polysemant_async(kw, limit=_MAX_OPTIONS))
     except Exception as e:
         return JSONResponse({"error": f"failed: {e}"}, status_code=500)
-    return {"items": items, "route": route}
+    return {"items": result["items"][:max(1, limit)], "route": result["route"]}
 
 
 @router.post('/api/baike/full')
@@ -76,8 +87,11 @@ async def api_baike_full(request: Request):
     if filter_text is not None:
         filter_text = str(filter_text)
     try:
-        data = baike_get_full(keyword, retries=retries, min_sections=min_sections, min_chars=min_chars,
-                               choice_index=choice_index, filter_text=filter_text)
+        # 整页抓取仍为同步实现（含重试与随机等待），放到线程中执行，避免阻塞事件循环
+        data = await asyncio.to_thread(
+            baike_get_full, keyword, retries=retries, min_sections=min_sections, min_chars=min_chars,
+            choice_index=choice_index, filter_text=filter_text,
+        )
     except Exception as e:
         return JSONResponse({"error": f"failed: {e}"}, status_code=500)
     return data
@@ -27,9 +27,9 @@ from fastnpc.api.auth import (
     _get_conn,
     update_group_message_moderator_info,
 )
-from fastnpc.api.utils import _require_user, _load_character_profile
+from fastnpc.api.utils import _require_user, _load_character_profile, _load_character_profiles
 from fastnpc.chat.prompt_builder import build_chat_system_prompt, _remove_timestamp_suffix
-from fastnpc.chat.group_moderator import judge_next_speaker
+from fastnpc.chat.group_moderator import judge_next_speaker_async
 from fastnpc.llm.openrouter import (
     get_openrouter_completion,
     get_openrouter_completion_async,
@@ -39,7 +39,7 @@ from fastnpc.llm.openrouter import (
 router = APIRouter()
 
 
-def _judge_next_speaker_after_message(group_id: int, message_id: int, uid: int) -> None:
+async def _judge_next_speaker_after_message(group_id: int, message_id: int, uid: int) -> None:
     """角色发言后，调用中控判断下一个说话者，并更新到该消息中
     
     这样查看消息时，显示的是"该角色发言后，下一个该谁发言"的判断
@@ -53,6 +53,11 @@ def _judge_next_speaker_after_message(group_id: int, message_id: int, uid: int)
         # 获取成员简介
         member_profiles = []
         
+        # 批量加载角色成员画像（未命中缓存的角色一次查询）
+        member_profiles_map = _load_character_profiles(
+            [m['member_name'] for m in members if m['member_type'] != 'user'], uid
+        )
+        
         for member in members:
             if member['member_type'] == 'user':
                 # 根据成员用户名查询其用户ID和简介
@@ -71,7 +76,7 @@ def _judge_next_speaker_after_message(group_id: int, message_id: int, uid: int)
             else:
                 # 从数据库读取角色简介
                 try:
-                    structured = _load_character_profile(member['member_name'], uid)
+                    structured = member_profiles_map.get(member['member_name'])
                     if structured:
                         base = structured.get('基础身份信息', {})
                         personality = structured.get('个性与行为设定', {})
@@ -96,7 +101,7 @@ def _judge_next_speaker_after_message(group_id: int, message_id: int, uid: int)
                     })
         
         # 调用中控判断下一个说话者
-        result = judge_next_speaker(member_profiles, messages)
+        result = await judge_next_speaker_async(member_profiles, messages)
         
         # 更新消息的中控信息
         moderator_prompt = result.get("moderator_prompt", "")
@@ -423,6 +428,11 @@ async def api_judge_next_speaker(group_id: int, request: Request):
     
     from fastnpc.chat.prompt_builder import _remove_timestamp_suffix
     
+    # 批量加载角色成员画像（未命中缓存的角色一次查询）
+    member_profiles_map = _load_character_profiles(
+        [m['member_name'] for m in members if m['member_type'] != 'user'], uid
+    )
+    
     for member in members:
         if member['member_type'] == 'user':
             # 根据成员用户名查询其用户ID和简介
@@ -441,7 +451,7 @@ async def api_judge_next_speaker(group_id: int, request: Request):
         else:
             # 从数据库读取角色简介
             try:
-                structured = _load_character_profile(member['member_name'], uid)
+                structured = member_profiles_map.get(member['member_name'])
                 if structured:
                     base = structured.get('基础身份信息', {})
                     # 优先使用LLM生成的人物简介
@@ -470,7 +480,7 @@ async def api_judge_next_speaker(group_id: int, request: Request):
                 })
     
     # 调用中控
-    result = judge_next_speaker(member_profiles, messages)
+    result = await judge_next_speaker_async(member_profiles, messages)
     
     return {
         "next_speaker": result.get("next_speaker"),
@@ -538,6 +548,11 @@ async def api_generate_group_reply(group_id: int, request: Request):
     
     # 构建群聊专用的其他角色列表
     other_characters = []
+    # 批量加载角色成员画像（未命中缓存的角色一次查询）
+    member_profiles_map = _load_character_profiles(
+        [m['member_name'] for m in members if m['member_type'] != 'user'], uid
+    )
+    
     for member in members:
         if member['member_name'] == character_name:
             continue
@@ -545,7 +560,7 @@ async def api_generate_group_reply(group_id: int, request: Request):
             continue  # 用户在交谈对象中单独处理
         
         try:
-            prof = _load_character_profile(member['member_name'], uid)
+            prof = member_profiles_map.get(member['member_name'])
             if prof:
                 base = prof.get('基础身份信息', {})
                 # 优先使用LLM生成的人物简介
@@ -631,7 +646,7 @@ async def api_generate_group_reply(group_id: int, request: Request):
             )
             
             # 再次调用中控判断"该角色发言后，下一个该谁发言"，并更新到该消息中
-            _judge_next_speaker_after_message(group_id, message_id, uid)
+            await _judge_next_speaker_after_message(group_id, message_id, uid)
             
             # 检查并压缩群聊会话记忆（异步并发）
             await _compress_group_session_memory_if_needed(group_id, uid)
@@ -810,6 +825,11 @@ def api_get_member_briefs(group_id: int, request: Request):
     
     from fastnpc.chat.prompt_builder import _remove_timestamp_suffix
     
+    # 批量加载角色成员画像（未命中缓存的角色一次查询）
+    member_profiles_map = _load_character_profiles(
+        [m['member_name'] for m in members if m['member_type'] != 'user'], uid
+    )
+    
     for member in members:
         if member['member_type'] == 'user':
             # 根据成员用户名查询其用户ID和简介
@@ -828,7 +848,7 @@ def api_get_member_briefs(group_id: int, request: Request):
             })
         else:
             try:
-                prof = _load_character_profile(member['member_name'], uid)
+                prof = member_profiles_map.get(member['member_name'])
                 if prof:
                     base = prof.get('基础身份信息', {})
                     # 优先使用LLM生成的人物简介
@@ -1032,12 +1052,13 @@ async def get_group_message_prompt(group_id: int, msg_id: int, request: Request)
     from fastnpc.config import USE_POSTGRESQL
     from fastnpc.api.auth import _row_to_dict
     from fastnpc.api.auth.db_utils import _return_conn
+    from fastnpc.api.auth.prompt_snapshots import resolve_prompt_snapshot
     
     conn = _get_conn()
     try:
         cur = conn.cursor()
         cur.execute(
-            "SELECT sender_type, sender_name, content, system_prompt_snapshot, moderator_prompt, moderator_response FROM group_messages WHERE id=%s AND group_id=%s",
+            "SELECT sender_type, sender_name, content, system_prompt_snapshot, system_prompt_snapshot_id, moderator_prompt, moderator_response FROM group_messages WHERE id=%s AND group_id=%s",
             (msg_id, group_id)
         )
         row = cur.fetchone()
@@ -1050,11 +1071,14 @@ async def get_group_message_prompt(group_id: int, msg_id: int, request: Request)
         else:
             row_dict = dict(row)
         
+        # 快照已去重存储，按ID还原（旧消息仍读取文本列）
+        system_prompt = resolve_prompt_snapshot(cur, row_dict['system_prompt_snapshot'], row_dict['system_prompt_snapshot_id'])
+        
         return {
             "sender_type": row_dict['sender_type'],
             "sender_name": row_dict['sender_name'],
             "user_content": row_dict['content'],
-            "system_prompt": row_dict['system_prompt_snapshot'] or "（无）",
+            "system_prompt": system_prompt or "（无）",
             "moderator_prompt": row_dict['moderator_prompt'] or "（无）",
             "moderator_response": row_dict['moderator_response'] or "（无）"
         }
@@ -6,14 +6,17 @@ from __future__ import annotations
 
 import uuid
 import time
+import json
 from typing import Optional
 
-from fastapi import APIRouter, BackgroundTasks, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Request, Form
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
 from fastnpc.config import TEMPLATES_DIR
-from fastnpc.api.state import TaskState, tasks, tasks_lock, _collect_and_structure
+from fastnpc.api.state import TaskState, register_task, get_task_snapshot, get_task_snapshot_async, cancel_task, _set_task
+from fastnpc.api.creation_scheduler import submit_creation_task, cancel_queued_creation, CreationRejected
+from fastnpc.api.task_store import stream_task_events
 
 
 router = APIRouter()
@@ -21,7 +24,7 @@ templates = Jinja2Templates(directory=TEMPLATES_DIR.as_posix())
 
 
 @router.post("/collect", response_class=HTMLResponse)
-def collect(request: Request, background_tasks: BackgroundTasks, role: str = Form(...), source: str = Form(...), model: str = Form("z-ai/glm-4-32b"),
+def collect(request: Request, role: str = Form(...), source: str = Form(...), model: str = Form("z-ai/glm-4-32b"),
             detail: str = Form("detailed"), choice_index: Optional[int] = Form(None), filter_text: Optional[str] = Form(None),
             export_facts: Optional[str] = Form(None), export_bullets: Optional[str] = Form(None)):
     task_id = uuid.uuid4().hex
@@ -33,9 +36,11 @@ def collect(request: Request, background_tasks: BackgroundTasks, role: str = For
     eb = bool(export_bullets)
     state = TaskState(role=role, source=source, model=model, detail=detail, choice_index=ci, filter_text=filter_text,
                       export_facts=ef, export_bullets=eb)
-    with tasks_lock:
-        tasks[task_id] = state
-    background_tasks.add_task(_collect_and_structure, task_id)
+    register_task(task_id, state)
+    try:
+        submit_creation_task(task_id, None)
+    except CreationRejected as e:
+        _set_task(task_id, status="error", message=str(e))
     # 返回进度条部件
     return templates.TemplateResponse(
         "partials/progress.html",
@@ -51,11 +56,11 @@ def collect(request: Request, background_tasks: BackgroundTasks, role: str = For
 
 @router.get("/progress/{task_id}", response_class=HTMLResponse)
 def progress(request: Request, task_id: str):
-    t = tasks.get(task_id)
+    t = get_task_snapshot(task_id)
     if not t:
         return HTMLResponse("<div class=\"text-red-600\">任务不存在</div>")
     now = int(time.time())
-    elapsed = max(0, now - getattr(t, 'started_at', now))
+    elapsed = max(0, now - (t.get('started_at') or now))
     def _fmt(sec: int) -> str:
         h = sec // 3600
         m = (sec % 3600) // 60
@@ -66,58 +71,85 @@ def progress(request: Request, task_id: str):
         {
             "request": request,
             "task_id": task_id,
-            "progress": t.progress,
-            "status": t.status,
-            "message": t.message,
+            "progress": t.get('progress'),
+            "status": t.get('status'),
+            "message": t.get('message'),
             "elapsed_text": _fmt(elapsed),
-            "role": t.role,
+            "role": t.get('role'),
         },
     )
 
 
+def _task_payload(t: dict) -> dict:
+    now = int(time.time())
+    started_at = t.get('started_at')
+    return {
+        "status": t.get('status'),
+        "progress": t.get('progress'),
+        "message": t.get('message'),
+        "role": t.get('role'),
+        "raw_path": t.get('raw_path'),
+        "structured_path": t.get('structured_path'),
+        "queue_position": t.get('queue_position') or 0,
+        "started_at": started_at,
+        "elapsed_sec": (max(0, now - started_at) if started_at else None),
+    }
+
+
 @router.get("/api/tasks/{task_id}")
 def api_task(task_id: str):
-    t = tasks.get(task_id)
+    t = get_task_snapshot(task_id)
     if not t:
         return {"status": "not_found"}
-    now = int(time.time())
-    return {
-        "status": t.status,
-        "progress": t.progress,
-        "message": t.message,
-        "role": t.role,
-        "raw_path": t.raw_path,
-        "structured_path": t.structured_path,
-        "started_at": getattr(t, 'started_at', None),
-        "elapsed_sec": (max(0, now - getattr(t, 'started_at', now)) if getattr(t, 'started_at', None) else None),
+    return _task_payload(t)
+
+
+@router.get("/api/tasks/{task_id}/events")
+async def api_task_events(task_id: str):
+    """SSE 推送任务进度（替代轮询 /api/tasks/{task_id}）
+
+    每个事件的 data 与 /api/tasks/{task_id} 的返回格式相同，任务结束（done/error/cancelled）
+    或不存在（not_found）后关闭连接；空闲时发送注释行作为心跳。
+    """
+    async def gen():
+        async for snapshot in stream_task_events(task_id, get_task_snapshot_async):
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+                continue
+            payload = _task_payload(snapshot) if snapshot.get('status') != 'not_found' else snapshot
+            yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
     }
+    return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
 
 
 @router.post("/api/tasks/{task_id}/cancel")
 def api_cancel_task(task_id: str, request: Request):
     """取消正在执行的任务"""
     from fastnpc.api.utils import _require_user
-    from fastnpc.api.state import tasks_lock
     
     user = _require_user(request)
     if not user:
         from fastapi.responses import JSONResponse
         return JSONResponse({"error": "unauthorized"}, status_code=401)
     
-    with tasks_lock:
-        t = tasks.get(task_id)
-        if not t:
-            from fastapi.responses import JSONResponse
-            return JSONResponse({"error": "任务不存在"}, status_code=404)
-        
-        # 验证任务所属用户
-        if t.user_id != user.get('uid'):
-            from fastapi.responses import JSONResponse
-            return JSONResponse({"error": "无权取消此任务"}, status_code=403)
-        
-        # 设置取消标志
-        t.cancelled = True
-        print(f"[INFO] 用户 {user.get('username')} 请求取消任务 {task_id}")
+    t = get_task_snapshot(task_id)
+    if not t:
+        from fastapi.responses import JSONResponse
+        return JSONResponse({"error": "任务不存在"}, status_code=404)
+    
+    # 验证任务所属用户
+    if t.get('user_id') != user.get('uid'):
+        from fastapi.responses import JSONResponse
+        return JSONResponse({"error": "无权取消此任务"}, status_code=403)
+    
+    # 设置取消标志（任务可能在其它 Worker 上执行，由共享存储传递）
+    cancel_task(task_id)
+    cancel_queued_creation(task_id)
+    print(f"[INFO] 用户 {user.get('username')} 请求取消任务 {task_id}")
     
     return {"ok": True, "message": "取消请求已发送"}
-
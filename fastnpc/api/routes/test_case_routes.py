@@ -15,6 +15,7 @@ from fastapi.responses import JSONResponse
 
 from fastnpc.config import USE_POSTGRESQL, BASE_DIR
 from fastnpc.api.auth.db_utils import _get_conn, _return_conn, _row_to_dict
+from fastnpc.api.auth.prompt_snapshots import release_snapshots_where
 from fastnpc.api.utils import _require_admin
 from fastnpc.api.cache import get_redis_cache
 from fastnpc.prompt_manager import PromptManager
@@ -561,6 +562,7 @@ async def reset_character_state(persona_id: str, request: Request):
         # 1. 删除数据库中的对话消息
         cur = conn.cursor()
         placeholder = "%s" if USE_POSTGRESQL else "?"
+        release_snapshots_where(cur, "messages", f"character_id = {placeholder}", (char_id,))
         cur.execute(f"DELETE FROM messages WHERE character_id = {placeholder}", (char_id,))
         deleted_msgs = cur.rowcount
         conn.commit()
@@ -619,6 +621,7 @@ async def reset_group_state(group_id: int, request: Request):
         reset_count = 0
         
         # 1. 删除群聊消息
+        release_snapshots_where(cur, "group_messages", f"group_id = {placeholder}", (group_id,))
         cur.execute(f"DELETE FROM group_messages WHERE group_id = {placeholder}", (group_id,))
         deleted_msgs = cur.rowcount
         reset_count += deleted_msgs
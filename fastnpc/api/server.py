@@ -12,6 +12,14 @@ from fastapi.staticfiles import StaticFiles
 
 from fastnpc.config import CHAR_DIR, TEMPLATES_DIR, STATIC_DIR, FRONTEND_ORIGINS, BASE_DIR
 from fastnpc.api.auth import init_db
+from fastnpc.api.auth.db_pool import close_all_connections
+from fastnpc.api.auth.db_pool_async import close_async_pools
+from fastnpc.api.compaction import start_compaction_workers, stop_compaction_workers
+from fastnpc.api.creation_scheduler import start_creation_workers, stop_creation_workers
+from fastnpc.llm.openrouter import close_async_openrouter_client, close_openrouter_clients
+from fastnpc.datasources.browser_pool import close_browser_pool
+from fastnpc.datasources.async_http import close_async_datasource_client
+from fastnpc.api.task_store import close_async_task_store
 
 # 导入所有路由模块
 from fastnpc.api.routes.auth_routes import router as auth_router
@@ -97,6 +105,33 @@ app.include_router(prompt_router)    # 提示词管理路由
 app.include_router(test_case_router) # 测试用例管理路由
 
 
+@app.on_event("startup")
+async def _on_startup() -> None:
+    # 启动记忆压缩后台 Worker（并恢复上次未完成的任务）
+    try:
+        start_compaction_workers()
+    except Exception as e:
+        print(f"[WARN] 启动记忆压缩 Worker 失败: {e}")
+    # 启动角色创建调度 Worker
+    try:
+        start_creation_workers()
+    except Exception as e:
+        print(f"[WARN] 启动角色创建 Worker 失败: {e}")
+
+
+@app.on_event("shutdown")
+async def _on_shutdown() -> None:
+    stop_compaction_workers()
+    stop_creation_workers()
+    close_browser_pool()
+    await close_async_pools()
+    await close_async_openrouter_client()
+    await close_async_datasource_client()
+    await close_async_task_store()
+    close_openrouter_clients()
+    close_all_connections()
+
+
 def create_app() -> FastAPI:
     """应用工厂函数"""
     return app
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+角色创建的单飞（single-flight）去重
+
+多个用户同时创建同一个热门人物时，每个 TaskState 都会独立抓取网页并调用 9 次结构化 LLM。
+这里让相同 key（数据源 + 规范化关键词 + 所选词条 + 详细程度）的并发创建共享同一次执行：
+
+- 进程内：第一个调用者成为领头者执行任务；其余调用者不在线程中等待，而是收到 FlightBusy，
+  由调度器把任务放回队列（归还执行名额），并用 watch_flight 登记回调，领头者结束时重新调度
+- 跨 Worker：领头者先用 Redis SET NX 获取锁 creation_flight:lock:{key}，完成后把结果写入
+  creation_flight:result:{key}（保留 CREATION_FLIGHT_RESULT_TTL 秒）；其它 Worker 的调用者同样收到
+  FlightBusy，由调度器定期重试；锁消失却没有结果（领头者失败或取消）时重试的调用者自行接手，
+  自首次等待起超过 CREATION_FLIGHT_WAIT_TIMEOUT 秒时不再等待、独立执行
+- 进程内的结果同样保留 CREATION_FLIGHT_RESULT_TTL 秒，供重新调度的调用者读取；
+  领头者失败时不保留结果，重新调度的调用者自行执行
+- Redis 不可用时只做进程内去重
+
+结果必须可 JSON 序列化。每个等待者拿到结果后各自完成头像处理与入库（save_character_full_data）。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastnpc.config import (
+    CREATION_SINGLE_FLIGHT,
+    CREATION_FLIGHT_LOCK_TTL,
+    CREATION_FLIGHT_WAIT_TIMEOUT,
+    CREATION_FLIGHT_RESULT_TTL,
+)
+
+
+LOCK_KEY_PREFIX = "creation_flight:lock"
+RESULT_KEY_PREFIX = "creation_flight:result"
+
+# Redis 失败后暂停使用的时间（秒）
+_REDIS_RETRY_INTERVAL = 30.0
+_redis_down_until = 0.0
+
+# 只删除自己持有的锁（锁过期后可能已被其它 Worker 获取）
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class FlightAborted(Exception):
+    """调用者的任务已取消，不再执行或等待共享任务"""
+
+
+class FlightBusy(Exception):
+    """相同 key 的任务正由其它调用者执行：调用者应释放执行名额，稍后重新调度
+
+    remote=False 时领头者在本进程内，可用 watch_flight 在其结束时得到通知；
+    remote=True 时领头者在其它 Worker，只能定期重试。
+    """
+
+    def __init__(self, key: str, remote: bool):
+        super().__init__(key)
+        self.key = key
+        self.remote = remote
+
+
+class _Flight:
+    def __init__(self):
+        # 领头者结束时调用的回调（等待中的调用者）
+        self.watchers: List[Callable[[], None]] = []
+
+
+_flights_lock = threading.Lock()
+_flights: Dict[str, _Flight] = {}
+# key -> (过期时间, 结果)：本进程最近完成的共享任务
+_results: Dict[str, Tuple[float, Any]] = {}
+_stats_lock = threading.Lock()
+_stats = {"leaders": 0, "shared_local": 0, "shared_remote": 0, "takeovers": 0, "aborted": 0, "busy": 0}
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def flight_key(*parts: Any) -> str:
+    """由任务参数生成 key（参数需可 JSON 序列化）"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _redis_client():
+    """可用时返回同步 Redis 客户端，否则返回 None（失败后暂停使用一段时间，避免每次等待连接超时）"""
+    global _redis_down_until
+    if time.time() < _redis_down_until:
+        return None
+    try:
+        from fastnpc.api.cache import get_redis_cache
+        client = get_redis_cache().client
+        client.ping()
+        return client
+    except Exception as e:
+        _redis_down_until = time.time() + _REDIS_RETRY_INTERVAL
+        print(f"[WARN] 创建任务去重 Redis 不可用，暂时只做进程内去重: {e}")
+        return None
+
+
+def run_single_flight(
+    key: str,
+    fn: Callable[[Callable[[], bool]], Any],
+    *,
+    cancelled: Callable[[], bool],
+    on_wait: Optional[Callable[[str], None]] = None,
+    wait_started: Optional[float] = None,
+) -> Tuple[Any, bool]:
+    """执行 key 对应的共享任务，或取得其最近的结果；任务正由其它调用者执行时抛出 FlightBusy
+
+    Args:
+        fn: 实际任务，参数 should_abort() 在没有其他等待者且调用者已取消时返回 True，
+            fn 可据此在阶段之间抛出 FlightAborted 提前结束
+        cancelled: 调用者任务是否已取消
+        on_wait: 需要等待其它任务时的回调（参数为提示信息），用于更新任务进度
+        wait_started: 调用者首次收到 FlightBusy 的时间（重新调度时传入），用于等待超时
+
+    Returns:
+        (结果, 是否复用了其它任务的结果)
+
+    Raises:
+        FlightAborted: 调用者任务已取消
+        FlightBusy: 相同任务正在执行，调用者应稍后重试
+    """
+    if not CREATION_SINGLE_FLIGHT:
+        return fn(cancelled), False
+
+    now = time.time()
+    with _flights_lock:
+        recent = _results.get(key)
+        if recent is not None and recent[0] > now:
+            _stats["shared_local"] += 1
+            return recent[1], True
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight()
+            _flights[key] = flight
+
+    if leader:
+        return _lead(key, flight, fn, cancelled, on_wait, wait_started)
+
+    if cancelled():
+        _count("aborted")
+        raise FlightAborted()
+    if on_wait:
+        on_wait("已有相同角色正在创建，等待其完成…")
+    _count("busy")
+    raise FlightBusy(key, remote=False)
+
+
+def watch_flight(key: str, callback: Callable[[], None]) -> bool:
+    """在本进程内 key 对应的领头者结束时调用 callback（领头者线程中调用，需很快返回）
+
+    Returns:
+        False 表示该任务已经结束（调用方应立即重新调度）
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is None:
+            return False
+        flight.watchers.append(callback)
+        return True
+
+
+def unwatch_flight(key: str, callback: Callable[[], None]) -> None:
+    """取消 watch_flight 登记的回调（等待中的任务被取消时调用）"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None and callback in flight.watchers:
+            flight.watchers.remove(callback)
+
+
+def _lead(
+    key: str,
+    flight: _Flight,
+    fn: Callable[[Callable[[], bool]], Any],
+    cancelled: Callable[[], bool],
+    on_wait: Optional[Callable[[str], None]],
+    wait_started: Optional[float],
+) -> Tuple[Any, bool]:
+    def should_abort() -> bool:
+        with _flights_lock:
+            alone = not flight.watchers
+        return alone and cancelled()
+
+    try:
+        result, shared = _run_across_workers(key, fn, should_abort, on_wait, wait_started)
+        now = time.time()
+        with _flights_lock:
+            for k in [k for k, (expires, _) in _results.items() if expires <= now]:
+                _results.pop(k, None)
+            _results[key] = (now + CREATION_FLIGHT_RESULT_TTL, result)
+        return result, shared
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+            watchers = list(flight.watchers)
+        for callback in watchers:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[WARN] 通知等待中的创建任务失败: {e}")
+
+
+def _run_across_workers(
+    key: str,
+    fn: Callable[[Callable[[], bool]], Any],
+    should_abort: Callable[[], bool],
+    on_wait: Optional[Callable[[str], None]],
+    wait_started: Optional[float],
+) -> Tuple[Any, bool]:
+    """进程内领头者：通过 Redis 锁与其它 Worker 去重"""
+    client = _redis_client()
+    if client is None:
+        _count("leaders")
+        return fn(should_abort), False
+
+    lock_key = f"{LOCK_KEY_PREFIX}:{key}"
+    result_key = f"{RESULT_KEY_PREFIX}:{key}"
+    token = uuid.uuid4().hex
+    try:
+        cached = client.get(result_key)
+        if cached is not None:
+            _count("shared_remote")
+            return json.loads(cached), True
+        if not client.set(lock_key, token, nx=True, ex=CREATION_FLIGHT_LOCK_TTL):
+            if wait_started is not None and time.time() - wait_started > CREATION_FLIGHT_WAIT_TIMEOUT:
+                print(f"[WARN] 等待共享创建任务超时，改为独立执行: {key}")
+                _count("leaders")
+                return fn(should_abort), False
+            if should_abort():
+                _count("aborted")
+                raise FlightAborted()
+            if on_wait:
+                on_wait("已有相同角色正在其它进程中创建，等待其完成…")
+            _count("busy")
+            raise FlightBusy(key, remote=True)
+        if wait_started is not None:
+            # 其它 Worker 的领头者失败或取消
+            _count("takeovers")
+    except (FlightAborted, FlightBusy):
+        raise
+    except Exception as e:
+        print(f"[WARN] 创建任务去重锁不可用，改为独立执行: {e}")
+        _count("leaders")
+        return fn(should_abort), False
+
+    _count("leaders")
+    try:
+        result = fn(should_abort)
+        try:
+            client.set(result_key, json.dumps(result, ensure_ascii=False), ex=CREATION_FLIGHT_RESULT_TTL)
+        except Exception as e:
+            print(f"[WARN] 写入共享创建结果失败: {e}")
+        return result, False
+    finally:
+        try:
+            client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            print(f"[WARN] 释放创建任务去重锁失败: {e}")
+
+
+def get_single_flight_stats() -> Dict[str, Any]:
+    """去重统计（用于监控）"""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    with _flights_lock:
+        stats["in_flight"] = len(_flights)
+        stats["waiting"] = sum(len(f.watchers) for f in _flights.values())
+    stats["enabled"] = CREATION_SINGLE_FLIGHT
+    return stats
@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+角色创建任务的跨 Worker 存储与进度推送
+
+任务执行体（TaskState）仍保存在执行它的 Worker 进程内（state.tasks），
+这里负责把任务快照同步到 Redis，使任意 Worker 都能查询进度、发起取消：
+
+- task:{task_id}         Redis Hash，每个字段一个 JSON 值（按字段写入，取消与进度更新互不覆盖）
+- task_events:{task_id}  Pub/Sub 频道，每次 _set_task 发布完整快照，供 SSE 端点推送
+- creation:running / creation:user_running:{uid} / creation:user_pending:{uid}
+                         ZSet，task_id -> 租约到期时间：角色创建调度器的全局并发、每用户并发与
+                         每用户排队+执行中计数（跨 Worker 生效）。租约由持有任务的 Worker 定期续期，
+                         Worker 崩溃后到期的条目在下次计数时清除
+
+SSE 端点使用按事件循环复用的异步 Redis 客户端（订阅与兜底读取快照都不占用线程池线程，
+也不为每个连接新建客户端）。Redis 不可用时退化为单进程模式：快照只在本进程内可见，
+SSE 通过进程内监听队列推送。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastnpc.config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_PASSWORD,
+    TASK_STORE_TTL,
+    TASK_EVENTS_HEARTBEAT,
+)
+
+
+TASK_KEY_PREFIX = "task"
+TASK_CHANNEL_PREFIX = "task_events"
+TERMINAL_STATUSES = ("done", "error", "cancelled")
+
+CREATION_RUNNING_KEY = "creation:running"
+CREATION_USER_RUNNING_PREFIX = "creation:user_running"
+CREATION_USER_PENDING_PREFIX = "creation:user_pending"
+# 创建任务计数的租约时长（秒）；调度器每 CREATION_LEASE_RENEW_INTERVAL 秒续期一次
+CREATION_LEASE_TTL = 120
+CREATION_LEASE_RENEW_INTERVAL = 30
+
+# 准入：清除过期条目后，用户排队+执行中的任务数未达上限时登记
+_ADMIT_SCRIPT = """
+redis.call('zremrangebyscore', KEYS[1], '-inf', ARGV[2])
+if redis.call('zscore', KEYS[1], ARGV[1]) then
+    return 1
+end
+if redis.call('zcard', KEYS[1]) >= tonumber(ARGV[4]) then
+    return 0
+end
+redis.call('zadd', KEYS[1], ARGV[3], ARGV[1])
+redis.call('expire', KEYS[1], ARGV[5])
+return 1
+"""
+
+# 开始执行：全局已满返回 0，用户已满返回 -1，否则登记并返回 1（KEYS[2] 为空表示匿名任务）
+_START_SCRIPT = """
+redis.call('zremrangebyscore', KEYS[1], '-inf', ARGV[2])
+if redis.call('zscore', KEYS[1], ARGV[1]) then
+    return 1
+end
+if redis.call('zcard', KEYS[1]) >= tonumber(ARGV[4]) then
+    return 0
+end
+if KEYS[2] ~= '' then
+    redis.call('zremrangebyscore', KEYS[2], '-inf', ARGV[2])
+    if redis.call('zcard', KEYS[2]) >= tonumber(ARGV[5]) then
+        return -1
+    end
+    redis.call('zadd', KEYS[2], ARGV[3], ARGV[1])
+    redis.call('expire', KEYS[2], ARGV[6])
+end
+redis.call('zadd', KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+
+# Redis 失败后暂停使用的时间（秒），避免每次更新都等待连接超时
+_REDIS_RETRY_INTERVAL = 30.0
+_redis_down_until = 0.0
+
+_listeners_lock = threading.Lock()
+# task_id -> [(事件循环, 队列)]：Redis 不可用时的进程内推送
+_local_listeners: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+# 事件循环 -> 异步 Redis 客户端（连接绑定到创建它的事件循环）
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def _redis_client():
+    """可用时返回同步 Redis 客户端，否则返回 None"""
+    if time.time() < _redis_down_until:
+        return None
+    try:
+        from fastnpc.api.cache import get_redis_cache
+        return get_redis_cache().client
+    except Exception:
+        return None
+
+
+def _mark_redis_down(e: Exception) -> None:
+    global _redis_down_until
+    _redis_down_until = time.time() + _REDIS_RETRY_INTERVAL
+    print(f"[WARN] 任务存储 Redis 不可用，暂时使用进程内存储: {e}")
+
+
+def _async_redis_client():
+    """当前事件循环复用的异步 Redis 客户端，Redis 不可用时返回 None
+
+    所有 SSE 连接共用客户端的连接池：订阅各自占用池中的一个连接，结束时归还。
+    """
+    if _redis_client() is None:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        with _async_clients_lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                try:
+                    import redis.asyncio as aioredis
+                except ImportError:
+                    return None
+                client = aioredis.Redis(
+                    host=REDIS_HOST,
+                    port=REDIS_PORT,
+                    db=REDIS_DB,
+                    password=REDIS_PASSWORD,
+                    decode_responses=True,
+                    socket_connect_timeout=5,
+                )
+                _async_clients[loop] = client
+    return client
+
+
+async def close_async_task_store() -> None:
+    """关闭当前事件循环的异步 Redis 客户端（事件循环结束前调用）"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    with _async_clients_lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+
+
+def is_terminal(snapshot: Optional[Dict[str, Any]]) -> bool:
+    return bool(snapshot) and snapshot.get("status") in TERMINAL_STATUSES
+
+
+def publish_task(task_id: str, fields: Dict[str, Any], snapshot: Dict[str, Any]) -> None:
+    """写入变化的字段并发布完整快照
+
+    Args:
+        fields: 本次变化的字段（只写这些字段，避免覆盖其它 Worker 写入的取消标志）
+        snapshot: 任务当前完整快照（用于推送）
+    """
+    client = _redis_client()
+    if client is not None:
+        key = f"{TASK_KEY_PREFIX}:{task_id}"
+        try:
+            pipe = client.pipeline()
+            pipe.hset(key, mapping={k: json.dumps(v, ensure_ascii=False) for k, v in fields.items()})
+            pipe.expire(key, TASK_STORE_TTL)
+            pipe.publish(f"{TASK_CHANNEL_PREFIX}:{task_id}", json.dumps(snapshot, ensure_ascii=False))
+            pipe.execute()
+            return
+        except Exception as e:
+            _mark_redis_down(e)
+    _notify_local(task_id, snapshot)
+
+
+def _decode_snapshot(raw: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    if not raw:
+        return None
+    snapshot = {}
+    for k, v in raw.items():
+        try:
+            snapshot[k] = json.loads(v)
+        except Exception:
+            snapshot[k] = v
+    return snapshot
+
+
+def load_task(task_id: str) -> Optional[Dict[str, Any]]:
+    """从 Redis 读取任务快照（其它 Worker 创建的任务）"""
+    client = _redis_client()
+    if client is None:
+        return None
+    try:
+        raw = client.hgetall(f"{TASK_KEY_PREFIX}:{task_id}")
+    except Exception as e:
+        _mark_redis_down(e)
+        return None
+    return _decode_snapshot(raw)
+
+
+async def load_task_async(task_id: str) -> Optional[Dict[str, Any]]:
+    """load_task 的异步版本（SSE 端点使用，不占用线程池线程）"""
+    client = _async_redis_client()
+    if client is None:
+        return None
+    try:
+        raw = await client.hgetall(f"{TASK_KEY_PREFIX}:{task_id}")
+    except Exception as e:
+        _mark_redis_down(e)
+        return None
+    return _decode_snapshot(raw)
+
+
+def mark_task_cancelled(task_id: str) -> bool:
+    """在共享存储中设置取消标志，执行任务的 Worker 在下一个检查点读取"""
+    client = _redis_client()
+    if client is None:
+        return False
+    key = f"{TASK_KEY_PREFIX}:{task_id}"
+    try:
+        if not client.exists(key):
+            return False
+        client.hset(key, "cancelled", json.dumps(True))
+        return True
+    except Exception as e:
+        _mark_redis_down(e)
+        return False
+
+
+def is_task_cancelled_remote(task_id: str) -> bool:
+    client = _redis_client()
+    if client is None:
+        return False
+    try:
+        value = client.hget(f"{TASK_KEY_PREFIX}:{task_id}", "cancelled")
+        return bool(value and json.loads(value))
+    except Exception as e:
+        _mark_redis_down(e)
+        return False
+
+
+def admit_creation(task_id: str, user_id: int, max_pending: int) -> Optional[bool]:
+    """跨 Worker 的每用户准入：登记排队中的任务
+
+    Returns:
+        True 已登记；False 用户排队+执行中的任务已达 max_pending；None Redis 不可用（调用方只做进程内检查）
+    """
+    client = _redis_client()
+    if client is None:
+        return None
+    now = time.time()
+    try:
+        return bool(client.eval(
+            _ADMIT_SCRIPT, 1, f"{CREATION_USER_PENDING_PREFIX}:{user_id}",
+            task_id, now, now + CREATION_LEASE_TTL, max_pending, CREATION_LEASE_TTL,
+        ))
+    except Exception as e:
+        _mark_redis_down(e)
+        return None
+
+
+def try_start_creation(task_id: str, user_id: Optional[int], max_running: int, per_user_running: int) -> Optional[int]:
+    """跨 Worker 的并发控制：占用一个执行名额
+
+    Returns:
+        1 已占用；0 全局已满；-1 该用户已满；None Redis 不可用（调用方只做进程内限制）
+    """
+    client = _redis_client()
+    if client is None:
+        return None
+    now = time.time()
+    user_key = f"{CREATION_USER_RUNNING_PREFIX}:{user_id}" if user_id else ""
+    try:
+        return int(client.eval(
+            _START_SCRIPT, 2, CREATION_RUNNING_KEY, user_key,
+            task_id, now, now + CREATION_LEASE_TTL, max_running, per_user_running, CREATION_LEASE_TTL,
+        ))
+    except Exception as e:
+        _mark_redis_down(e)
+        return None
+
+
+def release_creation(task_id: str, user_id: Optional[int], finished: bool = True) -> None:
+    """归还执行名额；finished=True 时同时移出用户的排队+执行中计数"""
+    client = _redis_client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zrem(CREATION_RUNNING_KEY, task_id)
+        if user_id:
+            pipe.zrem(f"{CREATION_USER_RUNNING_PREFIX}:{user_id}", task_id)
+            if finished:
+                pipe.zrem(f"{CREATION_USER_PENDING_PREFIX}:{user_id}", task_id)
+        pipe.execute()
+    except Exception as e:
+        _mark_redis_down(e)
+
+
+def renew_creation_leases(
+    running: List[Tuple[str, Optional[int]]],
+    pending: List[Tuple[str, Optional[int]]],
+) -> None:
+    """续期本进程执行中（running）与排队、执行中（pending）任务的计数租约"""
+    if not running and not pending:
+        return
+    client = _redis_client()
+    if client is None:
+        return
+    expiry = time.time() + CREATION_LEASE_TTL
+    try:
+        pipe = client.pipeline(transaction=False)
+        for task_id, user_id in running:
+            pipe.zadd(CREATION_RUNNING_KEY, {task_id: expiry}, xx=True)
+            if user_id:
+                pipe.zadd(f"{CREATION_USER_RUNNING_PREFIX}:{user_id}", {task_id: expiry}, xx=True)
+                pipe.expire(f"{CREATION_USER_RUNNING_PREFIX}:{user_id}", CREATION_LEASE_TTL)
+        for task_id, user_id in pending:
+            if user_id:
+                pipe.zadd(f"{CREATION_USER_PENDING_PREFIX}:{user_id}", {task_id: expiry}, xx=True)
+                pipe.expire(f"{CREATION_USER_PENDING_PREFIX}:{user_id}", CREATION_LEASE_TTL)
+        pipe.execute()
+    except Exception as e:
+        _mark_redis_down(e)
+
+
+def _notify_local(task_id: str, snapshot: Dict[str, Any]) -> None:
+    with _listeners_lock:
+        listeners = list(_local_listeners.get(task_id, []))
+    for loop, queue in listeners:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, dict(snapshot))
+        except RuntimeError:
+            # 事件循环已关闭（客户端断开）
+            pass
+
+
+async def _open_pubsub(task_id: str):
+    """订阅任务频道（使用共享的异步客户端），Redis 不可用时返回 None"""
+    client = _async_redis_client()
+    if client is None:
+        return None
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(f"{TASK_CHANNEL_PREFIX}:{task_id}")
+        return pubsub
+    except Exception as e:
+        print(f"[WARN] 订阅任务进度失败，使用进程内推送: {e}")
+        try:
+            await pubsub.aclose()
+        except Exception:
+            pass
+        return None
+
+
+async def _forward_pubsub(pubsub, queue: asyncio.Queue) -> None:
+    async for message in pubsub.listen():
+        if message.get("type") != "message":
+            continue
+        try:
+            queue.put_nowait(json.loads(message["data"]))
+        except Exception:
+            pass
+
+
+async def stream_task_events(
+    task_id: str,
+    get_snapshot: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """任务进度事件流（get_snapshot 为异步读取快照的函数，如 get_task_snapshot_async）
+
+    先产出当前快照，之后每次进度变化产出新快照，直到任务结束；
+    超过 TASK_EVENTS_HEARTBEAT 秒没有变化时重新读取一次快照（兜底丢失的消息），
+    无变化则产出 None（调用方据此发送心跳）。任务不存在时产出 {"status": "not_found"} 后结束。
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    # 先订阅再读取快照，避免错过两者之间的更新
+    pubsub = await _open_pubsub(task_id)
+    forwarder = None
+    local_entry = None
+    if pubsub is not None:
+        forwarder = asyncio.create_task(_forward_pubsub(pubsub, queue))
+    else:
+        local_entry = (loop, queue)
+        with _listeners_lock:
+            _local_listeners.setdefault(task_id, []).append(local_entry)
+
+    try:
+        last = await get_snapshot(task_id)
+        if not last:
+            yield {"status": "not_found"}
+            return
+        yield last
+        while not is_terminal(last):
+            try:
+                snapshot = await asyncio.wait_for(queue.get(), timeout=TASK_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                snapshot = await get_snapshot(task_id)
+                if not snapshot:
+                    yield {"status": "not_found"}
+                    return
+                if snapshot == last:
+                    yield None
+                    continue
+            last = snapshot
+            yield snapshot
+    finally:
+        if local_entry is not None:
+            with _listeners_lock:
+                listeners = _local_listeners.get(task_id, [])
+                if local_entry in listeners:
+                    listeners.remove(local_entry)
+                if not listeners:
+                    _local_listeners.pop(task_id, None)
+        if forwarder is not None:
+            forwarder.cancel()
+        if pubsub is not None:
+            try:
+                # 连接归还共享客户端的连接池
+                await pubsub.unsubscribe()
+                await pubsub.aclose()
+            except Exception:
+                pass
@@ -15,7 +15,8 @@ from fastnpc.config import CHAR_DIR
 from fastnpc.utils.roles import normalize_role_name
 from fastnpc.api.auth import (
     verify_cookie, list_users, get_or_create_character, update_character_structured,
-    load_character_full_data, get_character_id, save_character_memories, load_character_memories
+    load_character_full_data, load_characters_full_data, get_character_id, save_character_memories,
+    load_character_memories
 )
 from fastnpc.pipeline.structure import build_system_prompt
 from fastnpc.api.state import sessions, sessions_lock
@@ -47,14 +48,10 @@ def _load_character_profile(role: str, user_id: int) -> Optional[Dict[str, Any]]
         # 1. 尝试从数据库加载
         character_id = get_character_id(user_id, normalize_role_name(role))
         if character_id:
-            full_data = load_character_full_data(character_id)
+            # 画像与记忆一次加载（不含百科全文）
+            full_data = load_character_full_data(character_id, include_baike=False, include_memories=True)
             if full_data:
-                # 移除内部元数据，只保留原有的结构化数据
-                profile = {k: v for k, v in full_data.items() if k not in ['_metadata', 'baike_content']}
-                # 添加记忆（从 character_memories 表）
-                memories = load_character_memories(character_id)
-                profile['短期记忆'] = memories.get('short_term', [])
-                profile['长期记忆'] = memories.get('long_term', [])
+                profile = _profile_from_full_data(full_data)
                 
                 # 保存到缓存（5分钟TTL）
                 cache.set(cache_key, profile, ttl=300)
@@ -78,6 +75,66 @@ def _load_character_profile(role: str, user_id: int) -> Optional[Dict[str, Any]]
     return None
 
 
+def _profile_from_full_data(full_data: Dict[str, Any]) -> Dict[str, Any]:
+    """完整角色数据（含 _memories）→ 对话用 profile（与原 structured JSON 格式一致）"""
+    # 移除内部元数据，只保留原有的结构化数据
+    profile = {k: v for k, v in full_data.items() if k not in ['_metadata', 'baike_content', '_memories']}
+    # 添加记忆（从 character_memories 表）
+    memories = full_data.get('_memories') or {}
+    profile['短期记忆'] = memories.get('short_term', [])
+    profile['长期记忆'] = memories.get('long_term', [])
+    return profile
+
+
+def _load_character_profiles(roles: List[str], user_id: int) -> Dict[str, Optional[Dict[str, Any]]]:
+    """批量加载多个角色的 profile（群聊成员等场景）
+
+    先逐个查 Redis 缓存，未命中的角色按名称一次查出ID、一次加载完整数据；
+    仍未找到的再回退到 _load_character_profile（文件兼容路径）。
+    """
+    from fastnpc.api.auth import _get_conn, _return_conn
+
+    cache = get_redis_cache()
+    result: Dict[str, Optional[Dict[str, Any]]] = {}
+    missing: Dict[str, str] = {}
+    for role in roles:
+        name = normalize_role_name(role)
+        cached = cache.get(f"{CACHE_KEY_CHARACTER_PROFILE}:{user_id}:{name}")
+        if cached is not None:
+            result[role] = cached
+        else:
+            missing[role] = name
+
+    if missing:
+        try:
+            names = list(dict.fromkeys(missing.values()))
+            placeholders = ",".join(["%s"] * len(names))
+            conn = _get_conn()
+            try:
+                cur = conn.cursor()
+                cur.execute(
+                    f"SELECT id, name FROM characters WHERE user_id=%s AND name IN ({placeholders})",
+                    (user_id, *names),
+                )
+                ids = {row[1]: int(row[0]) for row in cur.fetchall()}
+            finally:
+                _return_conn(conn)
+            full = load_characters_full_data(list(ids.values()), include_baike=False, include_memories=True)
+            for role, name in list(missing.items()):
+                data = full.get(ids.get(name))
+                if data:
+                    profile = _profile_from_full_data(data)
+                    cache.set(f"{CACHE_KEY_CHARACTER_PROFILE}:{user_id}:{name}", profile, ttl=300)
+                    result[role] = profile
+                    missing.pop(role)
+        except Exception as e:
+            print(f"[WARN] 批量加载角色失败: {e}")
+
+    for role in missing:
+        result[role] = _load_character_profile(role, user_id)
+    return result
+
+
 def _require_user(request: Request) -> Optional[Dict[str, Any]]:
     """验证用户身份"""
     token = request.cookies.get('fastnpc_auth', '')
@@ -121,6 +178,99 @@ def _structured_path_for_role(role: str, user_id: Optional[int] = None) -> str:
     return candidates[0]
 
 
+def _make_preview(brief_intro: Any) -> str:
+    """由 brief_intro 生成角色列表中的简介预览（最多140字）"""
+    if not brief_intro or not isinstance(brief_intro, str):
+        return ""
+    preview = brief_intro.strip().replace("\n", " ")
+    if len(preview) > 140:
+        preview = preview[:140] + "…"
+    return preview
+
+
+def _encode_character_cursor(updated_at: int, char_id: int) -> str:
+    """角色列表分页游标：上一页最后一项的 (updated_at, id)"""
+    return f"{int(updated_at)}:{int(char_id)}"
+
+
+def _decode_character_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not cursor:
+        return None
+    try:
+        updated_at, char_id = str(cursor).split(":", 1)
+        return int(updated_at), int(char_id)
+    except Exception:
+        return None
+
+
+def _query_character_list(
+    user_id: Optional[int],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """单条查询获取角色列表（LEFT JOIN 简介，按 updated_at DESC, id DESC 键集分页）"""
+    from fastnpc.api.auth import _get_conn, _return_conn
+    from fastnpc.config import USE_POSTGRESQL
+
+    placeholder = "%s" if USE_POSTGRESQL else "?"
+    # 排序键与游标条件使用同一表达式（与下方结果中 updated_at 为空时记为 0 一致），
+    # 否则 updated_at 为 NULL 的行在翻页时会被跳过或重复；索引 idx_characters_user_updated_key 建在同一表达式上（db_migrations 004）
+    sort_key = "COALESCE(c.updated_at, 0)"
+    query = (
+        "SELECT c.id, c.name, c.updated_at, c.avatar_url, c.is_test_case, b.brief_intro "
+        "FROM characters c LEFT JOIN character_basic_info b ON b.character_id = c.id"
+    )
+    conditions: List[str] = []
+    params: List[Any] = []
+    if user_id:
+        conditions.append(f"c.user_id = {placeholder}")
+        params.append(user_id)
+    after = _decode_character_cursor(cursor)
+    if after:
+        conditions.append(
+            f"({sort_key} < {placeholder} OR ({sort_key} = {placeholder} AND c.id < {placeholder}))"
+        )
+        params.extend([after[0], after[0], after[1]])
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {sort_key} DESC, c.id DESC"
+    if limit:
+        query += f" LIMIT {placeholder}"
+        params.append(int(limit))
+
+    conn = _get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(query, tuple(params))
+        rows = cur.fetchall()
+        column_names = [desc[0] for desc in cur.description]
+    finally:
+        _return_conn(conn)
+
+    items: List[Dict[str, Any]] = []
+    for row in rows:
+        try:
+            row_dict = dict(zip(column_names, row)) if USE_POSTGRESQL else dict(row)
+            char_id = row_dict['id']
+            # 确保updated_at是整数
+            updated_at = int(row_dict['updated_at']) if row_dict.get('updated_at') else 0
+            # 获取is_test_case字段（处理PostgreSQL boolean和SQLite integer）
+            is_test_case_raw = row_dict.get('is_test_case')
+            items.append({
+                "id": char_id,
+                "role": row_dict['name'],
+                "path": f"db://characters/{char_id}",
+                "updated_at": updated_at,
+                "preview": _make_preview(row_dict.get('brief_intro')),
+                "avatar_url": row_dict.get('avatar_url') or "",
+                "is_test_case": bool(is_test_case_raw) if is_test_case_raw is not None else False,
+            })
+        except Exception as e:
+            print(f"[ERROR] 处理角色数据失败: {e}")
+            continue
+    return items
+
+
 def _list_structured_files(user_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """从数据库列出用户的所有角色（带Redis缓存）"""
     cache = get_redis_cache()
@@ -129,104 +279,46 @@ def _list_structured_files(user_id: Optional[int] = None) -> List[Dict[str, Any]
     # 尝试从缓存获取
     cached = cache.get(cache_key)
     if cached is not None:
-        print(f"[DEBUG] _list_structured_files: 从缓存返回 {len(cached)} 个角色")
         return cached
     
-    # 缓存未命中，查询数据库
+    # 缓存未命中，单条查询获取角色及简介
     items: List[Dict[str, Any]] = []
-    conn = None
     try:
-        from fastnpc.api.auth import _get_conn, _row_to_dict
-        from fastnpc.config import USE_POSTGRESQL
-        
-        print(f"[DEBUG] _list_structured_files: user_id={user_id}, USE_POSTGRESQL={USE_POSTGRESQL}")
-        
-        conn = _get_conn()
-        cur = conn.cursor()
-        
-        # 构建查询（兼容PostgreSQL和SQLite）
-        placeholder = "%s" if USE_POSTGRESQL else "?"
-        if user_id:
-            query = f"SELECT id, name, updated_at, avatar_url, is_test_case FROM characters WHERE user_id = {placeholder} ORDER BY updated_at DESC"
-            print(f"[DEBUG] Executing query: {query} with user_id={user_id}")
-            cur.execute(query, (user_id,))
-        else:
-            query = "SELECT id, name, updated_at, avatar_url, is_test_case FROM characters ORDER BY updated_at DESC"
-            print(f"[DEBUG] Executing query: {query}")
-            cur.execute(query)
-        
-        rows = cur.fetchall()
-        # 保存列名，因为后续查询会改变cursor.description
-        column_names = [desc[0] for desc in cur.description]
-        print(f"[DEBUG] Found {len(rows)} characters, columns: {column_names}")
-        
-        for row in rows:
-            try:
-                # 手动转换tuple到dict
-                if USE_POSTGRESQL:
-                    row_dict = dict(zip(column_names, row))
-                else:
-                    row_dict = dict(row)
-                    
-                char_id = row_dict['id']
-                role = row_dict['name']
-                # 确保updated_at是整数
-                updated_at = int(row_dict['updated_at']) if row_dict.get('updated_at') else 0
-                avatar_url = row_dict.get('avatar_url', '')
-                # 获取is_test_case字段（处理PostgreSQL boolean和SQLite integer）
-                is_test_case_raw = row_dict.get('is_test_case')
-                is_test_case = bool(is_test_case_raw) if is_test_case_raw is not None else False
-                
-                print(f"[DEBUG] Processing character: {role} (id={char_id}, updated_at={updated_at}, avatar_url={avatar_url}, is_test_case={is_test_case})")
-                
-                # 获取简介预览
-                preview = ""
-                try:
-                    cur.execute(f"SELECT brief_intro FROM character_basic_info WHERE character_id = {placeholder}", (char_id,))
-                    basic_row = cur.fetchone()
-                    if basic_row:
-                        # 直接访问第一个元素（brief_intro）
-                        brief = basic_row[0] if basic_row else None
-                        if brief and isinstance(brief, str):
-                            preview = brief.strip().replace("\n", " ")
-                            if len(preview) > 140:
-                                preview = preview[:140] + "…"
-                except Exception as e:
-                    print(f"[DEBUG] Failed to get preview for {role}: {e}")
-                
-                items.append({
-                    "role": role,
-                    "path": f"db://characters/{char_id}",
-                    "updated_at": updated_at,
-                    "preview": preview,
-                    "avatar_url": avatar_url or "",
-                    "is_test_case": is_test_case,
-                })
-            except Exception as e:
-                print(f"[ERROR] 处理角色数据失败: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
-        
-        print(f"[DEBUG] Returning {len(items)} items")
-        
+        items = _query_character_list(user_id)
         # 保存到缓存（1分钟TTL）
         cache.set(cache_key, items, ttl=60)
-        
     except Exception as e:
         print(f"[ERROR] 从数据库列出角色失败: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        if conn:
-            try:
-                conn.close()
-            except:
-                pass
     
     return items
 
 
+def _list_structured_files_page(
+    user_id: Optional[int],
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """分页列出角色（键集分页，每页耗时与角色总数无关）
+
+    Returns:
+        {"items": [...], "next_cursor": str | None}
+    """
+    items: List[Dict[str, Any]] = []
+    try:
+        # 多取一条用于判断是否还有下一页
+        items = _query_character_list(user_id, limit=limit + 1, cursor=cursor)
+    except Exception as e:
+        print(f"[ERROR] 从数据库分页列出角色失败: {e}")
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = _encode_character_cursor(last["updated_at"], last["id"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
 def _update_long_term_memory(role: str, uid: int, mem_context_text: str) -> Optional[str]:
     """将 Mem0 检索得到的上下文写入数据库的 "知识与能力.长期记忆"，并返回最新的 system 提示。"""
     try:
@@ -336,55 +428,78 @@ def _truncate_structured_profile_text(profile: Dict[str, Any], limit_chars: int)
     return prof
 
 
+def _json_list_len(sizes_total: int, count: int) -> int:
+    """json.dumps(list) 的长度：各元素序列化长度之和 + 方括号 + 元素间的 ", " 分隔符"""
+    return 2 + sizes_total + 2 * max(count - 1, 0)
+
+
 def _truncate_messages(messages: List[Dict[str, str]], limit_chars: int) -> List[Dict[str, str]]:
-    """裁剪消息历史，保持在字符限制内"""
+    """裁剪消息历史，保持在字符限制内
+
+    每条消息只序列化一次，维护剩余消息 JSON 长度的累计值，整体 O(n)。
+    结果与逐次 json.dumps(剩余消息) 判断长度完全一致。
+    """
     if limit_chars <= 0:
         return messages
     import json as _json
-    from collections import deque
-    dq = deque(messages)
-    while dq:
-        s = _json.dumps(list(dq), ensure_ascii=False)
-        if len(s) <= limit_chars:
+    sizes = [len(_json.dumps(m, ensure_ascii=False)) for m in messages]
+    total = sum(sizes)
+    n = len(messages)
+    start = 0
+
+    def _drop_left() -> None:
+        nonlocal start, total
+        total -= sizes[start]
+        start += 1
+
+    while start < n:
+        if _json_list_len(total, n - start) <= limit_chars:
             break
         # 丢弃最早的一条（保留 system/角色提示在会话外单独传入）
-        left = dq[0]
+        left = messages[start]
         # 避免误删 system，如最左是 system 则跳过该条，删下一条
-        if isinstance(left, dict) and left.get("role") == "system" and len(dq) >= 2:
-            dq.popleft()
-        dq.popleft()
-    return list(dq)
+        if isinstance(left, dict) and left.get("role") == "system" and n - start >= 2:
+            _drop_left()
+        _drop_left()
+    return messages[start:]
+
+
+def _weighted_early_index(n: int, r: float) -> int:
+    """按权重 w_i = n - i（越早权重越大）选出索引：满足 r <= 累计概率 的最小 i
+
+    累计权重 C(i) = (i+1)(2n-i)/2 单调递增，二分查找代替逐项累加，O(log n)。
+    """
+    threshold = r * (n * (n + 1) / 2)
+    lo, hi = 0, n - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if threshold <= (mid + 1) * (2 * n - mid) / 2:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
 
 
 def _truncate_long_term_memory(items: List[str], limit_chars: int) -> List[str]:
-    """裁剪长期记忆，保持在字符限制内"""
+    """裁剪长期记忆，保持在字符限制内
+
+    每条记忆只序列化一次并维护累计长度；每次删除消耗一次 random.random()，
+    与逐次重算概率向量的实现选择分布和随机数序列一致。
+    """
     if limit_chars <= 0:
         return items
     import json as _json
     import random
     arr = list(items)
+    sizes = [len(_json.dumps(x, ensure_ascii=False)) for x in arr]
+    total = sum(sizes)
     # 根据索引越小（越早）被删概率越高的策略进行加权随机删减
     while arr:
-        s = _json.dumps(arr, ensure_ascii=False)
-        if len(s) <= limit_chars:
+        if _json_list_len(total, len(arr)) <= limit_chars:
             break
-        n = len(arr)
-        # 权重：w_i = (n - i) 的反比，越早越大权重
-        weights = [float(n - i) for i in range(n)]
-        # 但我们想"越早越大概率被删"，因此选择 i=0 更容易选中
-        # 转为概率
-        total = sum(weights)
-        probs = [w / total for w in weights]
-        # 随机选择一个索引删除
-        r = random.random()
-        acc = 0.0
-        idx = 0
-        for i, p in enumerate(probs):
-            acc += p
-            if r <= acc:
-                idx = i
-                break
+        idx = _weighted_early_index(len(arr), random.random())
         arr.pop(idx)
+        total -= sizes.pop(idx)
     return arr
 
 
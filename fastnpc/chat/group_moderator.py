@@ -4,11 +4,12 @@ from __future__ import annotations
 
 import json
 import random
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
-from fastnpc.llm.openrouter import get_openrouter_completion
-from fastnpc.config import USE_DB_PROMPTS
+from fastnpc.llm.openrouter import get_openrouter_completion, stream_openrouter_text_async
+from fastnpc.config import USE_DB_PROMPTS, MODERATOR_MAX_TOKENS
 from fastnpc.prompt_manager import PromptManager, PromptCategory
+from fastnpc.chat.prompt_builder import _remove_timestamp_suffix
 
 
 MODERATOR_PROMPT = """任务：基于参与者性格与最近对话内容，从剧情角度判断下一位最合适发言的角色。
@@ -45,27 +46,69 @@ MODERATOR_PROMPT = """任务：基于参与者性格与最近对话内容，从
 **重要提示**：不要考虑发言频率或平衡性，只关注剧情逻辑和角色动机。
 """
 
+# 本地规则判断时记录到消息中的 moderator_prompt
+RULE_MODERATOR_PROMPT = "（本地规则判断，未调用LLM）"
 
-def judge_next_speaker(
+
+def _character_names(member_profiles: List[Dict[str, Any]]) -> List[str]:
+    return [p['name'] for p in member_profiles if p['type'] == 'character']
+
+
+def _rule_result(next_speaker: Optional[str], reason: str, confidence: float) -> Dict[str, Any]:
+    """本地规则判断结果（与LLM判断结果字段一致）"""
+    result = {"next_speaker": next_speaker, "reason": reason, "confidence": confidence}
+    result['moderator_prompt'] = RULE_MODERATOR_PROMPT
+    result['moderator_response'] = json.dumps(result, ensure_ascii=False)
+    return result
+
+
+def _addressed_characters(content: str, characters: List[str]) -> List[str]:
+    """消息中被直接点名的角色：@角色名，或以角色名开头（如"李白，你怎么看"）"""
+    text = content.strip()
+    addressed = []
+    for name in characters:
+        if not name:
+            continue
+        if f"@{name}" in text or text.startswith(name):
+            addressed.append(name)
+    return addressed
+
+
+def pre_route_next_speaker(
     member_profiles: List[Dict[str, Any]],
     messages: List[Dict[str, Any]]
-) -> Dict[str, Any]:
-    """判断下一个发言者（基于剧情逻辑）
-    
-    Args:
-        member_profiles: [{"name": "角色A", "type": "character", "profile": "简介"}, ...]
-        messages: [{"sender_name": "角色A", "content": "消息内容"}, ...]
-    
-    Returns:
-        {
-            "next_speaker": "角色名", 
-            "reason": "理由", 
-            "confidence": 0.85,
-            "moderator_prompt": "发送给LLM的完整prompt",
-            "moderator_response": "LLM返回的原始响应"
-        }
+) -> Optional[Dict[str, Any]]:
+    """无需LLM即可确定的情况（返回 None 表示需要调用LLM中控）
+
+    - 没有角色成员：无人可发言
+    - 只有一个角色：上一条不是它说的就由它发言，否则等待用户
+    - 最新一条消息直接点名了某个角色（且不是点名者自己）：由该角色发言
     """
-    
+    characters = _character_names(member_profiles)
+    if not characters:
+        return _rule_result(None, "无可用角色", 0)
+
+    last = messages[-1] if messages else None
+    last_sender = _remove_timestamp_suffix(str(last.get('sender_name', ''))) if last else ""
+
+    if len(characters) == 1:
+        name = characters[0]
+        if last_sender == name:
+            return _rule_result(None, "群聊中只有一个角色且刚刚发言，等待用户发言", 0)
+        return _rule_result(name, "群聊中只有一个角色", 1.0)
+
+    if last:
+        addressed = [n for n in _addressed_characters(str(last.get('content', '')), characters) if n != last_sender]
+        if len(addressed) == 1:
+            return _rule_result(addressed[0], f"{last_sender or '上一位发言者'}直接点名了{addressed[0]}", 0.9)
+
+    return None
+
+
+def _build_moderator_prompt(
+    member_profiles: List[Dict[str, Any]],
+    messages: List[Dict[str, Any]]
+) -> str:
     # 格式化参与者简介（只包含角色性格，不统计发言频率）
     participants_text = []
     for p in member_profiles:
@@ -93,67 +136,172 @@ def judge_next_speaker(
     if not prompt_template:
         prompt_template = MODERATOR_PROMPT
     
-    prompt = prompt_template.format(
+    return prompt_template.format(
         participants="\n".join(participants_text),
         recent_messages="\n".join(messages_text) if messages_text else "（暂无消息）"
     )
+
+
+def _parse_moderator_response(
+    member_profiles: List[Dict[str, Any]],
+    prompt: str,
+    response: str
+) -> Dict[str, Any]:
+    # 清理响应
+    cleaned = response.strip()
+    if cleaned.startswith('```json'):
+        cleaned = cleaned[7:].strip()
+    elif cleaned.startswith('```'):
+        cleaned = cleaned[3:].strip()
+    if cleaned.endswith('```'):
+        cleaned = cleaned[:-3].strip()
     
-    # 调用LLM
-    try:
-        response = get_openrouter_completion([{"role": "user", "content": prompt}])
-        
-        # 清理响应
-        cleaned = response.strip()
-        if cleaned.startswith('```json'):
-            cleaned = cleaned[7:].strip()
-        elif cleaned.startswith('```'):
-            cleaned = cleaned[3:].strip()
-        if cleaned.endswith('```'):
-            cleaned = cleaned[:-3].strip()
-        
-        result = json.loads(cleaned)
-        
-        # 验证confidence处理规则
-        confidence = float(result.get('confidence', 0))
-        next_speaker = result.get('next_speaker', '')
-        
-        # 0.4-0.6: 随机选择
-        if 0.5 <= confidence < 0.8:
-            characters = [p['name'] for p in member_profiles if p['type'] == 'character']
-            if characters:
-                next_speaker = random.choice(characters)
-                result['next_speaker'] = next_speaker
-                result['reason'] = f"置信度较低({confidence:.2f})，随机选择"
-        
-        # <0.5: 等待用户
-        elif confidence < 0.5:
-            result['next_speaker'] = None
-            result['reason'] = f"置信度过低({confidence:.2f})，等待用户发言"
-        
-        # 添加中控的prompt和响应
-        result['moderator_prompt'] = prompt
-        result['moderator_response'] = response
-        
-        return result
+    result = json.loads(cleaned)
     
-    except Exception as e:
-        print(f"[ERROR] 中控判断失败: {e}")
-        # 失败时随机选择一个角色
-        characters = [p['name'] for p in member_profiles if p['type'] == 'character']
+    # 验证confidence处理规则
+    confidence = float(result.get('confidence', 0))
+    next_speaker = result.get('next_speaker', '')
+    
+    # 0.4-0.6: 随机选择
+    if 0.5 <= confidence < 0.8:
+        characters = _character_names(member_profiles)
         if characters:
-            return {
-                "next_speaker": random.choice(characters),
-                "reason": "中控判断失败，随机选择",
-                "confidence": 0.1,
-                "moderator_prompt": prompt,
-                "moderator_response": f"ERROR: {str(e)}"
-            }
+            next_speaker = random.choice(characters)
+            result['next_speaker'] = next_speaker
+            result['reason'] = f"置信度较低({confidence:.2f})，随机选择"
+    
+    # <0.5: 等待用户
+    elif confidence < 0.5:
+        result['next_speaker'] = None
+        result['reason'] = f"置信度过低({confidence:.2f})，等待用户发言"
+    
+    # 添加中控的prompt和响应
+    result['moderator_prompt'] = prompt
+    result['moderator_response'] = response
+    
+    return result
+
+
+def _fallback_result(
+    member_profiles: List[Dict[str, Any]],
+    prompt: str,
+    error: Exception
+) -> Dict[str, Any]:
+    print(f"[ERROR] 中控判断失败: {error}")
+    # 失败时随机选择一个角色
+    characters = _character_names(member_profiles)
+    if characters:
         return {
-            "next_speaker": None, 
-            "reason": "无可用角色", 
-            "confidence": 0,
+            "next_speaker": random.choice(characters),
+            "reason": "中控判断失败，随机选择",
+            "confidence": 0.1,
             "moderator_prompt": prompt,
-            "moderator_response": "无可用角色"
+            "moderator_response": f"ERROR: {str(error)}"
+        }
+    return {
+        "next_speaker": None, 
+        "reason": "无可用角色", 
+        "confidence": 0,
+        "moderator_prompt": prompt,
+        "moderator_response": "无可用角色"
+    }
+
+
+def _first_json_object_end(text: str) -> int:
+    """返回首个完整 JSON 对象结束位置（不含），尚未结束时返回 -1"""
+    depth = 0
+    in_string = False
+    escaped = False
+    started = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+            started = True
+        elif ch == '}' and started:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+
+def judge_next_speaker(
+    member_profiles: List[Dict[str, Any]],
+    messages: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """判断下一个发言者（基于剧情逻辑，同步版本）
+    
+    Args:
+        member_profiles: [{"name": "角色A", "type": "character", "profile": "简介"}, ...]
+        messages: [{"sender_name": "角色A", "content": "消息内容"}, ...]
+    
+    Returns:
+        {
+            "next_speaker": "角色名", 
+            "reason": "理由", 
+            "confidence": 0.85,
+            "moderator_prompt": "发送给LLM的完整prompt",
+            "moderator_response": "LLM返回的原始响应"
         }
+    """
+    routed = pre_route_next_speaker(member_profiles, messages)
+    if routed is not None:
+        return routed
+    
+    prompt = _build_moderator_prompt(member_profiles, messages)
+    
+    # 调用LLM
+    try:
+        response = get_openrouter_completion(
+            [{"role": "user", "content": prompt}],
+            max_tokens=MODERATOR_MAX_TOKENS,
+        )
+        return _parse_moderator_response(member_profiles, prompt, response)
+    except Exception as e:
+        return _fallback_result(member_profiles, prompt, e)
 
 
+async def judge_next_speaker_async(
+    member_profiles: List[Dict[str, Any]],
+    messages: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """判断下一个发言者（异步版本，不阻塞Worker）
+
+    参数与返回值同 judge_next_speaker。先走本地规则；需要LLM时以流式调用，
+    收到首个完整 JSON 对象即停止接收（并限制 max_tokens），只为拿到 next_speaker。
+    """
+    routed = pre_route_next_speaker(member_profiles, messages)
+    if routed is not None:
+        return routed
+    
+    prompt = _build_moderator_prompt(member_profiles, messages)
+    
+    try:
+        chunks: List[str] = []
+        stream = stream_openrouter_text_async(
+            [{"role": "user", "content": prompt}],
+            max_tokens=MODERATOR_MAX_TOKENS,
+        )
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                text = "".join(chunks)
+                end = _first_json_object_end(text)
+                if end != -1:
+                    chunks = [text[:end]]
+                    break
+        finally:
+            await stream.aclose()
+        response = "".join(chunks)
+        return _parse_moderator_response(member_profiles, prompt, response)
+    except Exception as e:
+        return _fallback_result(member_profiles, prompt, e)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+角色画像段（system prompt 第②部分）缓存
+
+结构化画像只在编辑/重新生成时变化，而每轮对话都会重新渲染一遍。
+这里按 (角色ID, 画像版本, 模板版本) 缓存渲染结果：
+
+- 进程内 LRU 保存渲染好的文本
+- 画像版本号保存在 Redis（persona_ver:{角色ID}），update_character_structured /
+  save_character_full_data 调用 invalidate_persona_cache() 将其加一，
+  其它 Worker 进程在下次校验版本时自动失效本地缓存
+- Redis 不可用时只使用进程内版本号（单进程部署下同样正确）
+
+渲染本身只是字符串拼接，远快于一次 Redis 往返，因此 Redis 只保存版本号，
+且每个角色的版本号最多每 PERSONA_CACHE_CHECK_INTERVAL 秒从 Redis 读取一次。
+
+调用方必须在加载画像之前调用 get_persona_version()，并把结果传给 get_persona_text()：
+若在加载之后才读取版本号，加载与读取之间发生的修改会让旧画像渲染出的文本记在新版本号下，
+直到下一次修改前一直命中。先读版本号时，加载到的画像不会比该版本旧。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastnpc.config import PERSONA_CACHE_SIZE, PERSONA_CACHE_CHECK_INTERVAL
+
+
+# 画像渲染模板版本：修改 render_persona_text 的输出格式时加一，使旧缓存全部失效
+PERSONA_TEMPLATE_VERSION = 1
+
+VERSION_KEY_PREFIX = "persona_ver"
+
+_lock = threading.Lock()
+# (character_id, role_name) -> {"version", "template", "text"}
+_entries: "OrderedDict[Tuple[int, str], Dict[str, Any]]" = OrderedDict()
+# character_id -> (最近读取到的版本号, 读取时间)
+_checked_versions: Dict[int, Tuple[int, float]] = {}
+# Redis 不可用时的进程内版本号
+_local_versions: Dict[int, int] = {}
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _redis_client():
+    try:
+        from fastnpc.api.cache import get_redis_cache
+        return get_redis_cache().client
+    except Exception:
+        return None
+
+
+def _read_version(character_id: int) -> int:
+    """从 Redis 读取画像版本号，失败时使用进程内版本号"""
+    client = _redis_client()
+    if client is not None:
+        try:
+            value = client.get(f"{VERSION_KEY_PREFIX}:{character_id}")
+            return int(value) if value else 0
+        except Exception:
+            pass
+    return _local_versions.get(character_id, 0)
+
+
+def get_persona_version(character_id: Optional[int]) -> int:
+    """当前画像版本号（加载画像之前调用）；PERSONA_CACHE_CHECK_INTERVAL 秒内复用上次读取的结果"""
+    if not character_id:
+        return 0
+    character_id = int(character_id)
+    now = time.time()
+    with _lock:
+        checked = _checked_versions.get(character_id)
+        if checked is not None and now - checked[1] < PERSONA_CACHE_CHECK_INTERVAL:
+            return checked[0]
+    version = _read_version(character_id)
+    with _lock:
+        _checked_versions[character_id] = (version, now)
+        while len(_checked_versions) > PERSONA_CACHE_SIZE:
+            _checked_versions.pop(next(iter(_checked_versions)))
+    return version
+
+
+def invalidate_persona_cache(character_id: Optional[int]) -> None:
+    """角色画像被修改后调用：版本号加一，并清除本进程的缓存条目"""
+    if not character_id:
+        return
+    character_id = int(character_id)
+    with _lock:
+        _local_versions[character_id] = _local_versions.get(character_id, 0) + 1
+        _checked_versions.pop(character_id, None)
+        for key in [k for k in _entries if k[0] == character_id]:
+            _entries.pop(key, None)
+        _stats["invalidations"] += 1
+    client = _redis_client()
+    if client is not None:
+        try:
+            client.incr(f"{VERSION_KEY_PREFIX}:{character_id}")
+        except Exception as e:
+            print(f"[WARN] 更新画像缓存版本失败: {e}")
+
+
+def get_persona_text(
+    character_id: Optional[int],
+    role_name: str,
+    role_profile: Dict[str, Any],
+    render: Callable[[str, Dict[str, Any]], str],
+    version: Optional[int] = None,
+) -> str:
+    """获取角色画像段文本，命中缓存时不再渲染
+
+    version 为加载 role_profile 之前 get_persona_version() 的结果；未传入时在此读取
+    （只适用于画像刚从数据库直接读出、不会与修改并发的场景）。
+    character_id 为空或画像为空（加载失败）时直接渲染，不写入缓存。
+    """
+    if not character_id or not role_profile:
+        return render(role_name, role_profile)
+
+    key = (int(character_id), role_name)
+    if version is None:
+        version = get_persona_version(key[0])
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry["template"] == PERSONA_TEMPLATE_VERSION and entry["version"] == version:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return entry["text"]
+        _stats["misses"] += 1
+
+    text = render(role_name, role_profile)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry["template"] == PERSONA_TEMPLATE_VERSION and entry["version"] > version:
+            # 其它请求已缓存更新版本的画像，不用较旧的结果覆盖
+            return text
+        _entries[key] = {
+            "version": version,
+            "template": PERSONA_TEMPLATE_VERSION,
+            "text": text,
+        }
+        _entries.move_to_end(key)
+        while len(_entries) > PERSONA_CACHE_SIZE:
+            _entries.popitem(last=False)
+    return text
+
+
+def get_persona_cache_stats() -> Dict[str, Any]:
+    """缓存统计"""
+    with _lock:
+        total = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "size": len(_entries),
+            "hit_rate": f"{(_stats['hits'] / total * 100) if total else 0:.2f}%",
+        }
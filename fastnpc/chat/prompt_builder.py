@@ -5,6 +5,7 @@ from typing import Dict, Any, List, Optional
 
 from fastnpc.config import USE_DB_PROMPTS
 from fastnpc.prompt_manager import PromptManager, PromptCategory
+from fastnpc.chat.persona_cache import get_persona_text
 
 
 def _safe_get(d: Dict[str, Any], *keys: str, default: str = "（无）") -> str:
@@ -53,21 +54,8 @@ def _remove_timestamp_suffix(name: str) -> str:
     return re.sub(r'\d{12}$', '', name)
 
 
-def build_chat_system_prompt(
-    role_name: str,
-    user_name: str,
-    role_profile: Dict[str, Any],
-    user_profile: Optional[Dict[str, Any]],
-    chat_transcript_lines: List[str],
-    *,
-    include_ltm: bool = True,
-    include_stm: bool = True,
-    long_term_memories: Optional[List[str]] = None,
-    short_term_memories: Optional[List[str]] = None,
-    max_chars_transcript: int = 3000,
-    max_chars_ltm: int = 4000,
-    max_chars_stm: int = 3000,
-) -> str:
+def render_persona_text(role_name: str, role_profile: Dict[str, Any]) -> str:
+    """结构化画像 → 自然语言（system prompt 第②部分的画像正文）"""
     base = role_profile.get("基础身份信息", {}) if isinstance(role_profile, dict) else {}
     behavior = role_profile.get("个性与行为设定", {}) if isinstance(role_profile, dict) else {}
     story = role_profile.get("背景故事", {}) if isinstance(role_profile, dict) else {}
@@ -118,7 +106,33 @@ def build_chat_system_prompt(
                             "我必须严格遵守以下安全限制：禁止 NSFW、色情、违法犯罪指导、仇恨与歧视、隐私泄露，高风险医学/法律内容需加免责声明。\n"
                             f"我的演绎范围是 {_safe_get(control, '演绎范围')}。")
 
-    structured_text = "\n\n".join(parts_structured)
+    return "\n\n".join(parts_structured)
+
+
+def build_chat_system_prompt(
+    role_name: str,
+    user_name: str,
+    role_profile: Dict[str, Any],
+    user_profile: Optional[Dict[str, Any]],
+    chat_transcript_lines: List[str],
+    *,
+    include_ltm: bool = True,
+    include_stm: bool = True,
+    long_term_memories: Optional[List[str]] = None,
+    short_term_memories: Optional[List[str]] = None,
+    max_chars_transcript: int = 3000,
+    max_chars_ltm: int = 4000,
+    max_chars_stm: int = 3000,
+    character_id: Optional[int] = None,
+    persona_version: Optional[int] = None,
+) -> str:
+    """构建单聊六段式 system prompt
+
+    传入 character_id 时，画像段按 (角色, 画像版本, 模板版本) 缓存（见 persona_cache），
+    每轮只需拼接记忆与会话部分。persona_version 为加载 role_profile 之前读取的画像版本号。
+    """
+    # ② 结构化画像 → 自然语言
+    structured_text = get_persona_text(character_id, role_name, role_profile, render_persona_text, persona_version)
 
     # ③ 长期记忆 / ④ 短期记忆
     ltm_text = "（无）"
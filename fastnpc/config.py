@@ -55,6 +55,15 @@ POSTGRES_PASSWORD: str | None = os.environ.get("POSTGRES_PASSWORD")
 # 数据库连接池配置
 DB_POOL_MIN_CONN: int = int(os.environ.get("DB_POOL_MIN_CONN", "10"))
 DB_POOL_MAX_CONN: int = int(os.environ.get("DB_POOL_MAX_CONN", "50"))
+# 获取连接的最长等待时间（秒）
+DB_POOL_ACQUIRE_TIMEOUT: float = float(os.environ.get("DB_POOL_ACQUIRE_TIMEOUT", "30"))
+# 空闲超过该时间（秒）的连接在取出时做一次健康检查
+DB_POOL_IDLE_CHECK_SECONDS: float = float(os.environ.get("DB_POOL_IDLE_CHECK_SECONDS", "30"))
+# 连接最大存活时间（秒），超过后回收重建；0 表示不限制
+DB_POOL_MAX_LIFETIME: float = float(os.environ.get("DB_POOL_MAX_LIFETIME", "1800"))
+# 异步连接池（asyncpg，每个 Worker 进程的事件循环一个）
+ASYNC_DB_POOL_MIN_CONN: int = int(os.environ.get("ASYNC_DB_POOL_MIN_CONN", "2"))
+ASYNC_DB_POOL_MAX_CONN: int = int(os.environ.get("ASYNC_DB_POOL_MAX_CONN", "20"))
 
 # Redis 缓存配置
 REDIS_HOST: str = os.environ.get("REDIS_HOST", "localhost")
@@ -62,8 +71,90 @@ REDIS_PORT: int = int(os.environ.get("REDIS_PORT", "6379"))
 REDIS_DB: int = int(os.environ.get("REDIS_DB", "0"))
 REDIS_PASSWORD: str | None = os.environ.get("REDIS_PASSWORD")
 
+# 记忆压缩后台队列配置
+try:
+    MEMORY_COMPACTION_WORKERS: int = max(1, int(os.environ.get("MEMORY_COMPACTION_WORKERS", "2")))
+except Exception:
+    MEMORY_COMPACTION_WORKERS = 2
+
+# system prompt 快照分块是否 zlib 压缩
+PROMPT_SNAPSHOT_COMPRESS: bool = os.environ.get("PROMPT_SNAPSHOT_COMPRESS", "true").lower() in ("true", "1", "yes")
+
+# LLM（OpenRouter）HTTP 客户端：连接池与超时（秒）
+LLM_MAX_CONNECTIONS: int = int(os.environ.get("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY: float = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT: float = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10"))
+LLM_REQUEST_TIMEOUT: float = float(os.environ.get("LLM_REQUEST_TIMEOUT", "600"))
+LLM_HTTP2: bool = os.environ.get("LLM_HTTP2", "true").lower() in ("true", "1", "yes")
+OPENROUTER_BASE_URL: str = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+# 后台通道（角色创建结构化等）每个进程的 LLM 并发请求上限；交互通道（聊天）不受限
+LLM_BACKGROUND_MAX_CONCURRENCY: int = int(os.environ.get("LLM_BACKGROUND_MAX_CONCURRENCY", "12"))
+
+# 群聊中控判断的最大输出 token 数（只需要一个很短的 JSON）
+MODERATOR_MAX_TOKENS: int = int(os.environ.get("MODERATOR_MAX_TOKENS", "200"))
+
+# 角色画像段缓存：进程内条目数上限、跨进程版本校验间隔（秒）
+PERSONA_CACHE_SIZE: int = int(os.environ.get("PERSONA_CACHE_SIZE", "512"))
+PERSONA_CACHE_CHECK_INTERVAL: float = float(os.environ.get("PERSONA_CACHE_CHECK_INTERVAL", "2"))
+
+# 角色创建任务：Redis 中任务快照的保留时间（秒）、SSE 进度推送的心跳间隔（秒）
+TASK_STORE_TTL: int = int(os.environ.get("TASK_STORE_TTL", "86400"))
+TASK_EVENTS_HEARTBEAT: float = float(os.environ.get("TASK_EVENTS_HEARTBEAT", "15"))
+
+# 角色创建调度：全局同时执行的创建任务数（也是每个进程的 Worker 线程数）、每个用户同时执行数、
+# 每个用户排队+执行中的上限（以上三项在 Redis 可用时跨 Worker 计数，否则按进程计数）、每个进程的排队总长度上限
+CREATION_MAX_CONCURRENT: int = int(os.environ.get("CREATION_MAX_CONCURRENT", "2"))
+CREATION_PER_USER_CONCURRENT: int = int(os.environ.get("CREATION_PER_USER_CONCURRENT", "1"))
+CREATION_PER_USER_MAX_PENDING: int = int(os.environ.get("CREATION_PER_USER_MAX_PENDING", "3"))
+CREATION_QUEUE_MAX: int = int(os.environ.get("CREATION_QUEUE_MAX", "50"))
+
+# 同名角色创建去重（single-flight）：相同数据源+关键词+词条的并发创建共享一次抓取与结构化
+# 锁最长持有时间（秒，防止 Worker 崩溃后锁不释放）、等待者最长等待时间（秒）、结果在 Redis 中的保留时间（秒）
+CREATION_SINGLE_FLIGHT: bool = os.environ.get("CREATION_SINGLE_FLIGHT", "true").lower() in ("true", "1", "yes")
+CREATION_FLIGHT_LOCK_TTL: int = int(os.environ.get("CREATION_FLIGHT_LOCK_TTL", "900"))
+CREATION_FLIGHT_WAIT_TIMEOUT: int = int(os.environ.get("CREATION_FLIGHT_WAIT_TIMEOUT", "1200"))
+CREATION_FLIGHT_RESULT_TTL: int = int(os.environ.get("CREATION_FLIGHT_RESULT_TTL", "120"))
+
+# 结构化 LLM 结果缓存（按资料内容哈希 + 类别 + 提示词 + 模型复用结果）
+STRUCTURE_CACHE_ENABLED: bool = os.environ.get("STRUCTURE_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+
+# 结构化前按类别挑选相关章节（本地 BM25 打分），关闭后每个类别发送整页资料
+STRUCTURE_SECTION_ROUTING: bool = os.environ.get("STRUCTURE_SECTION_ROUTING", "true").lower() in ("true", "1", "yes")
+# 分块结构化（map-reduce）：整页 Markdown 超过单次上限 MAX_FACTS_CHARS（2 万字，strategy=mapreduce 时为本值）
+# 时按块分别抽取再合并。开启章节路由时按章节切成不超过本值的部分、在每部分内按类别预算路由，
+# 每个类别最多 6（concise）/ 8（detailed）块；未超过上限的页面只做路由，类别预算外的章节不发送
+STRUCTURE_CHUNK_CHARS: int = int(os.environ.get("STRUCTURE_CHUNK_CHARS", "12000"))
+# 单次结构化中同时进行的分块 LLM 调用数
+STRUCTURE_CHUNK_CONCURRENCY: int = int(os.environ.get("STRUCTURE_CHUNK_CONCURRENCY", "6"))
+
+# Playwright 浏览器池：常驻浏览器数量（每个浏览器由一个专用线程持有）
+BROWSER_POOL_SIZE: int = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+# 每个浏览器上下文最多打开的页面数，超过后关闭重建（释放内存、清理 Cookie 等状态）
+BROWSER_MAX_PAGES_PER_CONTEXT: int = int(os.environ.get("BROWSER_MAX_PAGES_PER_CONTEXT", "20"))
+# 浏览器空闲时的健康检查间隔（秒）
+BROWSER_HEALTH_CHECK_INTERVAL: int = int(os.environ.get("BROWSER_HEALTH_CHECK_INTERVAL", "60"))
+
+# 数据源 HTTP 响应磁盘缓存：新鲜期（秒）、容量上限（字节，按 LRU 淘汰）
+HTTP_CACHE_ENABLED: bool = os.environ.get("HTTP_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+HTTP_CACHE_DIR: Path = Path(os.environ.get("HTTP_CACHE_DIR", str(BASE_DIR / ".http_cache")))
+HTTP_CACHE_TTL: int = int(os.environ.get("HTTP_CACHE_TTL", "86400"))
+HTTP_CACHE_MAX_BYTES: int = int(os.environ.get("HTTP_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# 离线模式：只使用缓存（录制好的缓存目录），从不访问网络
+HTTP_CACHE_OFFLINE: bool = os.environ.get("HTTP_CACHE_OFFLINE", "false").lower() in ("true", "1", "yes")
+
+# 数据源 HTML 解析器：auto（有 lxml 时用 lxml，否则 html.parser）/ lxml / html.parser / html5lib
+HTML_PARSER: str = os.environ.get("HTML_PARSER", "auto")
+
+# 同名候选接口：异步 HTTP 客户端的最大连接数、按关键词缓存候选结果的时间（秒）
+DATASOURCE_MAX_CONNECTIONS: int = int(os.environ.get("DATASOURCE_MAX_CONNECTIONS", "50"))
+POLYSEMANT_CACHE_TTL: int = int(os.environ.get("POLYSEMANT_CACHE_TTL", "3600"))
+
 # 提示词管理配置
 USE_DB_PROMPTS: bool = os.environ.get("USE_DB_PROMPTS", "true").lower() in ("true", "1", "yes")
+# 激活提示词缓存有效期（秒）：进程内缓存（兜底丢失的失效通知）、Redis 缓存
+PROMPT_LOCAL_CACHE_TTL: int = int(os.environ.get("PROMPT_LOCAL_CACHE_TTL", "300"))
+PROMPT_REDIS_CACHE_TTL: int = int(os.environ.get("PROMPT_REDIS_CACHE_TTL", "300"))
 
 
 # 重要目录/文件路径
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+数据源异步 HTTP 访问（同名候选等交互接口使用）
+
+同步实现用 requests 串行发起多次请求并 time.sleep 随机等待，每个请求占用一个线程池线程数秒。
+这里提供基于 httpx 的异步版本：
+
+- httpx.AsyncClient 按事件循环复用（连接绑定到创建它的事件循环），总连接数受 DATASOURCE_MAX_CONNECTIONS 限制，
+  并发查询只占用 socket，不占用线程
+- 候选结果按 (数据源, 关键词) 缓存 POLYSEMANT_CACHE_TTL 秒：Redis 可用时多 Worker 共享，否则使用进程内缓存
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from fastnpc.config import DATASOURCE_MAX_CONNECTIONS, POLYSEMANT_CACHE_TTL
+
+
+CACHE_KEY_PREFIX = "polysemant"
+# 进程内缓存的最大条目数
+_LOCAL_CACHE_MAX = 512
+# Redis 失败后暂停使用的时间（秒），避免每次查询都等待连接超时
+_REDIS_RETRY_INTERVAL = 30.0
+_redis_down_until = 0.0
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+_local_cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _async_client() -> httpx.AsyncClient:
+    """当前事件循环复用的异步客户端"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=DATASOURCE_MAX_CONNECTIONS,
+                        max_keepalive_connections=max(1, DATASOURCE_MAX_CONNECTIONS // 2),
+                    ),
+                    timeout=httpx.Timeout(10.0, connect=6.0),
+                    follow_redirects=True,
+                )
+                _clients[loop] = client
+    return client
+
+
+async def close_async_datasource_client() -> None:
+    """关闭当前事件循环的异步客户端（事件循环结束前调用）"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    with _clients_lock:
+        client = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+async def fetch_async(
+    url: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    follow_redirects: bool = True,
+) -> httpx.Response:
+    """异步 GET（默认自动跟随重定向；follow_redirects=False 时返回 3xx 响应本身，用于读取 Location）"""
+    kwargs: Dict[str, Any] = {"params": params, "headers": headers, "follow_redirects": follow_redirects}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    return await _async_client().get(url, **kwargs)
+
+
+def _redis_client():
+    if time.time() < _redis_down_until:
+        return None
+    try:
+        from fastnpc.api.cache import get_redis_cache
+        return get_redis_cache().client
+    except Exception:
+        return None
+
+
+def _mark_redis_down(e: Exception) -> None:
+    global _redis_down_until
+    _redis_down_until = time.time() + _REDIS_RETRY_INTERVAL
+    print(f"[WARN] 同名候选缓存 Redis 不可用，暂时使用进程内缓存: {e}")
+
+
+def _cache_get(key: str) -> Optional[Any]:
+    client = _redis_client()
+    if client is not None:
+        try:
+            raw = client.get(key)
+            return json.loads(raw) if raw is not None else None
+        except Exception as e:
+            _mark_redis_down(e)
+    with _local_lock:
+        entry = _local_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            _local_cache.pop(key, None)
+            return None
+        _local_cache.move_to_end(key)
+        return entry[1]
+
+
+def _cache_set(key: str, value: Any, ttl: int) -> None:
+    client = _redis_client()
+    if client is not None:
+        try:
+            client.setex(key, ttl, json.dumps(value, ensure_ascii=False))
+            return
+        except Exception as e:
+            _mark_redis_down(e)
+    with _local_lock:
+        _local_cache[key] = (time.time() + ttl, value)
+        _local_cache.move_to_end(key)
+        while len(_local_cache) > _LOCAL_CACHE_MAX:
+            _local_cache.popitem(last=False)
+
+
+async def cached_options_async(
+    source: str,
+    keyword: str,
+    producer: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """按 (数据源, 关键词) 缓存 producer() 的结果；没有候选（items 为空）的结果不缓存
+
+    Redis 调用在线程中执行，不阻塞事件循环。
+    """
+    key = f"{CACHE_KEY_PREFIX}:{source}:{keyword}"
+    cached = await asyncio.to_thread(_cache_get, key)
+    if cached is not None:
+        return cached
+    result = await producer()
+    if result.get("items"):
+        await asyncio.to_thread(_cache_set, key, result, POLYSEMANT_CACHE_TTL)
+    return result
+
@@ -7,15 +7,20 @@ import re
 import time
 import random
 import os
+import asyncio
 from typing import Optional, Dict, Any, List, Tuple, Union
 from concurrent.futures import ThreadPoolExecutor
 try:
-    from playwright.sync_api import sync_playwright  # 可选：用于动态点击展开同名面板
+    import playwright.sync_api  # 可选：用于动态点击展开同名面板
     _HAS_PLAYWRIGHT = True
 except Exception:
     _HAS_PLAYWRIGHT = False
 from fastnpc.config import CHAR_DIR
-from urllib.parse import urlparse, parse_qs, unquote, urlunparse
+from fastnpc.datasources.browser_pool import run_page_job, run_page_job_async, PROFILE_BAIKE_POLYSEMANT
+from fastnpc.datasources.http_cache import cached_get
+from fastnpc.datasources.html_parser import ParsedPages, parse_html
+from fastnpc.datasources.async_http import fetch_async
+from urllib.parse import urlparse, parse_qs, unquote, urlunparse, urljoin
 
 # 将 Baike 全文抓取路径收敛为“modern_jlemma”单一路径
 _FULL_ONLY_MODERN = True
@@ -52,28 +57,61 @@ def _filter_noise(text: str) -> bool:
     return True
 
 
+def _baike_cacheable(resp: requests.Response) -> bool:
+    """反爬验证页（状态码 200，但跳转到安全验证）不缓存"""
+    if 'wappass.baidu.com' in (resp.url or ''):
+        return False
+    return '百度安全验证'.encode('utf-8') not in resp.content[:20000]
+
+
+_CARD_API_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+    'Accept': 'application/json,text/javascript,*/*;q=0.1',
+    'Referer': 'https://baike.baidu.com/',
+}
+# 词条页/搜索页请求头（异步候选查询使用）
+_PAGE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Referer': 'https://baike.baidu.com/',
+}
+
+
+def _card_api_url(keyword: str) -> str:
+    return (
+        'https://baike.baidu.com/api/openapi/BaikeLemmaCardApi?'
+        f'scope=103&format=json&appid=379020&bk_key={requests.utils.quote(keyword)}&bk_length=600'
+    )
+
+
+def _card_summary_from_json(data: Any) -> Optional[str]:
+    for key in ['abstract', 'desc']:
+        if isinstance(data, dict) and data.get(key):
+            text = str(data[key])
+            text = re.sub(r'\[\d+(-\d+)?\]', '', text)
+            return text.strip()
+    return None
+
+
 def _fetch_baike_card_summary(keyword: str, session: Optional[requests.Session] = None) -> Optional[str]:
     try:
         s = session or requests.Session()
-        s.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
-            'Accept': 'application/json,text/javascript,*/*;q=0.1',
-            'Referer': 'https://baike.baidu.com/',
-        })
-        api_url = (
-            'https://baike.baidu.com/api/openapi/BaikeLemmaCardApi?'
-            f'scope=103&format=json&appid=379020&bk_key={requests.utils.quote(keyword)}&bk_length=600'
-        )
-        resp = s.get(api_url, timeout=10)
+        s.headers.update(_CARD_API_HEADERS)
+        resp = cached_get(s, _card_api_url(keyword), timeout=10)
         if resp.status_code != 200:
             return None
-        data = resp.json()
-        for key in ['abstract', 'desc']:
-            if isinstance(data, dict) and data.get(key):
-                text = str(data[key])
-                text = re.sub(r'\[\d+(-\d+)?\]', '', text)
-                return text.strip()
+        return _card_summary_from_json(resp.json())
+    except Exception:
         return None
+
+
+async def _fetch_baike_card_summary_async(keyword: str) -> Optional[str]:
+    try:
+        resp = await fetch_async(_card_api_url(keyword), headers=_CARD_API_HEADERS)
+        if resp.status_code != 200:
+            return None
+        return _card_summary_from_json(resp.json())
     except Exception:
         return None
 
@@ -298,47 +336,80 @@ def _extract_options_from_search(keyword: str, session: requests.Session, limit:
     results: List[Dict[str, str]] = []
     try:
         search_url = f"https://baike.baidu.com/search?word={requests.utils.quote(keyword)}"
-        resp = session.get(search_url, timeout=10)
+        resp = cached_get(session, search_url, timeout=10, cacheable=_baike_cacheable)
         if not (200 <= resp.status_code < 300):
             return results
-        s = BeautifulSoup(resp.content, 'html.parser')
-        container = s.select_one('div.search-list') or s
-        anchors = container.find_all('a', href=lambda h: h and '/item/' in h)
-        seen = set()
-        for a in anchors:
-            text = a.get_text(' ', strip=True)
-            href = a.get('href') or ''
-            if not text or not href:
+        return _options_from_search_soup(parse_html(resp.content), keyword, limit=limit, relaxed=relaxed)
+    except Exception:
+        return results
+
+
+async def _extract_options_from_search_async(keyword: str, limit: int = 60, relaxed: bool = False) -> List[Dict[str, str]]:
+    """_extract_options_from_search 的异步版本"""
+    try:
+        search_url = f"https://baike.baidu.com/search?word={requests.utils.quote(keyword)}"
+        resp = await fetch_async(search_url, headers=_PAGE_HEADERS)
+        if not (200 <= resp.status_code < 300):
+            return []
+        return _options_from_search_soup(parse_html(resp.content), keyword, limit=limit, relaxed=relaxed)
+    except Exception:
+        return []
+
+
+def _options_from_search_soup(s: BeautifulSoup, keyword: str, *, limit: int, relaxed: bool) -> List[Dict[str, str]]:
+    results: List[Dict[str, str]] = []
+    container = s.select_one('div.search-list') or s
+    anchors = container.find_all('a', href=lambda h: h and '/item/' in h)
+    seen = set()
+    for a in anchors:
+        text = a.get_text(' ', strip=True)
+        href = a.get('href') or ''
+        if not text or not href:
+            continue
+        url = _make_absolute_baike_url(href)
+        try:
+            parsed = urlparse(url)
+            q = parse_qs(parsed.query)
+            if 'fromModule' in q and any('inlink' in v for vs in q.values() for v in vs):
                 continue
-            url = _make_absolute_baike_url(href)
+        except Exception:
+            pass
+        if not relaxed:
             try:
-                parsed = urlparse(url)
-                q = parse_qs(parsed.query)
-                if 'fromModule' in q and any('inlink' in v for vs in q.values() for v in vs):
-                    continue
+                decoded_path = unquote(url)
             except Exception:
-                pass
-            if not relaxed:
-                try:
-                    decoded_path = unquote(url)
-                except Exception:
-                    decoded_path = url
-                if (_normalize_text_for_match(keyword) not in _normalize_text_for_match(text)) and \
-                   (_normalize_text_for_match(keyword) not in _normalize_text_for_match(decoded_path)):
-                    continue
-            norm_url = _normalize_item_url(url)
-            if _should_drop_option_text(text) or not norm_url:
+                decoded_path = url
+            if (_normalize_text_for_match(keyword) not in _normalize_text_for_match(text)) and \
+               (_normalize_text_for_match(keyword) not in _normalize_text_for_match(decoded_path)):
                 continue
-            key = (text, norm_url)
-            if key in seen:
-                continue
-            seen.add(key)
-            results.append({'text': text, 'href': norm_url})
-            if len(results) >= limit:
-                break
-        return results
-    except Exception:
-        return results
+        norm_url = _normalize_item_url(url)
+        if _should_drop_option_text(text) or not norm_url:
+            continue
+        key = (text, norm_url)
+        if key in seen:
+            continue
+        seen.add(key)
+        results.append({'text': text, 'href': norm_url})
+        if len(results) >= limit:
+            break
+    return results
+
+
+# Baidu Web 结果跳转链接（baidu.com/link?url=...）同时解析的数量上限
+_BAIDU_LINK_CONCURRENCY = 8
+
+
+def _is_baidu_redirect(href: str) -> bool:
+    return href.startswith('http') and 'baidu.com/link?' in href
+
+
+def _redirect_target(status_code: int, headers: Any, href: str) -> str:
+    """跳转链接的目标地址：只读取 3xx 响应的 Location，不请求目标页面"""
+    if 300 <= status_code < 400:
+        location = headers.get('location')
+        if location:
+            return urljoin(href, location)
+    return href
 
 
 def _extract_options_from_baidu_web(keyword: str, session: requests.Session, limit: int = 60, *, relaxed: bool = True) -> List[Dict[str, str]]:
@@ -354,205 +425,243 @@ def _extract_options_from_baidu_web(keyword: str, session: requests.Session, lim
         resp = session.get(search_url, timeout=10)
         if not (200 <= resp.status_code < 300):
             return results
-        s = BeautifulSoup(resp.content, 'html.parser')
-        seen = set()
-        for a in s.find_all('a', href=True):
-            href = a.get('href') or ''
-            text = a.get_text(' ', strip=True)
-            if 'baidu.com' not in href:
-                continue
+        resolved: List[Tuple[str, str]] = []
+        for href, text in _baidu_web_links(parse_html(resp.content)):
             url = href
             try:
-                if href.startswith('http') and 'baidu.com' in href:
-                    r2 = session.get(href, timeout=6, allow_redirects=True)
-                    if 200 <= r2.status_code < 400:
-                        url = r2.url
+                if _is_baidu_redirect(href):
+                    r2 = session.get(href, timeout=6, allow_redirects=False)
+                    url = _redirect_target(r2.status_code, r2.headers, href)
             except Exception:
                 pass
-            if 'baike.baidu.com' not in url or '/item/' not in url:
-                continue
+            resolved.append((url, text))
+        return _options_from_baidu_web_links(resolved, keyword, limit=limit, relaxed=relaxed)
+    except Exception:
+        return results
+
+
+async def _extract_options_from_baidu_web_async(keyword: str, limit: int = 60, *, relaxed: bool = True) -> List[Dict[str, str]]:
+    """_extract_options_from_baidu_web 的异步版本：跳转链接并发解析（同时最多 _BAIDU_LINK_CONCURRENCY 个）"""
+    try:
+        q = f"site:baike.baidu.com {keyword}"
+        resp = await fetch_async(f"https://www.baidu.com/s?wd={requests.utils.quote(q)}", headers=_PAGE_HEADERS)
+        if not (200 <= resp.status_code < 300):
+            return []
+        links = _baidu_web_links(parse_html(resp.content))
+        semaphore = asyncio.Semaphore(_BAIDU_LINK_CONCURRENCY)
+
+        async def resolve(href: str) -> str:
+            if not _is_baidu_redirect(href):
+                return href
             try:
-                parsed = urlparse(url)
-                qd = parse_qs(parsed.query)
-                if 'fromModule' in qd and any('inlink' in v for vs in qd.values() for v in vs):
-                    continue
+                async with semaphore:
+                    r2 = await fetch_async(href, headers=_PAGE_HEADERS, timeout=6, follow_redirects=False)
+                return _redirect_target(r2.status_code, r2.headers, href)
             except Exception:
                 pass
-            if not relaxed:
-                try:
-                    decoded_path = unquote(url)
-                except Exception:
-                    decoded_path = url
-                norm_kw = _normalize_text_for_match(keyword)
-                if (norm_kw not in _normalize_text_for_match(text)) and (norm_kw not in _normalize_text_for_match(decoded_path)):
-                    continue
-            norm_url = _normalize_item_url(url)
-            if _should_drop_option_text(text) or not norm_url:
+            return href
+
+        urls = await asyncio.gather(*(resolve(href) for href, _ in links))
+        resolved = [(url, text) for url, (_, text) in zip(urls, links)]
+        return _options_from_baidu_web_links(resolved, keyword, limit=limit, relaxed=relaxed)
+    except Exception:
+        return []
+
+
+def _baidu_web_links(s: BeautifulSoup) -> List[Tuple[str, str]]:
+    """Baidu Web 搜索结果页中的 (链接, 标题)，链接多为 baidu.com/link 跳转地址"""
+    links: List[Tuple[str, str]] = []
+    for a in s.find_all('a', href=True):
+        href = a.get('href') or ''
+        if 'baidu.com' not in href:
+            continue
+        links.append((href, a.get_text(' ', strip=True)))
+    return links
+
+
+def _options_from_baidu_web_links(resolved: List[Tuple[str, str]], keyword: str, *, limit: int, relaxed: bool) -> List[Dict[str, str]]:
+    results: List[Dict[str, str]] = []
+    seen = set()
+    for url, text in resolved:
+        if 'baike.baidu.com' not in url or '/item/' not in url:
+            continue
+        try:
+            parsed = urlparse(url)
+            qd = parse_qs(parsed.query)
+            if 'fromModule' in qd and any('inlink' in v for vs in qd.values() for v in vs):
                 continue
-            key = (text or decoded_path, norm_url)
-            if key in seen:
+        except Exception:
+            pass
+        try:
+            decoded_path = unquote(url)
+        except Exception:
+            decoded_path = url
+        if not relaxed:
+            norm_kw = _normalize_text_for_match(keyword)
+            if (norm_kw not in _normalize_text_for_match(text)) and (norm_kw not in _normalize_text_for_match(decoded_path)):
                 continue
-            seen.add(key)
-            results.append({'text': text or decoded_path, 'href': norm_url})
-            if len(results) >= limit:
-                break
-        return results
-    except Exception:
-        return results
+        norm_url = _normalize_item_url(url)
+        if _should_drop_option_text(text) or not norm_url:
+            continue
+        key = (text or decoded_path, norm_url)
+        if key in seen:
+            continue
+        seen.add(key)
+        results.append({'text': text or decoded_path, 'href': norm_url})
+        if len(results) >= limit:
+            break
+    return results
 
 
-def _extract_options_dynamic_with_playwright(keyword: str, timeout_ms: int = 12000) -> List[Dict[str, str]]:
-    """使用无头浏览器点击"同名/多义"面板后抓取候选（与 Test 样例一致的选择器）。"""
+def _collect_polysemant_options(page, keyword: str, timeout_ms: int) -> List[Dict[str, str]]:
+    """在浏览器池提供的页面中点击"同名/多义"面板后抓取候选（与 Test 样例一致的选择器）。"""
     results: List[Dict[str, str]] = []
-    if not _HAS_PLAYWRIGHT:
-        return results
+    # 禁用页面缓存
+    page.route('**/*', lambda route: route.continue_(headers={
+        **route.request.headers,
+        'Cache-Control': 'no-cache, no-store, must-revalidate',
+        'Pragma': 'no-cache',
+    }))
+    
+    url = f"https://baike.baidu.com/item/{requests.utils.quote(keyword)}"
+    print(f"[DEBUG] 获取同名词选项 - URL: {url}")
+    page.goto(url, wait_until='domcontentloaded', timeout=timeout_ms, referer=None)
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-dev-shm-usage',
-                    '--no-sandbox',
-                ]
-            )
-            # 创建上下文，强制禁用缓存
-            context = browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
-                ignore_https_errors=True,
-                extra_http_headers={
-                    'Cache-Control': 'no-cache, no-store, must-revalidate',
-                    'Pragma': 'no-cache',
-                    'Expires': '0',
-                }
-            )
-            page = context.new_page()
-            
-            # 禁用页面缓存
-            page.route('**/*', lambda route: route.continue_(headers={
-                **route.request.headers,
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-            }))
+        # 点击“展开同名词”面板
+        loc = page.locator('div.J-polysemantText, div[class^="polysemantText_"]')
+        if loc.count() > 0:
+            loc.first.click(timeout=2000)
+        else:
+            icon = page.locator('#lemmaDesc div.J-polysemantText svg, svg.polysemantIcon_VoaS3')
+            if icon.count() > 0:
+                icon.first.click(timeout=2000)
+    except Exception:
+        pass
+    try:
+        # 等待新面板出现（包含你提供的结构）
+        page.wait_for_selector('div[class^="newPolysemantList_"], #newPolysemantList, #content', timeout=4000)
+    except Exception:
+        pass
+    page.wait_for_timeout(400)
+    # 覆盖更多可能位置的 a 链接
+    selector_union = ' , '.join([
+        'div[class^=\"newPolysemantList_\"] a[href*=\"/item/\"]',
+        '#newPolysemantList a[href*=\"/item/\"]',
+        '#content a[href*=\"/item/\"]',
+        'div[class^=\"contentItemChildren_\"] a[href*=\"/item/\"]',
+        'a[class^=\"contentItemChild_\"]',
+    ])
+    anchors = page.locator(selector_union)
+    count = min(200, anchors.count())
+    seen = set()
+    for i in range(count):
+        try:
+            a = anchors.nth(i)
+            href = a.get_attribute('href') or ''
+            text = (a.inner_text() or '').strip()
+            if not href or not text:
+                continue
+            abs_url = _normalize_item_url(href)
+            if _should_drop_option_text(text) or not abs_url:
+                continue
+            key = (text, abs_url)
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append({'text': text, 'href': abs_url})
+        except Exception:
+            continue
+    
+    # 如果没有找到同名词选项，提取当前页面信息作为唯一选项
+    if not results:
+        try:
+            print(f"[INFO] 没有找到同名词面板，提取当前页面信息作为选项")
             
-            url = f"https://baike.baidu.com/item/{requests.utils.quote(keyword)}"
-            print(f"[DEBUG] 获取同名词选项 - URL: {url}")
-            page.goto(url, wait_until='domcontentloaded', timeout=timeout_ms, referer=None)
-            try:
-                # 点击“展开同名词”面板
-                loc = page.locator('div.J-polysemantText, div[class^="polysemantText_"]')
-                if loc.count() > 0:
-                    loc.first.click(timeout=2000)
-                else:
-                    icon = page.locator('#lemmaDesc div.J-polysemantText svg, svg.polysemantIcon_VoaS3')
-                    if icon.count() > 0:
-                        icon.first.click(timeout=2000)
-            except Exception:
-                pass
+            # 提取标题
+            title = keyword  # 默认使用关键词
             try:
-                # 等待新面板出现（包含你提供的结构）
-                page.wait_for_selector('div[class^="newPolysemantList_"], #newPolysemantList, #content', timeout=4000)
-            except Exception:
-                pass
-            page.wait_for_timeout(400)
-            # 覆盖更多可能位置的 a 链接
-            selector_union = ' , '.join([
-                'div[class^=\"newPolysemantList_\"] a[href*=\"/item/\"]',
-                '#newPolysemantList a[href*=\"/item/\"]',
-                '#content a[href*=\"/item/\"]',
-                'div[class^=\"contentItemChildren_\"] a[href*=\"/item/\"]',
-                'a[class^=\"contentItemChild_\"]',
-            ])
-            anchors = page.locator(selector_union)
-            count = min(200, anchors.count())
-            seen = set()
-            for i in range(count):
+                title_elem = page.locator('dd.lemmaWgt-lemmaTitle-title h1, h1').first
+                if title_elem.count() > 0:
+                    title = title_elem.inner_text().strip()
+                    print(f"[INFO] 提取到标题: {title}")
+            except Exception as e:
+                print(f"[DEBUG] 提取标题失败: {e}")
+            
+            # 获取当前URL
+            current_url = page.url
+            print(f"[INFO] 当前URL: {current_url}")
+            
+            # 提取简介
+            summary = ""
+            summary_selectors = [
+                'div.lemmaSummary_GJZu8',
+                'div.lemmaWgt-lemmaSummary',
+                'div[class*="lemma"][class*="summary"]',
+                'div.J-summary',
+            ]
+            for selector in summary_selectors:
                 try:
-                    a = anchors.nth(i)
-                    href = a.get_attribute('href') or ''
-                    text = (a.inner_text() or '').strip()
-                    if not href or not text:
-                        continue
-                    abs_url = _normalize_item_url(href)
-                    if _should_drop_option_text(text) or not abs_url:
-                        continue
-                    key = (text, abs_url)
-                    if key in seen:
-                        continue
-                    seen.add(key)
-                    results.append({'text': text, 'href': abs_url})
+                    elem = page.locator(selector).first
+                    if elem.count() > 0:
+                        summary = elem.inner_text().strip()
+                        if summary:
+                            print(f"[INFO] 提取到简介 (长度: {len(summary)})")
+                            break
                 except Exception:
                     continue
             
-            # 如果没有找到同名词选项，提取当前页面信息作为唯一选项
-            if not results:
+            # 如果上述都没找到，尝试meta description
+            if not summary:
                 try:
-                    print(f"[INFO] 没有找到同名词面板，提取当前页面信息作为选项")
-                    
-                    # 提取标题
-                    title = keyword  # 默认使用关键词
-                    try:
-                        title_elem = page.locator('dd.lemmaWgt-lemmaTitle-title h1, h1').first
-                        if title_elem.count() > 0:
-                            title = title_elem.inner_text().strip()
-                            print(f"[INFO] 提取到标题: {title}")
-                    except Exception as e:
-                        print(f"[DEBUG] 提取标题失败: {e}")
-                    
-                    # 获取当前URL
-                    current_url = page.url
-                    print(f"[INFO] 当前URL: {current_url}")
-                    
-                    # 提取简介
-                    summary = ""
-                    summary_selectors = [
-                        'div.lemmaSummary_GJZu8',
-                        'div.lemmaWgt-lemmaSummary',
-                        'div[class*="lemma"][class*="summary"]',
-                        'div.J-summary',
-                    ]
-                    for selector in summary_selectors:
-                        try:
-                            elem = page.locator(selector).first
-                            if elem.count() > 0:
-                                summary = elem.inner_text().strip()
-                                if summary:
-                                    print(f"[INFO] 提取到简介 (长度: {len(summary)})")
-                                    break
-                        except Exception:
-                            continue
-                    
-                    # 如果上述都没找到，尝试meta description
-                    if not summary:
-                        try:
-                            meta = page.locator('meta[name="description"]').first
-                            if meta.count() > 0:
-                                summary = meta.get_attribute('content') or ""
-                                if summary:
-                                    print(f"[INFO] 从meta标签提取到简介 (长度: {len(summary)})")
-                        except Exception:
-                            pass
-                    
-                    # 构建返回项
-                    if title and current_url:
-                        normalized_url = _normalize_item_url(current_url)
-                        if normalized_url:
-                            results.append({
-                                'text': title,
-                                'href': normalized_url,
-                                'snippet': summary[:200] if summary else ""  # 限制长度
-                            })
-                            print(f"[INFO] 已添加当前页面作为选项: {title}")
-                except Exception as e:
-                    print(f"[DEBUG] 提取当前页面信息失败: {e}")
+                    meta = page.locator('meta[name="description"]').first
+                    if meta.count() > 0:
+                        summary = meta.get_attribute('content') or ""
+                        if summary:
+                            print(f"[INFO] 从meta标签提取到简介 (长度: {len(summary)})")
+                except Exception:
+                    pass
             
-            # 关闭上下文和浏览器，确保完全清理
-            page.close()
-            context.close()
-            browser.close()
-        return results
+            # 构建返回项
+            if title and current_url:
+                normalized_url = _normalize_item_url(current_url)
+                if normalized_url:
+                    results.append({
+                        'text': title,
+                        'href': normalized_url,
+                        'snippet': summary[:200] if summary else ""  # 限制长度
+                    })
+                    print(f"[INFO] 已添加当前页面作为选项: {title}")
+        except Exception as e:
+            print(f"[DEBUG] 提取当前页面信息失败: {e}")
+    return results
+
+
+def _extract_options_dynamic_with_playwright(keyword: str, timeout_ms: int = 12000) -> List[Dict[str, str]]:
+    """使用常驻无头浏览器提取同名词候选（阻塞当前线程，供创建流程等同步调用方使用）。"""
+    if not _HAS_PLAYWRIGHT:
+        return []
+    try:
+        return run_page_job(
+            lambda page: _collect_polysemant_options(page, keyword, timeout_ms),
+            profile=PROFILE_BAIKE_POLYSEMANT,
+            timeout=timeout_ms / 1000 + 20,
+        )
     except Exception:
-        return results
+        return []
+
+
+async def _extract_options_dynamic_with_playwright_async(keyword: str, timeout_ms: int = 12000) -> List[Dict[str, str]]:
+    """异步版本：浏览器操作在浏览器池线程中执行，等待期间不占用事件循环。"""
+    if not _HAS_PLAYWRIGHT:
+        return []
+    try:
+        return await run_page_job_async(
+            lambda page: _collect_polysemant_options(page, keyword, timeout_ms),
+            profile=PROFILE_BAIKE_POLYSEMANT,
+            timeout=timeout_ms / 1000 + 20,
+        )
+    except Exception:
+        return []
 
 
 def get_polysemant_options(
@@ -576,6 +685,55 @@ def get_polysemant_options(
     except Exception:
         return ([], 'playwright_error') if return_route else []
 
+
+async def _extract_options_from_item_page_async(keyword: str) -> List[Dict[str, str]]:
+    """异步请求词条页，从静态 HTML 的同名/多义容器中提取候选"""
+    try:
+        resp = await fetch_async(f"https://baike.baidu.com/item/{requests.utils.quote(keyword)}", headers=_PAGE_HEADERS)
+        if not (200 <= resp.status_code < 300):
+            return []
+        return _extract_polysemant_options(parse_html(resp.content), keyword)
+    except Exception:
+        return []
+
+
+async def lookup_polysemant_async(keyword: str, limit: int = 120) -> Dict[str, Any]:
+    """异步查询同名候选（供 /api/baike/polysemant 使用），返回 {"items", "route", "summary"}
+
+    与 get_polysemant_options 一致，以浏览器池点击“展开同名词”面板的结果为准（route=playwright_panel）：
+    词条页静态 HTML 只含部分同名义项，面板才是完整列表。卡片摘要与两个 HTTP 回退来源在面板加载期间
+    并发请求，面板不可用或无结果时依次使用：
+    - 词条页静态 HTML 中的同名/多义列表（route=http_item_page）
+    - 百科搜索页（http_search）
+    - Baidu Web 搜索（http_baidu_web）
+    summary 为默认义项的卡片摘要（可能为空）。
+    """
+    limit = max(1, min(limit, 200))
+    background = asyncio.gather(
+        _extract_options_from_item_page_async(keyword),
+        _extract_options_from_search_async(keyword, limit=60, relaxed=True),
+        _fetch_baike_card_summary_async(keyword),
+    )
+    items: List[Dict[str, str]] = []
+    route = 'playwright_panel'
+    try:
+        if _HAS_PLAYWRIGHT:
+            items = await _extract_options_dynamic_with_playwright_async(keyword)
+        page_items, search_items, summary = await background
+    finally:
+        background.cancel()
+    if not items and page_items:
+        items = page_items
+        route = 'http_item_page'
+    if not items and search_items:
+        items = search_items
+        route = 'http_search'
+    if not items:
+        items = await _extract_options_from_baidu_web_async(keyword, limit=60)
+        route = 'http_baidu_web'
+    return {'items': items[:limit], 'route': route if items else 'none', 'summary': summary or ''}
+
+
 def _get_full_once(
     keyword: str,
     *,
@@ -586,6 +744,7 @@ def _get_full_once(
     race_pc: bool = True,
     request_timeout: float = 8.0,
     connect_timeout: float = 6.0,
+    refresh: bool = False,
 ) -> Dict[str, Any]:
     url = chosen_url or f"https://baike.baidu.com/item/{requests.utils.quote(keyword)}"
     headers = {
@@ -600,10 +759,26 @@ def _get_full_once(
     session = requests.Session()
     session.headers.update(headers)
     timeout_tup = (connect_timeout, request_timeout)
-    _ = session.get('https://www.baidu.com/', timeout=timeout_tup)
-    time.sleep(random.uniform(0.2, 0.6))
-    _ = session.get('https://baike.baidu.com/', timeout=timeout_tup)
-    time.sleep(random.uniform(0.3, 0.8))
+    warmed_up = False
+    # 本次流程内的解析树缓存：重试、搜索回退拿到相同页面时不再重复解析（提取步骤均为只读）
+    pages = ParsedPages()
+
+    def _warm_up() -> None:
+        # 先访问首页获取 Cookie；页面全部命中缓存时不需要
+        nonlocal warmed_up
+        if warmed_up:
+            return
+        warmed_up = True
+        _ = session.get('https://www.baidu.com/', timeout=timeout_tup)
+        time.sleep(random.uniform(0.2, 0.6))
+        _ = session.get('https://baike.baidu.com/', timeout=timeout_tup)
+        time.sleep(random.uniform(0.3, 0.8))
+
+    def _get(target_url: str) -> requests.Response:
+        return cached_get(
+            session, target_url, timeout=timeout_tup, allow_redirects=True,
+            refresh=refresh, cacheable=_baike_cacheable, before_network=_warm_up,
+        )
 
     # AMP 优先并发：并行请求 AMP 版本，先返回可用内容
     amp_future = None
@@ -614,14 +789,14 @@ def _get_full_once(
         except Exception:
             amp_future = None
 
-    resp = session.get(url, timeout=timeout_tup, allow_redirects=True)
+    resp = _get(url)
     _debug_dump(keyword, 'pc_initial', resp.content)
     if resp.status_code == 403:
         card_summary = _fetch_baike_card_summary(keyword, session)
         search_url = f"https://baike.baidu.com/search?word={requests.utils.quote(keyword)}"
-        resp_search = session.get(search_url, timeout=timeout_tup)
+        resp_search = _get(search_url)
         if resp_search.status_code == 200:
-            soup_search = BeautifulSoup(resp_search.content, 'html.parser')
+            soup_search = pages.soup(resp_search.content)
             link_tag = soup_search.find('a', href=lambda h: h and '/item/' in h)
             if link_tag and link_tag.get('href'):
                 fallback_url = link_tag['href']
@@ -629,7 +804,7 @@ def _get_full_once(
                     fallback_url = 'https:' + fallback_url
                 elif fallback_url.startswith('/'):
                     fallback_url = 'https://baike.baidu.com' + fallback_url
-                resp = session.get(fallback_url, timeout=timeout_tup, allow_redirects=True)
+                resp = _get(fallback_url)
                 time.sleep(random.uniform(0.2, 0.6))
         if not (200 <= resp.status_code < 300):
             return {
@@ -663,7 +838,7 @@ def _get_full_once(
         except Exception:
             pass
 
-    soup = BeautifulSoup(resp.content, 'html.parser')
+    soup = pages.soup(resp.content)
     current_url = resp.url if hasattr(resp, 'url') else url
 
     # 同名候选：若提供了选择参数，则尝试解析候选并切换到指定义项
@@ -695,9 +870,9 @@ def _get_full_once(
             chosen_item = _choose_from_options(options, choice_index=choice_index, filter_text=filter_text)
             if chosen_item and chosen_item.get('href'):
                 try:
-                    resp2 = session.get(chosen_item['href'], timeout=timeout_tup, allow_redirects=True)
+                    resp2 = _get(chosen_item['href'])
                     if 200 <= resp2.status_code < 300:
-                        soup = BeautifulSoup(resp2.content, 'html.parser')
+                        soup = pages.soup(resp2.content)
                         current_url = resp2.url if hasattr(resp2, 'url') else chosen_item['href']
                         _debug_dump(keyword, 'pc_poly_choice', resp2.content)
                 except Exception:
@@ -710,9 +885,9 @@ def _get_full_once(
             fallback_url = 'https:' + fallback_url
         elif fallback_url.startswith('/'):
             fallback_url = 'https://baike.baidu.com' + fallback_url
-        resp2 = session.get(fallback_url, timeout=timeout_tup, allow_redirects=True)
+        resp2 = _get(fallback_url)
         if 200 <= resp2.status_code < 300:
-            soup = BeautifulSoup(resp2.content, 'html.parser')
+            soup = pages.soup(resp2.content)
             current_url = resp2.url if hasattr(resp2, 'url') else fallback_url
             _debug_dump(keyword, 'pc_poly', resp2.content)
 
@@ -903,10 +1078,11 @@ def _get_full_once(
                 'Referer': 'https://baike.baidu.com/',
                 'Connection': 'keep-alive',
             })
-            r = s2.get(amp_url, timeout=10, allow_redirects=True)
+            r = cached_get(s2, amp_url, timeout=10, refresh=refresh, cacheable=_baike_cacheable)
             if not (200 <= r.status_code < 300):
                 return {}
-            s = BeautifulSoup(r.content, 'html.parser')
+            # 在并发线程中执行，不使用 pages（非线程安全）
+            s = parse_html(r.content)
             sections_amp: List[Dict[str, Any]] = []
             for h2 in s.find_all('h2'):
                 tt = h2.get_text(" ", strip=True)
@@ -948,10 +1124,14 @@ def _get_full_once(
     if not sections and not _FULL_ONLY_MODERN:
         # 等待 5 秒后重试一次
         time.sleep(5.0)
-        resp_retry = session.get(url, timeout=timeout_tup, allow_redirects=True)
+        # 首次页面可能来自缓存且不完整：绕过缓存重新下载，并用新内容覆盖缓存
+        resp_retry = cached_get(
+            session, url, timeout=timeout_tup, refresh=True,
+            cacheable=_baike_cacheable, before_network=_warm_up,
+        )
         _debug_dump(keyword, 'pc_retry', resp_retry.content)
         if 200 <= resp_retry.status_code < 300:
-            soup_retry = BeautifulSoup(resp_retry.content, 'html.parser')
+            soup_retry = pages.soup(resp_retry.content)
             parse_core(soup_retry)
             # 若仍无章节，尝试全页段落兜底
             if not sections:
@@ -963,9 +1143,16 @@ def _get_full_once(
             card_summary = _fetch_baike_card_summary(keyword, session)
             if card_summary:
                 summary = card_summary
-    # 再次兜底：AMP 解析
+    # 再次兜底：AMP 解析（复用开头并发请求的结果，避免重复抓取与解析）
     if not sections and not _FULL_ONLY_MODERN:
-        amp = _fetch_amp_sections(url)
+        amp = None
+        if amp_future is not None:
+            try:
+                amp = amp_future.result()
+            except Exception:
+                amp = None
+        if amp is None:
+            amp = _fetch_amp_sections(url)
         if isinstance(amp, dict) and amp.get('sections'):
             sections = amp['sections']  # type: ignore
             if not summary and amp.get('summary'):
@@ -974,10 +1161,10 @@ def _get_full_once(
     if not sections and not _FULL_ONLY_MODERN:
         try:
             search_url = f"https://baike.baidu.com/search?word={requests.utils.quote(keyword)}"
-            resp_search = session.get(search_url, timeout=timeout_tup)
+            resp_search = _get(search_url)
             _debug_dump(keyword, 'search', resp_search.content)
             if 200 <= resp_search.status_code < 300:
-                soup_search = BeautifulSoup(resp_search.content, 'html.parser')
+                soup_search = pages.soup(resp_search.content)
                 link_tag = soup_search.find('a', href=lambda h: h and '/item/' in h)
                 if link_tag and link_tag.get('href'):
                     fallback_url = link_tag['href']
@@ -985,10 +1172,10 @@ def _get_full_once(
                         fallback_url = 'https:' + fallback_url
                     elif fallback_url.startswith('/'):
                         fallback_url = 'https://baike.baidu.com' + fallback_url
-                    resp_fallback = session.get(fallback_url, timeout=timeout_tup, allow_redirects=True)
+                    resp_fallback = _get(fallback_url)
                     _debug_dump(keyword, 'pc_fallback', resp_fallback.content)
                     if 200 <= resp_fallback.status_code < 300:
-                        soup_fb = BeautifulSoup(resp_fallback.content, 'html.parser')
+                        soup_fb = pages.soup(resp_fallback.content)
                         parse_core(soup_fb)
                         if not sections:
                             # 尝试全页段落兜底
@@ -1083,6 +1270,8 @@ def get_full(
                 race_pc=race_pc,
                 request_timeout=request_timeout,
                 connect_timeout=connect_timeout,
+                # 重试时跳过缓存，避免反复拿到同一份不完整的页面
+                refresh=attempt > 0,
             )
             last = data
             ok = False
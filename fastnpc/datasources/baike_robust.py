@@ -8,11 +8,13 @@ import json
 from typing import Dict, Any, List, Optional
 
 try:
-    from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+    from playwright.sync_api import TimeoutError as PlaywrightTimeout
     _HAS_PLAYWRIGHT = True
 except Exception:
     _HAS_PLAYWRIGHT = False
 
+from fastnpc.datasources.browser_pool import run_page_job, PROFILE_BAIKE_ROBUST
+
 
 def get_full_robust(
     keyword: str,
@@ -57,134 +59,84 @@ def get_full_robust(
 
 
 def _fetch_with_playwright(keyword: str, url: str, timeout_ms: int) -> Dict[str, Any]:
-    """使用Playwright抓取页面"""
-    with sync_playwright() as p:
-        # 使用Chromium，更稳定
-        browser = p.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',  # 隐藏自动化特征
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-            ]
-        )
+    """使用浏览器池中的常驻浏览器抓取页面"""
+    return run_page_job(
+        lambda page: _fetch_page(page, keyword, url, timeout_ms),
+        profile=PROFILE_BAIKE_ROBUST,
+        timeout=timeout_ms / 1000 + 30,
+    )
+
+
+def _fetch_page(page, keyword: str, url: str, timeout_ms: int) -> Dict[str, Any]:
+    """在浏览器池提供的页面中访问词条并提取内容（上下文参数见 browser_pool.CONTEXT_PROFILES）"""
+    # 注入脚本，隐藏webdriver特征
+    page.add_init_script("""
+        Object.defineProperty(navigator, 'webdriver', {
+            get: () => undefined
+        });
+        Object.defineProperty(navigator, 'plugins', {
+            get: () => [1, 2, 3, 4, 5]
+        });
+        Object.defineProperty(navigator, 'languages', {
+            get: () => ['zh-CN', 'zh', 'en']
+        });
+    """)
+    
+    try:
+        # 禁用页面缓存
+        page.route('**/*', lambda route: route.continue_(headers={
+            **route.request.headers,
+            'Cache-Control': 'no-cache, no-store, must-revalidate',
+            'Pragma': 'no-cache',
+        }))
         
-        # 创建上下文，模拟真实浏览器（禁用缓存以避免获取到旧页面）
-        context = browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            locale='zh-CN',
-            timezone_id='Asia/Shanghai',
-            ignore_https_errors=True,
-            extra_http_headers={
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Cache-Control': 'no-cache, no-store, must-revalidate',  # 强制禁用缓存
-                'Pragma': 'no-cache',  # HTTP/1.0 缓存控制
-                'Expires': '0',  # 立即过期
-            }
-        )
+        # 访问页面（强制刷新，不使用缓存）
+        print(f"[DEBUG] Playwright访问URL: {url}")
+        page.goto(url, wait_until='domcontentloaded', timeout=timeout_ms, referer=None)
         
-        page = context.new_page()
+        # 随机延迟，模拟人类阅读
+        time.sleep(random.uniform(0.8, 1.5))
         
-        # 注入脚本，隐藏webdriver特征
-        page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5]
-            });
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['zh-CN', 'zh', 'en']
-            });
-        """)
+        # 尝试点击展开同名词面板（如果有）
+        try:
+            poly_selector = 'div.J-polysemantText, div[class^="polysemantText_"]'
+            if page.locator(poly_selector).count() > 0:
+                page.locator(poly_selector).first.click(timeout=2000)
+                time.sleep(0.5)
+        except:
+            pass
         
+        # 等待主要内容加载
         try:
-            # 禁用页面缓存
-            page.route('**/*', lambda route: route.continue_(headers={
-                **route.request.headers,
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-            }))
-            
-            # 访问页面（强制刷新，不使用缓存）
-            print(f"[DEBUG] Playwright访问URL: {url}")
-            page.goto(url, wait_until='domcontentloaded', timeout=timeout_ms, referer=None)
-            
-            # 随机延迟，模拟人类阅读
-            time.sleep(random.uniform(0.8, 1.5))
-            
-            # 尝试点击展开同名词面板（如果有）
-            try:
-                poly_selector = 'div.J-polysemantText, div[class^="polysemantText_"]'
-                if page.locator(poly_selector).count() > 0:
-                    page.locator(poly_selector).first.click(timeout=2000)
-                    time.sleep(0.5)
-            except:
-                pass
-            
-            # 等待主要内容加载
-            try:
-                page.wait_for_selector('div.J-lemma-content, div.main-content, div.lemma-summary', timeout=5000)
-            except:
-                pass
-            
-            # 滚动页面，触发懒加载
-            page.evaluate("""
-                () => {
-                    window.scrollTo(0, document.body.scrollHeight / 3);
-                }
-            """)
-            time.sleep(0.3)
-            
-            page.evaluate("""
-                () => {
-                    window.scrollTo(0, document.body.scrollHeight / 2);
-                }
-            """)
-            time.sleep(0.3)
-            
-            # 获取页面内容
-            html_content = page.content()
-            
-            # 提取数据
-            result = _parse_html_content(page, keyword, url)
-            
-            # 验证返回的数据是否正确（标题应该包含关键词）
-            print(f"[DEBUG] 爬取结果 - keyword: {keyword}, title: {result.get('title', 'N/A')}")
-            
-            # 关闭上下文和浏览器，确保完全清理
-            page.close()
-            context.close()
-            browser.close()
-            
-            return result
-            
-        except PlaywrightTimeout as e:
-            try:
-                page.close()
-                context.close()
-            except:
-                pass
-            browser.close()
-            raise Exception(f"页面加载超时: {e}")
-        except Exception as e:
-            try:
-                page.close()
-                context.close()
-            except:
-                pass
-            browser.close()
-            raise
+            page.wait_for_selector('div.J-lemma-content, div.main-content, div.lemma-summary', timeout=5000)
+        except:
+            pass
+        
+        # 滚动页面，触发懒加载
+        page.evaluate("""
+            () => {
+                window.scrollTo(0, document.body.scrollHeight / 3);
+            }
+        """)
+        time.sleep(0.3)
+        
+        page.evaluate("""
+            () => {
+                window.scrollTo(0, document.body.scrollHeight / 2);
+            }
+        """)
+        time.sleep(0.3)
+        
+        # 提取数据
+        result = _parse_html_content(page, keyword, url)
+        
+        # 验证返回的数据是否正确（标题应该包含关键词）
+        print(f"[DEBUG] 爬取结果 - keyword: {keyword}, title: {result.get('title', 'N/A')}")
+        
+        return result
+        
+    except PlaywrightTimeout as e:
+        raise Exception(f"页面加载超时: {e}")
 
 
 def _parse_html_content(page, keyword: str, url: str) -> Dict[str, Any]:
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Playwright 常驻浏览器池
+
+原先 baike_robust 抓取与百科同名词面板提取每次调用都新建 sync_playwright() 并启动 Chromium，
+冷启动（约 1~3 秒、上百 MB 内存）占了抓取耗时的大头。这里维护少量常驻浏览器：
+
+- 每个浏览器由一个专用线程持有（Playwright 同步 API 对象不能跨线程使用），
+  调用方把“拿到 page 后做什么”的函数提交到队列，由浏览器线程执行
+- 按场景（profile）复用浏览器上下文，每个上下文打开 BROWSER_MAX_PAGES_PER_CONTEXT 个页面后关闭重建，
+  任务出错时立即丢弃该上下文，避免状态与内存累积
+- 健康检查：执行任务前、以及空闲每 BROWSER_HEALTH_CHECK_INTERVAL 秒检查浏览器连接，断开则重新启动
+- 同步接口 run_page_job 供创建流程使用；异步接口 run_page_job_async 只等待结果，不占用事件循环线程
+"""
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from playwright.sync_api import sync_playwright
+    _HAS_PLAYWRIGHT = True
+except Exception:
+    _HAS_PLAYWRIGHT = False
+
+from fastnpc.config import (
+    BROWSER_POOL_SIZE,
+    BROWSER_MAX_PAGES_PER_CONTEXT,
+    BROWSER_HEALTH_CHECK_INTERVAL,
+)
+
+
+PROFILE_BAIKE_ROBUST = "baike_robust"
+PROFILE_BAIKE_POLYSEMANT = "baike_polysemant"
+
+_LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',  # 隐藏自动化特征
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+]
+
+# 各抓取场景的上下文参数（与原先各自 new_context 的参数一致）
+CONTEXT_PROFILES: Dict[str, Dict[str, Any]] = {
+    PROFILE_BAIKE_ROBUST: {
+        'viewport': {'width': 1920, 'height': 1080},
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'locale': 'zh-CN',
+        'timezone_id': 'Asia/Shanghai',
+        'ignore_https_errors': True,
+        'extra_http_headers': {
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'DNT': '1',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            'Sec-Fetch-User': '?1',
+            'Cache-Control': 'no-cache, no-store, must-revalidate',  # 强制禁用缓存
+            'Pragma': 'no-cache',  # HTTP/1.0 缓存控制
+            'Expires': '0',  # 立即过期
+        },
+    },
+    PROFILE_BAIKE_POLYSEMANT: {
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+        'ignore_https_errors': True,
+        'extra_http_headers': {
+            'Cache-Control': 'no-cache, no-store, must-revalidate',
+            'Pragma': 'no-cache',
+            'Expires': '0',
+        },
+    },
+}
+
+
+class BrowserUnavailable(Exception):
+    """Playwright 未安装或浏览器池已关闭"""
+
+
+class _PageJob:
+    __slots__ = ("fn", "profile", "future")
+
+    def __init__(self, fn: Callable[[Any], Any], profile: str):
+        self.fn = fn
+        self.profile = profile
+        self.future: Future = Future()
+
+
+_jobs: "queue.Queue[Optional[_PageJob]]" = queue.Queue()
+_workers: List["_BrowserWorker"] = []
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"jobs": 0, "errors": 0, "launches": 0, "relaunches": 0, "contexts_created": 0, "contexts_recycled": 0}
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += n
+
+
+class _BrowserWorker(threading.Thread):
+    """持有一个常驻浏览器的线程"""
+
+    def __init__(self, index: int):
+        super().__init__(name=f"browser-pool-{index}", daemon=True)
+        self._playwright = None
+        self._browser = None
+        # profile -> [上下文, 已打开页面数]
+        self._contexts: Dict[str, List[Any]] = {}
+        self.busy = False
+
+    def run(self) -> None:
+        try:
+            while True:
+                try:
+                    job = _jobs.get(timeout=BROWSER_HEALTH_CHECK_INTERVAL)
+                except queue.Empty:
+                    self._health_check()
+                    continue
+                if job is None:
+                    break
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                self.busy = True
+                try:
+                    job.future.set_result(self._run_job(job))
+                except BaseException as e:
+                    _count("errors")
+                    job.future.set_exception(e)
+                finally:
+                    self.busy = False
+        finally:
+            self._shutdown()
+
+    def _run_job(self, job: _PageJob) -> Any:
+        _count("jobs")
+        self._ensure_browser()
+        context = self._context(job.profile)
+        page = context.new_page()
+        try:
+            return job.fn(page)
+        except Exception:
+            # 出错的上下文可能残留异常状态（弹窗、风控 Cookie 等），直接丢弃
+            self._drop_context(job.profile)
+            raise
+        finally:
+            try:
+                page.close()
+            except Exception:
+                pass
+
+    def _ensure_browser(self) -> None:
+        if self._browser is not None:
+            try:
+                if self._browser.is_connected():
+                    return
+            except Exception:
+                pass
+            print(f"[WARN] {self.name}: 浏览器连接已断开，重新启动")
+            _count("relaunches")
+            self._close_browser()
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=True, args=_LAUNCH_ARGS)
+        _count("launches")
+
+    def _context(self, profile: str):
+        entry = self._contexts.get(profile)
+        if entry is not None and entry[1] >= BROWSER_MAX_PAGES_PER_CONTEXT:
+            self._drop_context(profile)
+            _count("contexts_recycled")
+            entry = None
+        if entry is None:
+            entry = [self._browser.new_context(**CONTEXT_PROFILES.get(profile, {})), 0]
+            self._contexts[profile] = entry
+            _count("contexts_created")
+        entry[1] += 1
+        return entry[0]
+
+    def _drop_context(self, profile: str) -> None:
+        entry = self._contexts.pop(profile, None)
+        if entry is not None:
+            try:
+                entry[0].close()
+            except Exception:
+                pass
+
+    def _health_check(self) -> None:
+        """空闲时检查：浏览器断开则释放（下次任务时重新启动）"""
+        if self._browser is None:
+            return
+        try:
+            healthy = self._browser.is_connected()
+        except Exception:
+            healthy = False
+        if not healthy:
+            print(f"[WARN] {self.name}: 健康检查发现浏览器已断开")
+            self._close_browser()
+
+    def _close_browser(self) -> None:
+        for profile in list(self._contexts):
+            self._drop_context(profile)
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+
+    def _shutdown(self) -> None:
+        self._close_browser()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+
+def start_browser_pool(size: Optional[int] = None) -> None:
+    """启动浏览器线程（幂等；浏览器在第一个任务到来时才启动）"""
+    if not _HAS_PLAYWRIGHT:
+        return
+    with _pool_lock:
+        if _workers:
+            return
+        count = max(1, size or BROWSER_POOL_SIZE)
+        for i in range(count):
+            worker = _BrowserWorker(i)
+            _workers.append(worker)
+            worker.start()
+    print(f"[INFO] 已启动 Playwright 浏览器池（{count} 个浏览器）")
+
+
+def close_browser_pool(timeout: float = 10.0) -> None:
+    """关闭所有浏览器（应用关闭时调用），未开始的任务以 BrowserUnavailable 结束"""
+    with _pool_lock:
+        workers = list(_workers)
+        _workers.clear()
+    if not workers:
+        return
+    while True:
+        try:
+            job = _jobs.get_nowait()
+        except queue.Empty:
+            break
+        if job is not None and job.future.set_running_or_notify_cancel():
+            job.future.set_exception(BrowserUnavailable("浏览器池已关闭"))
+    for _ in workers:
+        _jobs.put(None)
+    deadline = time.time() + timeout
+    for worker in workers:
+        worker.join(max(0.0, deadline - time.time()))
+
+
+def _submit(fn: Callable[[Any], Any], profile: str) -> Future:
+    if not _HAS_PLAYWRIGHT:
+        raise BrowserUnavailable("Playwright 未安装")
+    start_browser_pool()
+    job = _PageJob(fn, profile)
+    _jobs.put(job)
+    return job.future
+
+
+def run_page_job(fn: Callable[[Any], Any], *, profile: str, timeout: Optional[float] = None) -> Any:
+    """在池中的浏览器里打开一个新页面执行 fn(page)，返回其结果（阻塞当前线程）
+
+    fn 在浏览器线程中执行，只能使用传入的 page；页面在 fn 返回后自动关闭。
+    """
+    return _submit(fn, profile).result(timeout)
+
+
+async def run_page_job_async(fn: Callable[[Any], Any], *, profile: str, timeout: Optional[float] = None) -> Any:
+    """run_page_job 的异步版本：等待期间不占用事件循环或线程池线程"""
+    future = _submit(fn, profile)
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+
+def get_browser_pool_stats() -> Dict[str, Any]:
+    """浏览器池统计（用于监控）"""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    with _pool_lock:
+        stats["browsers"] = len(_workers)
+        stats["busy"] = sum(1 for w in _workers if w.busy)
+    stats["queued"] = _jobs.qsize()
+    stats["available"] = _HAS_PLAYWRIGHT
+    return stats
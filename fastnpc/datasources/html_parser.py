@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+数据源 HTML 解析层
+
+baike / zhwiki 的全部提取逻辑都基于 BeautifulSoup 的查询接口（select / find / get_text），
+这里只替换底层解析器，不改变提取代码：
+
+- HTML_PARSER=auto（默认）：安装了 lxml 时使用 lxml（C 实现，比纯 Python 的 html.parser 快数倍），
+  否则回退到 html.parser
+- 也可显式指定 lxml / html.parser / html5lib
+- ParsedPages：一次抓取流程内按正文内容缓存解析树，重试、搜索回退、AMP 兜底拿到相同页面时不再重复解析
+
+解析树是可变对象：会 decompose 节点的提取步骤应放在只读步骤之后，或自行重新解析。
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Dict, Optional, Union
+
+from bs4 import BeautifulSoup, Tag
+
+from fastnpc.config import HTML_PARSER
+
+try:
+    import lxml  # noqa: F401
+    _HAS_LXML = True
+except Exception:
+    _HAS_LXML = False
+
+
+Markup = Union[str, bytes]
+
+
+def parser_name(preferred: Optional[str] = None) -> str:
+    """实际使用的 BeautifulSoup 解析器名称"""
+    name = (preferred or HTML_PARSER or "auto").strip().lower()
+    if name == "auto":
+        return "lxml" if _HAS_LXML else "html.parser"
+    if name == "lxml" and not _HAS_LXML:
+        return "html.parser"
+    return name
+
+
+def parse_html(markup: Markup, *, parser: Optional[str] = None) -> BeautifulSoup:
+    """解析 HTML（字符串或原始字节，字节由 BeautifulSoup 自动识别编码）"""
+    return BeautifulSoup(markup, parser_name(parser))
+
+
+def as_soup(markup: Union[Markup, Tag]) -> Tag:
+    """已解析的树原样返回，否则解析（供同时接受 HTML 与解析树的提取函数使用）"""
+    if isinstance(markup, Tag):
+        return markup
+    return parse_html(markup)
+
+
+class ParsedPages:
+    """单次抓取流程内的解析树缓存（按正文内容去重，非线程安全）"""
+
+    def __init__(self, parser: Optional[str] = None):
+        self._parser = parser
+        self._trees: Dict[str, BeautifulSoup] = {}
+        self.parsed = 0
+        self.reused = 0
+
+    def soup(self, content: Markup) -> BeautifulSoup:
+        raw = content.encode("utf-8") if isinstance(content, str) else content
+        key = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        tree = self._trees.get(key)
+        if tree is None:
+            tree = parse_html(content, parser=self._parser)
+            self._trees[key] = tree
+            self.parsed += 1
+        else:
+            self.reused += 1
+        return tree
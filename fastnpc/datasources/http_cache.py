@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+数据源 HTTP 响应磁盘缓存（baike / zhwiki 共用）
+
+每次创建、每次重试、每次同名词查询都会重新下载同样的页面。这里按 URL 缓存 GET 响应：
+
+- 存储：HTTP_CACHE_DIR/responses.sqlite（单文件，多线程/多进程安全），记录状态码、响应头、正文、最终 URL
+- 新鲜度：抓取后 HTTP_CACHE_TTL 秒内直接返回缓存，不访问网络
+- 过期后带 If-None-Match / If-Modified-Since 条件请求，304 时续期并返回缓存正文
+- 容量：总正文大小超过 HTTP_CACHE_MAX_BYTES 时按最近访问时间（LRU）淘汰
+- 离线模式（HTTP_CACHE_OFFLINE）：只读缓存、从不访问网络，未命中时抛 requests.ConnectionError，
+  可用预先录制的缓存目录离线复现抓取流程
+
+cached_get 返回标准的 requests.Response，调用方无需修改解析逻辑。只缓存 2xx 响应。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from fastnpc.config import (
+    HTTP_CACHE_ENABLED,
+    HTTP_CACHE_DIR,
+    HTTP_CACHE_TTL,
+    HTTP_CACHE_MAX_BYTES,
+    HTTP_CACHE_OFFLINE,
+)
+
+
+_DB_FILE = "responses.sqlite"
+# 淘汰时清理到容量上限的该比例，避免每次写入都触发淘汰
+_EVICT_TARGET_RATIO = 0.9
+# 需要保存的响应头（其余丢弃）
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Content-Encoding")
+
+_init_lock = threading.Lock()
+_initialized = False
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += n
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                HTTP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(HTTP_CACHE_DIR / _DB_FILE), timeout=10)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS responses(
+                            key TEXT PRIMARY KEY,
+                            url TEXT NOT NULL,
+                            final_url TEXT NOT NULL,
+                            status INTEGER NOT NULL,
+                            headers TEXT NOT NULL,
+                            body BLOB NOT NULL,
+                            size INTEGER NOT NULL,
+                            etag TEXT,
+                            last_modified TEXT,
+                            fetched_at REAL NOT NULL,
+                            expires_at REAL NOT NULL,
+                            last_access REAL NOT NULL
+                        )"""
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+                    conn.commit()
+                finally:
+                    conn.close()
+                _initialized = True
+    return sqlite3.connect(str(HTTP_CACHE_DIR / _DB_FILE), timeout=10)
+
+
+def _full_url(url: str, params: Optional[Dict[str, Any]]) -> str:
+    if not params:
+        return url
+    return requests.Request('GET', url, params=params).prepare().url or url
+
+
+def _cache_key(full_url: str) -> str:
+    return hashlib.sha256(full_url.encode("utf-8")).hexdigest()
+
+
+def _build_response(row: Dict[str, Any], request_url: str) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = int(row["status"])
+    resp._content = bytes(row["body"])
+    resp.headers = CaseInsensitiveDict(json.loads(row["headers"] or "{}"))
+    resp.url = row["final_url"] or request_url
+    resp.reason = "OK (cached)"
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    return resp
+
+
+def _load(key: str) -> Optional[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            "SELECT status, headers, body, final_url, etag, last_modified, expires_at FROM responses WHERE key=?",
+            (key,),
+        )
+        row = cur.fetchone()
+        if not row:
+            return None
+        conn.execute("UPDATE responses SET last_access=? WHERE key=?", (time.time(), key))
+        conn.commit()
+        return {
+            "status": row[0], "headers": row[1], "body": row[2], "final_url": row[3],
+            "etag": row[4], "last_modified": row[5], "expires_at": row[6],
+        }
+    finally:
+        conn.close()
+
+
+def _touch(key: str, ttl: float) -> None:
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("UPDATE responses SET expires_at=?, last_access=? WHERE key=?", (now + ttl, now, key))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _store(key: str, url: str, resp: requests.Response, ttl: float) -> None:
+    headers = {k: resp.headers[k] for k in _KEPT_HEADERS if k in resp.headers}
+    # requests 已解压正文，缓存的是解压后的内容
+    headers.pop("Content-Encoding", None)
+    body = resp.content or b""
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            """INSERT OR REPLACE INTO responses(key, url, final_url, status, headers, body, size, etag, last_modified,
+                                                fetched_at, expires_at, last_access)
+               VALUES(?,?,?,?,?,?,?,?,?,?,?,?)""",
+            (key, url, resp.url or url, resp.status_code, json.dumps(headers), sqlite3.Binary(body), len(body),
+             resp.headers.get("ETag"), resp.headers.get("Last-Modified"), now, now + ttl, now),
+        )
+        conn.commit()
+        _count("stores")
+        _evict(conn)
+    finally:
+        conn.close()
+
+
+def _evict(conn: sqlite3.Connection) -> None:
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= HTTP_CACHE_MAX_BYTES:
+        return
+    target = HTTP_CACHE_MAX_BYTES * _EVICT_TARGET_RATIO
+    removed = 0
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall():
+        if total <= target:
+            break
+        conn.execute("DELETE FROM responses WHERE key=?", (key,))
+        total -= size
+        removed += 1
+    conn.commit()
+    _count("evictions", removed)
+
+
+def cached_get(
+    session: requests.Session,
+    url: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Any = None,
+    allow_redirects: bool = True,
+    ttl: Optional[float] = None,
+    refresh: bool = False,
+    cacheable: Optional[Callable[[requests.Response], bool]] = None,
+    before_network: Optional[Callable[[], None]] = None,
+) -> requests.Response:
+    """带磁盘缓存的 session.get
+
+    Args:
+        ttl: 新鲜期（秒），默认 HTTP_CACHE_TTL
+        refresh: 忽略缓存强制重新下载（例如上次内容解析失败时重试）
+        cacheable: 额外判断响应是否可以缓存（例如排除反爬验证页）
+        before_network: 确实需要访问网络时先调用一次（例如预热 Cookie），命中缓存时不调用
+    """
+    if not HTTP_CACHE_ENABLED:
+        if before_network:
+            before_network()
+        return session.get(url, params=params, timeout=timeout, allow_redirects=allow_redirects)
+
+    ttl = HTTP_CACHE_TTL if ttl is None else ttl
+    full_url = _full_url(url, params)
+    key = _cache_key(full_url)
+    cached: Optional[Dict[str, Any]] = None
+    try:
+        cached = _load(key)
+    except Exception as e:
+        _count("errors")
+        print(f"[WARN] 读取 HTTP 缓存失败: {e}")
+
+    if HTTP_CACHE_OFFLINE:
+        if cached is None:
+            _count("misses")
+            raise requests.ConnectionError(f"HTTP 缓存离线模式未命中: {full_url}")
+        _count("hits")
+        return _build_response(cached, full_url)
+
+    if cached is not None and not refresh and cached["expires_at"] > time.time():
+        _count("hits")
+        return _build_response(cached, full_url)
+
+    # 过期：带验证器做条件请求
+    conditional: Dict[str, str] = {}
+    if cached is not None and not refresh:
+        if cached.get("etag"):
+            conditional["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            conditional["If-Modified-Since"] = cached["last_modified"]
+
+    if before_network:
+        before_network()
+    resp = session.get(
+        full_url, timeout=timeout, allow_redirects=allow_redirects, headers=conditional or None,
+    )
+    if resp.status_code == 304 and cached is not None:
+        _count("revalidated")
+        try:
+            _touch(key, ttl)
+        except Exception:
+            _count("errors")
+        return _build_response(cached, full_url)
+
+    _count("misses")
+    if 200 <= resp.status_code < 300 and (cacheable is None or cacheable(resp)):
+        try:
+            _store(key, full_url, resp, ttl)
+        except Exception as e:
+            _count("errors")
+            print(f"[WARN] 写入 HTTP 缓存失败: {e}")
+    return resp
+
+
+def invalidate(url: str, params: Optional[Dict[str, Any]] = None) -> None:
+    """删除某个 URL 的缓存"""
+    if not HTTP_CACHE_ENABLED:
+        return
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM responses WHERE key=?", (_cache_key(_full_url(url, params)),))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_http_cache_stats() -> Dict[str, Any]:
+    """缓存统计：本进程的命中情况，以及磁盘上的条目数与大小"""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    stats["enabled"] = HTTP_CACHE_ENABLED
+    stats["offline"] = HTTP_CACHE_OFFLINE
+    stats["max_bytes"] = HTTP_CACHE_MAX_BYTES
+    if HTTP_CACHE_ENABLED:
+        try:
+            conn = _connect()
+            try:
+                entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            finally:
+                conn.close()
+            stats["entries"] = int(entries)
+            stats["bytes"] = int(size)
+        except Exception as e:
+            stats["error"] = str(e)
+    return stats
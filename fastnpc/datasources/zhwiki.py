@@ -1,12 +1,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import asyncio
 import requests
-from bs4 import BeautifulSoup
+from bs4 import Tag
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional, Tuple, Union
+import threading
 import time
 import re
 
+from fastnpc.datasources.http_cache import cached_get
+from fastnpc.datasources.html_parser import as_soup, parse_html
+from fastnpc.datasources.async_http import fetch_async
+
 
 API_URL = "https://zh.wikipedia.org/w/api.php"
 VARIANT = "zh-hans"
@@ -16,14 +23,53 @@ HEADERS = {
 }
 
 
-def _api_get(params: Dict[str, Any]) -> Dict[str, Any]:
-    resp = requests.get(API_URL, params=params, headers=HEADERS, timeout=15)
+# 进程内共享的 keep-alive 会话（requests.Session 的并发 GET 是安全的）
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+# 无法在本地切分章节时，按章节回退请求的并发数
+_SECTION_FETCH_WORKERS = 8
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                sess = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=_SECTION_FETCH_WORKERS)
+                sess.mount('https://', adapter)
+                sess.mount('http://', adapter)
+                sess.headers.update(HEADERS)
+                _session = sess
+    return _session
+
+
+def _api_cacheable(resp: requests.Response) -> bool:
+    """API 错误响应（页面不存在等）不缓存"""
+    return b'"error"' not in resp.content[:200]
+
+
+def _api_get(params: Dict[str, Any], *, refresh: bool = False) -> Dict[str, Any]:
+    resp = cached_get(_get_session(), API_URL, params=params, timeout=15, refresh=refresh, cacheable=_api_cacheable)
     resp.raise_for_status()
     return resp.json()
 
 
-def _search_candidates(keyword: str, limit: int = 50) -> List[Dict[str, Any]]:
-    data = _api_get({'action': 'query', 'format': 'json', 'list': 'search', 'srsearch': keyword, 'srlimit': max(1, min(200, limit)), 'srprop': 'snippet|titlesnippet'})
+async def _api_get_async(params: Dict[str, Any]) -> Dict[str, Any]:
+    resp = await fetch_async(API_URL, params=params, headers=HEADERS, timeout=15)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _search_params(keyword: str, limit: int) -> Dict[str, Any]:
+    return {'action': 'query', 'format': 'json', 'list': 'search', 'srsearch': keyword, 'srlimit': max(1, min(200, limit)), 'srprop': 'snippet|titlesnippet'}
+
+
+def _search_candidates(keyword: str, limit: int = 50, *, refresh: bool = False) -> List[Dict[str, Any]]:
+    return _search_results(_api_get(_search_params(keyword, limit), refresh=refresh))
+
+
+def _search_results(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     hits = data.get('query', {}).get('search', [])
     results: List[Dict[str, Any]] = []
     for h in hits:
@@ -34,8 +80,15 @@ def _search_candidates(keyword: str, limit: int = 50) -> List[Dict[str, Any]]:
     return results
 
 
+def _pageprops_params(title: str) -> Dict[str, Any]:
+    return {'action': 'query', 'format': 'json', 'prop': 'pageprops', 'ppprop': 'disambiguation', 'titles': title}
+
+
 def _is_disambiguation(title: str) -> bool:
-    data = _api_get({'action': 'query', 'format': 'json', 'prop': 'pageprops', 'ppprop': 'disambiguation', 'titles': title})
+    return _is_disambiguation_props(_api_get(_pageprops_params(title)))
+
+
+def _is_disambiguation_props(data: Dict[str, Any]) -> bool:
     pages = data.get('query', {}).get('pages', {})
     for _, p in pages.items():
         if 'pageprops' in p and 'disambiguation' in p.get('pageprops', {}):
@@ -43,8 +96,15 @@ def _is_disambiguation(title: str) -> bool:
     return False
 
 
-def _disambig_links(title: str, limit: int = 200) -> List[Dict[str, Any]]:
-    data = _api_get({'action': 'parse', 'format': 'json', 'page': title, 'prop': 'links', 'variant': VARIANT})
+def _links_params(title: str) -> Dict[str, Any]:
+    return {'action': 'parse', 'format': 'json', 'page': title, 'prop': 'links', 'variant': VARIANT}
+
+
+def _disambig_links(title: str, limit: int = 200, *, refresh: bool = False) -> List[Dict[str, Any]]:
+    return _links_results(_api_get(_links_params(title), refresh=refresh), limit)
+
+
+def _links_results(data: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
     links = data.get('parse', {}).get('links', [])
     results: List[Dict[str, Any]] = []
     for l in links:
@@ -68,14 +128,8 @@ def get_polysemant_options(keyword: str, limit: int = 80, *, return_route: bool
             first = results[0]
             t = first.get('title') or ''
             if t and _is_disambiguation(t):
-                more = _disambig_links(t, limit=200)
                 # 追加，但去重
-                seen = { (r.get('title') or '') for r in results }
-                for m in more:
-                    tt = m.get('title') or ''
-                    if tt and tt not in seen:
-                        results.append(m)
-                        seen.add(tt)
+                _append_unique(results, _disambig_links(t, limit=200))
                 route = "disambig_links"
     except Exception:
         pass
@@ -83,6 +137,44 @@ def get_polysemant_options(keyword: str, limit: int = 80, *, return_route: bool
     return (results, route) if return_route else results
 
 
+def _append_unique(results: List[Dict[str, Any]], more: List[Dict[str, Any]]) -> None:
+    seen = {(r.get('title') or '') for r in results}
+    for m in more:
+        tt = m.get('title') or ''
+        if tt and tt not in seen:
+            results.append(m)
+            seen.add(tt)
+
+
+async def lookup_polysemant_async(keyword: str, limit: int = 80) -> Dict[str, Any]:
+    """get_polysemant_options 的异步版本（供 /api/zhwiki/polysemant 使用），返回 {"items", "route"}
+
+    首选候选通常就是关键词本身：搜索与关键词页面的消歧义检查并发发出，命中时省去一次往返。
+    """
+    search, own_props = await asyncio.gather(
+        _api_get_async(_search_params(keyword, limit)),
+        _api_get_async(_pageprops_params(keyword)),
+        return_exceptions=True,
+    )
+    if isinstance(search, BaseException):
+        raise search
+    results = _search_results(search)
+    route = "search"
+    try:
+        first = (results[0].get('title') or '') if results else ''
+        if first:
+            if first == keyword and not isinstance(own_props, BaseException):
+                is_disambig = _is_disambiguation_props(own_props)
+            else:
+                is_disambig = _is_disambiguation_props(await _api_get_async(_pageprops_params(first)))
+            if is_disambig:
+                _append_unique(results, _links_results(await _api_get_async(_links_params(first)), 200))
+                route = "disambig_links"
+    except Exception:
+        pass
+    return {'items': results[:max(1, min(200, limit))], 'route': route}
+
+
 def _parse_page_html(title: str, section: Optional[str] = None) -> str:
     params = {'action': 'parse', 'format': 'json', 'page': title, 'prop': 'text', 'formatversion': 2, 'variant': VARIANT}
     if section is not None:
@@ -92,8 +184,8 @@ def _parse_page_html(title: str, section: Optional[str] = None) -> str:
     return html or ''
 
 
-def _html_to_text(html: str) -> str:
-    soup = BeautifulSoup(html, 'html.parser')
+def _html_to_text(html: Union[str, Tag]) -> str:
+    soup = as_soup(html)
     for sup in soup.select('sup.reference, sup[role="note"]'):
         sup.decompose()
     text = soup.get_text("\n", strip=True)
@@ -116,8 +208,135 @@ def _parse_sections(title: str) -> List[Dict[str, Any]]:
     return catalog
 
 
-def _parse_infobox_from_html(html: str) -> Dict[str, str]:
-    soup = BeautifulSoup(html, 'html.parser')
+def _parse_page(title: str, *, refresh: bool = False) -> Dict[str, Any]:
+    """一次请求取回整页 HTML、章节目录与页面属性（消歧义标记），自动跟随重定向"""
+    data = _api_get({
+        'action': 'parse', 'format': 'json', 'page': title, 'prop': 'text|sections|properties',
+        'formatversion': 2, 'variant': VARIANT, 'redirects': 1,
+    }, refresh=refresh)
+    return data.get('parse') or {}
+
+
+def _catalog_from_parse(parsed: Dict[str, Any]) -> List[Dict[str, Any]]:
+    catalog = []
+    for s in parsed.get('sections') or []:
+        catalog.append({'index': s.get('index'), 'title': s.get('line', ''), 'anchor': s.get('anchor', ''), 'level': int(s.get('toclevel', 2))})
+    return catalog
+
+
+def _is_disambiguation_parse(parsed: Dict[str, Any]) -> bool:
+    props = parsed.get('properties') or {}
+    if isinstance(props, list):
+        # formatversion=1 的格式：[{'name': ..., '*': ...}]
+        return any(p.get('name') == 'disambiguation' for p in props if isinstance(p, dict))
+    return 'disambiguation' in props
+
+
+def _heading_of(node) -> Optional[Any]:
+    """返回章节标题元素：旧版 <h2><span class="mw-headline">，新版 <div class="mw-heading"><h2>"""
+    name = getattr(node, 'name', None)
+    if name and re.fullmatch(r'h[1-6]', name):
+        return node
+    if name == 'div' and 'mw-heading' in (node.get('class') or []):
+        return node.find(re.compile(r'^h[1-6]$'))
+    return None
+
+
+def _nodes_to_text(nodes: List[Any]) -> str:
+    parts = []
+    for node in nodes:
+        if not isinstance(node, Tag):
+            t = str(node).strip()
+            if t:
+                parts.append(t)
+            continue
+        for sup in node.select('sup.reference, sup[role="note"]'):
+            sup.decompose()
+        t = node.get_text("\n", strip=True)
+        if t:
+            parts.append(t)
+    text = "\n".join(parts)
+    text = re.sub(r'\n{2,}', '\n', text)
+    return text.strip()
+
+
+def _split_sections_from_html(html: Union[str, Tag], catalog: List[Dict[str, Any]]) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+    """按标题边界把整页 HTML 切分为导言与各章节正文
+
+    每个章节只包含到下一个标题（任意级别）为止的内容，子章节单独成段，不再重复包含。
+    页面结构无法识别（找不到目录中的标题）时返回 None，由调用方回退到按章节请求。
+    传入解析树时会移除其中的编辑链接、目录、信息框等节点。
+    """
+    soup = as_soup(html)
+    # lxml 会补全 <html><body> 外层
+    root = soup.select_one('div.mw-parser-output') or soup.find('body') or soup
+    for el in root.select('span.mw-editsection, style, script, #toc, .toc'):
+        el.decompose()
+
+    intro_nodes: List[Any] = []
+    buckets: List[Tuple[str, str, List[Any]]] = []  # (anchor, 标题, 节点)
+    for node in root.children:
+        heading = _heading_of(node)
+        if heading is not None:
+            headline = heading.select_one('span.mw-headline')
+            anchor = (headline.get('id') if headline else None) or heading.get('id') or ''
+            buckets.append((anchor, heading.get_text(' ', strip=True), []))
+        elif buckets:
+            buckets[-1][2].append(node)
+        else:
+            intro_nodes.append(node)
+
+    if catalog and not buckets:
+        return None
+    # 导言不含信息框（信息框另行解析为键值）
+    intro_nodes = [n for n in intro_nodes if not (getattr(n, 'name', None) == 'table' and 'infobox' in (n.get('class') or []))]
+    for node in intro_nodes:
+        if isinstance(node, Tag):
+            for box in node.select('table.infobox'):
+                box.decompose()
+    intro = _nodes_to_text(intro_nodes)
+
+    by_anchor = {anchor: (title, nodes) for anchor, title, nodes in buckets if anchor}
+    by_title = {title: (title, nodes) for _, title, nodes in buckets}
+    sections: List[Dict[str, Any]] = []
+    if catalog:
+        matched = 0
+        for item in catalog:
+            found = by_anchor.get(item.get('anchor') or '') or by_title.get(item.get('title') or '')
+            if found is None:
+                continue
+            matched += 1
+            text = _nodes_to_text(found[1])
+            if text:
+                sections.append({'title': item.get('title', ''), 'content': [text]})
+        if not matched:
+            return None
+    else:
+        for _, title, nodes in buckets:
+            text = _nodes_to_text(nodes)
+            if text:
+                sections.append({'title': title, 'content': [text]})
+    return intro, sections
+
+
+def _fetch_sections_concurrently(title: str, catalog: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """回退路径：按章节请求，复用会话并发执行，结果保持目录顺序"""
+    def fetch(item: Dict[str, Any]) -> str:
+        try:
+            return _html_to_text(_parse_page_html(title, section=item.get('index')))
+        except Exception:
+            return ''
+
+    with ThreadPoolExecutor(max_workers=_SECTION_FETCH_WORKERS) as executor:
+        texts = list(executor.map(fetch, catalog))
+    return [
+        {'title': item.get('title', ''), 'content': [text]}
+        for item, text in zip(catalog, texts) if text
+    ]
+
+
+def _parse_infobox_from_html(html: Union[str, Tag]) -> Dict[str, str]:
+    soup = as_soup(html)
     infobox: Dict[str, str] = {}
     table = soup.select_one('table.infobox')
     if not table:
@@ -133,8 +352,8 @@ def _parse_infobox_from_html(html: str) -> Dict[str, str]:
     return infobox
 
 
-def _parse_references_from_html(html: str) -> List[Dict[str, str]]:
-    soup = BeautifulSoup(html, 'html.parser')
+def _parse_references_from_html(html: Union[str, Tag]) -> List[Dict[str, str]]:
+    soup = as_soup(html)
     refs: List[Dict[str, str]] = []
     for li in soup.select('ol.references li, div.references li'):
         txt = li.get_text(' ', strip=True)
@@ -157,38 +376,58 @@ def _choose(options: List[Dict[str, Any]], *, choice_index: Optional[int], filte
     return options[0]
 
 
-def _get_full_once(keyword: str, *, choice_index: Optional[int] = None, filter_text: Optional[str] = None) -> Dict[str, Any]:
-    # 1) 搜索候选并选择
+def _get_full_once(keyword: str, *, choice_index: Optional[int] = None, filter_text: Optional[str] = None, refresh: bool = False) -> Dict[str, Any]:
+    # 1) 搜索候选，同时预取以关键词为标题的页面（多数情况下首选候选就是它，可省去一次往返）
     title = keyword
+    parsed: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        cand_future = executor.submit(_search_candidates, keyword, 80, refresh=refresh)
+        page_future = executor.submit(_parse_page, keyword, refresh=refresh)
+        try:
+            cand = cand_future.result()
+            chosen = _choose(cand, choice_index=choice_index, filter_text=filter_text) if cand else None
+            if chosen:
+                title = chosen.get('title') or keyword
+        except Exception:
+            pass
+        try:
+            prefetched = page_future.result()
+        except Exception:
+            prefetched = {}
+    if prefetched and title in (keyword, prefetched.get('title')):
+        parsed = prefetched
+        title = prefetched.get('title') or title
+
     try:
-        cand = _search_candidates(keyword, limit=80)
-        chosen = _choose(cand, choice_index=choice_index, filter_text=filter_text) if cand else None
-        if chosen:
-            title = chosen.get('title') or keyword
+        if not parsed:
+            parsed = _parse_page(title, refresh=refresh)
         # 2) 若为消歧义页，展开二级候选
-        if _is_disambiguation(title):
-            sub = _disambig_links(title, limit=200)
+        if _is_disambiguation_parse(parsed):
+            sub = _disambig_links(parsed.get('title') or title, limit=200, refresh=refresh)
             chosen2 = _choose(sub, choice_index=choice_index, filter_text=filter_text) if sub else None
             if chosen2:
                 title = chosen2.get('title') or title
+                parsed = _parse_page(title, refresh=refresh)
     except Exception:
         pass
-
-    summary = _get_extract_intro(title)
-    full_html = _parse_page_html(title)
-    infobox = _parse_infobox_from_html(full_html)
-    references = _parse_references_from_html(full_html)
-    catalog = _parse_sections(title)
-    sections: List[Dict[str, Any]] = []
-    if catalog:
-        for item in catalog:
-            idx = item.get('index')
-            html = _parse_page_html(title, section=idx)
-            text = _html_to_text(html)
-            if text:
-                sections.append({'title': item.get('title', ''), 'content': [text]})
+    if not parsed:
+        parsed = _parse_page(title, refresh=refresh)
+    title = parsed.get('title') or title
+
+    # 3) 导言、信息框、参考文献与各章节均从整页 HTML 本地切分（只解析一次；切分会修改解析树，放在只读提取之后）
+    page = parse_html(parsed.get('text') or '')
+    catalog = _catalog_from_parse(parsed)
+    infobox = _parse_infobox_from_html(page)
+    references = _parse_references_from_html(page)
+    split = _split_sections_from_html(page, catalog)
+    if split is not None:
+        summary, sections = split
     else:
-        text = _html_to_text(full_html)
+        print(f"[WARN] zhwiki 页面结构无法本地切分，按章节请求: {title}")
+        summary = _get_extract_intro(title)
+        sections = _fetch_sections_concurrently(title, catalog)
+    if not catalog and not sections:
+        text = _html_to_text(page)
         if text:
             sections.append({'title': title, 'content': [text]})
 
@@ -217,7 +456,8 @@ def get_full(keyword: str, retries: int = 5, min_sections: int = 0, min_chars: i
     last: Optional[Dict[str, Any]] = None
     for attempt in range(max(1, retries)):
         try:
-            data = _get_full_once(keyword, choice_index=choice_index, filter_text=filter_text)
+            # 重试时跳过缓存，避免反复拿到同一份不完整的结果
+            data = _get_full_once(keyword, choice_index=choice_index, filter_text=filter_text, refresh=attempt > 0)
             last = data
             ok = False
             if min_chars and _sections_char_count(data) >= max(0, min_chars):
@@ -5,24 +5,248 @@ import os
 import json
 from typing import List, Dict, Any, Optional
 
+import asyncio
+import threading
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+import httpx
 from openai import OpenAI, AsyncOpenAI
-from fastnpc.config import OPENROUTER_API_KEY
+from fastnpc.config import (
+    OPENROUTER_API_KEY,
+    OPENROUTER_BASE_URL,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_CONNECT_TIMEOUT,
+    LLM_REQUEST_TIMEOUT,
+    LLM_HTTP2,
+    LLM_BACKGROUND_MAX_CONCURRENCY,
+)
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    _HAS_H2 = True
+except ImportError:
+    _HAS_H2 = False
+
+
+# ========== 客户端复用 ==========
+# 每次调用都新建客户端会导致每轮对话、每次中控判断、每个结构化类别都重新做
+# TCP/TLS 握手。这里按进程复用同步客户端，按事件循环复用异步客户端
+# （httpx.AsyncClient 的连接绑定到创建它的事件循环）。
+
+_sync_client: Optional[OpenAI] = None
+_sync_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+_async_lock = threading.Lock()
+
+
+def _http_options() -> Dict[str, Any]:
+    """httpx 连接池与超时参数"""
+    return {
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        "http2": LLM_HTTP2 and _HAS_H2,
+    }
 
 
 def _client() -> Optional[OpenAI]:
-    """同步客户端（向后兼容）"""
+    """同步客户端（进程内复用）"""
+    global _sync_client
     api_key = OPENROUTER_API_KEY
     if not api_key:
         return None
-    return OpenAI(base_url="https://openrouter.ai/api/v1", api_key=api_key)
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                _sync_client = OpenAI(
+                    base_url=OPENROUTER_BASE_URL,
+                    api_key=api_key,
+                    http_client=httpx.Client(**_http_options()),
+                )
+    return _sync_client
 
 
 def _async_client() -> Optional[AsyncOpenAI]:
-    """异步客户端（新增）"""
+    """异步客户端（每个事件循环复用一个）"""
     api_key = OPENROUTER_API_KEY
     if not api_key:
         return None
-    return AsyncOpenAI(base_url="https://openrouter.ai/api/v1", api_key=api_key)
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        with _async_lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                client = AsyncOpenAI(
+                    base_url=OPENROUTER_BASE_URL,
+                    api_key=api_key,
+                    http_client=httpx.AsyncClient(**_http_options()),
+                )
+                _async_clients[loop] = client
+    return client
+
+
+async def close_async_openrouter_client() -> None:
+    """关闭当前事件循环的异步客户端（事件循环结束前调用）"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    with _async_lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.close()
+
+
+def close_openrouter_clients() -> None:
+    """关闭同步客户端（应用关闭时调用）"""
+    global _sync_client
+    with _sync_lock:
+        client, _sync_client = _sync_client, None
+    if client is not None:
+        client.close()
+
+
+# ========== 优先级通道 ==========
+# 角色创建等后台任务在 background 通道中调用 LLM，进程内最多 LLM_BACKGROUND_MAX_CONCURRENCY
+# 个并发请求；聊天、中控等交互请求（默认 interactive 通道）不受此限制，
+# 后台任务突发时不会占满 LLM 配额。通道通过 contextvar 传递，asyncio.gather 创建的子任务自动继承。
+
+LANE_INTERACTIVE = "interactive"
+LANE_BACKGROUND = "background"
+
+_lane: ContextVar[str] = ContextVar("llm_lane", default=LANE_INTERACTIVE)
+
+
+class _SlotWaiter:
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+
+def _resolve_waiter(future: "asyncio.Future") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _FifoSlots:
+    """跨线程、跨事件循环共享的 FIFO 名额
+
+    后台通道的调用方既有创建流程的工作线程，也有各个事件循环中的异步任务，不能用 asyncio.Semaphore。
+    同步调用在 threading.Event 上阻塞，异步调用等待本事件循环的 Future（不轮询）；
+    release 直接把名额交给最早的等待者，有人排队时新请求不会插队。
+    """
+
+    def __init__(self, size: int):
+        self._lock = threading.Lock()
+        self._free = size
+        self._waiters: deque = deque()
+
+    def _try_acquire(self) -> bool:
+        """调用方需持有 self._lock"""
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return True
+        return False
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = _SlotWaiter(event=threading.Event())
+            self._waiters.append(waiter)
+        waiter.event.wait()
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = _SlotWaiter(loop=loop, future=loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except BaseException:
+            # 取消时若名额已经交给本任务，转交给下一个等待者
+            with self._lock:
+                if waiter.granted:
+                    self._release_locked()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self._release_locked()
+
+    def _release_locked(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            if waiter.event is not None:
+                waiter.event.set()
+                return
+            try:
+                waiter.loop.call_soon_threadsafe(_resolve_waiter, waiter.future)
+                return
+            except RuntimeError:
+                # 等待者所在的事件循环已关闭
+                continue
+        self._free += 1
+
+
+_background_slots = _FifoSlots(max(1, LLM_BACKGROUND_MAX_CONCURRENCY))
+
+
+@contextmanager
+def llm_lane(lane: str):
+    """在当前上下文（线程或异步任务）内指定 LLM 调用通道"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+@contextmanager
+def _lane_slot():
+    if _lane.get() != LANE_BACKGROUND:
+        yield
+        return
+    _background_slots.acquire()
+    try:
+        yield
+    finally:
+        _background_slots.release()
+
+
+@asynccontextmanager
+async def _lane_slot_async():
+    if _lane.get() != LANE_BACKGROUND:
+        yield
+        return
+    await _background_slots.acquire_async()
+    try:
+        yield
+    finally:
+        _background_slots.release()
+
+
+def _optional_params(**params: Any) -> Dict[str, Any]:
+    """只传递已设置的可选参数（未设置时保持接口默认行为）"""
+    return {k: v for k, v in params.items() if v is not None}
 
 
 def get_openrouter_completion(
@@ -31,33 +255,37 @@ def get_openrouter_completion(
     *,
     stream: bool = False,
     response_format: Optional[Dict[str, Any]] = None,
+    max_tokens: Optional[int] = None,
 ) -> str:
-    """常规补全；支持可选 stream 与 response_format 直传。"""
+    """常规补全；支持可选 stream、response_format 与 max_tokens 直传。"""
     client = _client()
     if client is None:
         return "错误: 环境变量 OPENROUTER_API_KEY 未设置。"
+    extra = _optional_params(max_tokens=max_tokens)
     try:
-        if stream:
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                stream=True,
-                response_format=response_format,
-            )
-            chunks: List[str] = []
-            for ev in resp:  # type: ignore
-                try:
-                    delta = ev.choices[0].delta.content or ""  # type: ignore
-                except Exception:
-                    delta = ""
-                if delta:
-                    chunks.append(delta)
-            return "".join(chunks)
-        else:
-            completion = client.chat.completions.create(
-                model=model, messages=messages, response_format=response_format
-            )
-            return completion.choices[0].message.content  # type: ignore
+        with _lane_slot():
+            if stream:
+                resp = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    response_format=response_format,
+                    **extra,
+                )
+                chunks: List[str] = []
+                for ev in resp:  # type: ignore
+                    try:
+                        delta = ev.choices[0].delta.content or ""  # type: ignore
+                    except Exception:
+                        delta = ""
+                    if delta:
+                        chunks.append(delta)
+                return "".join(chunks)
+            else:
+                completion = client.chat.completions.create(
+                    model=model, messages=messages, response_format=response_format, **extra
+                )
+                return completion.choices[0].message.content  # type: ignore
     except Exception as e:
         return f"调用API时发生错误: {e}"
 
@@ -139,36 +367,40 @@ async def get_openrouter_completion_async(
     *,
     stream: bool = False,
     response_format: Optional[Dict[str, Any]] = None,
+    max_tokens: Optional[int] = None,
 ) -> str:
-    """异步常规补全；支持可选 stream 与 response_format 直传。
+    """异步常规补全；支持可选 stream、response_format 与 max_tokens 直传。
     
     不阻塞Worker，允许多个请求并发处理。
     """
     client = _async_client()
     if client is None:
         return "错误: 环境变量 OPENROUTER_API_KEY 未设置。"
+    extra = _optional_params(max_tokens=max_tokens)
     try:
-        if stream:
-            resp = await client.chat.completions.create(
-                model=model,
-                messages=messages,
-                stream=True,
-                response_format=response_format,
-            )
-            chunks: List[str] = []
-            async for ev in resp:  # type: ignore
-                try:
-                    delta = ev.choices[0].delta.content or ""  # type: ignore
-                except Exception:
-                    delta = ""
-                if delta:
-                    chunks.append(delta)
-            return "".join(chunks)
-        else:
-            completion = await client.chat.completions.create(
-                model=model, messages=messages, response_format=response_format
-            )
-            return completion.choices[0].message.content  # type: ignore
+        async with _lane_slot_async():
+            if stream:
+                resp = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    response_format=response_format,
+                    **extra,
+                )
+                chunks: List[str] = []
+                async for ev in resp:  # type: ignore
+                    try:
+                        delta = ev.choices[0].delta.content or ""  # type: ignore
+                    except Exception:
+                        delta = ""
+                    if delta:
+                        chunks.append(delta)
+                return "".join(chunks)
+            else:
+                completion = await client.chat.completions.create(
+                    model=model, messages=messages, response_format=response_format, **extra
+                )
+                return completion.choices[0].message.content  # type: ignore
     except Exception as e:
         return f"调用API时发生错误: {e}"
 
@@ -223,6 +455,7 @@ async def stream_openrouter_text_async(
     model: str = "z-ai/glm-4-32b",
     *,
     response_format: Optional[Dict[str, Any]] = None,
+    max_tokens: Optional[int] = None,
 ):
     """异步生成器：逐块产出增量文本。
     
@@ -234,7 +467,8 @@ async def stream_openrouter_text_async(
         return
     try:
         resp = await client.chat.completions.create(
-            model=model, messages=messages, stream=True, response_format=response_format
+            model=model, messages=messages, stream=True, response_format=response_format,
+            **_optional_params(max_tokens=max_tokens)
         )
         async for ev in resp:  # type: ignore
             try:
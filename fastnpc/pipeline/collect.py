@@ -36,6 +36,11 @@ def _strip_trailing_numeric_suffix(name: str) -> str:
         return name
 
 
+def collect_keyword(role: str) -> str:
+    """角色名对应的实际抓取关键词（规范化并去掉时间戳后缀）"""
+    return _strip_trailing_numeric_suffix(normalize_role_name(role))
+
+
 def collect(role: str, source: str, *, retries: int = 5, min_sections: int = 0, min_chars: int = 500, force_amp: bool = False,
             choice_index: Optional[int] = None, filter_text: Optional[str] = None, chosen_href: Optional[str] = None) -> Tuple[Dict[str, Any], str]:
     """根据数据源抓取百科内容，返回 (data, temp_file_path) 元组。
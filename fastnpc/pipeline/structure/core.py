@@ -5,15 +5,113 @@
 from __future__ import annotations
 
 import json
+import asyncio
 import os
 import re
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from fastnpc.config import MAX_CONCURRENCY
+from fastnpc.config import (
+    MAX_CONCURRENCY,
+    STRUCTURE_SECTION_ROUTING,
+    STRUCTURE_CHUNK_CHARS,
+    STRUCTURE_CHUNK_CONCURRENCY,
+)
 from .io_utils import read_text, try_load_json
-from .processors import ensure_string_source, json_to_markdown
-from .prompts import _category_prompts, _call_category_llm, _call_category_llm_async, _generate_persona_brief
+from .processors import ensure_string_source, json_to_markdown, chunk_text, merge_chunk_results
+from .prompts import (
+    MAX_FACTS_CHARS,
+    _category_prompts,
+    _call_category_llm,
+    _call_category_llm_async,
+    _generate_persona_brief,
+)
+from .routing import route_sections, route_sections_chunked
+
+
+def _category_facts(data: Any, categories: list, markdown_text: str) -> Dict[str, str]:
+    """每个类别发送的资料：开启章节路由时按类别挑选相关章节，否则均为整页 Markdown"""
+    if STRUCTURE_SECTION_ROUTING:
+        try:
+            return route_sections(data, categories, markdown_text)
+        except Exception as e:
+            print(f"[WARN] 章节路由失败，使用完整资料: {e}")
+    return {cat: markdown_text for cat in categories}
+
+
+def _plan_chunks(facts: str, persona_name: str, max_chunks: int, force: bool = False) -> List[str]:
+    """把单个类别的资料切分为若干块（不需要分块时返回只含原文的列表）
+
+    资料不超过单次上限时不分块（force=True 即 strategy=mapreduce 时按 STRUCTURE_CHUNK_CHARS 分块）；
+    块数超过 max_chunks 时增大块大小（不超过 MAX_FACTS_CHARS），仍超出则只保留前 max_chunks 块。
+    """
+    chunk_chars = max(1000, min(STRUCTURE_CHUNK_CHARS, MAX_FACTS_CHARS))
+    if len(facts) <= (chunk_chars if force else MAX_FACTS_CHARS):
+        return [facts]
+    chunks = chunk_text(facts, chunk_chars)
+    if len(chunks) > max_chunks:
+        chunk_chars = min(MAX_FACTS_CHARS, max(chunk_chars, len(facts) * 5 // (4 * max_chunks)))
+        chunks = chunk_text(facts, chunk_chars)
+    if len(chunks) > max_chunks:
+        print(f"[WARN] 资料过长，分块数 {len(chunks)} 超过上限 {max_chunks}，只处理前 {max_chunks} 块")
+        chunks = chunks[:max_chunks]
+    if len(chunks) <= 1:
+        return chunks or [facts]
+    # 后续分块缺少标题与概述，补充角色名，避免模型把资料当成其他人物
+    total = len(chunks)
+    return [chunks[0]] + [
+        f"# {persona_name}（资料第 {i + 1}/{total} 部分）\n\n{chunk}" for i, chunk in enumerate(chunks[1:], start=1)
+    ]
+
+
+def _plan_category_facts(
+    data: Any,
+    categories: list,
+    markdown_text: str,
+    persona_name: str,
+    max_chunks: int,
+    strategy: str = "global",
+) -> Dict[str, List[str]]:
+    """每个类别发送的资料分块（只有一块时为单次调用）
+
+    - 整页不超过 MAX_FACTS_CHARS（strategy=mapreduce 时为 STRUCTURE_CHUNK_CHARS）：
+      章节路由在类别预算内挑选章节，每个类别一次调用
+    - 整页更长：开启章节路由时先把章节切成不超过 STRUCTURE_CHUNK_CHARS 的部分，
+      每个部分内按类别路由（route_sections_chunked），跳过与类别无关的部分；
+      未开启路由或资料无法按章节切分时，对整页 Markdown 分块（_plan_chunks）
+    部分数超过 max_chunks 时增大部分大小（不超过 MAX_FACTS_CHARS），仍超出则保留最相关的部分。
+    """
+    force = strategy == "mapreduce"
+    chunk_chars = max(1000, min(STRUCTURE_CHUNK_CHARS, MAX_FACTS_CHARS))
+    if STRUCTURE_SECTION_ROUTING and len(markdown_text) > (chunk_chars if force else MAX_FACTS_CHARS):
+        if len(markdown_text) > chunk_chars * max_chunks:
+            chunk_chars = min(MAX_FACTS_CHARS, max(chunk_chars, len(markdown_text) * 5 // (4 * max_chunks)))
+        try:
+            routed = route_sections_chunked(data, categories, chunk_chars, max_chunks, full_chars=len(markdown_text))
+            if routed is not None:
+                return routed
+        except Exception as e:
+            print(f"[WARN] 分块章节路由失败，使用整页分块: {e}")
+    facts = _category_facts(data, categories, markdown_text)
+    return {cat: _plan_chunks(facts[cat], persona_name, max_chunks, force=force) for cat in categories}
+
+
+async def _call_category_chunked_async(
+    category_name: str,
+    prompt: str,
+    chunks: List[str],
+    semaphore: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    """分块抽取同一类别（并发受 semaphore 限制），按分块顺序合并结果"""
+    async def _one(chunk: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await _call_category_llm_async(category_name, prompt, chunk)
+
+    results = await asyncio.gather(*(_one(chunk) for chunk in chunks), return_exceptions=True)
+    failed = sum(1 for r in results if not isinstance(r, dict) or not r)
+    if failed:
+        print(f"[WARN] {category_name}: {failed}/{len(chunks)} 个分块抽取失败")
+    return merge_chunk_results([r for r in results if isinstance(r, dict)])
 
 
 def run(
@@ -105,13 +203,14 @@ def run(
             pass
 
     prompts = _category_prompts(persona_name)
+    facts = _category_facts(data, list(prompts.keys()), markdown_text)
     results: Dict[str, Any] = {}
     
     # 并发生成九大类，受 MAX_CONCURRENCY 限制
     max_workers = max(1, int(MAX_CONCURRENCY or 4))
     try:
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_map = {executor.submit(_call_category_llm, cat, ptxt, markdown_text): cat for cat, ptxt in prompts.items()}
+            future_map = {executor.submit(_call_category_llm, cat, ptxt, facts[cat]): cat for cat, ptxt in prompts.items()}
             for fut in as_completed(future_map):
                 cat = future_map[fut]
                 try:
@@ -122,7 +221,7 @@ def run(
     except Exception:
         # 发生异常则回退至串行
         for cat, ptxt in prompts.items():
-            js = _call_category_llm(cat, ptxt, markdown_text)
+            js = _call_category_llm(cat, ptxt, facts[cat])
             results[cat] = js if isinstance(js, dict) else {}
 
     # 简介
@@ -201,9 +300,10 @@ async def run_async(
     异步主流程：从原始数据生成结构化角色画像（并行生成9个类别）
     
     性能提升：从串行20-60秒 → 并行3-8秒（5-8倍）
-    """
-    import asyncio
     
+    整页超过单次上限（或 strategy="mapreduce"）时按块并发抽取（见 _plan_category_facts，
+    每个类别最多 max_chunks 块，同时进行的分块调用受 STRUCTURE_CHUNK_CONCURRENCY 限制），再按分块顺序合并。
+    """
     raw_text = read_text(input_path)
     data = try_load_json(input_path)
     source_text = ensure_string_source(data, raw_text)
@@ -257,12 +357,19 @@ async def run_async(
             pass
 
     prompts = _category_prompts(persona_name)
+    plan = _plan_category_facts(data, list(prompts.keys()), markdown_text, persona_name, max_chunks, strategy)
     
     # 异步并行生成九大类（🚀 关键优化：同时调用9个LLM）
+    chunk_semaphore = asyncio.Semaphore(max(1, STRUCTURE_CHUNK_CONCURRENCY))
     tasks = []
     categories = []
     for cat, ptxt in prompts.items():
-        tasks.append(_call_category_llm_async(cat, ptxt, markdown_text))
+        chunks = plan[cat]
+        if len(chunks) > 1:
+            print(f"[INFO] {cat}: 资料 {sum(len(c) for c in chunks)} 字符，分 {len(chunks)} 块抽取")
+            tasks.append(_call_category_chunked_async(cat, ptxt, chunks, chunk_semaphore))
+        else:
+            tasks.append(_call_category_llm_async(cat, ptxt, chunks[0]))
         categories.append(cat)
     
     try:
@@ -281,7 +388,7 @@ async def run_async(
         results = {}
         for cat, ptxt in prompts.items():
             try:
-                js = await _call_category_llm_async(cat, ptxt, markdown_text)
+                js = await _call_category_llm_async(cat, ptxt, plan[cat][0])
                 results[cat] = js if isinstance(js, dict) else {}
             except Exception:
                 results[cat] = {}
@@ -48,6 +48,68 @@ def chunk_text(text: str, max_chars: int = 12000) -> List[str]:
     return chunks
 
 
+# 合并分块结果时，两段都不短于该长度的不同文本视为互补描述，拼接保留
+_MERGE_LONG_TEXT_CHARS = 30
+
+
+def _is_empty_value(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _value_key(value: Any) -> str:
+    try:
+        return json.dumps(value, ensure_ascii=False, sort_keys=True)
+    except Exception:
+        return str(value)
+
+
+def _merge_values(a: Any, b: Any) -> Any:
+    """合并同一字段在两个分块中的抽取值（a 来自靠前的分块）"""
+    if _is_empty_value(a):
+        return b
+    if _is_empty_value(b):
+        return a
+    if isinstance(a, dict) and isinstance(b, dict):
+        merged = dict(a)
+        for k, v in b.items():
+            merged[k] = _merge_values(merged[k], v) if k in merged else v
+        return merged
+    if isinstance(a, list) or isinstance(b, list):
+        items = (a if isinstance(a, list) else [a]) + (b if isinstance(b, list) else [b])
+        seen = set()
+        merged_list = []
+        for item in items:
+            key = _value_key(item)
+            if key not in seen:
+                seen.add(key)
+                merged_list.append(item)
+        return merged_list
+    if isinstance(a, str) and isinstance(b, str):
+        a_s, b_s = a.strip(), b.strip()
+        if b_s in a_s:
+            return a
+        if a_s in b_s:
+            return b
+        if len(a_s) >= _MERGE_LONG_TEXT_CHARS and len(b_s) >= _MERGE_LONG_TEXT_CHARS:
+            return f"{a_s}\n{b_s}"
+    # 短字段（姓名、年龄等）冲突时以靠前的分块为准（首块包含概述与信息框）
+    return a
+
+
+def merge_chunk_results(results: List[Any]) -> Dict[str, Any]:
+    """按分块顺序合并同一类别的多个抽取结果（结果与调用完成顺序无关）
+
+    - 字典逐键递归合并；列表按出现顺序去重拼接
+    - 文本：相同或互相包含时取较完整的一方，两段较长的不同描述换行拼接，
+      短字段冲突时保留靠前分块的值
+    """
+    merged: Dict[str, Any] = {}
+    for result in results:
+        if isinstance(result, dict) and result:
+            merged = _merge_values(merged, result)
+    return merged
+
+
 def parse_json_from_text(text: str) -> Optional[Any]:
     """从文本中提取并解析 JSON"""
     if not text:
@@ -9,6 +9,7 @@ from typing import Any, Dict, List
 
 from fastnpc.llm.openrouter import get_openrouter_completion, get_openrouter_completion_async
 from .processors import parse_json_from_text
+from .result_cache import make_cache_key, get_cached_result, store_result
 from fastnpc.config import USE_DB_PROMPTS
 from fastnpc.prompt_manager import PromptManager, PromptCategory
 
@@ -144,6 +145,40 @@ def _category_prompts(persona_name: str) -> Dict[str, str]:
     }
 
 
+# 结构化与简介生成使用的模型（同时是结果缓存键的一部分）
+STRUCTURE_MODEL = "z-ai/glm-4-32b"
+
+# 单个类别调用发送的资料上限（字符），避免过长导致拒答或截断
+MAX_FACTS_CHARS = 20000
+
+_DEFAULT_STRUCTURED_SYSTEM_MESSAGE = (
+    "你是严谨的中文信息抽取助手。\n"
+    "任务：仅基于用户给出的'完整事实列表'文本，生成严格 JSON，键为中文且与提示字段完全一致。\n"
+    "若完整角色信息中无相关信息，则依据材料合理推测。"
+)
+
+
+def _truncate_facts(facts_markdown: str) -> str:
+    if isinstance(facts_markdown, str) and len(facts_markdown) > MAX_FACTS_CHARS:
+        return facts_markdown[:MAX_FACTS_CHARS]
+    return facts_markdown
+
+
+def _category_messages(sys_msg: str, prompt: str, facts_markdown: str) -> List[Dict[str, str]]:
+    user_msg = (
+        prompt + "\n\n完整角色信息如下（Markdown）：\n" + facts_markdown
+    )
+    return [
+        {"role": "system", "content": sys_msg},
+        {"role": "user", "content": user_msg},
+    ]
+
+
+def _is_llm_error(text: str) -> bool:
+    """openrouter 封装在调用失败时返回错误文本而不是抛异常"""
+    return text.startswith("调用API时发生错误") or text.startswith("错误:")
+
+
 def _call_category_llm(category_name: str, prompt: str, facts_markdown: str) -> Dict[str, Any]:
     """同步版本（向后兼容）"""
     # 尝试从数据库加载系统消息
@@ -159,27 +194,18 @@ def _call_category_llm(category_name: str, prompt: str, facts_markdown: str) ->
     
     # 降级到硬编码版本
     if not sys_msg:
-        sys_msg = (
-            "你是严谨的中文信息抽取助手。\n"
-            "任务：仅基于用户给出的'完整事实列表'文本，生成严格 JSON，键为中文且与提示字段完全一致。\n"
-            "若完整角色信息中无相关信息，则依据材料合理推测。"
-        )
-    # 截断：限制上下文长度，避免过长导致拒答或截断（2 万字符）
-    try:
-        if isinstance(facts_markdown, str) and len(facts_markdown) > 20000:
-            facts_markdown = facts_markdown[:20000]
-    except Exception:
-        pass
-    user_msg = (
-        prompt + "\n\n完整角色信息如下（Markdown）：\n" + facts_markdown
-    )
+        sys_msg = _DEFAULT_STRUCTURED_SYSTEM_MESSAGE
+    facts_markdown = _truncate_facts(facts_markdown)
+    key = make_cache_key(category_name, sys_msg, prompt, facts_markdown, STRUCTURE_MODEL)
+    cached = get_cached_result(key)
+    if isinstance(cached, dict):
+        return cached
     try:
-        resp = get_openrouter_completion([
-            {"role": "system", "content": sys_msg},
-            {"role": "user", "content": user_msg},
-        ])
+        resp = get_openrouter_completion(_category_messages(sys_msg, prompt, facts_markdown), model=STRUCTURE_MODEL)
         js = parse_json_from_text(str(resp or "")) or {}
         if isinstance(js, dict):
+            if js:
+                store_result(key, js)
             return js
         return {}
     except Exception:
@@ -188,27 +214,19 @@ def _call_category_llm(category_name: str, prompt: str, facts_markdown: str) ->
 
 async def _call_category_llm_async(category_name: str, prompt: str, facts_markdown: str) -> Dict[str, Any]:
     """异步版本（并行生成，不阻塞Worker）"""
-    sys_msg = (
-        "你是严谨的中文信息抽取助手。\n"
-        "任务：仅基于用户给出的'完整事实列表'文本，生成严格 JSON，键为中文且与提示字段完全一致。\n"
-        "若完整角色信息中无相关信息，则依据材料合理推测。"
-    )
-    # 截断：限制上下文长度，避免过长导致拒答或截断（2 万字符）
+    import asyncio
+    sys_msg = _DEFAULT_STRUCTURED_SYSTEM_MESSAGE
+    facts_markdown = _truncate_facts(facts_markdown)
+    key = make_cache_key(category_name, sys_msg, prompt, facts_markdown, STRUCTURE_MODEL)
+    cached = await asyncio.to_thread(get_cached_result, key)
+    if isinstance(cached, dict):
+        return cached
     try:
-        if isinstance(facts_markdown, str) and len(facts_markdown) > 20000:
-            facts_markdown = facts_markdown[:20000]
-    except Exception:
-        pass
-    user_msg = (
-        prompt + "\n\n完整角色信息如下（Markdown）：\n" + facts_markdown
-    )
-    try:
-        resp = await get_openrouter_completion_async([
-            {"role": "system", "content": sys_msg},
-            {"role": "user", "content": user_msg},
-        ])
+        resp = await get_openrouter_completion_async(_category_messages(sys_msg, prompt, facts_markdown), model=STRUCTURE_MODEL)
         js = parse_json_from_text(str(resp or "")) or {}
         if isinstance(js, dict):
+            if js:
+                await asyncio.to_thread(store_result, key, js)
             return js
         return {}
     except Exception:
@@ -250,12 +268,19 @@ def _generate_persona_brief(role_json: Dict[str, Any], persona_name: str, choose
         )
     
     sys_msg = "你是严谨的中文写作助手。"
+    key = make_cache_key("人物简介", sys_msg, user_msg, role_str, STRUCTURE_MODEL)
+    cached = get_cached_result(key)
+    if isinstance(cached, str) and cached:
+        return cached
     try:
         resp = get_openrouter_completion([
             {"role": "system", "content": sys_msg},
             {"role": "user", "content": user_msg},
-        ])
-        return str(resp or "").strip()
+        ], model=STRUCTURE_MODEL)
+        brief = str(resp or "").strip()
+        if brief and not _is_llm_error(brief):
+            store_result(key, brief)
+        return brief
     except Exception:
         return ""
 
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+结构化 LLM 结果缓存
+
+同一个百科/维基页面被不同用户创建、或通过复制角色重新生成时，发送给各类别的
+(系统消息, 类别提示词, 资料文本) 完全相同，结果可以直接复用。缓存持久化在
+structure_results 表中，键为：
+
+- content_hash: 实际发送的资料文本的 SHA-256
+- category:     类别名（人物简介单独一类）
+- prompt_hash:  系统消息 + 渲染后类别提示词 + STRUCTURE_CACHE_VERSION 的 SHA-256
+                （PromptManager.activate_version 切换模板后内容变化，旧结果自然不再命中）
+- model:        调用的模型
+
+只缓存成功解析的结果；读写失败不影响结构化流程。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from fastnpc.config import STRUCTURE_CACHE_ENABLED
+
+
+# 解析/合并逻辑变化导致旧结果不再适用时加一
+STRUCTURE_CACHE_VERSION = 1
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+
+class StructureCacheKey(NamedTuple):
+    content_hash: str
+    category: str
+    prompt_hash: str
+    model: str
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(category: str, sys_msg: str, prompt: str, content: str, model: str) -> StructureCacheKey:
+    prompt_hash = _hash(f"{STRUCTURE_CACHE_VERSION}\x00{sys_msg}\x00{prompt}")
+    return StructureCacheKey(_hash(content), category, prompt_hash, model)
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_cached_result(key: StructureCacheKey) -> Optional[Any]:
+    """查询缓存，未命中返回 None"""
+    if not STRUCTURE_CACHE_ENABLED:
+        return None
+    from fastnpc.api.auth.db_utils import _get_conn, _return_conn
+    conn = _get_conn()
+    try:
+        cur = conn.cursor()
+        where = "content_hash=%s AND category=%s AND prompt_hash=%s AND model=%s"
+        cur.execute(f"SELECT result_json FROM structure_results WHERE {where}", tuple(key))
+        row = cur.fetchone()
+        if not row:
+            conn.commit()
+            _count("misses")
+            return None
+        cur.execute(
+            f"UPDATE structure_results SET hit_count=hit_count+1, last_hit_at=%s WHERE {where}",
+            (int(time.time()),) + tuple(key),
+        )
+        conn.commit()
+        _count("hits")
+        return json.loads(row[0])
+    except Exception as e:
+        conn.rollback()
+        _count("errors")
+        print(f"[WARN] 读取结构化结果缓存失败: {e}")
+        return None
+    finally:
+        _return_conn(conn)
+
+
+def store_result(key: StructureCacheKey, result: Any) -> None:
+    """写入缓存（同键覆盖）"""
+    if not STRUCTURE_CACHE_ENABLED:
+        return
+    from fastnpc.api.auth.db_utils import _get_conn, _return_conn
+    conn = _get_conn()
+    now = int(time.time())
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """INSERT INTO structure_results(content_hash, category, prompt_hash, model, result_json, hit_count, created_at, last_hit_at)
+               VALUES(%s,%s,%s,%s,%s,0,%s,%s)
+               ON CONFLICT(content_hash, category, prompt_hash, model)
+               DO UPDATE SET result_json=excluded.result_json, created_at=excluded.created_at""",
+            tuple(key) + (json.dumps(result, ensure_ascii=False), now, now),
+        )
+        conn.commit()
+        _count("stores")
+    except Exception as e:
+        conn.rollback()
+        _count("errors")
+        print(f"[WARN] 写入结构化结果缓存失败: {e}")
+    finally:
+        _return_conn(conn)
+
+
+def get_structure_cache_stats() -> Dict[str, Any]:
+    """缓存统计：本进程的命中/未命中次数，以及表中的条目数与累计命中数"""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = f"{(stats['hits'] / total * 100) if total else 0:.2f}%"
+    stats["enabled"] = STRUCTURE_CACHE_ENABLED
+    from fastnpc.api.auth.db_utils import _get_conn, _return_conn
+    conn = _get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*), COALESCE(SUM(hit_count), 0) FROM structure_results")
+        row = cur.fetchone()
+        conn.commit()
+        stats["entries"] = int(row[0])
+        stats["total_hits"] = int(row[1])
+    except Exception as e:
+        conn.rollback()
+        stats["entries"] = None
+        stats["error"] = str(e)
+    finally:
+        _return_conn(conn)
+    return stats
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+结构化前的章节路由（本地打分，不调用 LLM）
+
+各类别原本都收到整页 Markdown（常达数万字），而“对话与交互规范”“系统与控制参数”等类别
+只需要其中一小部分。这里把抓取结果切分为单元（概述、信息框、各章节），按类别关键词做
+BM25 打分（章节标题命中额外加权），在字符预算内为每个类别挑选最相关的单元，
+按原文顺序渲染为 Markdown。
+
+- 概述与信息框总是保留（身份、时代等基础事实几乎对所有类别都有用）
+- 来源元数据（数据源、链接、关键词、整页字数）总是保留：“来源”类别预算很小，几乎总被裁剪，
+  而它要抽取的正是这些顶层字段，裁剪后的资料字数也不能代表原始信息量
+- 整页不超过预算时不做裁剪，直接使用完整 Markdown
+- zhwiki 的 catalog 提供章节层级，子章节打分时带上父章节标题
+- 中文按字二元组（bigram）切分，无需分词词典
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 各类别的检索关键词（同时匹配章节标题和正文）
+CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "基础身份信息": ["姓名", "本名", "别名", "字号", "出生", "籍贯", "民族", "国籍", "性别", "年龄", "职业",
+                "身份", "职务", "官职", "外貌", "相貌", "身高", "称号", "头衔", "封号", "人物简介", "简介"],
+    "个性与行为设定": ["性格", "为人", "品格", "个性", "脾气", "性情", "价值观", "信念", "思想", "态度", "情绪",
+                "喜好", "爱好", "嗜好", "厌恶", "动机", "志向", "评价", "轶事", "逸事", "习惯"],
+    "背景故事": ["生平", "经历", "早年", "少年", "青年", "晚年", "家世", "家庭", "出身", "事件", "去世",
+              "逝世", "人际关系", "亲属", "家族", "父亲", "母亲", "妻子", "子女", "朋友", "师从", "秘密", "关系"],
+    "知识与能力": ["成就", "作品", "著作", "技能", "能力", "才能", "专长", "学术", "研究", "武艺", "贡献",
+               "知识", "学问", "擅长", "代表作", "发明", "战绩", "不足", "缺陷"],
+    "对话与交互规范": ["语言", "说话", "口头禅", "名言", "语录", "言论", "语气", "风格", "谈吐", "交往",
+                 "待人", "性格", "评价", "轶事", "逸事"],
+    "任务/功能性信息": ["目标", "志向", "理想", "使命", "任务", "抱负", "计划", "追求", "职责", "动机"],
+    "环境与世界观": ["时代", "背景", "历史", "朝代", "社会", "制度", "世界观", "设定", "地理", "文化",
+                "政治", "组织", "势力", "国家", "宗教"],
+    "系统与控制参数": ["性格", "评价", "争议", "形象"],
+    "来源": ["来源", "参考", "出处"],
+}
+
+# 各类别的字符预算（整页 Markdown 不超过预算时不裁剪）
+CATEGORY_BUDGETS: Dict[str, int] = {
+    "基础身份信息": 6000,
+    "个性与行为设定": 8000,
+    "背景故事": 12000,
+    "知识与能力": 8000,
+    "对话与交互规范": 6000,
+    "任务/功能性信息": 5000,
+    "环境与世界观": 6000,
+    "系统与控制参数": 3000,
+    "来源": 2000,
+}
+DEFAULT_BUDGET = 8000
+
+# BM25 参数
+_K1 = 1.5
+_B = 0.75
+# 章节标题命中的权重倍数
+_TITLE_WEIGHT = 3.0
+
+# 来源元数据单元渲染的顶层字段（json_to_markdown 会渲染这些字段，章节路由不能丢掉）
+_SOURCE_FIELDS: List[Tuple[str, str]] = [("source", "数据源"), ("url", "链接"), ("keyword", "关键词")]
+
+_CJK_RE = re.compile(r"[一-鿿]+")
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文按字二元组（单字词保留单字），英文/数字按词"""
+    tokens: List[str] = []
+    for run in _CJK_RE.findall(text or ""):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(w.lower() for w in _WORD_RE.findall(text or ""))
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：汉字约 1 token/字，其它字符约 4 字符/token"""
+    if not text:
+        return 0
+    cjk = sum(len(run) for run in _CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class _Unit:
+    """路由单元：一个章节（或概述/信息框）"""
+    __slots__ = ("order", "title", "path", "text", "pinned", "tf", "title_tf", "length")
+
+    def __init__(self, order: int, title: str, path: str, text: str, pinned: bool = False):
+        self.order = order
+        self.title = title
+        self.path = path
+        self.text = text
+        self.pinned = pinned
+        self.tf = Counter(tokenize(text))
+        self.title_tf = Counter(tokenize(path))
+        self.length = sum(self.tf.values())
+
+    def render(self) -> str:
+        return f"## {self.title}\n\n{self.text}" if self.title else self.text
+
+
+def _section_text(sec: Dict[str, Any]) -> str:
+    paras = sec.get("paragraphs") or sec.get("paras") or sec.get("content")
+    if isinstance(paras, list):
+        return "\n\n".join(str(p or "").strip() for p in paras if str(p or "").strip())
+    if isinstance(paras, str):
+        return paras.strip()
+    return ""
+
+
+def build_units(data: Any, full_chars: Optional[int] = None) -> Optional[List[_Unit]]:
+    """把 baike/zhwiki 抓取结果切分为路由单元；不是预期结构时返回 None
+
+    full_chars 为整页 Markdown 的字数，写入来源元数据单元（路由后的资料只是整页的一部分）。
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("sections"), list) or not data["sections"]:
+        return None
+    units: List[_Unit] = []
+    title = str(data.get("title") or data.get("keyword") or "").strip()
+    summary = str(data.get("summary") or "").strip()
+    head = (f"# {title}\n\n" if title else "") + (f"## 概述\n\n{summary}" if summary else "")
+    if head.strip():
+        units.append(_Unit(len(units), "", "概述", head.strip(), pinned=True))
+    meta = [(label, str(data.get(key) or "").strip()) for key, label in _SOURCE_FIELDS]
+    if full_chars:
+        meta.append(("原文字数", f"约 {full_chars} 字"))
+    meta_rows = [f"| {label} | {value} |" for label, value in meta if value]
+    if meta_rows:
+        units.append(_Unit(len(units), "来源信息", "来源信息", "\n".join(["| 键 | 值 |", "|---|---|"] + meta_rows), pinned=True))
+    infobox = data.get("infobox")
+    if isinstance(infobox, dict) and infobox:
+        rows = [f"| {k} | {str(v).strip()} |" for k, v in infobox.items() if str(v or "").strip()]
+        if rows:
+            units.append(_Unit(len(units), "基本信息", "基本信息", "\n".join(["| 键 | 值 |", "|---|---|"] + rows), pinned=True))
+
+    # zhwiki：catalog 给出层级，子章节的打分路径带上父章节标题
+    levels: Dict[str, int] = {}
+    for item in data.get("catalog") or []:
+        if isinstance(item, dict) and item.get("title"):
+            levels.setdefault(str(item["title"]).strip(), int(item.get("level") or 2))
+    parents: List[Tuple[int, str]] = []
+    for sec in data["sections"]:
+        if not isinstance(sec, dict):
+            continue
+        sec_title = str(sec.get("title") or "").strip()
+        text = _section_text(sec)
+        if not text:
+            continue
+        level = levels.get(sec_title, 2)
+        while parents and parents[-1][0] >= level:
+            parents.pop()
+        path = " ".join([p for _, p in parents] + [sec_title])
+        parents.append((level, sec_title))
+        units.append(_Unit(len(units), sec_title, path, text))
+    return units
+
+
+def _bm25_scores(units: List[_Unit], query: List[str]) -> List[float]:
+    n = len(units)
+    avg_len = (sum(u.length for u in units) / n) if n else 0.0
+    terms = set(query)
+    df = {t: sum(1 for u in units if t in u.tf or t in u.title_tf) for t in terms}
+    scores = []
+    for u in units:
+        score = 0.0
+        for t in terms:
+            if not df[t]:
+                continue
+            idf = math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+            f = u.tf.get(t, 0)
+            if f:
+                norm = _K1 * (1 - _B + _B * (u.length / avg_len if avg_len else 1.0))
+                score += idf * f * (_K1 + 1) / (f + norm)
+            if u.title_tf.get(t):
+                score += idf * _TITLE_WEIGHT
+        scores.append(score)
+    return scores
+
+
+def _select(units: List[_Unit], scores: List[float], budget: int) -> List[_Unit]:
+    chosen = [u for u in units if u.pinned]
+    used = sum(len(u.render()) + 2 for u in chosen)
+    ranked = sorted(
+        (u for u in units if not u.pinned),
+        key=lambda u: (-scores[u.order], u.order),
+    )
+    for u in ranked:
+        if scores[u.order] <= 0 and used >= budget // 2:
+            # 不相关的章节只用来补足过少的资料（按原文顺序，越靠前越概括）
+            break
+        size = len(u.render()) + 2
+        if used + size <= budget:
+            chosen.append(u)
+            used += size
+        elif used < budget * 0.8:
+            # 高分但过长的章节截取开头部分，填满剩余预算
+            remaining = budget - used - len(u.title) - 8
+            if remaining > 500:
+                chosen.append(_Unit(u.order, u.title, u.path, u.text[:remaining]))
+                used = budget
+    chosen.sort(key=lambda u: u.order)
+    return chosen
+
+
+def route_sections(
+    data: Any,
+    categories: List[str],
+    markdown_text: str,
+    budgets: Optional[Dict[str, int]] = None,
+) -> Dict[str, str]:
+    """为每个类别选出相关资料
+
+    Returns:
+        {类别: 资料 Markdown}；无法切分或整页未超过预算时为完整 markdown_text
+    """
+    budgets = budgets or CATEGORY_BUDGETS
+    units = build_units(data, len(markdown_text))
+    routed: Dict[str, str] = {}
+    for category in categories:
+        budget = budgets.get(category, DEFAULT_BUDGET)
+        if not units or len(markdown_text) <= budget:
+            routed[category] = markdown_text
+            continue
+        query = tokenize(" ".join(CATEGORY_KEYWORDS.get(category, [category])))
+        scores = _bm25_scores(units, query)
+        chosen = _select(units, scores, budget)
+        routed[category] = "\n\n".join(u.render() for u in chosen)
+    return routed
+
+
+def route_sections_chunked(
+    data: Any,
+    categories: List[str],
+    chunk_chars: int,
+    max_chunks: int,
+    budgets: Optional[Dict[str, int]] = None,
+    full_chars: Optional[int] = None,
+) -> Optional[Dict[str, List[str]]]:
+    """整页过长时按部分路由：章节按原文顺序切成不超过 chunk_chars 的若干部分，
+    每个类别在每个部分内按预算挑选章节（概述、来源元数据与信息框每部分都保留）
+
+    route_sections 只在整页范围内挑选一个预算的资料，长页面中超出预算的相关章节会被丢弃；
+    这里每个类别最多得到 max_chunks 份资料（各自不超过类别预算），分别抽取后再合并。
+    与类别无关（没有任何章节得分）的部分跳过；相关部分超过 max_chunks 时保留得分最高的部分。
+
+    Returns:
+        {类别: [资料 Markdown, ...]}；无法切分时返回 None
+    """
+    budgets = budgets or CATEGORY_BUDGETS
+    units = build_units(data, full_chars)
+    if not units:
+        return None
+    pinned = [u for u in units if u.pinned]
+    parts: List[List[_Unit]] = []
+    size = 0
+    for u in units:
+        if u.pinned:
+            continue
+        unit_size = len(u.render()) + 2
+        if not parts or (parts[-1] and size + unit_size > chunk_chars):
+            parts.append([])
+            size = 0
+        parts[-1].append(u)
+        size += unit_size
+    if not parts:
+        return None
+
+    routed: Dict[str, List[str]] = {}
+    for category in categories:
+        budget = budgets.get(category, DEFAULT_BUDGET)
+        query = tokenize(" ".join(CATEGORY_KEYWORDS.get(category, [category])))
+        # IDF 按整页统计，各部分得分可比
+        scores = _bm25_scores(units, query)
+        relevance = [sum(scores[u.order] for u in part) for part in parts]
+        keep = [i for i, r in enumerate(relevance) if r > 0] or [0]
+        if len(keep) > max_chunks:
+            keep = sorted(sorted(keep, key=lambda i: (-relevance[i], i))[:max_chunks])
+        routed[category] = [
+            "\n\n".join(u.render() for u in _select(pinned + parts[i], scores, budget)) for i in keep
+        ]
+    return routed
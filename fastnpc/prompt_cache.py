@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+激活提示词的两级缓存（PromptManager.get_active_prompt 使用）
+
+每次角色创建读取 9 次结构化提示词，每次记忆凝练、群聊中控也都要读取一次，而提示词只在管理员
+创建/修改/激活版本时才变化。原实现每次读取都是一次 Redis GET + JSON 解码，未命中时再查数据库。
+
+- 第一级：进程内 LRU 字典，命中时不访问网络
+- 第二级：Redis，prompt:active:{类别}[:{子分类}] 存 {"v": 版本号, "data": 提示词}；
+  全局版本号 prompt:version 在每次失效时递增，版本号与当前不一致的条目视为未命中，
+  避免“读取数据库期间提示词被修改，旧结果随后被写回 Redis”
+- 失效：create_prompt / update_prompt / activate_version 调用 invalidate_prompt_cache，
+  删除 Redis 条目、递增版本号，并在频道 prompt_cache:invalidate 上广播；
+  每个 Worker 的后台线程订阅该频道并淘汰本进程的条目
+
+进程内缓存只在订阅正常（或 Redis 不可用、只能依赖本进程缓存）时使用；订阅建立或断开时清空，
+因为期间可能错过失效消息。条目另有 PROMPT_LOCAL_CACHE_TTL 秒的有效期兜底。
+
+返回的提示词字典在各调用者之间共享，调用者只能读取，不能修改。
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastnpc.config import PROMPT_LOCAL_CACHE_TTL, PROMPT_REDIS_CACHE_TTL
+
+
+VERSION_KEY = "prompt:version"
+INVALIDATE_CHANNEL = "prompt_cache:invalidate"
+# 失效消息中表示“全部提示词”的 key
+ALL_PROMPTS = "*"
+
+# 进程内缓存的最大条目数
+_LOCAL_CACHE_MAX = 256
+# 订阅线程读取消息的等待时间（秒）；Redis 客户端带 socket_timeout，不能无限阻塞在 listen() 上
+_POLL_TIMEOUT = 1.0
+# Redis 失败后暂停使用的时间（秒）
+_REDIS_RETRY_INTERVAL = 30.0
+_redis_down_until = 0.0
+
+_lock = threading.Lock()
+# key -> (版本号, 提示词, 过期时间)
+_local: "OrderedDict[str, Tuple[int, Any, float]]" = OrderedDict()
+# 每次淘汰递增；读取期间发生过淘汰的结果不写入进程内缓存
+_generation = 0
+_subscribed = False
+_subscriber: Optional[threading.Thread] = None
+_stats = {"local_hits": 0, "redis_hits": 0, "loads": 0, "invalidations": 0, "messages": 0}
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def _redis_client():
+    if time.time() < _redis_down_until:
+        return None
+    try:
+        from fastnpc.api.cache import get_redis_cache
+        return get_redis_cache().client
+    except Exception:
+        return None
+
+
+def _mark_redis_down(e: Exception) -> None:
+    global _redis_down_until
+    _redis_down_until = time.time() + _REDIS_RETRY_INTERVAL
+    print(f"[WARN] 提示词缓存 Redis 不可用，暂时只使用进程内缓存: {e}")
+
+
+def _evict_local(key: Optional[str]) -> None:
+    """淘汰进程内条目（key 为 None 或 ALL_PROMPTS 时清空）"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if key is None or key == ALL_PROMPTS:
+            _local.clear()
+        else:
+            _local.pop(key, None)
+
+
+def _store_local(key: str, version: int, value: Any, generation: int) -> None:
+    with _lock:
+        if generation != _generation:
+            return
+        _local[key] = (version, value, time.time() + PROMPT_LOCAL_CACHE_TTL)
+        _local.move_to_end(key)
+        while len(_local) > _LOCAL_CACHE_MAX:
+            _local.popitem(last=False)
+
+
+def _subscribe_loop() -> None:
+    """后台订阅失效频道；断开后清空进程内缓存并重连"""
+    global _subscribed
+    while True:
+        client = _redis_client()
+        if client is None:
+            time.sleep(_REDIS_RETRY_INTERVAL)
+            continue
+        pubsub = None
+        try:
+            pubsub = client.pubsub()
+            pubsub.subscribe(INVALIDATE_CHANNEL)
+            while True:
+                message = pubsub.get_message(timeout=_POLL_TIMEOUT)
+                if message is None:
+                    continue
+                kind = message.get("type")
+                if kind == "subscribe":
+                    # 订阅建立之前可能错过失效消息
+                    _evict_local(None)
+                    _subscribed = True
+                elif kind == "message":
+                    _count("messages")
+                    try:
+                        key = json.loads(message["data"]).get("key")
+                    except Exception:
+                        key = None
+                    _evict_local(key)
+        except Exception as e:
+            _mark_redis_down(e)
+        finally:
+            _subscribed = False
+            _evict_local(None)
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+        time.sleep(_POLL_TIMEOUT)
+
+
+def _ensure_subscriber() -> None:
+    global _subscriber
+    if _subscriber is not None:
+        return
+    with _lock:
+        if _subscriber is None:
+            _subscriber = threading.Thread(target=_subscribe_loop, name="prompt-cache-subscriber", daemon=True)
+            _subscriber.start()
+
+
+def _local_trusted() -> bool:
+    """进程内缓存是否可用：订阅正常，或 Redis 不可用（此时只能依赖本进程的失效与有效期）"""
+    return _subscribed or time.time() < _redis_down_until
+
+
+def cached_prompt(key: str, loader: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """读取 key 对应的激活提示词，两级缓存均未命中时调用 loader() 查询数据库
+
+    “没有激活的提示词”（None）同样缓存，调用方回退到内置提示词时不再反复查询。
+    loader 抛出的异常原样抛出，不缓存。
+    """
+    _ensure_subscriber()
+    now = time.time()
+    with _lock:
+        if _local_trusted():
+            entry = _local.get(key)
+            if entry is not None and entry[2] > now:
+                _local.move_to_end(key)
+                _stats["local_hits"] += 1
+                return entry[1]
+        generation = _generation
+
+    client = _redis_client()
+    version = 0
+    if client is not None:
+        try:
+            raw, current = client.mget(key, VERSION_KEY)
+            version = int(current or 0)
+            if raw is not None:
+                payload = json.loads(raw)
+                if isinstance(payload, dict) and payload.get("v") == version:
+                    value = payload.get("data")
+                    _store_local(key, version, value, generation)
+                    _count("redis_hits")
+                    return value
+        except Exception as e:
+            _mark_redis_down(e)
+            client = None
+
+    value = loader()
+    _count("loads")
+    if client is not None:
+        try:
+            # 版本号取自查询数据库之前：期间若已失效，写入的条目版本落后，读取时会被忽略
+            client.set(key, json.dumps({"v": version, "data": value}, ensure_ascii=False), ex=PROMPT_REDIS_CACHE_TTL)
+        except Exception as e:
+            _mark_redis_down(e)
+    _store_local(key, version, value, generation)
+    return value
+
+
+def invalidate_prompt_cache(key: Optional[str] = None) -> None:
+    """提示词变更后调用：淘汰本进程条目、删除 Redis 条目、递增版本号并通知其它 Worker
+
+    Args:
+        key: 缓存键（PromptManager._get_cache_key），None 表示全部提示词
+    """
+    _evict_local(key)
+    _count("invalidations")
+    client = _redis_client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline()
+        pipe.incr(VERSION_KEY)
+        if key is not None:
+            pipe.delete(key)
+        pipe.publish(INVALIDATE_CHANNEL, json.dumps({"key": key or ALL_PROMPTS}, ensure_ascii=False))
+        pipe.execute()
+    except Exception as e:
+        _mark_redis_down(e)
+
+
+def get_prompt_cache_stats() -> Dict[str, Any]:
+    """缓存统计（本进程）"""
+    with _lock:
+        stats: Dict[str, Any] = dict(_stats)
+        stats["entries"] = len(_local)
+    stats["subscribed"] = _subscribed
+    stats["local_ttl"] = PROMPT_LOCAL_CACHE_TTL
+    return stats
@@ -11,7 +11,7 @@ from typing import Dict, Any, List, Optional
 
 from fastnpc.config import USE_DB_PROMPTS, USE_POSTGRESQL
 from fastnpc.api.auth.db_utils import _get_conn, _return_conn, _row_to_dict
-from fastnpc.api.cache import get_redis_cache
+from fastnpc.prompt_cache import cached_prompt, invalidate_prompt_cache
 
 
 # 提示词类别常量
@@ -77,14 +77,19 @@ class PromptManager:
         if not USE_DB_PROMPTS:
             return None
         
-        # 尝试从缓存获取
-        cache = get_redis_cache()
-        cache_key = PromptManager._get_cache_key(category, sub_category)
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
-        
-        # 从数据库查询
+        # 进程内缓存 -> Redis -> 数据库（返回的字典在调用者之间共享，只读）
+        try:
+            return cached_prompt(
+                PromptManager._get_cache_key(category, sub_category),
+                lambda: PromptManager._load_active_prompt(category, sub_category),
+            )
+        except Exception as e:
+            print(f"[ERROR] 获取提示词失败: {e}")
+            return None
+    
+    @staticmethod
+    def _load_active_prompt(category: str, sub_category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """从数据库查询激活的提示词（查询失败时抛出异常，不缓存）"""
         conn = _get_conn()
         try:
             cur = conn.cursor()
@@ -127,14 +132,7 @@ class PromptManager:
             else:
                 result['metadata'] = {}
             
-            # 缓存结果（5分钟）
-            cache.set(cache_key, result, ttl=300)
-            
             return result
-        
-        except Exception as e:
-            print(f"[ERROR] 获取提示词失败: {e}")
-            return None
         finally:
             _return_conn(conn)
     
@@ -245,10 +243,9 @@ class PromptManager:
             
             conn.commit()
             
-            # 如果是激活状态，清除缓存
+            # 如果是激活状态，清除缓存并通知其它 Worker
             if is_active:
-                cache = get_redis_cache()
-                cache.delete(PromptManager._get_cache_key(category, sub_category))
+                invalidate_prompt_cache(PromptManager._get_cache_key(category, sub_category))
             
             print(f"[INFO] 创建提示词成功: {name} (ID: {prompt_id})")
             return prompt_id
@@ -349,10 +346,9 @@ class PromptManager:
             
             conn.commit()
             
-            # 如果是激活状态，清除缓存
+            # 如果是激活状态，清除缓存并通知其它 Worker
             if old_data.get('is_active'):
-                cache = get_redis_cache()
-                cache.delete(PromptManager._get_cache_key(
+                invalidate_prompt_cache(PromptManager._get_cache_key(
                     old_data['category'], old_data.get('sub_category')
                 ))
             
@@ -411,9 +407,8 @@ class PromptManager:
             
             conn.commit()
             
-            # 清除缓存
-            cache = get_redis_cache()
-            cache.delete(PromptManager._get_cache_key(category, sub_category))
+            # 清除缓存并通知其它 Worker
+            invalidate_prompt_cache(PromptManager._get_cache_key(category, sub_category))
             
             print(f"[INFO] 激活提示词: {prompt_id} (类别: {category}, 子分类: {sub_category})")
             return True
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+数据源 HTML 解析器基准测试
+
+对已保存的真实页面，比较各个 BeautifulSoup 解析器（html.parser / lxml / html5lib，未安装的跳过）的
+单页解析耗时与峰值内存，并给出 zhwiki 页面“信息框 + 参考文献 + 章节切分”整条提取链路在
+旧实现（每步各自解析一次）与共享解析树之间的耗时对比。
+
+页面来源:
+- 默认：随仓库提交的样例页面（fixtures/http_responses，百科 HTML 与 zhwiki parse 接口返回的整页 HTML），
+  结果可复现，可与 check_offline_collection.py --record 重新录制的页面对比
+- --local-cache：本机数据源 HTTP 缓存（HTTP_CACHE_DIR/responses.sqlite）与百科调试转储
+  （FASTNPC_DEBUG_BAIKE=1 时写入 CHAR_DIR/debug/*.html）
+- --pages：指定 HTML 文件或目录
+
+峰值内存用 tracemalloc 统计，只包含 Python 对象（解析树本身），不含 lxml 底层 C 库的临时分配。
+
+用法:
+    python fastnpc/scripts/benchmark_html_parsers.py
+    python fastnpc/scripts/benchmark_html_parsers.py --local-cache --limit 20
+    python fastnpc/scripts/benchmark_html_parsers.py --pages path/to/pages --repeat 5 --limit 20
+"""
+import sys
+import json
+import sqlite3
+import statistics
+import time
+import tracemalloc
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastnpc.config import CHAR_DIR, HTTP_CACHE_DIR
+from fastnpc.datasources.html_parser import parse_html, parser_name
+from fastnpc.datasources.zhwiki import (
+    _parse_infobox_from_html,
+    _parse_references_from_html,
+    _split_sections_from_html,
+)
+
+
+CANDIDATE_PARSERS = ["html.parser", "lxml", "html5lib"]
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures" / "http_responses"
+
+
+def print_header(title):
+    print("=" * 80)
+    print(f" {title}")
+    print("=" * 80)
+
+
+def available_parsers():
+    names = []
+    for name in CANDIDATE_PARSERS:
+        try:
+            parse_html("<p>ok</p>", parser=name)
+        except Exception:
+            continue
+        # 未安装 lxml 时 parser_name 会回退到 html.parser，不重复统计
+        if parser_name(name) == name:
+            names.append(name)
+    return names
+
+
+def _page_from_response(url, content_type, body):
+    """把一条 HTTP 响应转换为 (名称, 类型, HTML)；不是可解析页面时返回 None"""
+    content_type = (content_type or "").lower()
+    if "json" in content_type:
+        try:
+            html = (json.loads(body).get("parse") or {}).get("text") or ""
+        except Exception:
+            return None
+        if isinstance(html, str) and len(html) > 2000:
+            return (url, "zhwiki", html)
+    elif "html" in content_type and len(body) > 2000:
+        return (url, "baike", body)
+    return None
+
+
+def pages_from_fixtures(limit):
+    """随仓库提交的样例页面（check_offline_collection.py 使用的同一批响应）"""
+    manifest = FIXTURE_DIR / "manifest.json"
+    if not manifest.exists():
+        return []
+    with open(manifest, "r", encoding="utf-8") as f:
+        responses = json.load(f).get("responses") or []
+    pages = []
+    for entry in responses:
+        page = _page_from_response(entry["file"], entry.get("content_type"), (FIXTURE_DIR / entry["file"]).read_bytes())
+        if page:
+            pages.append(page)
+        if len(pages) >= limit:
+            break
+    return pages
+
+
+def pages_from_http_cache(limit):
+    """(名称, 类型, HTML) 列表：百科页面与 zhwiki 整页 HTML"""
+    db = HTTP_CACHE_DIR / "responses.sqlite"
+    if not db.exists():
+        return []
+    pages = []
+    conn = sqlite3.connect(str(db))
+    try:
+        rows = conn.execute(
+            "SELECT url, headers, body FROM responses ORDER BY last_access DESC"
+        ).fetchall()
+    finally:
+        conn.close()
+    for url, headers, body in rows:
+        content_type = json.loads(headers or "{}").get("Content-Type") or ""
+        if "json" in content_type.lower() and "wikipedia.org" not in url:
+            continue
+        page = _page_from_response(url, content_type, bytes(body))
+        if page:
+            pages.append(page)
+        if len(pages) >= limit:
+            break
+    return pages
+
+
+def pages_from_files(paths, limit):
+    files = []
+    for p in paths:
+        p = Path(p)
+        if p.is_dir():
+            files.extend(sorted(p.glob("*.html")))
+        elif p.exists():
+            files.append(p)
+    pages = []
+    for f in files[:limit]:
+        raw = f.read_bytes()
+        kind = "zhwiki" if b"mw-parser-output" in raw else "baike"
+        pages.append((f.name, kind, raw))
+    return pages
+
+
+def measure_parse(markup, parser, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse_html(markup, parser=parser)
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    parse_html(markup, parser=parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def zhwiki_extraction(html, parser, shared):
+    """zhwiki 提取链路：shared=False 时每步各自解析（旧实现），否则共享一棵树"""
+    started = time.perf_counter()
+    if shared:
+        page = parse_html(html, parser=parser)
+        _parse_infobox_from_html(page)
+        _parse_references_from_html(page)
+        _split_sections_from_html(page, [])
+    else:
+        _parse_infobox_from_html(parse_html(html, parser=parser))
+        _parse_references_from_html(parse_html(html, parser=parser))
+        _split_sections_from_html(parse_html(html, parser=parser), [])
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据源 HTML 解析器基准测试")
+    parser.add_argument("--pages", nargs="*", help="HTML 文件或目录（默认使用样例页面）")
+    parser.add_argument("--local-cache", action="store_true", help="读取本机 HTTP 缓存与百科调试转储")
+    parser.add_argument("--repeat", type=int, default=3, help="每页每个解析器的重复次数（取中位数）")
+    parser.add_argument("--limit", type=int, default=50, help="最多测试的页面数")
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = pages_from_files(args.pages, args.limit)
+    elif args.local_cache:
+        pages = pages_from_http_cache(args.limit)
+        pages += pages_from_files([CHAR_DIR / "debug"], max(0, args.limit - len(pages)))
+    else:
+        pages = pages_from_fixtures(args.limit)
+    if not pages:
+        if args.local_cache:
+            print("[ERROR] 没有找到已保存的页面：请先运行一次角色创建（启用 HTTP 缓存），或用 --pages 指定")
+        else:
+            print(f"[ERROR] 没有找到页面：{FIXTURE_DIR} 为空，或用 --pages 指定")
+        return 1
+
+    parsers = available_parsers()
+    print_header(f"解析器: {', '.join(parsers)}（当前配置使用 {parser_name()}），页面数: {len(pages)}")
+    totals = {name: [0.0, 0] for name in parsers}
+    for name, kind, markup in pages:
+        size_kb = len(markup) / 1024
+        label = name if len(name) <= 60 else "…" + name[-59:]
+        print(f"\n[{kind}] {label}（{size_kb:.0f} KB）")
+        for p in parsers:
+            seconds, peak = measure_parse(markup, p, max(1, args.repeat))
+            totals[p][0] += seconds
+            totals[p][1] = max(totals[p][1], peak)
+            print(f"  {p:<12} 解析 {seconds * 1000:8.1f} ms   峰值内存 {peak / 1024 / 1024:7.1f} MB")
+
+    print_header("汇总")
+    base = totals.get("html.parser", [0.0, 0])[0]
+    for p in parsers:
+        seconds, peak = totals[p]
+        speedup = f"，相对 html.parser {base / seconds:.1f}x" if base and seconds and p != "html.parser" else ""
+        print(f"  {p:<12} 总解析 {seconds * 1000:9.1f} ms   单页峰值内存最大 {peak / 1024 / 1024:6.1f} MB{speedup}")
+
+    wiki_pages = [markup for _, kind, markup in pages if kind == "zhwiki"]
+    if wiki_pages:
+        current = parser_name()
+        before = sum(zhwiki_extraction(h, "html.parser", shared=False) for h in wiki_pages)
+        after = sum(zhwiki_extraction(h, current, shared=True) for h in wiki_pages)
+        print(f"\n  zhwiki 提取链路（{len(wiki_pages)} 页）: html.parser 每步解析 {before * 1000:.1f} ms"
+              f" → {current} 共享解析树 {after * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 客户端复用基准测试
+
+启动一个本地 OpenAI 兼容的模拟服务器（流式 /chat/completions），对比：
+- 每次调用新建 AsyncOpenAI 客户端（旧实现）
+- openrouter._async_client() 复用的连接池客户端
+
+统计首字延迟（time-to-first-token）和完整响应耗时。本地回环没有真实的 TLS/跨地域握手开销，
+可用 --connect-delay 在服务端每个新连接上模拟握手耗时（例如 OpenRouter 约 100~300ms）。
+
+用法:
+    python fastnpc/scripts/benchmark_llm_client.py
+    python fastnpc/scripts/benchmark_llm_client.py --requests 50 --concurrency 5 --connect-delay 150
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """最小化的 OpenAI 兼容流式接口（HTTP/1.1 keep-alive + chunked）"""
+
+    protocol_version = "HTTP/1.1"
+    connect_delay = 0.0
+    chunks = 20
+    chunk_interval = 0.002
+
+    def setup(self):
+        super().setup()
+        # 模拟新连接的握手耗时（只在连接建立时发生一次）
+        if self.connect_delay > 0:
+            time.sleep(self.connect_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(self.chunks):
+            event = {
+                "id": "mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "delta": {"content": f"字{i}"}, "finish_reason": None}],
+            }
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            time.sleep(self.chunk_interval)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+def start_mock_server(connect_delay_ms: float):
+    MockOpenAIHandler.connect_delay = connect_delay_ms / 1000.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockOpenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def stream_once(client):
+    """返回 (首字延迟ms, 总耗时ms)"""
+    start = time.perf_counter()
+    first = None
+    resp = await client.chat.completions.create(
+        model="mock", messages=[{"role": "user", "content": "你好"}], stream=True
+    )
+    async for ev in resp:
+        if first is None and ev.choices and ev.choices[0].delta.content:
+            first = time.perf_counter()
+    end = time.perf_counter()
+    return ((first or end) - start) * 1000, (end - start) * 1000
+
+
+async def run_mode(name, get_client, requests, concurrency, fresh):
+    sem = asyncio.Semaphore(concurrency)
+    ttft, total = [], []
+
+    async def one():
+        async with sem:
+            client = get_client()
+            try:
+                t, d = await stream_once(client)
+                ttft.append(t)
+                total.append(d)
+            finally:
+                if fresh:
+                    await client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - started
+    ttft.sort()
+    print(f"[{name}]")
+    print(f"  首字延迟: p50 {statistics.median(ttft):.1f}ms, p95 {ttft[min(len(ttft) - 1, int(len(ttft) * 0.95))]:.1f}ms")
+    print(f"  完整响应: p50 {statistics.median(total):.1f}ms  总耗时 {wall:.2f}s")
+    return statistics.median(ttft)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='LLM 客户端复用基准测试')
+    parser.add_argument('--requests', type=int, default=40, help='每种模式的请求数，默认40')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发数，默认4')
+    parser.add_argument('--connect-delay', type=float, default=100.0, help='模拟每个新连接的握手耗时（毫秒），默认100')
+    args = parser.parse_args()
+
+    server = start_mock_server(args.connect_delay)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    # 必须在导入 fastnpc.config 之前设置
+    os.environ["OPENROUTER_BASE_URL"] = base_url
+    os.environ["OPENROUTER_API_KEY"] = os.environ.get("OPENROUTER_API_KEY") or "mock-key"
+
+    from openai import AsyncOpenAI
+    from fastnpc.llm.openrouter import _async_client, close_async_openrouter_client
+
+    print("=" * 80)
+    print(f" LLM 客户端复用基准测试（模拟握手 {args.connect_delay:.0f}ms，{args.requests} 次请求，并发 {args.concurrency}）")
+    print("=" * 80)
+
+    async def run():
+        fresh = await run_mode(
+            "每次新建客户端",
+            lambda: AsyncOpenAI(base_url=base_url, api_key="mock-key"),
+            args.requests, args.concurrency, fresh=True,
+        )
+        pooled = await run_mode(
+            "复用连接池客户端",
+            _async_client,
+            args.requests, args.concurrency, fresh=False,
+        )
+        await close_async_openrouter_client()
+        print(f"\n首字延迟 p50 节省: {fresh - pooled:.1f}ms")
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+聊天消息查询基准测试
+
+在临时表 bench_messages / bench_group_messages 中生成大量消息，
+对比创建热路径索引（db_migrations.message_index_statements）前后
+list_messages / list_group_messages 查询的执行计划与延迟。
+
+用法:
+    python fastnpc/scripts/benchmark_message_queries.py --rows 2000000
+    python fastnpc/scripts/benchmark_message_queries.py --rows 200000 --keep
+"""
+import sys
+import random
+import statistics
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastnpc.api.auth import _get_conn, _return_conn
+from fastnpc.api.auth.db_migrations import message_index_statements, UNCOMPRESSED_PREDICATE
+from fastnpc.config import USE_POSTGRESQL
+
+
+MSG_TABLE = "bench_messages"
+GROUP_TABLE = "bench_group_messages"
+P = "%s" if USE_POSTGRESQL else "?"
+
+
+def print_header(title):
+    print("=" * 80)
+    print(f" {title}")
+    print("=" * 80)
+
+
+def drop_tables(cur):
+    cur.execute(f"DROP TABLE IF EXISTS {MSG_TABLE}")
+    cur.execute(f"DROP TABLE IF EXISTS {GROUP_TABLE}")
+
+
+def create_and_fill(conn, rows, chats, groups, compressed_ratio):
+    """生成测试数据：较早的消息标记为已压缩，最近的为未压缩（与线上分布一致）"""
+    cur = conn.cursor()
+    drop_tables(cur)
+    id_type = "SERIAL PRIMARY KEY" if USE_POSTGRESQL else "INTEGER PRIMARY KEY AUTOINCREMENT"
+    cur.execute(
+        f"""
+        CREATE TABLE {MSG_TABLE}(
+            id {id_type},
+            user_id INT NOT NULL,
+            character_id INT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at BIGINT NOT NULL,
+            compressed INT DEFAULT 0,
+            system_prompt_snapshot TEXT
+        )
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE {GROUP_TABLE}(
+            id {id_type},
+            group_id INT NOT NULL,
+            sender_type TEXT NOT NULL,
+            sender_id INT,
+            sender_name TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at BIGINT NOT NULL,
+            system_prompt_snapshot TEXT,
+            moderator_prompt TEXT,
+            moderator_response TEXT,
+            compressed INT DEFAULT 0
+        )
+        """
+    )
+    cutoff = int(rows * compressed_ratio)
+    started = time.time()
+    if USE_POSTGRESQL:
+        cur.execute(
+            f"""
+            INSERT INTO {MSG_TABLE}(user_id, character_id, role, content, created_at, compressed)
+            SELECT (g % {chats}) / 10 + 1, (g % {chats}) + 1,
+                   CASE WHEN g % 2 = 0 THEN 'user' ELSE 'assistant' END,
+                   repeat('消息内容', 20), g, CASE WHEN g < {cutoff} THEN 1 ELSE 0 END
+            FROM generate_series(0, {rows - 1}) AS g
+            """
+        )
+        cur.execute(
+            f"""
+            INSERT INTO {GROUP_TABLE}(group_id, sender_type, sender_name, content, created_at, compressed)
+            SELECT (g % {groups}) + 1, 'character', '角色', repeat('群聊内容', 20), g,
+                   CASE WHEN g < {cutoff} THEN 1 ELSE 0 END
+            FROM generate_series(0, {rows - 1}) AS g
+            """
+        )
+    else:
+        cur.execute(
+            f"""
+            WITH RECURSIVE seq(g) AS (SELECT 0 UNION ALL SELECT g + 1 FROM seq WHERE g < {rows - 1})
+            INSERT INTO {MSG_TABLE}(user_id, character_id, role, content, created_at, compressed)
+            SELECT (g % {chats}) / 10 + 1, (g % {chats}) + 1,
+                   CASE WHEN g % 2 = 0 THEN 'user' ELSE 'assistant' END,
+                   '消息内容消息内容消息内容消息内容', g, CASE WHEN g < {cutoff} THEN 1 ELSE 0 END
+            FROM seq
+            """
+        )
+        cur.execute(
+            f"""
+            WITH RECURSIVE seq(g) AS (SELECT 0 UNION ALL SELECT g + 1 FROM seq WHERE g < {rows - 1})
+            INSERT INTO {GROUP_TABLE}(group_id, sender_type, sender_name, content, created_at, compressed)
+            SELECT (g % {groups}) + 1, 'character', '角色', '群聊内容群聊内容群聊内容群聊内容', g,
+                   CASE WHEN g < {cutoff} THEN 1 ELSE 0 END
+            FROM seq
+            """
+        )
+    conn.commit()
+    cur.execute(f"ANALYZE {MSG_TABLE}")
+    cur.execute(f"ANALYZE {GROUP_TABLE}")
+    conn.commit()
+    print(f"已生成 {rows} 条单聊消息、{rows} 条群聊消息（{time.time() - started:.1f}s）")
+
+
+def build_queries(chats, groups):
+    """与 list_messages / list_group_messages 相同形状的查询"""
+    return {
+        "单聊-未压缩(会话记忆)": (
+            f"SELECT id, role, content, created_at, compressed, system_prompt_snapshot FROM {MSG_TABLE} "
+            f"WHERE user_id={P} AND character_id={P} AND {UNCOMPRESSED_PREDICATE} ORDER BY id ASC LIMIT {P}",
+            lambda: ((c := random.randrange(chats)) // 10 + 1, c + 1, 200),
+        ),
+        "单聊-全部": (
+            f"SELECT id, role, content, created_at, compressed, system_prompt_snapshot FROM {MSG_TABLE} "
+            f"WHERE user_id={P} AND character_id={P} ORDER BY id ASC LIMIT {P}",
+            lambda: ((c := random.randrange(chats)) // 10 + 1, c + 1, 200),
+        ),
+        "群聊-未压缩(会话记忆)": (
+            f"SELECT id, sender_type, sender_id, sender_name, content, created_at, compressed FROM {GROUP_TABLE} "
+            f"WHERE group_id={P} AND {UNCOMPRESSED_PREDICATE} ORDER BY id ASC LIMIT {P}",
+            lambda: (random.randrange(groups) + 1, 200),
+        ),
+    }
+
+
+def explain(cur, sql, params):
+    if USE_POSTGRESQL:
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+        return [r[0] for r in cur.fetchall()]
+    cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+    return [str(r[-1]) for r in cur.fetchall()]
+
+
+def measure(cur, sql, make_params, iterations):
+    timings = []
+    for _ in range(iterations):
+        params = make_params()
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "max": timings[-1],
+    }
+
+
+def run_round(conn, label, queries, iterations):
+    print_header(label)
+    cur = conn.cursor()
+    results = {}
+    for name, (sql, make_params) in queries.items():
+        print(f"\n[{name}] 执行计划:")
+        for line in explain(cur, sql, make_params()):
+            print(f"    {line}")
+        conn.commit()
+        results[name] = measure(cur, sql, make_params, iterations)
+        r = results[name]
+        print(f"  延迟({iterations}次): p50 {r['p50']:.2f}ms, p95 {r['p95']:.2f}ms, max {r['max']:.2f}ms")
+    conn.commit()
+    print()
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='聊天消息查询基准测试')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='每张表生成的消息数，默认100万')
+    parser.add_argument('--chats', type=int, default=5000, help='单聊会话（用户×角色）数量，默认5000')
+    parser.add_argument('--groups', type=int, default=1000, help='群聊数量，默认1000')
+    parser.add_argument('--compressed-ratio', type=float, default=0.95, help='已压缩消息比例，默认0.95')
+    parser.add_argument('--iterations', type=int, default=200, help='每个查询执行次数，默认200')
+    parser.add_argument('--keep', action='store_true', help='保留测试表（默认结束后删除）')
+    args = parser.parse_args()
+
+    print_header(f"消息查询基准测试（{'PostgreSQL' if USE_POSTGRESQL else 'SQLite'}）")
+    conn = _get_conn()
+    try:
+        create_and_fill(conn, args.rows, args.chats, args.groups, args.compressed_ratio)
+        queries = build_queries(args.chats, args.groups)
+
+        before = run_round(conn, "无索引", queries, args.iterations)
+
+        cur = conn.cursor()
+        started = time.time()
+        for sql in message_index_statements(MSG_TABLE, GROUP_TABLE):
+            cur.execute(sql)
+        cur.execute(f"ANALYZE {MSG_TABLE}")
+        cur.execute(f"ANALYZE {GROUP_TABLE}")
+        conn.commit()
+        print(f"索引创建耗时: {time.time() - started:.1f}s\n")
+
+        after = run_round(conn, "热路径索引", queries, args.iterations)
+
+        print_header("对比 (p50)")
+        for name in queries:
+            b, a = before[name]["p50"], after[name]["p50"]
+            speedup = b / a if a > 0 else float("inf")
+            print(f"  {name:<16} {b:>10.2f}ms -> {a:>8.2f}ms  ({speedup:.1f}x)")
+    finally:
+        if not args.keep:
+            try:
+                drop_tables(conn.cursor())
+                conn.commit()
+            except Exception as e:
+                print(f"[WARN] 删除测试表失败: {e}")
+        _return_conn(conn)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+结构化章节路由基准测试
+
+对存储的抓取结果（baike/zhwiki 原始 JSON）统计每次角色创建发送给 9 个类别 LLM 调用的
+输入 token 估算值：
+- 路由前：每个类别发送 系统消息 + 类别提示词 + 整页 Markdown（截断到 MAX_FACTS_CHARS）
+- 路由后：每个类别只发送 route_sections 挑选的章节
+
+同时检查召回：标题命中类别关键词的章节是否被保留（只统计能放进预算的章节），
+以及“来源”类别的资料是否仍包含来源链接（url）。
+token 数按 routing.estimate_tokens 估算（汉字约 1 token/字），与实际分词器会有偏差，
+但前后对比口径一致。
+
+用法:
+    python fastnpc/scripts/benchmark_section_routing.py
+    python fastnpc/scripts/benchmark_section_routing.py --fixtures path/to/raw1.json path/to/raw2.json --detail
+"""
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+# 只统计硬编码提示词，不依赖数据库
+os.environ.setdefault("USE_DB_PROMPTS", "false")
+
+from fastnpc.pipeline.structure.processors import json_to_markdown
+from fastnpc.pipeline.structure.prompts import (
+    _category_prompts,
+    _category_messages,
+    _truncate_facts,
+    _DEFAULT_STRUCTURED_SYSTEM_MESSAGE,
+)
+from fastnpc.pipeline.structure.routing import (
+    CATEGORY_BUDGETS,
+    CATEGORY_KEYWORDS,
+    DEFAULT_BUDGET,
+    build_units,
+    estimate_tokens,
+    route_sections,
+)
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures" / "section_routing"
+
+
+def print_header(title):
+    print("=" * 80)
+    print(f" {title}")
+    print("=" * 80)
+
+
+def request_tokens(prompt, facts):
+    messages = _category_messages(_DEFAULT_STRUCTURED_SYSTEM_MESSAGE, prompt, _truncate_facts(facts))
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+def title_recall(data, category, routed_text):
+    """标题命中类别关键词、且单独放得进预算的章节中，被路由保留的比例"""
+    units = build_units(data) or []
+    budget = CATEGORY_BUDGETS.get(category, DEFAULT_BUDGET)
+    keywords = CATEGORY_KEYWORDS.get(category, [])
+    expected = [
+        u for u in units
+        if not u.pinned and len(u.render()) <= budget and any(k in u.title for k in keywords)
+    ]
+    if not expected:
+        return None
+    kept = sum(1 for u in expected if f"## {u.title}\n" in routed_text)
+    return kept, len(expected)
+
+
+def benchmark_fixture(path, persona_name, detail):
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    name = persona_name or data.get("title") or data.get("keyword") or Path(path).stem
+    markdown_text = json_to_markdown(data)
+    prompts = _category_prompts(name)
+    routed = route_sections(data, list(prompts.keys()), markdown_text)
+
+    print_header(f"{Path(path).name}（{name}，Markdown {len(markdown_text)} 字符）")
+    before_total = after_total = 0
+    recall_kept = recall_expected = 0
+    for category, prompt in prompts.items():
+        before = request_tokens(prompt, markdown_text)
+        after = request_tokens(prompt, routed[category])
+        before_total += before
+        after_total += after
+        recall = title_recall(data, category, routed[category])
+        if recall:
+            recall_kept += recall[0]
+            recall_expected += recall[1]
+        if detail:
+            recall_text = f"{recall[0]}/{recall[1]}" if recall else "-"
+            print(f"  {category:<12} {before:>7} → {after:>7} tokens"
+                  f"（资料 {len(routed[category]):>6} 字符，标题召回 {recall_text}）")
+    saved = (1 - after_total / before_total) * 100 if before_total else 0.0
+    print(f"  每次创建输入 tokens: {before_total} → {after_total}（减少 {saved:.1f}%）")
+    if recall_expected:
+        print(f"  标题命中章节召回: {recall_kept}/{recall_expected}")
+    url = str(data.get("url") or "").strip()
+    url_kept = not url or (url in routed.get("来源", ""))
+    if url:
+        print(f"  来源链接保留: {'是' if url_kept else '否（“来源”类别的资料缺少 ' + url + '）'}")
+    return before_total, after_total, url_kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="结构化章节路由基准测试")
+    parser.add_argument("--fixtures", nargs="*", help="抓取结果 JSON 路径（默认使用内置样例）")
+    parser.add_argument("--persona-name", default="", help="角色名（默认取 JSON 的 title）")
+    parser.add_argument("--detail", action="store_true", help="输出每个类别的明细")
+    args = parser.parse_args()
+
+    paths = args.fixtures or sorted(str(p) for p in FIXTURE_DIR.glob("*.json"))
+    if not paths:
+        print(f"[ERROR] 没有找到样例: {FIXTURE_DIR}")
+        return 1
+
+    totals = [benchmark_fixture(p, args.persona_name, args.detail) for p in paths]
+    before = sum(t[0] for t in totals)
+    after = sum(t[1] for t in totals)
+    missing_url = sum(1 for t in totals if not t[2])
+    print_header("汇总")
+    print(f"  样例数: {len(totals)}")
+    print(f"  平均每次创建输入 tokens: {before // len(totals)} → {after // len(totals)}"
+          f"（减少 {(1 - after / before) * 100 if before else 0:.1f}%）")
+    if missing_url:
+        print(f"[ERROR] {missing_url} 个样例的“来源”类别资料缺少来源链接")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
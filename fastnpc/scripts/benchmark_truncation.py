@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+对话历史 / 长期记忆裁剪基准测试
+
+对比 _truncate_messages、_truncate_long_term_memory 与原先“每删一条重新 json.dumps 全部剩余内容”
+的实现：先用相同随机种子校验输出完全一致，再测量 200~2000 条消息下的耗时。
+
+用法:
+    python fastnpc/scripts/benchmark_truncation.py
+    python fastnpc/scripts/benchmark_truncation.py --sizes 200 1000 2000 --iterations 50
+"""
+import sys
+import json
+import random
+import statistics
+import time
+from collections import deque
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastnpc.api.utils import _truncate_messages, _truncate_long_term_memory
+
+
+def legacy_truncate_messages(messages, limit_chars):
+    """原实现（O(n²)），作为正确性与性能基线"""
+    if limit_chars <= 0:
+        return messages
+    dq = deque(messages)
+    while dq:
+        s = json.dumps(list(dq), ensure_ascii=False)
+        if len(s) <= limit_chars:
+            break
+        left = dq[0]
+        if isinstance(left, dict) and left.get("role") == "system" and len(dq) >= 2:
+            dq.popleft()
+        dq.popleft()
+    return list(dq)
+
+
+def legacy_truncate_long_term_memory(items, limit_chars):
+    """原实现（每删一条重算序列化和概率向量）"""
+    if limit_chars <= 0:
+        return items
+    arr = list(items)
+    while arr:
+        s = json.dumps(arr, ensure_ascii=False)
+        if len(s) <= limit_chars:
+            break
+        n = len(arr)
+        weights = [float(n - i) for i in range(n)]
+        total = sum(weights)
+        probs = [w / total for w in weights]
+        r = random.random()
+        acc = 0.0
+        idx = 0
+        for i, p in enumerate(probs):
+            acc += p
+            if r <= acc:
+                idx = i
+                break
+        arr.pop(idx)
+    return arr
+
+
+def make_messages(count, rng):
+    roles = ["user", "assistant"]
+    msgs = [{"role": "system", "content": "系统提示"}]
+    for i in range(count):
+        text = "对话内容" * rng.randint(5, 60)
+        msgs.append({"role": roles[i % 2], "content": f"{i}:{text}"})
+    return msgs
+
+
+def make_memories(count, rng):
+    return [f"记忆{i}：" + "事件描述" * rng.randint(3, 30) for i in range(count)]
+
+
+def print_header(title):
+    print("=" * 80)
+    print(f" {title}")
+    print("=" * 80)
+
+
+def check_equivalence(rounds):
+    """随机数据、随机限额下逐一比对输出"""
+    rng = random.Random(2024)
+    for _ in range(rounds):
+        count = rng.randint(0, 300)
+        msgs = make_messages(count, rng)
+        full = len(json.dumps(msgs, ensure_ascii=False))
+        limit = rng.randint(1, full + 10)
+        assert _truncate_messages(msgs, limit) == legacy_truncate_messages(msgs, limit), "消息裁剪结果不一致"
+
+        mems = make_memories(count, rng)
+        full = len(json.dumps(mems, ensure_ascii=False))
+        limit = rng.randint(1, full + 10)
+        seed = rng.random()
+        random.seed(seed)
+        new = _truncate_long_term_memory(mems, limit)
+        random.seed(seed)
+        old = legacy_truncate_long_term_memory(mems, limit)
+        assert new == old, "长期记忆裁剪结果不一致"
+    print(f"正确性校验通过（{rounds} 组随机数据）\n")
+
+
+def timeit(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='对话历史裁剪基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 500, 1000, 2000], help='消息条数')
+    parser.add_argument('--limit', type=int, default=8000, help='字符限额，默认8000')
+    parser.add_argument('--iterations', type=int, default=20, help='每组重复次数，默认20')
+    parser.add_argument('--check-rounds', type=int, default=200, help='正确性校验组数，默认200')
+    args = parser.parse_args()
+
+    print_header("裁剪函数基准测试")
+    check_equivalence(args.check_rounds)
+
+    rng = random.Random(7)
+    print(f"{'条数':>6} | {'消息-原实现':>12} | {'消息-新实现':>12} | {'记忆-原实现':>12} | {'记忆-新实现':>12}")
+    for size in args.sizes:
+        msgs = make_messages(size, rng)
+        mems = make_memories(size, rng)
+        old_m = timeit(lambda: legacy_truncate_messages(msgs, args.limit), args.iterations)
+        new_m = timeit(lambda: _truncate_messages(msgs, args.limit), args.iterations)
+        random.seed(1)
+        old_l = timeit(lambda: legacy_truncate_long_term_memory(mems, args.limit), args.iterations)
+        random.seed(1)
+        new_l = timeit(lambda: _truncate_long_term_memory(mems, args.limit), args.iterations)
+        print(f"{size:>6} | {old_m:>10.2f}ms | {new_m:>10.2f}ms | {old_l:>10.2f}ms | {new_l:>10.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
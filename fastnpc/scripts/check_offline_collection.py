@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+数据源离线回放检查
+
+把 fixtures/http_responses 中录制的 HTTP 响应导入一个临时的数据源 HTTP 缓存，开启离线模式
+（HTTP_CACHE_OFFLINE，只读缓存、从不访问网络），再对每个样例运行 baike / zhwiki 的抓取流程
+（get_full），检查标题、章节数、正文长度、信息框字段与参考文献是否符合预期。
+任何一次未命中缓存都会以 ConnectionError 失败，因此也能发现抓取流程新增的请求。
+
+--record 会在线运行同样的样例，把实际发生的请求与响应重新写入样例目录，并按结果更新预期值。
+
+用法:
+    python fastnpc/scripts/check_offline_collection.py
+    python fastnpc/scripts/check_offline_collection.py --source zhwiki --verbose
+    python fastnpc/scripts/check_offline_collection.py --record
+"""
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures" / "http_responses"
+MANIFEST = FIXTURE_DIR / "manifest.json"
+
+
+def print_header(title):
+    print("=" * 80)
+    print(f" {title}")
+    print("=" * 80)
+
+
+def configure_cache(cache_dir, offline):
+    """必须在导入 fastnpc 之前调用：HTTP 缓存配置在导入时读取"""
+    os.environ["HTTP_CACHE_ENABLED"] = "true"
+    os.environ["HTTP_CACHE_DIR"] = str(cache_dir)
+    os.environ["HTTP_CACHE_OFFLINE"] = "true" if offline else "false"
+    os.environ.setdefault("FASTNPC_DEBUG_BAIKE", "0")
+
+
+def load_manifest():
+    with open(MANIFEST, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def import_responses(manifest):
+    """把样例响应写入（临时）HTTP 缓存"""
+    import requests
+    from fastnpc.datasources.http_cache import _cache_key, _store
+
+    for entry in manifest["responses"]:
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = (FIXTURE_DIR / entry["file"]).read_bytes()
+        resp.headers["Content-Type"] = entry["content_type"]
+        resp.url = entry["url"]
+        # 离线模式不检查新鲜度，TTL 只需足够长
+        _store(_cache_key(entry["url"]), entry["url"], resp, 10 * 365 * 86400)
+    return len(manifest["responses"])
+
+
+def run_case(case):
+    from fastnpc.datasources import baike, zhwiki
+
+    if case["source"] == "baike":
+        # 与 AMP 并发请求竞速只影响线上耗时，回放时关闭以保证结果确定
+        return baike.get_full(case["keyword"], retries=1, race_pc=False)
+    return zhwiki.get_full(case["keyword"], retries=1)
+
+
+def section_chars(data):
+    return sum(len(p) for s in data.get("sections") or [] for p in s.get("content") or [] if isinstance(p, str))
+
+
+def check_case(case, data):
+    """返回不符合预期的描述列表"""
+    expect = case.get("expect") or {}
+    problems = []
+    if expect.get("title") and data.get("title") != expect["title"]:
+        problems.append(f"标题 {data.get('title')!r} != {expect['title']!r}")
+    sections = data.get("sections") or []
+    if len(sections) < expect.get("min_sections", 1):
+        problems.append(f"章节数 {len(sections)} < {expect.get('min_sections', 1)}")
+    chars = section_chars(data)
+    if chars < expect.get("min_chars", 1):
+        problems.append(f"正文字数 {chars} < {expect.get('min_chars', 1)}")
+    if not data.get("summary"):
+        problems.append("摘要为空")
+    infobox = data.get("infobox") or {}
+    missing = [k for k in expect.get("infobox_keys") or [] if k not in infobox]
+    if missing:
+        problems.append(f"信息框缺少字段: {', '.join(missing)}")
+    refs = data.get("references") or []
+    if len(refs) < expect.get("min_references", 0):
+        problems.append(f"参考文献 {len(refs)} < {expect.get('min_references', 0)}")
+    return problems
+
+
+def cached_urls(cache_dir):
+    db = Path(cache_dir) / "responses.sqlite"
+    if not db.exists():
+        return {}
+    conn = sqlite3.connect(str(db))
+    try:
+        rows = conn.execute("SELECT url, headers, body FROM responses").fetchall()
+    finally:
+        conn.close()
+    return {url: (json.loads(headers or "{}").get("Content-Type") or "", bytes(body)) for url, headers, body in rows}
+
+
+def record(manifest, cache_dir, cases):
+    """在线运行样例，重新录制响应并更新预期值"""
+    responses = []
+    recorded_cases = []
+    seen = set()
+    for case in cases:
+        before = set(cached_urls(cache_dir))
+        data = run_case(case)
+        after = cached_urls(cache_dir)
+        new_urls = [u for u in after if u not in before and u not in seen]
+        for i, url in enumerate(new_urls):
+            content_type, body = after[url]
+            ext = "json" if "json" in content_type.lower() else "html"
+            name = f"{case['source']}_{case['keyword']}_{i}.{ext}"
+            (FIXTURE_DIR / name).write_bytes(body)
+            responses.append({"url": url, "content_type": content_type, "file": name})
+            seen.add(url)
+        infobox = list((data.get("infobox") or {}).keys())
+        recorded_cases.append({
+            "source": case["source"],
+            "keyword": case["keyword"],
+            "expect": {
+                "title": data.get("title") or case["keyword"],
+                "min_sections": len(data.get("sections") or []),
+                "min_chars": section_chars(data),
+                "infobox_keys": infobox[:2],
+                "min_references": len(data.get("references") or []),
+            },
+        })
+        print(f"[INFO] 录制 {case['source']}:{case['keyword']} — {len(new_urls)} 个响应，"
+              f"{len(data.get('sections') or [])} 个章节")
+    # 删除不再使用的旧样例文件
+    keep = {r["file"] for r in responses}
+    for old in manifest["responses"]:
+        if old["file"] not in keep:
+            (FIXTURE_DIR / old["file"]).unlink(missing_ok=True)
+    manifest["responses"] = responses
+    manifest["cases"] = recorded_cases
+    with open(MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] 已写入 {MANIFEST}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据源离线回放检查")
+    parser.add_argument("--source", choices=["baike", "zhwiki"], help="只检查指定数据源")
+    parser.add_argument("--record", action="store_true", help="在线重新录制样例响应（需要网络）")
+    parser.add_argument("--verbose", action="store_true", help="输出每个样例的章节标题")
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    cases = [c for c in manifest["cases"] if not args.source or c["source"] == args.source]
+
+    with tempfile.TemporaryDirectory(prefix="fastnpc_http_cache_") as cache_dir:
+        configure_cache(cache_dir, offline=not args.record)
+        if args.record:
+            print_header(f"在线录制 {len(cases)} 个样例")
+            return record(manifest, cache_dir, cases)
+
+        print_header(f"离线回放: {import_responses(manifest)} 个响应，{len(cases)} 个样例")
+        failed = 0
+        for case in cases:
+            label = f"{case['source']}:{case['keyword']}"
+            try:
+                data = run_case(case)
+                problems = check_case(case, data)
+            except Exception as e:
+                data, problems = {}, [f"抓取失败: {e}"]
+            if problems:
+                failed += 1
+                print(f"❌ {label}")
+                for p in problems:
+                    print(f"   - {p}")
+            else:
+                print(f"✅ {label}: {len(data.get('sections') or [])} 个章节，{section_chars(data)} 字，"
+                      f"信息框 {len(data.get('infobox') or {})} 项，参考文献 {len(data.get('references') or [])} 条")
+            if args.verbose and data:
+                for s in data.get("sections") or []:
+                    print(f"     · {s.get('title')}")
+
+        from fastnpc.datasources.http_cache import get_http_cache_stats
+        stats = get_http_cache_stats()
+        print(f"\n缓存命中 {stats['hits']} 次，未命中 {stats['misses']} 次")
+        if failed:
+            print(f"[ERROR] {failed}/{len(cases)} 个样例未通过")
+            return 1
+        print(f"[SUCCESS] {len(cases)} 个样例全部通过")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
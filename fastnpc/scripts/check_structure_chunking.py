@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+结构化分块路径检查（不调用 LLM）
+
+章节路由把每个类别的资料限制在类别预算内（2千~1.2万字），分块只在整页超过 MAX_FACTS_CHARS 时触发。
+本脚本对长页面运行 run_async 使用的分块规划（_plan_category_facts），检查：
+- 短页面：每个类别一次调用
+- 长页面：分块路径被触发（至少一个类别分为多块），每块不超过单次上限，
+  且标题命中类别关键词的章节都发送给了该类别（路由没有把长页面截断到一个预算）；
+  同时给出单次路由（只选一个预算）时的保留比例作对比。页面超过 max_chunks × MAX_FACTS_CHARS 时
+  只保留最相关的部分，此时只报告比例、不判定失败
+
+默认的长页面由样例 fixtures/section_routing/zhwiki_李白.json 扩展而成：章节依次复制并在标题后加
+“（续 N）”，直到 Markdown 超过 --target-chars；也可用 --fixture 指定真实的长页面抓取结果
+（CHAR_DIR 下的 baike_*.json / zhwiki_*.json），此时不再扩展。
+
+用法:
+    python fastnpc/scripts/check_structure_chunking.py
+    python fastnpc/scripts/check_structure_chunking.py --fixture path/to/baike_xxx.json --level concise --detail
+"""
+import os
+import sys
+import copy
+import json
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+# 只使用硬编码提示词，不依赖数据库
+os.environ.setdefault("USE_DB_PROMPTS", "false")
+
+from fastnpc.config import STRUCTURE_SECTION_ROUTING
+from fastnpc.pipeline.structure.core import _category_facts, _plan_category_facts
+from fastnpc.pipeline.structure.processors import json_to_markdown
+from fastnpc.pipeline.structure.prompts import MAX_FACTS_CHARS, _category_prompts
+from fastnpc.pipeline.structure.routing import (
+    CATEGORY_BUDGETS,
+    CATEGORY_KEYWORDS,
+    DEFAULT_BUDGET,
+    build_units,
+    estimate_tokens,
+)
+
+
+DEFAULT_FIXTURE = Path(__file__).resolve().parent / "fixtures" / "section_routing" / "zhwiki_李白.json"
+
+
+def print_header(title):
+    print("=" * 80)
+    print(f" {title}")
+    print("=" * 80)
+
+
+def lengthen(data, target_chars):
+    """复制章节（标题加“（续 N）”）直到整页 Markdown 超过 target_chars"""
+    base_sections = [s for s in data.get("sections") or [] if isinstance(s, dict)]
+    if not base_sections:
+        return data
+    long_data = copy.deepcopy(data)
+    round_no = 1
+    while len(json_to_markdown(long_data)) <= target_chars:
+        round_no += 1
+        for sec in base_sections:
+            extra = copy.deepcopy(sec)
+            extra["title"] = f"{sec.get('title') or '章节'}（续 {round_no}）"
+            long_data["sections"].append(extra)
+    # catalog 只描述原始章节层级，扩展出的章节按二级章节处理
+    return long_data
+
+
+def keyword_sections(data, category):
+    """标题命中类别关键词、且单独放得进类别预算的章节标题"""
+    budget = CATEGORY_BUDGETS.get(category, DEFAULT_BUDGET)
+    keywords = CATEGORY_KEYWORDS.get(category, [])
+    return [
+        u.title for u in build_units(data) or []
+        if not u.pinned and len(u.render()) <= budget and any(k in u.title for k in keywords)
+    ]
+
+
+def recall(data, category, texts):
+    expected = keyword_sections(data, category)
+    sent = "\n".join(texts)
+    missing = [t for t in expected if f"## {t}\n" not in sent]
+    return len(expected) - len(missing), len(expected), missing
+
+
+def check_plan(label, data, persona_name, max_chunks, expect_chunked, detail):
+    """返回不符合预期的描述列表"""
+    markdown_text = json_to_markdown(data)
+    categories = list(_category_prompts(persona_name).keys())
+    plan = _plan_category_facts(data, categories, markdown_text, persona_name, max_chunks)
+    calls = sum(len(chunks) for chunks in plan.values())
+    tokens = sum(estimate_tokens(c) for chunks in plan.values() for c in chunks)
+    sections = len([u for u in build_units(data) or [] if not u.pinned])
+    print(f"\n[{label}] 整页 {len(markdown_text)} 字，{sections} 个章节 → {calls} 次调用，资料约 {tokens} tokens")
+    if detail:
+        for cat, chunks in plan.items():
+            sizes = "、".join(str(len(c)) for c in chunks)
+            print(f"  {cat:<10} {len(chunks)} 块（{sizes} 字）")
+
+    problems = []
+    chunked = [cat for cat, chunks in plan.items() if len(chunks) > 1]
+    if expect_chunked and not chunked:
+        problems.append("长页面没有任何类别分块")
+    if not expect_chunked and chunked:
+        problems.append(f"短页面被分块: {', '.join(chunked)}")
+    for cat, chunks in plan.items():
+        if len(chunks) > max_chunks:
+            problems.append(f"{cat}: {len(chunks)} 块超过上限 {max_chunks}")
+        oversized = [len(c) for c in chunks if len(c) > MAX_FACTS_CHARS]
+        if oversized:
+            problems.append(f"{cat}: 分块超过单次上限 {MAX_FACTS_CHARS}: {oversized}")
+    if expect_chunked and STRUCTURE_SECTION_ROUTING:
+        single = _category_facts(data, categories, markdown_text)
+        strict = len(markdown_text) <= max_chunks * MAX_FACTS_CHARS
+        kept_total = single_total = expected_total = 0
+        for cat in categories:
+            kept, expected, missing = recall(data, cat, plan[cat])
+            single_kept, _, _ = recall(data, cat, [single[cat]])
+            kept_total += kept
+            single_total += single_kept
+            expected_total += expected
+            if missing and strict:
+                shown = "、".join(missing[:5]) + ("…" if len(missing) > 5 else "")
+                problems.append(f"{cat}: {len(missing)} 个相关章节未发送: {shown}")
+        if expected_total:
+            print(f"  关键词章节保留: 分块路由 {kept_total}/{expected_total}，单次路由 {single_total}/{expected_total}"
+                  + ("" if strict else "（超过分块上限，只保留最相关部分）"))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="结构化分块路径检查（不调用 LLM）")
+    parser.add_argument("--fixture", help="长页面抓取结果 JSON（默认扩展样例页面）")
+    parser.add_argument("--target-chars", type=int, default=MAX_FACTS_CHARS * 3, help="扩展样例页面的目标长度")
+    parser.add_argument("--level", choices=["concise", "detailed"], default="detailed")
+    parser.add_argument("--detail", action="store_true", help="输出每个类别的分块大小")
+    args = parser.parse_args()
+
+    max_chunks = 6 if args.level == "concise" else 8
+    print_header(f"分块规划检查（章节路由: {'开启' if STRUCTURE_SECTION_ROUTING else '关闭'}，每类最多 {max_chunks} 块）")
+
+    base = json.loads(DEFAULT_FIXTURE.read_text(encoding="utf-8"))
+    persona_name = base.get("title") or base.get("keyword") or "角色"
+    problems = check_plan("短页面", base, persona_name, max_chunks, False, args.detail)
+    if args.fixture:
+        long_data = json.loads(Path(args.fixture).read_text(encoding="utf-8"))
+        long_name = long_data.get("title") or long_data.get("keyword") or "角色"
+        if len(json_to_markdown(long_data)) <= MAX_FACTS_CHARS:
+            print(f"[ERROR] {args.fixture} 不超过 {MAX_FACTS_CHARS} 字，不会触发分块")
+            return 1
+    else:
+        long_data = lengthen(base, args.target_chars)
+        long_name = persona_name
+    problems += check_plan("长页面", long_data, long_name, max_chunks, True, args.detail)
+
+    if problems:
+        for p in problems:
+            print(f"❌ {p}")
+        return 1
+    print("\n[SUCCESS] 分块路径检查通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
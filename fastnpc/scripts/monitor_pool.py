@@ -14,7 +14,7 @@ from datetime import datetime
 project_root = Path(__file__).resolve().parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from fastnpc.api.auth.db_pool import get_pool_status, get_pg_connection_pool
+from fastnpc.api.auth.db_pool import get_pool_status
 from fastnpc.config import USE_POSTGRESQL
 
 
@@ -25,6 +25,19 @@ def print_header():
     print()
 
 
+def print_wait_histogram(status):
+    """打印获取连接的等待时间直方图"""
+    histogram = status.get('wait_histogram') or {}
+    total = sum(histogram.values())
+    print(f"  等待时间: 平均 {status.get('wait_avg_ms', 0):.2f}ms, 最大 {status.get('wait_max_ms', 0):.2f}ms")
+    if not total:
+        return
+    print("  等待时间分布:")
+    for label, count in histogram.items():
+        bar = "#" * int(round(40 * count / total))
+        print(f"    {label:>10} | {count:>8} | {bar}")
+
+
 def print_status():
     """打印连接池状态"""
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -40,20 +53,10 @@ def print_status():
             print(f"  最小连接数: {status.get('min_connections')}")
             print(f"  最大连接数: {status.get('max_connections')}")
             
-            # 尝试获取更详细的信息
-            try:
-                pool = get_pg_connection_pool()
-                # psycopg2.pool 没有直接的API获取当前连接数
-                # 但我们可以尝试获取连接来测试可用性
-                try:
-                    conn = pool.getconn(timeout=0.1)  # 非阻塞获取
-                    pool.putconn(conn)
-                    print(f"  状态: ✅ 可用 (成功获取测试连接)")
-                except Exception as e:
-                    print(f"  状态: ⚠️  可能已满 ({type(e).__name__})")
-            except Exception as e:
-                print(f"  错误: {e}")
-    
+            print(f"  连接总数: {status.get('size')}  使用中: {status.get('in_use')}  空闲: {status.get('idle')}  排队等待: {status.get('waiting')}")
+            print(f"  累计获取: {status.get('acquired')}  超时: {status.get('timeouts')}  "
+                  f"健康检查失败: {status.get('health_check_failed')}  到期回收: {status.get('recycled_lifetime')}")
+            print_wait_histogram(status)
     print()
 
 
@@ -72,50 +75,59 @@ def monitor_loop(interval=5):
         print("\n监控已停止")
 
 
-def test_connection_acquisition(count=10):
-    """测试连接获取（压力测试）"""
+def test_connection_acquisition(count=10, threads=1, hold=0.0):
+    """测试连接获取（压力测试）
+
+    threads > 1 时并发获取，每个连接持有 hold 秒后归还，用于观察连接池饱和时的排队情况。
+    """
     print_header()
-    print(f"测试连接获取（{count}次）")
+    print(f"测试连接获取（{count}次，{threads}个线程）")
     print()
     
     if not USE_POSTGRESQL:
         print("SQLite 不使用连接池，跳过测试")
         return
     
+    from concurrent.futures import ThreadPoolExecutor
     from fastnpc.api.auth.db_pool import get_connection_from_pool, return_connection_to_pool
     
-    connections = []
+    def acquire_once(i):
+        start = time.time()
+        conn = get_connection_from_pool()
+        duration = (time.time() - start) * 1000
+        try:
+            if hold > 0:
+                time.sleep(hold)
+        finally:
+            return_connection_to_pool(conn)
+        return duration
+    
     success = 0
     failed = 0
+    durations = []
     
-    # 获取连接
-    print(f"尝试获取 {count} 个连接...")
-    for i in range(count):
-        try:
-            start = time.time()
-            conn = get_connection_from_pool()
-            duration = (time.time() - start) * 1000
-            connections.append(conn)
-            success += 1
-            print(f"  [{i+1}/{count}] ✅ 成功 (耗时: {duration:.1f}ms)")
-        except Exception as e:
-            failed += 1
-            print(f"  [{i+1}/{count}] ❌ 失败: {e}")
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        futures = [executor.submit(acquire_once, i) for i in range(count)]
+        for i, future in enumerate(futures):
+            try:
+                duration = future.result()
+                durations.append(duration)
+                success += 1
+                if threads == 1:
+                    print(f"  [{i+1}/{count}] ✅ 成功 (耗时: {duration:.1f}ms)")
+            except Exception as e:
+                failed += 1
+                print(f"  [{i+1}/{count}] ❌ 失败: {e}")
     
     print()
     print(f"获取结果: 成功 {success}, 失败 {failed}")
+    if durations:
+        durations.sort()
+        p50 = durations[len(durations) // 2]
+        p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+        print(f"获取耗时: p50 {p50:.1f}ms, p99 {p99:.1f}ms, max {durations[-1]:.1f}ms")
     print()
-    
-    # 归还连接
-    if connections:
-        print(f"归还 {len(connections)} 个连接...")
-        for i, conn in enumerate(connections):
-            try:
-                return_connection_to_pool(conn)
-                print(f"  [{i+1}/{len(connections)}] ✅ 已归还")
-            except Exception as e:
-                print(f"  [{i+1}/{len(connections)}] ❌ 归还失败: {e}")
-    
+    print_wait_histogram(get_pool_status())
     print()
     print("测试完成")
 
@@ -130,13 +142,17 @@ def main():
                         help='监控间隔（秒），默认5秒')
     parser.add_argument('--count', type=int, default=10,
                         help='测试连接数量，默认10')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='测试并发线程数，默认1')
+    parser.add_argument('--hold', type=float, default=0.0,
+                        help='测试时每个连接的持有时间（秒），默认0')
     
     args = parser.parse_args()
     
     if args.mode == 'monitor':
         monitor_loop(args.interval)
     elif args.mode == 'test':
-        test_connection_acquisition(args.count)
+        test_connection_acquisition(args.count, args.threads, args.hold)
     else:  # status
         print_header()
         print_status()
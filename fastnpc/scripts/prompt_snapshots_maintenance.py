@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+System prompt 快照维护工具
+
+- --stats:    查看去重存储统计（逻辑原文总量 vs 实际存储量）
+- --backfill: 将旧消息 system_prompt_snapshot 文本列中的快照迁移到去重存储
+- --gc:       清理无引用的快照和分块（--recount 先按消息表重新统计引用计数）
+
+用法:
+    python fastnpc/scripts/prompt_snapshots_maintenance.py --stats
+    python fastnpc/scripts/prompt_snapshots_maintenance.py --backfill --batch 500
+    python fastnpc/scripts/prompt_snapshots_maintenance.py --gc --recount
+"""
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastnpc.api.auth import _get_conn, _return_conn
+from fastnpc.api.auth.prompt_snapshots import (
+    store_prompt_snapshot,
+    gc_prompt_snapshots,
+    get_prompt_snapshot_stats,
+)
+
+
+def print_header(title):
+    print("=" * 80)
+    print(f" {title}")
+    print("=" * 80)
+
+
+def print_stats(conn):
+    cur = conn.cursor()
+    stats = get_prompt_snapshot_stats(cur)
+    conn.commit()
+    logical = stats["logical_chars"]
+    stored = stats["stored_bytes"]
+    print(f"  快照数: {stats['snapshots']}  引用消息数: {stats['references']}  分块数: {stats['chunks']}")
+    print(f"  逻辑原文: {logical} 字符  实际存储: {stored} 字节")
+    if stored:
+        print(f"  压缩比: {logical / stored:.1f}x（按字符/字节粗略估算）")
+    for table in ("messages", "group_messages"):
+        cur.execute(f"SELECT COUNT(*) FROM {table} WHERE system_prompt_snapshot IS NOT NULL")
+        legacy = cur.fetchone()[0]
+        print(f"  {table} 未迁移的旧快照: {legacy}")
+    conn.commit()
+
+
+def backfill(conn, batch):
+    """分批迁移旧快照：每批一个事务，写入去重存储后清空文本列"""
+    for table in ("messages", "group_messages"):
+        migrated = 0
+        started = time.time()
+        while True:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    f"SELECT id, system_prompt_snapshot FROM {table} "
+                    "WHERE system_prompt_snapshot IS NOT NULL ORDER BY id ASC LIMIT %s",
+                    (batch,),
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                for msg_id, text in rows:
+                    snapshot_id = store_prompt_snapshot(cur, text)
+                    cur.execute(
+                        f"UPDATE {table} SET system_prompt_snapshot_id=%s, system_prompt_snapshot=NULL WHERE id=%s",
+                        (snapshot_id, msg_id),
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            migrated += len(rows)
+            print(f"  {table}: 已迁移 {migrated} 条")
+        print(f"[INFO] {table} 迁移完成: {migrated} 条（{time.time() - started:.1f}s）")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='System prompt 快照维护工具')
+    parser.add_argument('--stats', action='store_true', help='显示去重存储统计')
+    parser.add_argument('--backfill', action='store_true', help='迁移旧消息中的快照文本')
+    parser.add_argument('--batch', type=int, default=500, help='每批迁移的消息数，默认500')
+    parser.add_argument('--gc', action='store_true', help='清理无引用的快照和分块')
+    parser.add_argument('--recount', action='store_true', help='清理前按消息表重新统计引用计数')
+    args = parser.parse_args()
+
+    if not (args.stats or args.backfill or args.gc):
+        args.stats = True
+
+    conn = _get_conn()
+    try:
+        if args.backfill:
+            print_header("迁移旧快照")
+            backfill(conn, max(1, args.batch))
+        if args.gc:
+            print_header("清理无引用快照")
+            cur = conn.cursor()
+            try:
+                result = gc_prompt_snapshots(cur, recount=args.recount)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"  删除快照: {result['snapshots_deleted']}  删除分块: {result['chunks_deleted']}")
+        if args.stats:
+            print_header("快照存储统计")
+            print_stats(conn)
+    finally:
+        _return_conn(conn)
+
+
+if __name__ == '__main__':
+    main()
@@ -23,6 +23,7 @@ function AppContent() {
   const {
     characters,
     setCharacters,
+    refreshList,
     activeRole,
     setActiveRole,
     messages,
@@ -107,9 +108,8 @@ function AppContent() {
   async function loadInitialData() {
       try {
         const me = await api.get('/auth/me')
-      const [chars, grps] = await Promise.all([api.get('/api/characters'), api.get('/api/groups')])
+      const [chars, grps] = await Promise.all([refreshList(), api.get('/api/groups')])
         
-        setCharacters(chars.data.items || [])
         setGroups(grps.data.items || [])
         
         if (me.data?.is_admin === 1) {
@@ -119,8 +119,8 @@ function AppContent() {
           } catch {}
         }
         
-        if (chars.data.items?.length && !activeRole && !activeGroupId) {
-          setActiveRole(chars.data.items[0].role)
+        if (chars.length && !activeRole && !activeGroupId) {
+          setActiveRole(chars[0].role)
           setActiveType('character')
         }
 
@@ -30,9 +30,17 @@ export function Sidebar({
   const [q, setQ] = useState('')
   const [sort, setSort] = useState<'updated' | 'alpha'>('updated')
 
-  const { menuVisible, setMenuVisible, menuPos, setMenuPos, menuRole, setMenuRole, renaming, setRenaming, newName, setNewName, renameRole, deleteRole, copyRole } =
+  const { menuVisible, setMenuVisible, menuPos, setMenuPos, menuRole, setMenuRole, renaming, setRenaming, newName, setNewName, renameRole, deleteRole, copyRole, hasMoreCharacters, loadingMoreCharacters, loadMoreCharacters } =
     useCharacter()
 
+  // 滚动接近底部时加载下一页角色
+  function handleListScroll(e: React.UIEvent<HTMLUListElement>) {
+    const el = e.currentTarget
+    if (hasMoreCharacters && !loadingMoreCharacters && el.scrollTop + el.clientHeight >= el.scrollHeight - 80) {
+      loadMoreCharacters()
+    }
+  }
+
   const allItems = [
     ...characters.map(c => ({
       type: 'character' as const,
@@ -65,7 +73,7 @@ export function Sidebar({
           <option value="alpha">按名称</option>
         </select>
       </div>
-      <ul className="role-list">
+      <ul className="role-list" onScroll={handleListScroll}>
         {filteredItems.map(item => (
           <li
             key={`${item.type}-${item.type === 'character' ? item.data.role : item.data.id}`}
@@ -188,6 +196,13 @@ export function Sidebar({
             )}
           </li>
         ))}
+        {hasMoreCharacters && (
+          <li className="load-more">
+            <button onClick={() => loadMoreCharacters()} disabled={loadingMoreCharacters}>
+              {loadingMoreCharacters ? '加载中...' : '加载更多角色'}
+            </button>
+          </li>
+        )}
       </ul>
       <div className="fab-container">
         <div className="fab-hint">新建</div>
@@ -39,7 +39,7 @@ export function CreateCharacterModal({ show, onClose, onOpenPoly }: CreateCharac
     createRole,
     polyChoiceIdx,
     characters,
-    setCharacters,
+    refreshList,
     activeRole,
   } = useCharacter()
 
@@ -90,8 +90,7 @@ export function CreateCharacterModal({ show, onClose, onOpenPoly }: CreateCharac
       })
 
       // 刷新角色列表
-      const { data: list } = await api.get('/api/characters')
-      setCharacters(list.items || [])
+      await refreshList()
       
       alert('头像已更新')
     } catch (e: any) {
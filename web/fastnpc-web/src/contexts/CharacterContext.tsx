@@ -79,8 +79,13 @@ interface CharacterContextType {
   showManageChar: boolean
   setShowManageChar: (show: boolean) => void
   
+  // 角色列表分页（侧边栏按 updated_at 倒序逐页加载）
+  hasMoreCharacters: boolean
+  loadingMoreCharacters: boolean
+  loadMoreCharacters: () => Promise<void>
+  
   // 方法
-  refreshList: () => Promise<void>
+  refreshList: () => Promise<CharacterItem[]>
   createRole: () => Promise<void>
   cancelCurrentTask: () => Promise<void>
   renameRole: (oldName: string) => Promise<void>
@@ -91,12 +96,17 @@ interface CharacterContextType {
   loadCharBrief: () => Promise<void>
 }
 
+// 侧边栏每页加载的角色数（后端上限 200）
+const CHARACTER_PAGE_SIZE = 50
+
 const CharacterContext = createContext<CharacterContextType | undefined>(undefined)
 
 export function CharacterProvider({ children }: { children: ReactNode }) {
   const { api, user } = useAuth()
   
   const [characters, setCharacters] = useState<CharacterItem[]>([])
+  const [charactersCursor, setCharactersCursor] = useState<string | null>(null)
+  const [loadingMoreCharacters, setLoadingMoreCharacters] = useState(false)
   const [activeRole, setActiveRole] = useState<string>('')
   const [messages, setMessages] = useState<Message[]>([])
   const [input, setInput] = useState('')
@@ -140,9 +150,32 @@ export function CharacterProvider({ children }: { children: ReactNode }) {
   const [charIntro, setCharIntro] = useState<string>('')
   const [showManageChar, setShowManageChar] = useState(false)
 
-  async function refreshList() {
-    const { data } = await api.get('/api/characters')
-    setCharacters(data.items || [])
+  // 重新加载第一页（已加载的后续页丢弃，滚动到底部时再继续加载）
+  async function refreshList(): Promise<CharacterItem[]> {
+    const { data } = await api.get('/api/characters', { params: { limit: CHARACTER_PAGE_SIZE } })
+    const items: CharacterItem[] = data.items || []
+    setCharacters(items)
+    setCharactersCursor(data.next_cursor || null)
+    return items
+  }
+
+  async function loadMoreCharacters() {
+    if (!charactersCursor || loadingMoreCharacters) return
+    setLoadingMoreCharacters(true)
+    try {
+      const { data } = await api.get('/api/characters', { params: { limit: CHARACTER_PAGE_SIZE, cursor: charactersCursor } })
+      const items: CharacterItem[] = data.items || []
+      // 翻页期间本地新增（复制等）的角色可能再次出现，按角色名去重（同一用户下唯一）
+      setCharacters(prev => {
+        const seen = new Set(prev.map(c => c.role))
+        return [...prev, ...items.filter(c => !seen.has(c.role))]
+      })
+      setCharactersCursor(data.next_cursor || null)
+    } catch (e) {
+      console.error('加载更多角色失败:', e)
+    } finally {
+      setLoadingMoreCharacters(false)
+    }
   }
 
   async function reloadMessages() {
@@ -187,18 +220,12 @@ export function CharacterProvider({ children }: { children: ReactNode }) {
       const { data } = await api.post('/api/characters', payload)
       const taskId = data.task_id
       setCurrentTaskId(taskId)
-      // poll
-      let done = false
-      let finalStatus = ''
-      while (!done) {
+      // 优先通过 SSE 接收进度推送，连接失败时回退为轮询
+      let finalStatus = await waitTaskEvents(taskId)
+      while (!finalStatus) {
         const { data: t } = await api.get(`/api/tasks/${taskId}`)
         setProgress(t)
-        if (t.status === 'done') {
-          done = true
-          finalStatus = 'done'
-          break
-        }
-        if (t.status === 'error' || t.status === 'not_found' || t.status === 'cancelled') {
+        if (t.status === 'done' || t.status === 'error' || t.status === 'not_found' || t.status === 'cancelled') {
           finalStatus = t.status
           break
         }
@@ -211,17 +238,18 @@ export function CharacterProvider({ children }: { children: ReactNode }) {
         await new Promise(r => setTimeout(r, 1000))
       }
       
-      // refresh list
-      const { data: list } = await api.get('/api/characters')
-      setCharacters(list.items || [])
+      // refresh list（新角色 updated_at 最新，位于第一页）
+      await refreshList()
       
       // 只有成功完成时才设置活动角色
       if (finalStatus === 'done') {
         setActiveRole(roleWithTs)
         setCreateDone(true)
       }
-    } catch (e) {
+    } catch (e:any) {
       console.error(e)
+      // 排队已满或同时创建的角色过多（429）
+      if (e?.response?.status === 429) alert(e?.response?.data?.error || '当前创建任务较多，请稍后再试')
     } finally {
       setCreating(false)
       setCurrentTaskId('')
@@ -233,6 +261,23 @@ export function CharacterProvider({ children }: { children: ReactNode }) {
     }
   }
   
+  // 订阅任务进度事件，返回最终状态；SSE 不可用或中途断开时返回空字符串
+  function waitTaskEvents(taskId: string): Promise<string> {
+    return new Promise(resolve => {
+      if (typeof EventSource === 'undefined') { resolve(''); return }
+      const es = new EventSource(`/api/tasks/${taskId}/events`, { withCredentials: true })
+      es.onmessage = (ev) => {
+        const t = JSON.parse(ev.data)
+        setProgress(t)
+        if (t.status === 'done' || t.status === 'error' || t.status === 'not_found' || t.status === 'cancelled') {
+          es.close()
+          resolve(t.status)
+        }
+      }
+      es.onerror = () => { es.close(); resolve('') }
+    })
+  }
+
   async function cancelCurrentTask() {
     if (!currentTaskId) return
     try {
@@ -428,6 +473,9 @@ export function CharacterProvider({ children }: { children: ReactNode }) {
         setCharIntro,
         showManageChar,
         setShowManageChar,
+        hasMoreCharacters: charactersCursor != null,
+        loadingMoreCharacters,
+        loadMoreCharacters,
         refreshList,
         createRole,
         cancelCurrentTask,